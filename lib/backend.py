@@ -75,6 +75,7 @@ from ganeti.storage import bdev
 from ganeti.storage import drbd
 from ganeti.storage import extstorage
 from ganeti.storage import filestorage
+from ganeti.storage import wipe
 from ganeti import objects
 from ganeti import ssconf
 from ganeti import serializer
@@ -87,6 +88,7 @@ from ganeti import ht
 from ganeti.storage.base import BlockDev
 from ganeti.storage.drbd import DRBD8
 from ganeti import hooksmaster
+from ganeti import workerpool
 import ganeti.metad as metad
 
 
@@ -103,6 +105,9 @@ _X509_CERT_FILE = "cert"
 _IES_STATUS_FILE = "status"
 _IES_PID_FILE = "pid"
 _IES_CA_FILE = "ca"
+_WIPE_STATUS_FILE = "status"
+_WIPE_PID_FILE = "pid"
+_WIPE_OUTPUT_FILE = "output"
 
 #: Valid LVS output line regex
 _LVSLINE_REGEX = re.compile(r"^ *([^|]+)\|([^|]+)\|([0-9.]+)\|([^|]{6,})\|?$")
@@ -124,6 +129,9 @@ _RCMD_INVALID_DELAY = 10
 #: command requests arrive
 _RCMD_LOCK_TIMEOUT = _RCMD_INVALID_DELAY * 0.8
 
+#: How long to wait for the lock on the command statistics file
+_CMD_STATS_LOCK_TIMEOUT = 5.0
+
 
 class RPCFail(Exception):
   """Class denoting RPC failure.
@@ -1140,16 +1148,26 @@ def VerifyNodeNetTest(my_name, test_config):
                        " in the node list")
     return result
 
-  for name, pip, sip in nodes:
-    fail = []
-    if not netutils.TcpPing(pip, port, source=my_pip):
-      fail.append("primary")
-      if sip != pip:
-        if not netutils.TcpPing(sip, port, source=my_sip):
-          fail.append("secondary")
-      if fail:
-        result[name] = ("failure using the %s interface(s)" %
-                        " and ".join(fail))
+  # All nodes are probed at once; the secondary IP is only tried for nodes
+  # whose primary IP can't be reached
+  primary_ok = netutils.TcpPingMany([(pip, my_pip) for (_, pip, _) in nodes],
+                                    port)
+  failed = [(name, pip, sip)
+            for ((name, pip, sip), success) in zip(nodes, primary_ok)
+            if not success]
+
+  secondary = [(name, sip) for (name, pip, sip) in failed if sip != pip]
+  secondary_ok = dict(zip([name for (name, _) in secondary],
+                          netutils.TcpPingMany([(sip, my_sip)
+                                                for (_, sip) in secondary],
+                                               port)))
+
+  for name, pip, sip in failed:
+    fail = ["primary"]
+    if sip != pip and not secondary_ok[name]:
+      fail.append("secondary")
+    result[name] = ("failure using the %s interface(s)" %
+                    " and ".join(fail))
   return result
 
 
@@ -1251,14 +1269,20 @@ def VerifyNode(what, cluster_name, all_hvparams):
     # Try to contact all nodes
     val = {}
     ssh_port_map = ssconf.SimpleStore().GetSshPortMap()
-    for node in nodes:
-      # We only test if master candidates can communicate to other nodes.
-      # We cannot test if normal nodes cannot communicate with other nodes,
-      # because the administrator might have installed additional SSH keys,
-      # over which Ganeti has no power.
-      if my_name in mcs:
-        success, message = _GetSshRunner(cluster_name). \
-                              VerifyNodeHostname(node, ssh_port_map[node])
+    # We only test if master candidates can communicate to other nodes.
+    # We cannot test if normal nodes cannot communicate with other nodes,
+    # because the administrator might have installed additional SSH keys,
+    # over which Ganeti has no power.
+    if my_name in mcs:
+      runner = _GetSshRunner(cluster_name)
+      results = workerpool.ParallelMap(
+        "VerifyNodeHostname",
+        lambda node: runner.VerifyNodeHostname(node, ssh_port_map[node]),
+        nodes, constants.SSHS_MAX_PARALLEL)
+      for (node, (ok, ret)) in zip(nodes, results):
+        if not ok:
+          raise ret
+        (success, message) = ret
         if not success:
           val[node] = message
 
@@ -1391,6 +1415,76 @@ def VerifyNode(what, cluster_name, all_hvparams):
   return result
 
 
+def _UpdateCommandStatsFile(filename, fn):
+  """Reads and optionally updates the node daemon's command statistics.
+
+  @type filename: string
+  @param filename: path to the statistics file
+  @type fn: callable
+  @param fn: function receiving the current statistics and returning the
+    new ones, or C{None} if the file should not be changed
+  @rtype: dict
+  @return: the statistics read from the file
+
+  """
+  lock = utils.FileLock.Open(filename)
+  try:
+    lock.Exclusive(blocking=True, timeout=_CMD_STATS_LOCK_TIMEOUT)
+
+    lock.fd.seek(0)
+    data = lock.fd.read()
+    if data:
+      stats = serializer.LoadJson(data)
+    else:
+      stats = {}
+
+    new_stats = fn(stats)
+    if new_stats is not None:
+      lock.fd.seek(0)
+      lock.fd.truncate()
+      lock.fd.write(serializer.DumpJson(new_stats))
+      lock.fd.flush()
+  finally:
+    lock.Close()
+
+  return stats
+
+
+def UpdateCommandStats(stats,
+                       _stats_file=pathutils.NODED_COMMAND_STATS_FILE):
+  """Adds the statistics of a single request to the node's totals.
+
+  The node daemon handles every request in a separate process, so the
+  statistics collected by L{utils.RunCmd} are combined in a file.
+
+  @type stats: dict
+  @param stats: statistics as returned by L{utils.GetCommandStats}
+
+  """
+  if stats:
+    _UpdateCommandStatsFile(_stats_file,
+                            lambda total: utils.MergeCommandStats(total,
+                                                                  stats))
+
+
+def GetCommandStats(reset, _stats_file=pathutils.NODED_COMMAND_STATS_FILE):
+  """Returns the statistics of the commands run by the node daemon.
+
+  @type reset: bool
+  @param reset: whether to clear the statistics after reading them
+  @rtype: dict
+  @return: dictionary mapping program names to their statistics, see
+    L{utils.GetCommandStats}
+
+  """
+  if reset:
+    fn = lambda _: {}
+  else:
+    fn = lambda _: None
+
+  return _UpdateCommandStatsFile(_stats_file, fn)
+
+
 def GetCryptoTokens(token_requests):
   """Perform actions on the node's cryptographic tokens.
 
@@ -1460,6 +1554,47 @@ def _InitSshUpdateData(data, noded_cert_file, ssconf_store):
   data[constants.SSHS_CLUSTER_NAME] = cluster_name
 
 
+def _RunSshUpdateOnNodes(run_cmd_fn, cluster_name, ssh_port_map, node_data,
+                         max_parallel=constants.SSHS_MAX_PARALLEL, **kwargs):
+  """Runs C{ssh_update} on several nodes concurrently.
+
+  @type run_cmd_fn: function
+  @param run_cmd_fn: function to run commands on remote nodes via SSH
+  @type cluster_name: string
+  @param cluster_name: the name of the cluster
+  @type ssh_port_map: dict of str to int
+  @param ssh_port_map: mapping of node names to their SSH port
+  @type node_data: list of tuples; (string, dict, boolean)
+  @param node_data: the names of the nodes to update, each with the data to
+    pass to C{ssh_update} and whether to retry a failed update up to
+    C{constants.SSHS_MAX_RETRIES} times
+  @type max_parallel: int
+  @param max_parallel: the maximum number of nodes updated at the same time
+  @param kwargs: further keyword arguments for C{run_cmd_fn}
+  @rtype: list of tuples; (string, bool, object)
+  @return: for every node, in the order of C{node_data}, the node name,
+    whether the update succeeded and either the result of the update or the
+    exception it raised
+
+  """
+  def _Update((node, data, retry)):
+    args = (cluster_name, node, pathutils.SSH_UPDATE, ssh_port_map.get(node),
+            data)
+    if retry:
+      backoff = 5  # seconds
+      return utils.RetryByNumberOfTimes(constants.SSHS_MAX_RETRIES, backoff,
+                                        errors.SshUpdateError, run_cmd_fn,
+                                        *args, **kwargs)
+    else:
+      return run_cmd_fn(*args, **kwargs)
+
+  results = workerpool.ParallelMap("SshUpdate", _Update, node_data,
+                                   max_parallel)
+
+  return [(node, success, result)
+          for ((node, _, _), (success, result)) in zip(node_data, results)]
+
+
 def AddNodeSshKey(node_uuid, node_name,
                   potential_master_candidates,
                   to_authorized_keys=False,
@@ -1555,6 +1690,7 @@ def AddNodeSshKeyBulk(node_list,
   if not ssconf_store:
     ssconf_store = ssconf.SimpleStore()
 
+  name_replacements = []
   for node_info in node_list:
     # replacement not necessary for keys that are not supposed to be in the
     # list of public keys
@@ -1574,9 +1710,11 @@ def AddNodeSshKeyBulk(node_list,
       if node_info.name in keys_by_name:
         # Replace the name by UUID in the file as the name should only be used
         # temporarily
-        ssh.ReplaceNameByUuid(node_info.uuid, node_info.name,
-                              error_fn=errors.SshUpdateError,
-                              key_file=pub_key_file)
+        name_replacements.append(
+          (ssh.PUB_KEY_RENAME, node_info.name, node_info.uuid))
+  if name_replacements:
+    ssh.ModifyPubKeyFile(name_replacements, error_fn=errors.SshUpdateError,
+                         key_file=pub_key_file)
 
   # Retrieve updated map of UUIDs to keys
   keys_by_uuid = ssh.QueryPubKeyFile(
@@ -1596,29 +1734,36 @@ def AddNodeSshKeyBulk(node_list,
   ssh_port_map = ssconf_store.GetSshPortMap()
 
   # Update the target nodes themselves
+  node_data = None
+  target_data = []
   for node_info in node_list:
     logging.debug("Updating SSH key files of target node '%s'.", node_info.name)
     if node_info.get_public_keys:
-      node_data = {}
-      _InitSshUpdateData(node_data, noded_cert_file, ssconf_store)
-      all_keys = ssh.QueryPubKeyFile(None, key_file=pub_key_file)
-      node_data[constants.SSHS_SSH_PUBLIC_KEYS] = \
-        (constants.SSHS_OVERRIDE, all_keys)
-
-      try:
-        backoff = 5  # seconds
-        utils.RetryByNumberOfTimes(
-            constants.SSHS_MAX_RETRIES, backoff,
-            errors.SshUpdateError,
-            run_cmd_fn, cluster_name, node_info.name, pathutils.SSH_UPDATE,
-            ssh_port_map.get(node_info.name), node_data,
-            debug=ssh_update_debug, verbose=ssh_update_verbose,
-            use_cluster_key=False, ask_key=False, strict_host_check=False)
-      except errors.SshUpdateError as e:
-        # Clean up the master's public key file if adding key fails
-        if node_info.to_public_keys:
-          ssh.RemovePublicKey(node_info.uuid)
-        raise e
+      if node_data is None:
+        node_data = {}
+        _InitSshUpdateData(node_data, noded_cert_file, ssconf_store)
+        all_keys = ssh.QueryPubKeyFile(None, key_file=pub_key_file)
+        node_data[constants.SSHS_SSH_PUBLIC_KEYS] = \
+          (constants.SSHS_OVERRIDE, all_keys)
+      target_data.append((node_info, (node_info.name, node_data, True)))
+
+  target_results = _RunSshUpdateOnNodes(
+      run_cmd_fn, cluster_name, ssh_port_map,
+      [data for (_, data) in target_data],
+      debug=ssh_update_debug, verbose=ssh_update_verbose,
+      use_cluster_key=False, ask_key=False, strict_host_check=False)
+
+  target_errors = [(node_info, err)
+                   for ((node_info, _), (_, success, err))
+                   in zip(target_data, target_results)
+                   if not success]
+  if target_errors:
+    # Clean up the master's public key file if adding key fails
+    ssh.ModifyPubKeyFile([(ssh.PUB_KEY_REMOVE, node_info.uuid, None)
+                          for (node_info, err) in target_errors
+                          if isinstance(err, errors.SshUpdateError) and
+                          node_info.to_public_keys])
+    raise target_errors[0][1]
 
   # Update all nodes except master and the target nodes
   keys_by_uuid_auth = ssh.QueryPubKeyFile(
@@ -1642,7 +1787,7 @@ def AddNodeSshKeyBulk(node_list,
   master_node = ssconf_store.GetMasterNode()
   online_nodes = ssconf_store.GetOnlineNodeList()
 
-  node_errors = []
+  update_data = []
   for node in all_nodes:
     if node == master_node:
       logging.debug("Skipping master node '%s'.", master_node)
@@ -1652,32 +1797,32 @@ def AddNodeSshKeyBulk(node_list,
       continue
     if node in potential_master_candidates:
       logging.debug("Updating SSH key files of node '%s'.", node)
-      try:
-        backoff = 5  # seconds
-        utils.RetryByNumberOfTimes(
-            constants.SSHS_MAX_RETRIES, backoff, errors.SshUpdateError,
-            run_cmd_fn, cluster_name, node, pathutils.SSH_UPDATE,
-            ssh_port_map.get(node), pot_mc_data,
-            debug=ssh_update_debug, verbose=ssh_update_verbose,
-            use_cluster_key=False, ask_key=False, strict_host_check=False)
-      except errors.SshUpdateError as last_exception:
-        error_msg = ("When adding the key of node '%s', updating SSH key"
-                     " files of node '%s' failed after %s retries."
-                     " Not trying again. Last error was: %s." %
-                     (node, node_info.name, constants.SSHS_MAX_RETRIES,
-                      last_exception))
-        node_errors.append((node, error_msg))
-        # We only log the error and don't throw an exception, because
-        # one unreachable node shall not abort the entire procedure.
-        logging.error(error_msg)
+      update_data.append((node, pot_mc_data, True))
+    elif to_authorized_keys:
+      update_data.append((node, base_data, False))
 
+  results = _RunSshUpdateOnNodes(
+      run_cmd_fn, cluster_name, ssh_port_map, update_data,
+      debug=ssh_update_debug, verbose=ssh_update_verbose,
+      use_cluster_key=False, ask_key=False, strict_host_check=False)
+
+  node_errors = []
+  for (node, success, result) in results:
+    if success:
+      continue
+    if node in potential_master_candidates and \
+        isinstance(result, errors.SshUpdateError):
+      error_msg = ("When adding the key of node '%s', updating SSH key"
+                   " files of node '%s' failed after %s retries."
+                   " Not trying again. Last error was: %s." %
+                   (node, node_info.name, constants.SSHS_MAX_RETRIES,
+                    result))
+      node_errors.append((node, error_msg))
+      # We only log the error and don't throw an exception, because
+      # one unreachable node shall not abort the entire procedure.
+      logging.error(error_msg)
     else:
-      if to_authorized_keys:
-        run_cmd_fn(cluster_name, node, pathutils.SSH_UPDATE,
-                   ssh_port_map.get(node), base_data,
-                   debug=ssh_update_debug, verbose=ssh_update_verbose,
-                   use_cluster_key=False, ask_key=False,
-                   strict_host_check=False)
+      raise result
 
   return node_errors
 
@@ -1902,6 +2047,7 @@ def RemoveNodeSshKeyBulk(node_list,
       all_nodes_to_remove = [node_info.name for node_info in node_list]
       logging.debug("Removing keys of nodes '%s' from all nodes but itself and"
                     " master.", ", ".join(all_nodes_to_remove))
+      update_data = []
       for node in all_nodes:
         if node == master_node:
           logging.debug("Skipping master node '%s'.", master_node)
@@ -1917,9 +2063,6 @@ def RemoveNodeSshKeyBulk(node_list,
           raise errors.OpExecError("No SSH port information available for"
                                    " node '%s', map: %s." %
                                    (node, ssh_port_map))
-        error_msg_final = ("When removing the key of node '%s', updating the"
-                           " SSH key files of node '%s' failed. Last error"
-                           " was: %s.")
 
         if node in potential_master_candidates or from_authorized_keys:
           if node in potential_master_candidates:
@@ -1927,19 +2070,22 @@ def RemoveNodeSshKeyBulk(node_list,
           else:
             node_desc = "normal"
           logging.debug("Updating key setup of %s node %s.", node_desc, node)
-          try:
-            backoff = 5  # seconds
-            utils.RetryByNumberOfTimes(
-                constants.SSHS_MAX_RETRIES, backoff, errors.SshUpdateError,
-                run_cmd_fn, cluster_name, node, pathutils.SSH_UPDATE,
-                ssh_port, pot_mc_data,
-                debug=ssh_update_debug, verbose=ssh_update_verbose,
-                use_cluster_key=False, ask_key=False, strict_host_check=False)
-          except errors.SshUpdateError as last_exception:
-            error_msg = error_msg_final % (
-                node_info.name, node, last_exception)
-            result_msgs.append((node, error_msg))
-            logging.error(error_msg)
+          update_data.append((node, pot_mc_data, True))
+
+      error_msg_final = ("When removing the key of node '%s', updating the"
+                         " SSH key files of node '%s' failed. Last error"
+                         " was: %s.")
+      for (node, success, result) in _RunSshUpdateOnNodes(
+          run_cmd_fn, cluster_name, ssh_port_map, update_data,
+          debug=ssh_update_debug, verbose=ssh_update_verbose,
+          use_cluster_key=False, ask_key=False, strict_host_check=False):
+        if success:
+          continue
+        if not isinstance(result, errors.SshUpdateError):
+          raise result
+        error_msg = error_msg_final % (node_info.name, node, result)
+        result_msgs.append((node, error_msg))
+        logging.error(error_msg)
 
   for node_info in node_list:
     if node_info.clear_authorized_keys or node_info.from_public_keys or \
@@ -1998,8 +2144,9 @@ def RemoveNodeSshKeyBulk(node_list,
               " Error: %s" % (node_info.name, last_exception))))
 
   if all_keys_to_remove and from_public_keys:
-    for node_uuid in nodes_remove_from_public_keys:
-      ssh.RemovePublicKey(node_uuid, key_file=pub_key_file)
+    ssh.ModifyPubKeyFile([(ssh.PUB_KEY_REMOVE, node_uuid, None)
+                          for node_uuid in nodes_remove_from_public_keys],
+                         key_file=pub_key_file)
 
   return result_msgs
 
@@ -2171,29 +2318,41 @@ def RenewSshKeys(node_uuids, node_names, master_candidate_uuids,
     node_list.append((node_uuid, node_name, master_candidate,
                       potential_master_candidate))
 
-    if master_candidate:
-      logging.debug("Fetching old SSH key from node '%s'.", node_name)
-      old_pub_key = ssh.ReadRemoteSshPubKey(old_pub_keyfile,
-                                            node_name, cluster_name,
-                                            ssh_port_map[node_name],
-                                            False, # ask_key
-                                            False) # key_check
-      if old_pub_key != old_master_key:
-        # If we are already in a multi-key setup (that is past Ganeti 2.12),
-        # we can safely remove the old key of the node. Otherwise, we cannot
-        # remove that node's key, because it is also the master node's key
-        # and that would terminate all communication from the master to the
-        # node.
-        node_info_to_remove.append(SshRemoveNodeInfo(
-            uuid=node_uuid,
-            name=node_name,
-            from_authorized_keys=master_candidate,
-            from_public_keys=False,
-            clear_authorized_keys=False,
-            clear_public_keys=False))
-      else:
-        logging.debug("Old key of node '%s' is the same as the current master"
-                      " key. Not deleting that key on the node.", node_name)
+  def _FetchPubKey(pub_keyfile, node_name):
+    return ssh.ReadRemoteSshPubKey(pub_keyfile, node_name, cluster_name,
+                                   ssh_port_map[node_name],
+                                   False, # ask_key
+                                   False) # key_check
+
+  mc_nodes = [(node_uuid, node_name)
+              for (node_uuid, node_name, master_candidate, _) in node_list
+              if master_candidate]
+  for (_, node_name) in mc_nodes:
+    logging.debug("Fetching old SSH key from node '%s'.", node_name)
+  old_pub_keys = workerpool.ParallelMap(
+      "SshKeyFetch", compat.partial(_FetchPubKey, old_pub_keyfile),
+      [node_name for (_, node_name) in mc_nodes], constants.SSHS_MAX_PARALLEL)
+
+  for ((node_uuid, node_name), (success, old_pub_key)) in \
+      zip(mc_nodes, old_pub_keys):
+    if not success:
+      raise old_pub_key
+    if old_pub_key != old_master_key:
+      # If we are already in a multi-key setup (that is past Ganeti 2.12),
+      # we can safely remove the old key of the node. Otherwise, we cannot
+      # remove that node's key, because it is also the master node's key
+      # and that would terminate all communication from the master to the
+      # node.
+      node_info_to_remove.append(SshRemoveNodeInfo(
+          uuid=node_uuid,
+          name=node_name,
+          from_authorized_keys=True,
+          from_public_keys=False,
+          clear_authorized_keys=False,
+          clear_public_keys=False))
+    else:
+      logging.debug("Old key of node '%s' is the same as the current master"
+                    " key. Not deleting that key on the node.", node_name)
 
   logging.debug("Removing old SSH keys of all master candidates.")
   if node_info_to_remove:
@@ -2211,10 +2370,7 @@ def RenewSshKeys(node_uuids, node_names, master_candidate_uuids,
     if node_errors:
       all_node_errors = all_node_errors + node_errors
 
-  for (node_uuid, node_name, master_candidate, potential_master_candidate) \
-      in node_list:
-
-    logging.debug("Generating new SSH key for node '%s'.", node_name)
+  def _RenewNodeKey((node_uuid, node_name)):
     _GenerateNodeSshKey(node_name, ssh_port_map, new_key_type, new_key_bits,
                         ssconf_store=ssconf_store,
                         noded_cert_file=noded_cert_file,
@@ -2223,19 +2379,32 @@ def RenewSshKeys(node_uuids, node_names, master_candidate_uuids,
                         ssh_update_debug=ssh_update_debug)
 
     try:
-      logging.debug("Fetching newly created SSH key from node '%s'.", node_name)
-      pub_key = ssh.ReadRemoteSshPubKey(new_pub_keyfile,
-                                        node_name, cluster_name,
-                                        ssh_port_map[node_name],
-                                        False, # ask_key
-                                        False) # key_check
+      return _FetchPubKey(new_pub_keyfile, node_name)
     except:
       raise errors.SshUpdateError("Could not fetch key of node %s"
                                   " (UUID %s)" % (node_name, node_uuid))
 
+  for (_, node_name, _, _) in node_list:
+    logging.debug("Generating new SSH key for node '%s' and fetching it.",
+                  node_name)
+  new_pub_keys = workerpool.ParallelMap(
+      "SshKeyRenew", _RenewNodeKey,
+      [(node_uuid, node_name) for (node_uuid, node_name, _, _) in node_list],
+      constants.SSHS_MAX_PARALLEL)
+
+  pub_key_changes = []
+  renew_errors = []
+  for ((node_uuid, node_name, master_candidate, potential_master_candidate),
+       (success, pub_key)) in zip(node_list, new_pub_keys):
+    if not success:
+      # The other nodes may already use their new keys, which therefore
+      # have to be distributed nevertheless
+      renew_errors.append(str(pub_key))
+      continue
+
     if potential_master_candidate:
-      ssh.RemovePublicKey(node_uuid, key_file=ganeti_pub_keys_file)
-      ssh.AddPublicKey(node_uuid, pub_key, key_file=ganeti_pub_keys_file)
+      pub_key_changes.append((ssh.PUB_KEY_REMOVE, node_uuid, None))
+      pub_key_changes.append((ssh.PUB_KEY_ADD, node_uuid, pub_key))
 
     node_info = SshAddNodeInfo(name=node_name,
                                uuid=node_uuid,
@@ -2244,15 +2413,24 @@ def RenewSshKeys(node_uuids, node_names, master_candidate_uuids,
                                get_public_keys=True)
     node_keys_to_add.append(node_info)
 
-  node_errors = AddNodeSshKeyBulk(
-      node_keys_to_add, potential_master_candidates,
-      pub_key_file=ganeti_pub_keys_file, ssconf_store=ssconf_store,
-      noded_cert_file=noded_cert_file,
-      run_cmd_fn=run_cmd_fn,
-      ssh_update_debug=ssh_update_debug,
-      ssh_update_verbose=ssh_update_verbose)
-  if node_errors:
-    all_node_errors = all_node_errors + node_errors
+  if pub_key_changes:
+    ssh.ModifyPubKeyFile(pub_key_changes, key_file=ganeti_pub_keys_file)
+
+  if node_keys_to_add:
+    node_errors = AddNodeSshKeyBulk(
+        node_keys_to_add, potential_master_candidates,
+        pub_key_file=ganeti_pub_keys_file, ssconf_store=ssconf_store,
+        noded_cert_file=noded_cert_file,
+        run_cmd_fn=run_cmd_fn,
+        ssh_update_debug=ssh_update_debug,
+        ssh_update_verbose=ssh_update_verbose)
+    if node_errors:
+      all_node_errors = all_node_errors + node_errors
+
+  if renew_errors:
+    raise errors.SshUpdateError("Could not renew the SSH keys of %d node(s):"
+                                " %s" % (len(renew_errors),
+                                         "; ".join(renew_errors)))
 
   # Renewing the master node's key
 
@@ -3475,8 +3653,8 @@ def BlockdevConvert(src_disk, target_disk):
           result.cmd, result.fail_reason, result.output)
 
 
-def BlockdevWipe(disk, offset, size):
-  """Wipes a block device.
+def _GetWipeDevice(disk, offset, size, drbd_snapshot=None):
+  """Finds a block device to wipe and checks the area to wipe.
 
   @type disk: L{objects.Disk}
   @param disk: the disk object we want to wipe
@@ -3484,10 +3662,13 @@ def BlockdevWipe(disk, offset, size):
   @param offset: The offset in MiB in the file
   @type size: int
   @param size: The size in MiB to write
+  @type drbd_snapshot: L{drbd.DRBD8Snapshot} or None
+  @param drbd_snapshot: DRBD state shared by the disks of a single RPC
+  @rtype: L{bdev.BlockDev}
 
   """
   try:
-    rdev = _RecursiveFindBD(disk)
+    rdev = _RecursiveFindBD(disk, drbd_snapshot=drbd_snapshot)
   except errors.BlockDeviceError:
     rdev = None
 
@@ -3502,7 +3683,142 @@ def BlockdevWipe(disk, offset, size):
   if (offset + size) > rdev.size:
     _Fail("Wipe offset and size are bigger than device size")
 
-  _DumpDevice("/dev/zero", rdev.dev_path, offset, size, True)
+  return rdev
+
+
+def BlockdevWipe(disk, offset, size):
+  """Wipes a block device.
+
+  @type disk: L{objects.Disk}
+  @param disk: the disk object we want to wipe
+  @type offset: int
+  @param offset: The offset in MiB in the file
+  @type size: int
+  @param size: The size in MiB to write
+
+  """
+  rdev = _GetWipeDevice(disk, offset, size)
+
+  try:
+    wipe.WipeDevice(rdev.dev_path, offset, size)
+  except EnvironmentError, err:
+    _Fail("Wiping device %s failed: %s", rdev.dev_path, err, exc=True)
+
+
+def StartBlockdevWipe(disks):
+  """Starts wiping block devices in the background.
+
+  One process is started per disk, so all disks are wiped concurrently.
+
+  @type disks: list of tuples; (L{objects.Disk}, int, int)
+  @param disks: the disks to wipe, each with the offset and size in MiB of
+      the area to wipe
+  @rtype: list of strings
+  @return: the names of the started wipes, to be passed to
+      L{GetBlockdevWipeStatus} and L{CleanupBlockdevWipe}
+
+  """
+  drbd_snapshot = drbd.DRBD8Snapshot()
+  devices = [(disk, _GetWipeDevice(disk, offset, size,
+                                   drbd_snapshot=drbd_snapshot),
+              offset, size)
+             for (disk, offset, size) in disks]
+
+  names = []
+  try:
+    for (disk, rdev, offset, size) in devices:
+      status_dir = tempfile.mkdtemp(dir=pathutils.WIPE_DIR,
+                                    prefix=("%s-%s-" %
+                                            (disk.uuid,
+                                             utils.TimestampForFilename())))
+      names.append(os.path.basename(status_dir))
+
+      cmd = [
+        pathutils.WIPE_DEVICE,
+        utils.PathJoin(status_dir, _WIPE_STATUS_FILE),
+        rdev.dev_path,
+        str(offset),
+        str(size),
+        ]
+
+      utils.StartDaemon(cmd,
+                        pidfile=utils.PathJoin(status_dir, _WIPE_PID_FILE),
+                        output=utils.PathJoin(status_dir, _WIPE_OUTPUT_FILE))
+  except Exception:
+    CleanupBlockdevWipe(names)
+    raise
+
+  return names
+
+
+def _ReadBlockdevWipeStatus(status_dir):
+  """Reads the status file of a wipe.
+
+  @return: the status dictionary or None if it hasn't been written yet
+
+  """
+  try:
+    data = utils.ReadFile(utils.PathJoin(status_dir, _WIPE_STATUS_FILE))
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      raise
+    data = None
+
+  if not data:
+    return None
+
+  return serializer.LoadJson(data)
+
+
+def GetBlockdevWipeStatus(names):
+  """Returns the status of background wipes.
+
+  @type names: list of strings
+  @param names: names as returned by L{StartBlockdevWipe}
+  @rtype: list of dicts
+  @return: the status of each wipe, see C{constants.WIPE_STATUS_*}
+
+  """
+  result = []
+
+  for name in names:
+    status_dir = utils.PathJoin(pathutils.WIPE_DIR, name)
+
+    status = _ReadBlockdevWipeStatus(status_dir)
+    if not (status and status[constants.WIPE_STATUS_FINISHED]):
+      pid = utils.ReadLockedPidFile(utils.PathJoin(status_dir, _WIPE_PID_FILE))
+      if not pid:
+        # The process might have finished since the status was read
+        status = _ReadBlockdevWipeStatus(status_dir)
+        if not (status and status[constants.WIPE_STATUS_FINISHED]):
+          status = dict(status or {})
+          status[constants.WIPE_STATUS_FINISHED] = True
+          status[constants.WIPE_STATUS_ERROR] = \
+            "Wipe process %s terminated unexpectedly" % name
+
+    result.append(status)
+
+  return result
+
+
+def CleanupBlockdevWipe(names):
+  """Removes the state of background wipes.
+
+  Wipes which are still running are killed.
+
+  @type names: list of strings
+  @param names: names as returned by L{StartBlockdevWipe}
+
+  """
+  for name in names:
+    status_dir = utils.PathJoin(pathutils.WIPE_DIR, name)
+
+    pid = utils.ReadLockedPidFile(utils.PathJoin(status_dir, _WIPE_PID_FILE))
+    if pid:
+      logging.info("Wipe %s is still running with PID %s", name, pid)
+      utils.KillProcess(pid, waitpid=False)
+
+    shutil.rmtree(status_dir, ignore_errors=True)
 
 
 def BlockdevImage(disk, image, size):
@@ -3625,7 +3941,7 @@ def BlockdevRemove(disk):
     _Fail("; ".join(msgs))
 
 
-def _RecursiveAssembleBD(disk, owner, as_primary):
+def _RecursiveAssembleBD(disk, owner, as_primary, drbd_snapshot=None):
   """Activate a block device for an instance.
 
   This is run on the primary and secondary nodes for an instance.
@@ -3639,6 +3955,8 @@ def _RecursiveAssembleBD(disk, owner, as_primary):
   @type as_primary: boolean
   @param as_primary: if we should make the block device
       read/write
+  @type drbd_snapshot: L{drbd.DRBD8Snapshot}
+  @param drbd_snapshot: the DRBD state snapshot shared by all devices
 
   @return: the assembled device or None (in case no device
       was assembled)
@@ -3656,7 +3974,8 @@ def _RecursiveAssembleBD(disk, owner, as_primary):
       mcn = len(disk.children) - mcn # max number of Nones
     for chld_disk in disk.children:
       try:
-        cdev = _RecursiveAssembleBD(chld_disk, owner, as_primary)
+        cdev = _RecursiveAssembleBD(chld_disk, owner, as_primary,
+                                    drbd_snapshot=drbd_snapshot)
       except errors.BlockDeviceError, err:
         if children.count(None) >= mcn:
           raise
@@ -3666,7 +3985,7 @@ def _RecursiveAssembleBD(disk, owner, as_primary):
       children.append(cdev)
 
   if as_primary or disk.AssembleOnSecondary():
-    r_dev = bdev.Assemble(disk, children)
+    r_dev = bdev.Assemble(disk, children, drbd_snapshot=drbd_snapshot)
     result = r_dev
     if as_primary or disk.OpenOnSecondary():
       r_dev.Open()
@@ -3689,7 +4008,8 @@ def BlockdevAssemble(disk, instance, as_primary, idx):
 
   """
   try:
-    result = _RecursiveAssembleBD(disk, instance.name, as_primary)
+    result = _RecursiveAssembleBD(disk, instance.name, as_primary,
+                                  drbd_snapshot=drbd.DRBD8Snapshot())
     if isinstance(result, BlockDev):
       # pylint: disable=E1103
       dev_path = result.dev_path
@@ -3811,8 +4131,9 @@ def BlockdevGetmirrorstatus(disks):
 
   """
   stats = []
+  drbd_snapshot = drbd.DRBD8Snapshot()
   for dsk in disks:
-    rbd = _RecursiveFindBD(dsk)
+    rbd = _RecursiveFindBD(dsk, drbd_snapshot=drbd_snapshot)
     if rbd is None:
       _Fail("Can't find device %s", dsk)
 
@@ -3837,9 +4158,11 @@ def BlockdevGetmirrorstatusMulti(disks):
   is_plain_disk = compat.any([_CheckForPlainDisk(d) for d in disks])
   if is_plain_disk:
     lvs_cache = bdev.LogicalVolume.GetLvGlobalInfo()
+  drbd_snapshot = drbd.DRBD8Snapshot()
   for disk in disks:
     try:
-      rbd = _RecursiveFindBD(disk, lvs_cache=lvs_cache)
+      rbd = _RecursiveFindBD(disk, lvs_cache=lvs_cache,
+                             drbd_snapshot=drbd_snapshot)
       if rbd is None:
         result.append((False, "Can't find device %s" % disk))
         continue
@@ -3872,13 +4195,18 @@ def _CheckForPlainDisk(disk):
   return False
 
 
-def _RecursiveFindBD(disk, lvs_cache=None):
+def _RecursiveFindBD(disk, lvs_cache=None, drbd_snapshot=None):
   """Check if a device is activated.
 
   If so, return information about the real device.
 
   @type disk: L{objects.Disk}
   @param disk: the disk object we need to find
+  @type lvs_cache: dict
+  @param lvs_cache: the LVM info as returned by
+      L{bdev.LogicalVolume.GetLvGlobalInfo}
+  @type drbd_snapshot: L{drbd.DRBD8Snapshot}
+  @param drbd_snapshot: the DRBD state snapshot shared by all devices
 
   @return: None if the device can't be found,
       otherwise the device instance
@@ -3887,9 +4215,11 @@ def _RecursiveFindBD(disk, lvs_cache=None):
   children = []
   if disk.children:
     for chdisk in disk.children:
-      children.append(_RecursiveFindBD(chdisk, lvs_cache=lvs_cache))
+      children.append(_RecursiveFindBD(chdisk, lvs_cache=lvs_cache,
+                                       drbd_snapshot=drbd_snapshot))
 
-  return bdev.FindDevice(disk, children, lvs_cache=lvs_cache)
+  return bdev.FindDevice(disk, children, lvs_cache=lvs_cache,
+                         drbd_snapshot=drbd_snapshot)
 
 
 def _OpenRealBD(disk):
@@ -3931,6 +4261,72 @@ def BlockdevFind(disk):
   return rbd.GetSyncStatus()
 
 
+def _RecursiveFindStatusTree(disk, lvs_cache=None, drbd_snapshot=None):
+  """Find a device and its children and compute their status.
+
+  @type disk: L{objects.Disk}
+  @param disk: the disk object we need to find
+  @rtype: tuple
+  @return: the device instance or None if it can't be found, and the status
+      tree as described in L{BlockdevFindMulti}
+
+  """
+  children = []
+  children_trees = []
+  if disk.children:
+    for chdisk in disk.children:
+      (chdev, chtree) = _RecursiveFindStatusTree(chdisk, lvs_cache=lvs_cache,
+                                                 drbd_snapshot=drbd_snapshot)
+      children.append(chdev)
+      children_trees.append(chtree)
+
+  rbd = bdev.FindDevice(disk, children, lvs_cache=lvs_cache,
+                        drbd_snapshot=drbd_snapshot)
+  if rbd is None:
+    status = None
+  else:
+    status = rbd.GetSyncStatus()
+
+  return (rbd, (status, children_trees))
+
+
+def BlockdevFindMulti(disks):
+  """Find a list of devices and their children.
+
+  This is the multi-device version of L{BlockdevFind}, which also returns
+  the status of all children of the given disks.
+
+  @type disks: list of L{objects.Disk}
+  @param disks: the list of disks to find
+  @rtype: list
+  @return: List of tuples, (bool, tree), one for each disk; bool denotes
+    success/failure, on success tree is a tuple of the
+    L{objects.BlockDevStatus} of the disk (or None if it can't be found)
+    and the list of trees of its children, on failure it is an error
+    message
+
+  """
+  result = []
+  lvs_cache = None
+  if compat.any([_CheckForPlainDisk(d) for d in disks]):
+    lvs_cache = bdev.LogicalVolume.GetLvGlobalInfo()
+  drbd_snapshot = drbd.DRBD8Snapshot()
+
+  for disk in disks:
+    try:
+      (_, tree) = _RecursiveFindStatusTree(disk, lvs_cache=lvs_cache,
+                                           drbd_snapshot=drbd_snapshot)
+    except errors.BlockDeviceError, err:
+      logging.exception("Error while finding device")
+      result.append((False, "Failed to find device: %s" % err))
+    else:
+      result.append((True, tree))
+
+  assert len(disks) == len(result)
+
+  return result
+
+
 def BlockdevGetdimensions(disks):
   """Computes the size of the given disks.
 
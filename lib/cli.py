@@ -136,9 +136,6 @@ __all__ = [
  QR_UNKNOWN,
  QR_INCOMPLETE) = range(3)
 
-#: Maximum batch size for ChooseJob
-_CHOOSE_BATCH = 25
-
 
 # constants used to create InstancePolicy dictionary
 TISPECS_GROUP_TYPES = {
@@ -688,83 +685,121 @@ def SendJob(ops, cl=None):
   return job_id
 
 
-def GenericPollJob(job_id, cbs, report_cbs, cancel_fn=None,
-                   update_freq=constants.DEFAULT_WFJC_TIMEOUT):
-  """Generic job-polling function.
+def _WaitForJobs(job_ids, cbs, report_cbs, cancel_fn=None,
+                 update_freq=constants.DEFAULT_WFJC_TIMEOUT):
+  """Waits for a set of jobs to finish.
 
-  @type job_id: number
-  @param job_id: Job ID
+  All jobs are observed using a single L{JobPollCbBase.WaitForJobsChangeOnce}
+  call per round, so waiting for many jobs doesn't require polling each of
+  them in turn.
+
+  @type job_ids: list of numbers
+  @param job_ids: Job IDs
   @type cbs: Instance of L{JobPollCbBase}
   @param cbs: Data callbacks
   @type report_cbs: Instance of L{JobPollReportCbBase}
   @param report_cbs: Reporting callbacks
   @type cancel_fn: Function returning a boolean
-  @param cancel_fn: Function to check if we should cancel the running job
+  @param cancel_fn: Function to check if we should cancel the running jobs
   @type update_freq: int/long
   @param update_freq: number of seconds between each WFJC reports
-  @return: the opresult of the job
-  @raise errors.JobLost: If job can't be found
-  @raise errors.JobCanceled: If job is canceled
-  @raise errors.OpExecError: If job didn't succeed
+  @return: Generator yielding tuples of job ID and a boolean telling whether
+    the job was found, in the order in which the jobs finish
+  @raise errors.JobCanceled: If jobs are canceled
 
   """
-  prev_job_info = None
-  prev_logmsg_serial = None
+  if update_freq <= 0:
+    raise errors.ParameterError("Update frequency must be a positive number")
+
+  # Previously received job information and highest log serial per job
+  pending = dict((job_id, (None, None)) for job_id in job_ids)
 
-  status = None
   should_cancel = False
 
-  if update_freq <= 0:
-    raise errors.ParameterError("Update frequency must be a positive number")
+  while pending:
+    jobs = [(job_id, ) + pending[job_id]
+            for job_id in job_ids if job_id in pending]
 
-  while True:
     if cancel_fn:
       timer = 0
       while timer < update_freq:
-        result = cbs.WaitForJobChangeOnce(job_id, ["status"], prev_job_info,
-                                          prev_logmsg_serial,
-                                          timeout=constants.CLI_WFJC_FREQUENCY)
+        result = cbs.WaitForJobsChangeOnce(jobs, ["status"],
+                                           timeout=constants.CLI_WFJC_FREQUENCY)
         should_cancel = cancel_fn()
-        if should_cancel or not result or result != constants.JOB_NOTCHANGED:
+        if should_cancel or result != constants.JOB_NOTCHANGED:
           break
         timer += constants.CLI_WFJC_FREQUENCY
     else:
-      result = cbs.WaitForJobChangeOnce(job_id, ["status"], prev_job_info,
-                                        prev_logmsg_serial, timeout=update_freq)
-    if not result:
-      # job not found, go away!
-      raise errors.JobLost("Job with id %s lost" % job_id)
+      result = cbs.WaitForJobsChangeOnce(jobs, ["status"], timeout=update_freq)
+
+    if result == constants.JOB_NOTCHANGED:
+      updates = []
+    else:
+      updates = result
+
+    for (job_id, update) in updates:
+      if not update:
+        # job not found, go away!
+        del pending[job_id]
+        yield (job_id, False)
 
     if should_cancel:
-      logging.info("Job %s canceled because the client timed out.", job_id)
-      cbs.CancelJob(job_id)
+      for job_id in pending:
+        logging.info("Job %s canceled because the client timed out.", job_id)
+        cbs.CancelJob(job_id)
       raise errors.JobCanceled("Job was canceled")
 
     if result == constants.JOB_NOTCHANGED:
-      report_cbs.ReportNotChanged(job_id, status)
+      for (job_id, prev_job_info, _) in jobs:
+        if prev_job_info:
+          (status, ) = prev_job_info
+        else:
+          status = None
+        report_cbs.ReportNotChanged(job_id, status)
       # Wait again
       continue
 
-    # Split result, a tuple of (field values, log entries)
-    (job_info, log_entries) = result
-    (status, ) = job_info
+    for (job_id, update) in updates:
+      if not update:
+        continue
+
+      # Split result, a tuple of (field values, log entries)
+      (job_info, log_entries) = update
+      (status, ) = job_info
+      (_, prev_logmsg_serial) = pending[job_id]
+
+      if log_entries:
+        for log_entry in log_entries:
+          (serial, timestamp, log_type, message) = log_entry
+          report_cbs.ReportLogMessage(job_id, serial, timestamp,
+                                      log_type, message)
+          prev_logmsg_serial = max(prev_logmsg_serial, serial)
+
+      # TODO: Handle canceled and archived jobs
+      elif status in (constants.JOB_STATUS_SUCCESS,
+                      constants.JOB_STATUS_ERROR,
+                      constants.JOB_STATUS_CANCELING,
+                      constants.JOB_STATUS_CANCELED):
+        del pending[job_id]
+        yield (job_id, True)
+        continue
+
+      pending[job_id] = (job_info, prev_logmsg_serial)
 
-    if log_entries:
-      for log_entry in log_entries:
-        (serial, timestamp, log_type, message) = log_entry
-        report_cbs.ReportLogMessage(job_id, serial, timestamp,
-                                    log_type, message)
-        prev_logmsg_serial = max(prev_logmsg_serial, serial)
 
-    # TODO: Handle canceled and archived jobs
-    elif status in (constants.JOB_STATUS_SUCCESS,
-                    constants.JOB_STATUS_ERROR,
-                    constants.JOB_STATUS_CANCELING,
-                    constants.JOB_STATUS_CANCELED):
-      break
+def _GetJobResult(cbs, job_id):
+  """Retrieves and evaluates the result of a finished job.
 
-    prev_job_info = job_info
+  @type cbs: Instance of L{JobPollCbBase}
+  @param cbs: Data callbacks
+  @type job_id: number
+  @param job_id: Job ID
+  @return: the opresult of the job
+  @raise errors.JobLost: If job can't be found
+  @raise errors.JobCanceled: If job is canceled
+  @raise errors.OpExecError: If job didn't succeed
 
+  """
   jobs = cbs.QueryJobs([job_id], ["status", "opstatus", "opresult"])
   if not jobs:
     raise errors.JobLost("Job with id %s lost" % job_id)
@@ -794,6 +829,34 @@ def GenericPollJob(job_id, cbs, report_cbs, cancel_fn=None,
   raise errors.OpExecError(result)
 
 
+def GenericPollJob(job_id, cbs, report_cbs, cancel_fn=None,
+                   update_freq=constants.DEFAULT_WFJC_TIMEOUT):
+  """Generic job-polling function.
+
+  @type job_id: number
+  @param job_id: Job ID
+  @type cbs: Instance of L{JobPollCbBase}
+  @param cbs: Data callbacks
+  @type report_cbs: Instance of L{JobPollReportCbBase}
+  @param report_cbs: Reporting callbacks
+  @type cancel_fn: Function returning a boolean
+  @param cancel_fn: Function to check if we should cancel the running job
+  @type update_freq: int/long
+  @param update_freq: number of seconds between each WFJC reports
+  @return: the opresult of the job
+  @raise errors.JobLost: If job can't be found
+  @raise errors.JobCanceled: If job is canceled
+  @raise errors.OpExecError: If job didn't succeed
+
+  """
+  for (_, found) in _WaitForJobs([job_id], cbs, report_cbs,
+                                 cancel_fn=cancel_fn, update_freq=update_freq):
+    if not found:
+      raise errors.JobLost("Job with id %s lost" % job_id)
+
+  return _GetJobResult(cbs, job_id)
+
+
 class JobPollCbBase(object):
   """Base class for L{GenericPollJob} callbacks.
 
@@ -811,6 +874,34 @@ class JobPollCbBase(object):
     """
     raise NotImplementedError()
 
+  def WaitForJobsChangeOnce(self, jobs, fields,
+                            timeout=constants.DEFAULT_WFJC_TIMEOUT):
+    """Waits for changes on any of several jobs.
+
+    The default implementation only supports a single job and is based on
+    L{WaitForJobChangeOnce}.
+
+    @type jobs: list of tuples; (job ID, previous job information, previous
+      log serial)
+    @param jobs: Jobs to be observed
+    @type fields: list of strings
+    @param fields: Fields
+    @return: L{constants.JOB_NOTCHANGED} or a list of (job ID, update) pairs
+      for all jobs which changed; the update is C{None} for lost jobs
+
+    """
+    if len(jobs) != 1:
+      raise NotImplementedError("Only one job supported at this time")
+
+    ((job_id, prev_job_info, prev_log_serial), ) = jobs
+
+    result = self.WaitForJobChangeOnce(job_id, fields, prev_job_info,
+                                       prev_log_serial, timeout=timeout)
+    if result == constants.JOB_NOTCHANGED:
+      return result
+
+    return [(job_id, result)]
+
   def QueryJobs(self, job_ids, fields):
     """Returns the selected fields for the selected job IDs.
 
@@ -877,6 +968,13 @@ class _LuxiJobPollCb(JobPollCbBase):
                                         prev_job_info, prev_log_serial,
                                         timeout=timeout)
 
+  def WaitForJobsChangeOnce(self, jobs, fields,
+                            timeout=constants.DEFAULT_WFJC_TIMEOUT):
+    """Waits for changes on any of several jobs.
+
+    """
+    return self.cl.WaitForJobsChangeOnce(jobs, fields, timeout=timeout)
+
   def QueryJobs(self, job_ids, fields):
     """Returns the selected fields for the selected job IDs.
 
@@ -2476,33 +2574,34 @@ class JobExecutor(object):
     for ((status, data), (idx, name, _)) in zip(results, self.queue):
       self.jobs.append((idx, status, data, name))
 
-  def _ChooseJob(self):
-    """Choose a non-waiting/queued job to poll next.
+  def _GetJobResult(self, cbs, jid, name, found):
+    """Retrieves the result of a finished job.
 
-    """
-    assert self.jobs, "_ChooseJob called with empty job list"
-
-    result = self.cl.QueryJobs([i[2] for i in self.jobs[:_CHOOSE_BATCH]],
-                               ["status"])
-    assert result
-
-    for job_data, status in zip(self.jobs, result):
-      if (isinstance(status, list) and status and
-          status[0] in (constants.JOB_STATUS_QUEUED,
-                        constants.JOB_STATUS_WAITING,
-                        constants.JOB_STATUS_CANCELING)):
-        # job is still present and waiting
-        continue
-      # good candidate found (either running job or lost job)
-      self.jobs.remove(job_data)
-      return job_data
+    @rtype: tuple; (success, job result)
 
-    # no job found
-    return self.jobs.pop(0)
+    """
+    try:
+      if not found:
+        raise errors.JobLost("Job with id %s lost" % jid)
+      return (True, _GetJobResult(cbs, jid))
+    except errors.JobLost, err:
+      _, job_result = FormatError(err)
+      ToStderr("Job %s%s has been archived, cannot check its result",
+               jid, self._IfName(name, " for %s"))
+      return (False, job_result)
+    except (errors.GenericError, rpcerr.ProtocolError), err:
+      _, job_result = FormatError(err)
+      # the error message will always be shown, verbose or not
+      ToStderr("Job %s%s has failed: %s",
+               jid, self._IfName(name, " for %s"), job_result)
+      return (False, job_result)
 
   def GetResults(self):
     """Wait for and return the results of all jobs.
 
+    All submitted jobs are waited for at the same time and their results are
+    collected in the order in which they finish.
+
     @rtype: list
     @return: list of tuples (success, job results), in the same order
         as the submitted jobs; if a job has failed, instead of the result
@@ -2523,25 +2622,31 @@ class JobExecutor(object):
       ToStderr("Failed to submit job%s: %s", self._IfName(name, " for %s"), jid)
       results.append((idx, False, jid))
 
-    while self.jobs:
-      (idx, _, jid, name) = self._ChooseJob()
+    pending = dict((jid, (idx, name)) for (idx, _, jid, name) in self.jobs)
+
+    for (_, _, jid, name) in self.jobs:
       ToStdout("Waiting for job %s%s ...", jid, self._IfName(name, " for %s"))
-      try:
-        job_result = PollJob(jid, cl=self.cl, feedback_fn=self.feedback_fn)
-        success = True
-      except errors.JobLost, err:
-        _, job_result = FormatError(err)
-        ToStderr("Job %s%s has been archived, cannot check its result",
-                 jid, self._IfName(name, " for %s"))
-        success = False
-      except (errors.GenericError, rpcerr.ProtocolError), err:
-        _, job_result = FormatError(err)
-        success = False
-        # the error message will always be shown, verbose or not
+
+    if self.feedback_fn:
+      reporter = FeedbackFnJobPollReportCb(self.feedback_fn)
+    else:
+      reporter = StdioJobPollReportCb()
+
+    cbs = _LuxiJobPollCb(self.cl)
+
+    try:
+      for (jid, found) in _WaitForJobs([row[2] for row in self.jobs],
+                                       cbs, reporter):
+        (idx, name) = pending.pop(jid)
+        results.append((idx, ) + self._GetJobResult(cbs, jid, name, found))
+    except (errors.GenericError, rpcerr.ProtocolError), err:
+      _, job_result = FormatError(err)
+      for (jid, (idx, name)) in pending.items():
         ToStderr("Job %s%s has failed: %s",
                  jid, self._IfName(name, " for %s"), job_result)
+        results.append((idx, False, job_result))
 
-      results.append((idx, success, job_result))
+    self.jobs = []
 
     # sort based on the index, then drop it
     results.sort()
@@ -1164,18 +1164,22 @@ def _RenewCrypto(new_cluster_cert, new_rapi_cert, # pylint: disable=R0911
     # Create a temporary ssconf file using the master's client cert digest
     # and the 'bootstrap' keyword to enable distribution of all nodes' digests.
     master_digest = utils.GetCertificateDigest()
-    ssconf_master_candidate_certs_filename = os.path.join(
-        pathutils.DATA_DIR, "%s%s" %
-        (constants.SSCONF_FILEPREFIX, constants.SS_MASTER_CANDIDATES_CERTS))
-    utils.WriteFile(
-        ssconf_master_candidate_certs_filename,
-        data="%s=%s" % (constants.CRYPTO_BOOTSTRAP, master_digest))
+    ss = ssconf.SimpleStore()
+    ss.WriteFiles({
+      constants.SS_MASTER_CANDIDATES_CERTS:
+        "%s=%s" % (constants.CRYPTO_BOOTSTRAP, master_digest),
+      })
+    # The snapshot file has to be copied as well, as it takes precedence over
+    # the per-key file when reading
+    ssconf_filenames = [
+      ss.KeyToFilename(constants.SS_MASTER_CANDIDATES_CERTS),
+      ss.GetSnapshotFilename(),
+      ]
     for node_name in ctx.nonmaster_nodes:
       port = ctx.ssh_ports[node_name]
-      ctx.feedback_fn("Copying %s to %s:%d" %
-                      (ssconf_master_candidate_certs_filename, node_name, port))
-      ctx.ssh.CopyFileToNode(node_name, port,
-                             ssconf_master_candidate_certs_filename)
+      for filename in ssconf_filenames:
+        ctx.feedback_fn("Copying %s to %s:%d" % (filename, node_name, port))
+        ctx.ssh.CopyFileToNode(node_name, port, filename)
 
     # Write the boostrap entry to the config using wconfd.
     config_live_lock = utils.livelock.LiveLock("renew_crypto")
@@ -2295,6 +2299,16 @@ def _VersionSpecificDowngrade():
   """
   ToStdoutAndLoginfo("Performing version-specific downgrade tasks.")
 
+  # Older versions only maintain the per-key ssconf files, so a snapshot left
+  # behind would soon contain outdated values
+  ToStdoutAndLoginfo("Removing the ssconf snapshot file on all nodes")
+  badnodes = _VerifyCommand(["rm", "-f",
+                             ssconf.SimpleStore().GetSnapshotFilename()])
+  if badnodes:
+    ToStderr("Failed to remove the ssconf snapshot file on %s.",
+             ", ".join(badnodes))
+    return False
+
   return True
 
 
@@ -49,7 +49,9 @@ from ganeti import errors
 from ganeti import compat
 from ganeti import ht
 from ganeti import metad
+from ganeti import ssconf
 from ganeti import wconfd
+import ganeti.rpc.node as rpc
 
 
 #: Default fields for L{ListLocks}
@@ -721,6 +723,82 @@ def Wconfd(opts, args): # pylint: disable=W0613
   return 0
 
 
+def _FormatCommandHistogram(histogram):
+  """Formats the duration histogram of a command.
+
+  @type histogram: list of int
+  @param histogram: number of runs per bucket of L{utils.CMD_DURATION_BUCKETS}
+  @rtype: string
+
+  """
+  labels = (["<=%ss" % bound for bound in utils.CMD_DURATION_BUCKETS] +
+            [">%ss" % utils.CMD_DURATION_BUCKETS[-1]])
+  return utils.CommaJoin("%s:%d" % (label, count)
+                         for (label, count) in zip(labels, histogram)
+                         if count)
+
+
+@rpc.RunWithRPC
+def CommandStats(opts, args):
+  """Show statistics about the commands run by the node daemons.
+
+  @param opts: the command line options selected by the user
+  @type args: list
+  @param args: names of the nodes to query, all online nodes if empty
+  @rtype: int
+  @return: the desired exit code
+
+  """
+  if args:
+    nodes = args
+  else:
+    nodes = ssconf.SimpleStore().GetOnlineNodeList()
+
+  result = rpc.BootstrapRunner().call_node_command_stats(nodes, opts.reset)
+
+  if opts.no_headers:
+    headers = None
+  else:
+    headers = {
+      "node": "Node",
+      "program": "Program",
+      "count": "Runs",
+      "failed": "Failed",
+      "timeouts": "Timeouts",
+      "total_time": "Time",
+      "histogram": "Durations",
+      }
+
+  fields = ["node", "program", "count", "failed", "timeouts", "total_time",
+            "histogram"]
+
+  errs = 0
+  data = []
+  for node in nodes:
+    node_result = result[node]
+    if node_result.fail_msg:
+      ToStderr("Can't get command statistics from node %s: %s", node,
+               node_result.fail_msg)
+      errs += 1
+      continue
+
+    for (program, stats) in sorted(node_result.payload.items()):
+      data.append([node, program, stats["count"], stats["failed"],
+                   stats["timeouts"], "%.3f" % stats["total_time"],
+                   _FormatCommandHistogram(stats["histogram"])])
+
+  for line in GenerateTable(separator=opts.separator, headers=headers,
+                            fields=fields, data=data,
+                            numfields=["count", "failed", "timeouts",
+                                       "total_time"]):
+    ToStdout(line)
+
+  if errs:
+    return constants.EXIT_FAILURE
+  else:
+    return constants.EXIT_SUCCESS
+
+
 commands = {
   "delay": (
     Delay, [ArgUnknown(min=1, max=1)],
@@ -803,6 +881,13 @@ commands = {
     ListLocks, ARGS_NONE,
     [NOHDR_OPT, SEP_OPT, FIELDS_OPT, INTERVAL_OPT, VERBOSE_OPT],
     "[--interval N]", "Show a list of locks in the master daemon"),
+  "command-stats": (
+    CommandStats, ARGS_MANY_NODES,
+    [NOHDR_OPT, SEP_OPT,
+     cli_option("--reset", default=False, action="store_true",
+                help="Reset the statistics after querying them")],
+    "[--reset] [<node>...]",
+    "Show statistics about the commands run by the node daemons"),
   "wconfd": (
     Wconfd, [ArgUnknown(min=1)], [],
     "<cmd> <args...>", "Directly talk to WConfD"),
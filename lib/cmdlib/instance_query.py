@@ -33,6 +33,7 @@
 import itertools
 
 from ganeti import constants
+from ganeti import errors
 from ganeti import locking
 from ganeti import utils
 from ganeti.cmdlib.base import NoHooksLU
@@ -42,6 +43,20 @@ from ganeti.cmdlib.instance_utils import NICListToTuple
 from ganeti.hypervisor import hv_base
 
 
+def _GetChildStatusTrees(trees, idx):
+  """Returns the status trees of a child device, by node UUID.
+
+  @type trees: dict
+  @param trees: the status trees of the parent device, by node UUID
+  @type idx: int
+  @param idx: the index of the child
+
+  """
+  return dict((node_uuid, tree[1][idx])
+              for (node_uuid, tree) in trees.items()
+              if tree is not None)
+
+
 class LUInstanceQueryData(NoHooksLU):
   """Query runtime instance data.
 
@@ -129,20 +144,74 @@ class LUInstanceQueryData(NoHooksLU):
 
     self.wanted_instances = instances.values()
 
-  def _ComputeBlockdevStatus(self, node_uuid, instance, dev):
-    """Returns the status of a block device
+  @staticmethod
+  def _GetDiskStatusNodes(instance, dev):
+    """Returns the nodes to query for the status of a top-level disk.
 
     """
-    if self.op.static or not node_uuid:
-      return None
+    node_uuids = [instance.primary_node]
+    if dev.dev_type in constants.DTS_DRBD:
+      node_uuids.extend(node_uuid for node_uuid in dev.logical_id[:2]
+                        if node_uuid != instance.primary_node)
+    return node_uuids
 
-    result = self.rpc.call_blockdev_find(node_uuid, (dev, instance))
-    if result.offline:
-      return None
+  def _ComputeBlockdevStatusTrees(self, instances_disks):
+    """Returns the status of the block devices of multiple instances.
+
+    All nodes are queried in parallel, with a single RPC call each covering
+    all the disks and their children on that node.
+
+    @type instances_disks: list of tuples
+    @param instances_disks: tuples of an instance and the list of its disks
+    @rtype: dict
+    @return: a dictionary mapping (node UUID, disk UUID) to the status tree
+      of the disk on that node, as described in L{backend.BlockdevFindMulti}
+
+    """
+    if self.op.static:
+      return {}
+
+    node_disks = {}
+    for (instance, disks) in instances_disks:
+      for dev in disks:
+        for node_uuid in self._GetDiskStatusNodes(instance, dev):
+          node_disks.setdefault(node_uuid, []).append((dev, instance))
+
+    if not node_disks:
+      return {}
 
-    result.Raise("Can't compute disk status for %s" % instance.name)
+    result = self.rpc.call_blockdev_find_multi(node_disks.keys(), node_disks)
 
-    status = result.payload
+    trees = {}
+    for (node_uuid, disks_insts) in node_disks.items():
+      nres = result[node_uuid]
+      if nres.offline:
+        continue
+
+      nres.Raise("Can't compute disk status on node %s" %
+                 self.cfg.GetNodeName(node_uuid))
+
+      for ((dev, instance), (success, tree)) in zip(disks_insts, nres.payload):
+        if not success:
+          raise errors.OpExecError("Can't compute disk status for %s: %s" %
+                                   (instance.name, tree))
+        trees[(node_uuid, dev.uuid)] = tree
+
+    return trees
+
+  @staticmethod
+  def _ComputeBlockdevStatus(node_uuid, trees):
+    """Returns the status of a block device
+
+    @type trees: dict
+    @param trees: the status trees of the device, by node UUID
+
+    """
+    tree = trees.get(node_uuid)
+    if tree is None:
+      return None
+
+    status = tree[0]
     if status is None:
       return None
 
@@ -150,20 +219,29 @@ class LUInstanceQueryData(NoHooksLU):
             status.sync_percent, status.estimated_time,
             status.is_degraded, status.ldisk_status)
 
-  def _ComputeDiskStatus(self, instance, node_uuid2name_fn, dev):
+  def _ComputeDiskStatus(self, instance, node_uuid2name_fn, dev, all_trees):
     """Compute block device status.
 
+    @type all_trees: dict
+    @param all_trees: the status trees as returned by
+      L{_ComputeBlockdevStatusTrees}
+
     """
     (anno_dev,) = AnnotateDiskParams(instance, [dev], self.cfg)
 
+    trees = dict((node_uuid, all_trees.get((node_uuid, dev.uuid)))
+                 for node_uuid in self._GetDiskStatusNodes(instance, dev))
+
     return self._ComputeDiskStatusInner(instance, None, node_uuid2name_fn,
-                                        anno_dev)
+                                        anno_dev, trees)
 
   def _ComputeDiskStatusInner(self, instance, snode_uuid, node_uuid2name_fn,
-                              dev):
+                              dev, trees):
     """Compute block device status.
 
     @attention: The device has to be annotated already.
+    @type trees: dict
+    @param trees: the status trees of the device, by node UUID
 
     """
     drbd_info = None
@@ -188,14 +266,17 @@ class LUInstanceQueryData(NoHooksLU):
       # replace the secret present at the end of the ids with None
       output_logical_id = dev.logical_id[:-1] + (None,)
 
-    dev_pstatus = self._ComputeBlockdevStatus(instance.primary_node,
-                                              instance, dev)
-    dev_sstatus = self._ComputeBlockdevStatus(snode_uuid, instance, dev)
+    dev_pstatus = self._ComputeBlockdevStatus(instance.primary_node, trees)
+    if snode_uuid:
+      dev_sstatus = self._ComputeBlockdevStatus(snode_uuid, trees)
+    else:
+      dev_sstatus = None
 
     if dev.children:
       dev_children = [
-        self._ComputeDiskStatusInner(instance, snode_uuid, node_uuid2name_fn, d)
-        for d in dev.children
+        self._ComputeDiskStatusInner(instance, snode_uuid, node_uuid2name_fn, d,
+                                     _GetChildStatusTrees(trees, idx))
+        for (idx, d) in enumerate(dev.children)
       ]
     else:
       dev_children = []
@@ -228,7 +309,11 @@ class LUInstanceQueryData(NoHooksLU):
     groups = dict(self.cfg.GetMultiNodeGroupInfo(node.group
                                                  for node in nodes.values()))
 
-    for instance in self.wanted_instances:
+    instances_disks = [(instance, self.cfg.GetInstanceDisks(instance.uuid))
+                       for instance in self.wanted_instances]
+    status_trees = self._ComputeBlockdevStatusTrees(instances_disks)
+
+    for (instance, disk_objects) in instances_disks:
       pnode = nodes[instance.primary_node]
       hvparams = cluster.FillHV(instance, skip_globals=True)
 
@@ -272,8 +357,8 @@ class LUInstanceQueryData(NoHooksLU):
       group2name_fn = lambda uuid: groups[uuid].name
       node_uuid2name_fn = lambda uuid: nodes[uuid].name
 
-      disk_objects = self.cfg.GetInstanceDisks(instance.uuid)
-      output_disks = [self._ComputeDiskStatus(instance, node_uuid2name_fn, d)
+      output_disks = [self._ComputeDiskStatus(instance, node_uuid2name_fn, d,
+                                              status_trees)
                       for d in disk_objects]
 
       secondary_nodes = self.cfg.GetInstanceSecondaryNodes(instance.uuid)
@@ -1264,50 +1264,75 @@ def WipeDisks(lu, instance, disks=None):
       logging.warn("Pausing synchronization of disk %s of instance '%s'"
                    " failed", idx, instance.name)
 
+  names = None
   try:
     for (idx, device, offset) in disks:
-      # The wipe size is MIN_WIPE_CHUNK_PERCENT % of the instance disk but
-      # MAX_WIPE_CHUNK at max. Truncating to integer to avoid rounding errors.
-      wipe_chunk_size = \
-        int(min(constants.MAX_WIPE_CHUNK,
-                device.size / 100.0 * constants.MIN_WIPE_CHUNK_PERCENT))
-
-      size = device.size
-      last_output = 0
-      start_time = time.time()
-
       if offset == 0:
         info_text = ""
       else:
         info_text = (" (from %s to %s)" %
                      (utils.FormatUnit(offset, "h"),
-                      utils.FormatUnit(size, "h")))
+                      utils.FormatUnit(device.size, "h")))
 
       lu.LogInfo("* Wiping disk %s%s", idx, info_text)
 
-      logging.info("Wiping disk %d for instance %s on node %s using"
-                   " chunk size %s", idx, instance.name, node_name,
-                   wipe_chunk_size)
+    # All disks are wiped concurrently by the node, which is polled for the
+    # progress
+    areas = [(offset, device.size - offset) for (_, device, offset) in disks]
+    total_size = sum(size for (_, size) in areas)
+
+    logging.info("Wiping disks %s of instance %s on node %s",
+                 utils.CommaJoin(map(compat.fst, disks)), instance.name,
+                 node_name)
 
-      while offset < size:
-        wipe_size = min(wipe_chunk_size, size - offset)
+    result = lu.rpc.call_blockdev_wipe_start(node_uuid,
+                                             (map(compat.snd, disks),
+                                              instance),
+                                             areas)
+    result.Raise("Could not start wiping disks of instance '%s'" %
+                 instance.name)
+    names = result.payload
+
+    start_time = time.time()
+    last_output = start_time
 
-        logging.debug("Wiping disk %d, offset %s, chunk %s",
-                      idx, offset, wipe_size)
+    while True:
+      result = lu.rpc.call_blockdev_wipe_status(node_uuid, names)
+      result.Raise("Could not get status of disk wipe on node '%s'" %
+                   node_name)
 
-        result = lu.rpc.call_blockdev_wipe(node_uuid, (device, instance),
-                                           offset, wipe_size)
-        result.Raise("Could not wipe disk %d at offset %d for size %d" %
-                     (idx, offset, wipe_size))
+      done = 0
+      finished = True
+      for ((idx, _, _), status) in zip(disks, result.payload):
+        if not status:
+          finished = False
+          continue
 
-        now = time.time()
-        offset += wipe_size
-        if now - last_output >= 60:
-          eta = _CalcEta(now - start_time, offset, size)
-          lu.LogInfo(" - done: %.1f%% ETA: %s",
-                     offset / float(size) * 100, utils.FormatSeconds(eta))
-          last_output = now
+        error = status[constants.WIPE_STATUS_ERROR]
+        if error:
+          raise errors.OpExecError("Could not wipe disk %d: %s" % (idx, error))
+
+        done += status[constants.WIPE_STATUS_DONE]
+        finished = finished and status[constants.WIPE_STATUS_FINISHED]
+
+      if finished:
+        break
+
+      now = time.time()
+      if done > 0 and now - last_output >= 60:
+        eta = _CalcEta(now - start_time, done, total_size)
+        lu.LogInfo(" - done: %.1f%% ETA: %s",
+                   done / float(total_size) * 100, utils.FormatSeconds(eta))
+        last_output = now
+
+      time.sleep(constants.WIPE_STATUS_POLL_INTERVAL)
   finally:
+    if names:
+      result = lu.rpc.call_blockdev_wipe_cleanup(node_uuid, names)
+      if result.fail_msg:
+        lu.LogWarning("Failed to clean up after wiping disks on node '%s': %s",
+                      node_name, result.fail_msg)
+
     logging.info("Resuming synchronization of disks for instance '%s'",
                  instance.name)
 
@@ -55,6 +55,7 @@ import threading
 import itertools
 
 from ganeti.config.temporary_reservations import TemporaryReservationManager
+from ganeti.config.index import ConfigIndex
 from ganeti.config.utils import ConfigSync, ConfigManager
 from ganeti.config.verify import (VerifyType, VerifyNic, VerifyIpolicy,
                                   ValidateConfig)
@@ -164,10 +165,25 @@ class ConfigWriter(object):
     3. provide convenient access methods to config data (facade)
 
   """
+  # Containers of the configuration data that can be sent to WConfd as part
+  # of a configuration delta, by the type of the objects they hold
+  _DELTA_CONTAINERS = {
+    objects.Node: "nodes",
+    objects.NodeGroup: "nodegroups",
+    objects.Instance: "instances",
+    objects.Network: "networks",
+    objects.Disk: "disks",
+    }
+
   def __init__(self, cfg_file=None, offline=False, _getents=runtime.GetEnts,
                accept_foreign=False, wconfdcontext=None, wconfd=None):
     self.write_count = 0
     self._config_data = None
+    self._index = None
+    self._config_serial = None
+    self._modified = set()
+    self._removed = set()
+    self._full_write = True
     self._SetConfigData(None)
     self._offline = offline
     if cfg_file is None:
@@ -194,10 +210,75 @@ class ConfigWriter(object):
     return self._config_data
 
   def OutDate(self):
-    self._config_data = None
+    self._SetConfigData(None)
 
   def _SetConfigData(self, cfg):
     self._config_data = cfg
+    # The index is rebuilt on first use
+    self._index = None
+    # Until told otherwise, the data can't be assumed to match WConfd's copy
+    self._config_serial = None
+
+  def _Index(self):
+    """Returns the secondary indexes over the current configuration data.
+
+    @rtype: L{ConfigIndex}
+
+    """
+    if self._index is None:
+      self._index = ConfigIndex(self._ConfigData())
+    return self._index
+
+  def _UnlockedUpdateIndex(self, fn, *args):
+    """Applies a change to the secondary indexes, if they were built.
+
+    """
+    if self._index is not None:
+      fn(self._index, *args)
+
+  def _ResetChanges(self, full_write=False):
+    """Forgets about the changes recorded for the next configuration write.
+
+    @type full_write: bool
+    @param full_write: whether the next write has to send the whole
+        configuration instead of only the recorded changes
+
+    """
+    self._modified = set()
+    self._removed = set()
+    self._full_write = full_write
+
+  def _UnlockedMarkModified(self, *objs):
+    """Records objects that were added or modified under the config lock.
+
+    Only the recorded objects (and the cluster object, which is always
+    included) are sent to WConfd when the configuration is written.
+
+    """
+    for obj in objs:
+      self._modified.add((self._DELTA_CONTAINERS[type(obj)], obj.uuid))
+
+  def _UnlockedMarkRemoved(self, uuid):
+    """Records an object that was removed under the config lock.
+
+    """
+    self._removed.add(uuid)
+
+  def _UnlockedGetConfigDelta(self):
+    """Returns the recorded changes in the form expected by WConfd.
+
+    @rtype: dict
+
+    """
+    data = self._ConfigData()
+    delta = dict((name, {}) for name in self._DELTA_CONTAINERS.values())
+    delta["cluster"] = data.cluster.ToDict()
+    delta["removed"] = list(self._removed)
+    for (name, uuid) in self._modified:
+      obj = getattr(data, name).get(uuid)
+      if obj is not None:
+        delta[name][uuid] = obj.ToDict()
+    return delta
 
   def _GetWConfdContext(self):
     return self._wconfdcontext
@@ -352,14 +433,16 @@ class ConfigWriter(object):
       raise errors.ConfigurationError("Disk %s doesn't exist" % disk_uuid)
 
     # Disk must not be attached anywhere
-    for inst in self._ConfigData().instances.values():
-      if disk_uuid in inst.disks:
-        raise errors.ReservationError("Cannot remove disk %s. Disk is"
-                                      " attached to instance %s"
-                                      % (disk_uuid, inst.name))
+    inst_uuid = self._Index().disk_instance.get(disk_uuid)
+    if inst_uuid is not None:
+      raise errors.ReservationError("Cannot remove disk %s. Disk is"
+                                    " attached to instance %s"
+                                    % (disk_uuid,
+                                       self._UnlockedGetInstanceName(inst_uuid)))
 
     # Remove disk from config file
     del self._ConfigData().disks[disk_uuid]
+    self._UnlockedMarkRemoved(disk_uuid)
     self._ConfigData().cluster.serial_no += 1
 
   def RemoveInstanceDisk(self, inst_uuid, disk_uuid):
@@ -1046,6 +1129,10 @@ class ConfigWriter(object):
         result.append("IP address %s is used by multiple owners: %s" %
                       (ip, utils.CommaJoin(owners)))
 
+    # secondary indexes check
+    if self._index is not None:
+      result.extend(self._index.Verify())
+
     return result
 
   @ConfigSync(shared=1)
@@ -1486,6 +1573,7 @@ class ConfigWriter(object):
     group.UpgradeConfig()
 
     self._ConfigData().nodegroups[group.uuid] = group
+    self._UnlockedMarkModified(group)
     self._ConfigData().cluster.serial_no += 1
 
   @ConfigSync()
@@ -1505,6 +1593,7 @@ class ConfigWriter(object):
             "Group '%s' is the only group, cannot be removed" % group_uuid
 
     del self._ConfigData().nodegroups[group_uuid]
+    self._UnlockedMarkRemoved(group_uuid)
     self._ConfigData().cluster.serial_no += 1
 
   def _UnlockedLookupNodeGroup(self, target):
@@ -1750,6 +1839,8 @@ class ConfigWriter(object):
 
     inst = self._ConfigData().instances[inst_uuid]
     inst.name = new_name
+    self._UnlockedUpdateIndex(ConfigIndex.UpdateInstance, inst)
+    self._UnlockedMarkModified(inst)
 
     instance_disks = self._UnlockedGetInstanceDisks(inst_uuid)
     for (_, disk) in enumerate(instance_disks):
@@ -1759,6 +1850,7 @@ class ConfigWriter(object):
         disk.logical_id = (disk.logical_id[0],
                            utils.PathJoin(file_storage_dir, inst.name,
                                           os.path.basename(disk.logical_id[1])))
+        self._UnlockedMarkModified(disk)
 
     # Force update of ssconf files
     self._ConfigData().cluster.serial_no += 1
@@ -1980,10 +2072,11 @@ class ConfigWriter(object):
     return self._UnlockedGetInstanceInfoByName(inst_name)
 
   def _UnlockedGetInstanceInfoByName(self, inst_name):
-    for inst in self._UnlockedGetAllInstancesInfo().values():
-      if inst.name == inst_name:
-        return inst
-    return None
+    inst = self._UnlockedGetInstanceInfo(
+      self._Index().instance_by_name.get(inst_name))
+    if inst is None or inst.name != inst_name:
+      return None
+    return inst
 
   def _UnlockedGetInstanceName(self, inst_uuid):
     inst_info = self._UnlockedGetInstanceInfo(inst_uuid)
@@ -2038,7 +2131,10 @@ class ConfigWriter(object):
     @type nodes: list of node uuids
 
     """
-    self._UnlockedGetDiskInfo(disk_uuid).nodes = nodes
+    disk = self._UnlockedGetDiskInfo(disk_uuid)
+    disk.nodes = nodes
+    self._UnlockedUpdateIndex(ConfigIndex.UpdateDisk, disk_uuid)
+    self._UnlockedMarkModified(disk)
 
   @ConfigSync()
   def SetDiskLogicalID(self, disk_uuid, logical_id):
@@ -2061,6 +2157,7 @@ class ConfigWriter(object):
                                    logical_id)
 
     disk.logical_id = logical_id
+    self._UnlockedMarkModified(disk)
 
   def _UnlockedGetInstanceNames(self, inst_uuids):
     return [self._UnlockedGetInstanceName(uuid) for uuid in inst_uuids]
@@ -2081,6 +2178,8 @@ class ConfigWriter(object):
     self._UnlockedAddNodeToGroup(node.uuid, node.group)
     assert node.uuid in self._ConfigData().nodegroups[node.group].members
     self._ConfigData().nodes[node.uuid] = node
+    self._UnlockedUpdateIndex(ConfigIndex.AddNode, node)
+    self._UnlockedMarkModified(node)
     self._ConfigData().cluster.serial_no += 1
 
   @ConfigSync()
@@ -2103,8 +2202,11 @@ class ConfigWriter(object):
     if node_uuid not in self._ConfigData().nodes:
       raise errors.ConfigurationError("Unknown node '%s'" % node_uuid)
 
-    self._UnlockedRemoveNodeFromGroup(self._ConfigData().nodes[node_uuid])
+    node = self._ConfigData().nodes[node_uuid]
+    self._UnlockedRemoveNodeFromGroup(node)
     del self._ConfigData().nodes[node_uuid]
+    self._UnlockedUpdateIndex(ConfigIndex.RemoveNode, node)
+    self._UnlockedMarkRemoved(node_uuid)
     self._ConfigData().cluster.serial_no += 1
 
   def ExpandNodeName(self, short_name):
@@ -2164,13 +2266,9 @@ class ConfigWriter(object):
     @return: a tuple with two lists: the primary and the secondary instances
 
     """
-    pri = []
-    sec = []
-    for inst in self._ConfigData().instances.values():
-      if inst.primary_node == node_uuid:
-        pri.append(inst.uuid)
-      if node_uuid in self._UnlockedGetInstanceSecondaryNodes(inst.uuid):
-        sec.append(inst.uuid)
+    index = self._Index()
+    pri = list(index.node_primary.get(node_uuid, []))
+    sec = list(index.node_secondary.get(node_uuid, []))
     return (pri, sec)
 
   @ConfigSync(shared=1)
@@ -2184,14 +2282,11 @@ class ConfigWriter(object):
 
     """
     if primary_only:
-      nodes_fn = lambda inst: [inst.primary_node]
+      index = self._Index().group_primary
     else:
-      nodes_fn = lambda inst: self._UnlockedGetInstanceNodes(inst.uuid)
+      index = self._Index().group_all
 
-    return frozenset(inst.uuid
-                     for inst in self._ConfigData().instances.values()
-                     for node_uuid in nodes_fn(inst)
-                     if self._UnlockedGetNodeInfo(node_uuid).group == uuid)
+    return frozenset(index.get(uuid, []))
 
   def _UnlockedGetHvparamsString(self, hvname):
     """Return the string representation of the list of hyervisor parameters of
@@ -2313,10 +2408,10 @@ class ConfigWriter(object):
     return self._UnlockedGetAllNodesInfo()
 
   def _UnlockedGetNodeInfoByName(self, node_name):
-    for node in self._UnlockedGetAllNodesInfo().values():
-      if node.name == node_name:
-        return node
-    return None
+    node = self._UnlockedGetNodeInfo(self._Index().node_by_name.get(node_name))
+    if node is None or node.name != node_name:
+      return None
+    return node
 
   @ConfigSync(shared=1)
   def GetNodeInfoByName(self, node_name):
@@ -2475,6 +2570,7 @@ class ConfigWriter(object):
         mod_list.append(node)
         node.master_candidate = True
         node.serial_no += 1
+        self._UnlockedMarkModified(node)
         mc_now += 1
       if mc_now != mc_max:
         # this should not happen
@@ -2575,11 +2671,14 @@ class ConfigWriter(object):
       if node.uuid not in new_group.members:
         new_group.members.append(node.uuid)
 
+      self._UnlockedUpdateIndex(ConfigIndex.UpdateNodeGroup, node.uuid)
+
     # Update timestamps and serials (only once per node/group object)
     now = time.time()
     for obj in frozenset(itertools.chain(*resmod)):
       obj.serial_no += 1
       obj.mtime = now
+      self._UnlockedMarkModified(obj)
 
     # Force ssconf update
     self._ConfigData().cluster.serial_no += 1
@@ -2634,6 +2733,7 @@ class ConfigWriter(object):
         return # we already have the lock, do nothing
     else:
       self._lock_current_shared = shared
+      self._ResetChanges()
     if force:
       self._lock_forced = True
     # Read the configuration data. If offline, read the file directly.
@@ -2686,22 +2786,57 @@ class ConfigWriter(object):
       else:
         # poll until we acquire the lock
         while True:
-          logging.debug("Receiving config from WConfd.LockConfig [shared=%s]",
-                        bool(shared))
-          dict_data = \
-              self._wconfd.LockConfig(self._GetWConfdContext(), bool(shared))
-          if dict_data is not None:
-            logging.debug("Received config from WConfd.LockConfig")
+          (locked, dict_data) = self._LockConfig(shared)
+          if locked:
             break
           time.sleep(random.random())
 
       try:
         if dict_data is not None:
           self._SetConfigData(objects.ConfigData.FromDict(dict_data))
+          self._config_serial = self._ConfigData().serial_no
           self._UpgradeConfig()
       except Exception, err:
         raise errors.ConfigurationError(err)
 
+  def _LockConfig(self, shared):
+    """Tries to acquire the configuration lock in WConfd.
+
+    If the local copy of the configuration is known to match a version held
+    by WConfd, the configuration is only transferred if it changed since.
+
+    @rtype: tuple
+    @return: whether the lock was acquired, and the configuration data as a
+        dictionary, or None if the local copy is still up to date
+
+    """
+    if self._config_data is None or self._config_serial is None:
+      logging.debug("Receiving config from WConfd.LockConfig [shared=%s]",
+                    bool(shared))
+      dict_data = \
+          self._wconfd.LockConfig(self._GetWConfdContext(), bool(shared))
+      if dict_data is None:
+        return (False, None)
+      logging.debug("Received config from WConfd.LockConfig")
+      return (True, dict_data)
+
+    logging.debug("Receiving config from WConfd.LockConfigIfChanged"
+                  " [shared=%s, serial=%s]", bool(shared), self._config_serial)
+    result = self._wconfd.LockConfigIfChanged(self._GetWConfdContext(),
+                                              bool(shared),
+                                              self._config_serial)
+    if result is None:
+      return (False, None)
+
+    (serial_no, dict_data) = result
+    if dict_data is None:
+      logging.debug("Configuration unchanged at serial %s, reusing the local"
+                    " copy", serial_no)
+    else:
+      logging.debug("Received config with serial %s from"
+                    " WConfd.LockConfigIfChanged", serial_no)
+    return (True, dict_data)
+
   def _CloseConfig(self, save):
     """Release resources relating the config data.
 
@@ -2718,6 +2853,10 @@ class ConfigWriter(object):
         raise
     elif not self._offline and \
          not (self._lock_current_shared and not self._lock_forced):
+      if not self._lock_current_shared:
+        # Changes might have been made to the local copy without being
+        # written, it can't be reused for the next exclusive lock
+        self._config_serial = None
       logging.debug("Unlocking configuration without writing")
       self._wconfd.UnlockConfig(self._GetWConfdContext())
       self._lock_forced = False
@@ -2742,27 +2881,43 @@ class ConfigWriter(object):
     else:
       oldconf = None
 
-    # In-object upgrades
+    # In-object upgrades only fill in defaults; they are repeated whenever the
+    # configuration is loaded and the cluster object, which they change most,
+    # is part of every configuration delta. The steps below generate new data
+    # which WConfd has to receive, so they are tracked.
     self._ConfigData().UpgradeConfig()
 
+    generated = False
     for item in self._AllUUIDObjects():
       if item.uuid is None:
         item.uuid = self._GenerateUniqueID(_UPGRADE_CONFIG_JID)
+        generated = True
     if not self._ConfigData().nodegroups:
       default_nodegroup_name = constants.INITIAL_NODE_GROUP_NAME
       default_nodegroup = objects.NodeGroup(name=default_nodegroup_name,
                                             members=[])
       self._UnlockedAddNodeGroup(default_nodegroup, _UPGRADE_CONFIG_JID, True)
+      generated = True
     for node in self._ConfigData().nodes.values():
       if not node.group:
         node.group = self._UnlockedLookupNodeGroup(None)
+        generated = True
       # This is technically *not* an upgrade, but needs to be done both when
       # nodegroups are being added, and upon normally loading the config,
       # because the members list of a node group is discarded upon
       # serializing/deserializing the object.
       self._UnlockedAddNodeToGroup(node.uuid, node.group)
 
-    if saveafter:
+    if generated and not self._offline:
+      # WConfd's copy doesn't contain the generated data. Objects are
+      # identified by their UUID in configuration deltas, so the next write
+      # must send the whole configuration. The local copy differs from the
+      # one WConfd holds under the received serial number and must not be
+      # reused for a later lock, which would forget about the full write.
+      self._full_write = True
+      self._config_serial = None
+
+    if oldconf is not None:
       modified = (oldconf != self._ConfigData().ToDict())
     else:
       modified = True # can't prove it didn't change, but doesn't matter
@@ -2802,24 +2957,58 @@ class ConfigWriter(object):
       finally:
         os.close(fd)
     else:
+      # Only a successful delta write tells us the serial number under which
+      # WConfd stores our copy of the configuration
+      self._config_serial = None
       try:
-        if releaselock:
-          res = self._wconfd.WriteConfigAndUnlock(self._GetWConfdContext(),
-                                                  self._ConfigData().ToDict())
-          if not res:
-            logging.warning("WriteConfigAndUnlock indicates we already have"
-                            " released the lock; assuming this was just a retry"
-                            " and the initial call succeeded")
+        if self._full_write:
+          self._WriteFullConfig(releaselock)
         else:
-          self._wconfd.WriteConfig(self._GetWConfdContext(),
-                                   self._ConfigData().ToDict())
+          self._WriteConfigDelta(releaselock)
       except errors.LockError:
         raise errors.ConfigurationError("The configuration file has been"
                                         " modified since the last write, cannot"
                                         " update")
+      self._ResetChanges()
 
     self.write_count += 1
 
+  def _WriteFullConfig(self, releaselock):
+    """Sends the whole configuration to WConfd.
+
+    """
+    if releaselock:
+      res = self._wconfd.WriteConfigAndUnlock(self._GetWConfdContext(),
+                                              self._ConfigData().ToDict())
+      if not res:
+        logging.warning("WriteConfigAndUnlock indicates we already have"
+                        " released the lock; assuming this was just a retry"
+                        " and the initial call succeeded")
+    else:
+      self._wconfd.WriteConfig(self._GetWConfdContext(),
+                               self._ConfigData().ToDict())
+
+  def _WriteConfigDelta(self, releaselock):
+    """Sends the objects changed under the config lock to WConfd.
+
+    On success, the local copy of the configuration is identical to the one
+    in WConfd and can be reused for subsequent locks.
+
+    """
+    res = self._wconfd.WriteConfigDelta(self._GetWConfdContext(),
+                                        self._UnlockedGetConfigDelta(),
+                                        releaselock)
+    if res is None:
+      logging.warning("WriteConfigDelta indicates we already have"
+                      " released the lock; assuming this was just a retry"
+                      " and the initial call succeeded")
+      return
+
+    (serial_no, mtime) = res
+    self._ConfigData().serial_no = serial_no
+    self._ConfigData().mtime = mtime
+    self._config_serial = serial_no
+
   def _GetAllHvparamsStrings(self, hypervisors):
     """Get the hvparams of all given hypervisors from the config.
 
@@ -3203,6 +3392,7 @@ class ConfigWriter(object):
     net.serial_no = 1
     net.ctime = net.mtime = time.time()
     self._ConfigData().networks[net.uuid] = net
+    self._UnlockedMarkModified(net)
     self._ConfigData().cluster.serial_no += 1
 
   def _UnlockedLookupNetwork(self, target):
@@ -3253,6 +3443,7 @@ class ConfigWriter(object):
       raise errors.ConfigurationError("Unknown network '%s'" % network_uuid)
 
     del self._ConfigData().networks[network_uuid]
+    self._UnlockedMarkRemoved(network_uuid)
     self._ConfigData().cluster.serial_no += 1
 
   def _UnlockedGetGroupNetParams(self, net_uuid, node_uuid):
@@ -3418,9 +3609,7 @@ class ConfigWriter(object):
     @rtype: string
     @return: uuid of instance the disk is attached to.
     """
-    for inst_uuid, inst_info in self._UnlockedGetAllInstancesInfo().items():
-      if disk_uuid in inst_info.disks:
-        return inst_uuid
+    return self._Index().disk_instance.get(disk_uuid)
 
   def SetMaintdRoundDelay(self, delay):
     """Set the minimal time the maintenance daemon should wait between rounds"""
@@ -0,0 +1,238 @@
+#
+#
+
+# Copyright (C) 2014 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Secondary indexes over the configuration data."""
+
+
+class ConfigIndex(object):
+  """Secondary indexes over a L{objects.ConfigData} object.
+
+  The configuration only maps UUIDs to objects; looking up an object by name
+  or finding all instances related to a node, node group or disk requires a
+  scan over all instances. This class keeps the reverse mappings, so that
+  these lookups take constant time.
+
+  The index is built from a full scan and can afterwards be kept up to date
+  by the mutating methods of L{ConfigWriter}, which report every change
+  affecting an indexed relation.
+
+  """
+  def __init__(self, data):
+    """Builds the indexes from the given configuration data.
+
+    @type data: L{objects.ConfigData}
+
+    """
+    self._data = data
+    self.instance_by_name = {}
+    self.node_by_name = {}
+    self.node_primary = {}
+    self.node_secondary = {}
+    self.group_primary = {}
+    self.group_all = {}
+    self.disk_instance = {}
+    # Relations indexed for each instance, so that they can be removed again
+    # without looking at the (possibly already modified) instance object
+    self._instance_relations = {}
+
+    for node in data.nodes.values():
+      self.node_by_name[node.name] = node.uuid
+
+    for instance in data.instances.values():
+      self.AddInstance(instance)
+
+  @staticmethod
+  def _Add(index, key, value):
+    index.setdefault(key, set()).add(value)
+
+  @staticmethod
+  def _Remove(index, key, value):
+    values = index.get(key)
+    if values is not None:
+      values.discard(value)
+      if not values:
+        del index[key]
+
+  def _ComputeRelations(self, instance):
+    """Computes the indexed relations of an instance.
+
+    @rtype: tuple
+    @return: (name, primary node, secondary nodes, primary node groups, all
+        node groups, disks)
+
+    """
+    data = self._data
+
+    disks = []
+    all_nodes = set()
+    for disk_uuid in instance.disks:
+      disk = data.disks.get(disk_uuid)
+      if disk is not None:
+        all_nodes.update(disk.all_nodes)
+      disks.append(disk_uuid)
+
+    all_nodes.discard(instance.primary_node)
+    secondaries = frozenset(all_nodes)
+
+    def _Groups(node_uuids):
+      return frozenset(data.nodes[node_uuid].group
+                       for node_uuid in node_uuids
+                       if node_uuid in data.nodes)
+
+    primary_groups = _Groups([instance.primary_node])
+    all_groups = primary_groups | _Groups(secondaries)
+
+    return (instance.name, instance.primary_node, secondaries, primary_groups,
+            all_groups, tuple(disks))
+
+  def AddInstance(self, instance):
+    """Adds an instance to the indexes.
+
+    @type instance: L{objects.Instance}
+
+    """
+    uuid = instance.uuid
+    relations = self._ComputeRelations(instance)
+    (name, primary, secondaries, primary_groups, all_groups, disks) = relations
+
+    self._instance_relations[uuid] = relations
+    self.instance_by_name[name] = uuid
+    self._Add(self.node_primary, primary, uuid)
+    for node_uuid in secondaries:
+      self._Add(self.node_secondary, node_uuid, uuid)
+    for group_uuid in primary_groups:
+      self._Add(self.group_primary, group_uuid, uuid)
+    for group_uuid in all_groups:
+      self._Add(self.group_all, group_uuid, uuid)
+    for disk_uuid in disks:
+      self.disk_instance[disk_uuid] = uuid
+
+  def RemoveInstance(self, uuid):
+    """Removes an instance from the indexes.
+
+    @type uuid: string
+    @param uuid: the UUID of the instance
+
+    """
+    relations = self._instance_relations.pop(uuid, None)
+    if relations is None:
+      return
+
+    (name, primary, secondaries, primary_groups, all_groups, disks) = relations
+
+    if self.instance_by_name.get(name) == uuid:
+      del self.instance_by_name[name]
+    self._Remove(self.node_primary, primary, uuid)
+    for node_uuid in secondaries:
+      self._Remove(self.node_secondary, node_uuid, uuid)
+    for group_uuid in primary_groups:
+      self._Remove(self.group_primary, group_uuid, uuid)
+    for group_uuid in all_groups:
+      self._Remove(self.group_all, group_uuid, uuid)
+    for disk_uuid in disks:
+      if self.disk_instance.get(disk_uuid) == uuid:
+        del self.disk_instance[disk_uuid]
+
+  def UpdateInstance(self, instance):
+    """Re-indexes an instance after it was modified.
+
+    @type instance: L{objects.Instance}
+
+    """
+    self.RemoveInstance(instance.uuid)
+    self.AddInstance(instance)
+
+  def UpdateDisk(self, disk_uuid):
+    """Re-indexes the instance a disk is attached to, if any.
+
+    @type disk_uuid: string
+
+    """
+    inst_uuid = self.disk_instance.get(disk_uuid)
+    if inst_uuid is not None:
+      self.UpdateInstance(self._data.instances[inst_uuid])
+
+  def AddNode(self, node):
+    """Adds a node to the indexes.
+
+    @type node: L{objects.Node}
+
+    """
+    self.node_by_name[node.name] = node.uuid
+
+  def RemoveNode(self, node):
+    """Removes a node from the indexes.
+
+    @type node: L{objects.Node}
+
+    """
+    if self.node_by_name.get(node.name) == node.uuid:
+      del self.node_by_name[node.name]
+
+  def UpdateNodeGroup(self, node_uuid):
+    """Re-indexes all instances on a node after it changed its group.
+
+    @type node_uuid: string
+
+    """
+    inst_uuids = (self.node_primary.get(node_uuid, frozenset()) |
+                  self.node_secondary.get(node_uuid, frozenset()))
+    for inst_uuid in inst_uuids:
+      self.UpdateInstance(self._data.instances[inst_uuid])
+
+  def GetIndexes(self):
+    """Returns all indexes, for comparison purposes.
+
+    @rtype: dict
+    @return: dictionary mapping the index name to its content
+
+    """
+    return {
+      "instance_by_name": self.instance_by_name,
+      "node_by_name": self.node_by_name,
+      "node_primary": self.node_primary,
+      "node_secondary": self.node_secondary,
+      "group_primary": self.group_primary,
+      "group_all": self.group_all,
+      "disk_instance": self.disk_instance,
+      }
+
+  def Verify(self):
+    """Verifies the indexes against a full scan of the configuration.
+
+    @rtype: list
+    @return: a list of error messages, one for each index that is out of date
+
+    """
+    expected = ConfigIndex(self._data).GetIndexes()
+    return ["configuration index '%s' is out of date" % name
+            for (name, index) in sorted(self.GetIndexes().items())
+            if index != expected[name]]
@@ -64,6 +64,7 @@ EXT_PLUGIN_MASK = re.compile("^[a-zA-Z0-9_-]+$")
 
 JOB_ID_TEMPLATE = r"\d+"
 JOB_FILE_RE = re.compile(r"^job-(%s)$" % JOB_ID_TEMPLATE)
+JOB_JOURNAL_FILE_RE = re.compile(r"^job-(%s)\.journal$" % JOB_ID_TEMPLATE)
 
 # HVC_DEFAULTS contains one value 'HV_VNC_PASSWORD_FILE' which is not
 # a constant because it depends on an environment variable that is
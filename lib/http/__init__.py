@@ -115,6 +115,14 @@ class HttpSessionHandshakeUnexpectedEOF(HttpError):
   """
 
 
+class HttpSessionClosedByPeer(HttpError):
+  """Internal exception for a connection closed before a request was sent.
+
+  This should only be used for internal error reporting.
+
+  """
+
+
 class HttpSocketTimeout(Exception):
   """Internal exception for socket timeouts.
 
@@ -815,6 +823,7 @@ class HttpMessageReader(object):
 
     buf = ""
     eof = False
+    received = False
     while self.parser_status != self.PS_COMPLETE:
       # TODO: Don't read more than necessary (Content-Length), otherwise
       # data might be lost and/or an error could occur
@@ -822,6 +831,7 @@ class HttpMessageReader(object):
 
       if data:
         buf += data
+        received = True
       else:
         eof = True
 
@@ -833,6 +843,10 @@ class HttpMessageReader(object):
       if (eof and
           self.parser_status in (self.PS_START_LINE,
                                  self.PS_HEADERS)):
+        if not received:
+          # Peer closed the connection without sending anything, e.g. an idle
+          # keep-alive connection
+          raise HttpSessionClosedByPeer("Connection closed prematurely")
         raise HttpError("Connection closed prematurely")
 
     # Parse rest
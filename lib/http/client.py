@@ -33,6 +33,7 @@
 
 import logging
 import threading
+import time
 
 from cStringIO import StringIO
 
@@ -252,6 +253,170 @@ class _PendingRequest(object):
       req.completion_cb(req)
 
 
+class CurlPool(object):
+  """Pool of reusable cURL handles.
+
+  Handles are kept per destination (host and port) so that libcurl can reuse
+  the underlying keep-alive connection, avoiding a new TCP connect and TLS
+  handshake for every request. Handles which have been idle for too long or
+  whose last request failed are discarded.
+
+  """
+  #: Maximum number of idle handles kept in the pool
+  MAX_SIZE = 256
+
+  #: Number of seconds after which an idle handle is closed
+  MAX_IDLE = 60.0
+
+  def __init__(self, max_size=MAX_SIZE, max_idle=MAX_IDLE,
+               _curl=pycurl.Curl, _time_fn=time.time):
+    """Initializes this class.
+
+    @type max_size: int
+    @param max_size: Maximum number of idle handles
+    @type max_idle: float
+    @param max_idle: Maximum idle time of a handle in seconds
+
+    """
+    self._max_size = max_size
+    self._max_idle = max_idle
+    self._curl = _curl
+    self._time_fn = _time_fn
+
+    # The pool is shared between all threads of a process
+    self._lock = threading.Lock()
+
+    # Maps (host, port) to a list of (timestamp, handle) tuples, most recently
+    # used handle last
+    self._idle = {}
+    self._count = 0
+
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def _ExpireUnlocked(self, now):
+    """Closes all handles which have been idle for too long.
+
+    """
+    for key in self._idle.keys():
+      entries = self._idle[key]
+      keep = [(ts, curl) for (ts, curl) in entries
+              if now - ts <= self._max_idle]
+
+      for (_, curl) in entries[:len(entries) - len(keep)]:
+        self._CloseHandle(curl)
+
+      self._count -= len(entries) - len(keep)
+      self.evictions += len(entries) - len(keep)
+
+      if keep:
+        self._idle[key] = keep
+      else:
+        del self._idle[key]
+
+  @staticmethod
+  def _CloseHandle(curl):
+    """Closes a cURL handle, ignoring errors.
+
+    """
+    try:
+      curl.close()
+    except Exception: # pylint: disable=W0703
+      logging.debug("Error while closing cURL handle", exc_info=True)
+
+  def Get(self, host, port):
+    """Returns a cURL handle for a destination.
+
+    If an idle handle for the destination is available it is reused,
+    otherwise a new one is created.
+
+    @type host: string
+    @param host: Hostname or IP address
+    @type port: int
+    @param port: Port
+
+    """
+    self._lock.acquire()
+    try:
+      self._ExpireUnlocked(self._time_fn())
+
+      entries = self._idle.get((host, port))
+      if entries:
+        (_, curl) = entries.pop()
+        if not entries:
+          del self._idle[(host, port)]
+        self._count -= 1
+        self.hits += 1
+        return curl
+
+      self.misses += 1
+    finally:
+      self._lock.release()
+
+    return self._curl()
+
+  def Put(self, host, port, curl, healthy):
+    """Returns a cURL handle to the pool.
+
+    @type host: string
+    @param host: Hostname or IP address
+    @type port: int
+    @param port: Port
+    @type curl: pycurl.Curl
+    @param curl: cURL handle
+    @type healthy: bool
+    @param healthy: Whether the last request on this handle succeeded; failed
+      handles are not reused as their connection may be in a bad state
+
+    """
+    if not healthy:
+      self._CloseHandle(curl)
+      return
+
+    self._lock.acquire()
+    try:
+      if self._count >= self._max_size:
+        self.evictions += 1
+        self._CloseHandle(curl)
+      else:
+        self._idle.setdefault((host, port), []).append((self._time_fn(), curl))
+        self._count += 1
+    finally:
+      self._lock.release()
+
+  def Clear(self):
+    """Closes all idle handles.
+
+    """
+    self._lock.acquire()
+    try:
+      for entries in self._idle.values():
+        for (_, curl) in entries:
+          self._CloseHandle(curl)
+      self._idle.clear()
+      self._count = 0
+    finally:
+      self._lock.release()
+
+  def GetStats(self):
+    """Returns usage counters for this pool.
+
+    @rtype: dict
+
+    """
+    self._lock.acquire()
+    try:
+      return {
+        "hits": self.hits,
+        "misses": self.misses,
+        "evictions": self.evictions,
+        "idle": self._count,
+        }
+    finally:
+      self._lock.release()
+
+
 class _NoOpRequestMonitor(object): # pylint: disable=W0232
   """No-op request monitor.
 
@@ -362,14 +527,17 @@ def _ProcessCurlRequests(multi, requests):
     multi.select(1.0)
 
 
-def ProcessRequests(requests, lock_monitor_cb=None, _curl=pycurl.Curl,
-                    _curl_multi=pycurl.CurlMulti,
+def ProcessRequests(requests, lock_monitor_cb=None, pool=None,
+                    _curl=pycurl.Curl, _curl_multi=pycurl.CurlMulti,
                     _curl_process=_ProcessCurlRequests):
   """Processes any number of HTTP client requests.
 
   @type requests: list of L{HttpClientRequest}
   @param requests: List of all requests
   @param lock_monitor_cb: Callable for registering with lock monitor
+  @type pool: L{CurlPool} or None
+  @param pool: If given, cURL handles are taken from and returned to this
+    pool instead of being created for every request
 
   """
   assert compat.all((req.error is None and
@@ -378,10 +546,16 @@ def ProcessRequests(requests, lock_monitor_cb=None, _curl=pycurl.Curl,
                      req.resp_body is None)
                     for req in requests)
 
+  if pool is None:
+    get_curl_fn = lambda _: _curl()
+  else:
+    get_curl_fn = lambda req: pool.Get(req.host, req.port)
+
   # Prepare all requests
   curl_to_client = \
     dict((client.GetCurlHandle(), client)
-         for client in [_StartRequest(_curl(), req) for req in requests])
+         for client in [_StartRequest(get_curl_fn(req), req)
+                        for req in requests])
 
   assert len(curl_to_client) == len(requests)
 
@@ -396,10 +570,15 @@ def ProcessRequests(requests, lock_monitor_cb=None, _curl=pycurl.Curl,
   for (curl, msg) in _curl_process(_curl_multi(), curl_to_client.keys()):
     monitor.acquire(shared=0)
     try:
-      curl_to_client.pop(curl).Done(msg)
+      client = curl_to_client.pop(curl)
+      client.Done(msg)
     finally:
       monitor.release()
 
+    if pool is not None:
+      req = client.GetCurrentRequest()
+      pool.Put(req.host, req.port, curl, not msg)
+
   assert not curl_to_client, "Not all requests were processed"
 
   # Don't try to read information anymore as all requests have been processed
@@ -35,6 +35,7 @@ import BaseHTTPServer
 import cgi
 import logging
 import os
+import select
 import socket
 import time
 import signal
@@ -279,13 +280,16 @@ class HttpResponder(object):
     """
     self._handler = handler
 
-  def __call__(self, fn):
+  def __call__(self, fn, allow_keep_alive=False):
     """Handles a request.
 
     @type fn: callable
     @param fn: Callback for retrieving HTTP request, must return a tuple
       containing request message (L{http.HttpMessage}) and C{None} or the
       message reader (L{_HttpClientToServerMessageReader})
+    @type allow_keep_alive: bool
+    @param allow_keep_alive: Whether the connection may be kept open after
+      this request if the client supports it
 
     """
     response_msg = http.HttpMessage()
@@ -294,6 +298,7 @@ class HttpResponder(object):
                                        code=None, reason=None)
 
     force_close = True
+    keep_alive = False
 
     try:
       (request_msg, req_msg_reader) = fn()
@@ -316,9 +321,12 @@ class HttpResponder(object):
     else:
       # Only wait for client to close if we didn't have any exception.
       force_close = False
+      keep_alive = (allow_keep_alive and req_msg_reader is not None and
+                    not req_msg_reader.peer_will_close)
 
     return (request_msg, req_msg_reader, force_close,
-            self._Finalize(self.responses, response_msg))
+            self._Finalize(self.responses, response_msg,
+                           keep_alive=keep_alive))
 
   @staticmethod
   def _SetError(responses, handler, response_msg, err):
@@ -358,15 +366,19 @@ class HttpResponder(object):
     response_msg.body = body
 
   @staticmethod
-  def _Finalize(responses, msg):
+  def _Finalize(responses, msg, keep_alive=False):
     assert msg.start_line.reason is None
 
     if not msg.headers:
       msg.headers = {}
 
+    if keep_alive:
+      connection = "keep-alive"
+    else:
+      connection = "close"
+
     msg.headers.update({
-      # TODO: Keep-alive is not supported
-      http.HTTP_CONNECTION: "close",
+      http.HTTP_CONNECTION: connection,
       http.HTTP_DATE: _DateTimeHeader(),
       http.HTTP_SERVER: http.HTTP_GANETI_VERSION,
       })
@@ -389,8 +401,9 @@ class HttpServerRequestExecutor(object):
 
   This class implements the server side of HTTP. It's based on code of
   Python's BaseHTTPServer, from both version 2.4 and 3k. It does not
-  support non-ASCII character encodings. Keep-alive connections are
-  not supported.
+  support non-ASCII character encodings. Keep-alive connections are only
+  supported if enabled on the server, in which case up to
+  L{HttpServer.keep_alive_requests} requests are handled per connection.
 
   """
   # Timeouts in seconds for socket layer
@@ -413,6 +426,9 @@ class HttpServerRequestExecutor(object):
     request_msg_reader = None
     force_close = True
 
+    max_requests = server.keep_alive_requests
+    idle_timeout = server.keep_alive_idle_timeout
+
     logging.debug("Connection from %s:%s", client_addr[0], client_addr[1])
     try:
       # Block for closing connection
@@ -428,16 +444,44 @@ class HttpServerRequestExecutor(object):
             # Ignore rest
             return
 
-        (request_msg, request_msg_reader, force_close, response_msg) = \
-          responder(compat.partial(self._ReadRequest, sock, self.READ_TIMEOUT))
-        if response_msg:
-          # HttpMessage.start_line can be of different types
-          # Instance of 'HttpClientToServerStartLine' has no 'code' member
-          # pylint: disable=E1103,E1101
-          logging.info("%s:%s %s %s", client_addr[0], client_addr[1],
-                       request_msg.start_line, response_msg.start_line.code)
-          self._SendResponse(sock, request_msg, response_msg,
-                             self.WRITE_TIMEOUT)
+        count = 0
+        while True:
+          allow_keep_alive = (count + 1 < max_requests)
+
+          try:
+            (request_msg, request_msg_reader, force_close, response_msg) = \
+              responder(compat.partial(self._ReadRequest, sock,
+                                       self.READ_TIMEOUT),
+                        allow_keep_alive=allow_keep_alive)
+          except http.HttpSessionClosedByPeer:
+            if count == 0:
+              raise
+            # Client closed idle keep-alive connection
+            force_close = False
+            request_msg_reader = None
+            break
+
+          count += 1
+
+          if response_msg:
+            # HttpMessage.start_line can be of different types
+            # Instance of 'HttpClientToServerStartLine' has no 'code' member
+            # pylint: disable=E1103,E1101
+            logging.info("%s:%s %s %s", client_addr[0], client_addr[1],
+                         request_msg.start_line, response_msg.start_line.code)
+            self._SendResponse(sock, request_msg, response_msg,
+                               self.WRITE_TIMEOUT)
+
+          if not (response_msg and
+                  response_msg.headers.get(http.HTTP_CONNECTION) ==
+                  "keep-alive"):
+            break
+
+          if not self._WaitForRequest(sock, idle_timeout):
+            logging.debug("Keep-alive connection from %s:%s idle, closing",
+                          client_addr[0], client_addr[1])
+            force_close = True
+            break
       finally:
         http.ShutdownConnection(sock, self.CLOSE_TIMEOUT, self.WRITE_TIMEOUT,
                                 request_msg_reader, force_close)
@@ -446,6 +490,23 @@ class HttpServerRequestExecutor(object):
     finally:
       logging.debug("Disconnected %s:%s", client_addr[0], client_addr[1])
 
+  @staticmethod
+  def _WaitForRequest(sock, timeout):
+    """Waits for the next request on a keep-alive connection.
+
+    @type timeout: float or None
+    @param timeout: Idle timeout in seconds
+    @rtype: bool
+    @return: Whether data (or EOF) is available on the socket
+
+    """
+    # Data may already be buffered inside the SSL layer
+    pending_fn = getattr(sock, "pending", None)
+    if pending_fn and pending_fn():
+      return True
+
+    return utils.WaitForFdCondition(sock, select.POLLIN, timeout) is not None
+
   @staticmethod
   def _ReadRequest(sock, timeout):
     """Reads a request sent by client.
@@ -482,7 +543,8 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
 
   def __init__(self, mainloop, local_address, port, max_clients, handler,
                ssl_params=None, ssl_verify_peer=False,
-               request_executor_class=None, ssl_verify_callback=None):
+               request_executor_class=None, ssl_verify_callback=None,
+               keep_alive_requests=1, keep_alive_idle_timeout=None):
     """Initializes the HTTP server
 
     @type mainloop: ganeti.daemon.Mainloop
@@ -504,6 +566,13 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
     @type request_executor_class: class
     @param request_executor_class: a class derived from the
         HttpServerRequestExecutor class
+    @type keep_alive_requests: int
+    @param keep_alive_requests: Maximum number of requests handled by a
+        child process on one connection before it is recycled; 1 disables
+        keep-alive
+    @type keep_alive_idle_timeout: float
+    @param keep_alive_idle_timeout: Number of seconds after which an idle
+        keep-alive connection is closed and its child process exits
 
     """
     http.HttpBase.__init__(self)
@@ -514,6 +583,13 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
     else:
       self.request_executor = request_executor_class
 
+    assert keep_alive_requests >= 1
+    assert keep_alive_requests == 1 or keep_alive_idle_timeout > 0, \
+      "Keep-alive connections require an idle timeout"
+
+    self.keep_alive_requests = keep_alive_requests
+    self.keep_alive_idle_timeout = keep_alive_idle_timeout
+
     self.mainloop = mainloop
     self.local_address = local_address
     self.port = port
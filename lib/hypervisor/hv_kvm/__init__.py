@@ -71,11 +71,14 @@ from ganeti import uidpool
 from ganeti import ssconf
 from ganeti import netutils
 from ganeti import pathutils
+from ganeti import compat
+from ganeti import workerpool
 from ganeti.hypervisor import hv_base
 from ganeti.utils import wrapper as utils_wrapper
 
 from ganeti.hypervisor.hv_kvm.monitor import QmpConnection, QmpMessage, \
-                                             MonitorSocket
+                                             MonitorSocket, QmpConnectionCache, \
+                                             HmpConnection
 from ganeti.hypervisor.hv_kvm.netdev import OpenTap
 
 
@@ -172,11 +175,23 @@ _MIGRATION_CAPS_DELIM = ":"
 def _with_qmp(fn):
   """Wrapper used on hotplug related methods"""
   def wrapper(self, instance, *args, **kwargs):
-    """Create a QmpConnection and run the wrapped method"""
-    if not getattr(self, "qmp", None):
-      filename = self._InstanceQmpMonitor(instance.name)# pylint: disable=W0212
-      self.qmp = QmpConnection(filename)
-    return fn(self, instance, *args, **kwargs)
+    """Run the wrapped method with a QMP connection to the instance.
+
+    All QMP commands of the outermost wrapped method, including those of
+    nested wrapped methods, share one connection, which is closed
+    afterwards.
+
+    """
+    if getattr(self, "qmp", None):
+      return fn(self, instance, *args, **kwargs)
+
+    filename = self._InstanceQmpMonitor(instance.name)# pylint: disable=W0212
+    with QmpConnectionCache() as qmp_cache:
+      self.qmp = qmp_cache.Get(filename)
+      try:
+        return fn(self, instance, *args, **kwargs)
+      finally:
+        self.qmp = None
   return wrapper
 
 
@@ -550,6 +565,12 @@ class KVMHypervisor(hv_base.BaseHypervisor):
   _MIGRATION_INFO_MAX_BAD_ANSWERS = 5
   _MIGRATION_INFO_RETRY_DELAY = 2
 
+  #: Maximum number of instances queried concurrently by L{GetAllInstancesInfo}
+  _INFO_MAX_WORKERS = 16
+  #: Seconds after which L{GetAllInstancesInfo} stops querying QMP monitors
+  #: and only reports the information available from /proc
+  _INFO_QMP_TIMEOUT = 10
+
   _VERSION_RE = re.compile(r"\b(\d+)\.(\d+)(\.(\d+))?\b")
 
   _CPU_INFO_RE = re.compile(r"cpu\s+\#(\d+).*thread_id\s*=\s*(\d+)", re.I)
@@ -965,7 +986,7 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     """
     result = {}
     output = self._CallMonitorCommand(instance_name, self._CPU_INFO_CMD)
-    for line in output.stdout.splitlines():
+    for line in output.splitlines():
       match = self._CPU_INFO_RE.search(line)
       if not match:
         continue
@@ -1011,15 +1032,15 @@ class KVMHypervisor(hv_base.BaseHypervisor):
   def _ClearUserShutdown(cls, instance_name):
     utils.RemoveFile(cls._InstanceShutdownMonitor(instance_name))
 
-  def GetInstanceInfo(self, instance_name, hvparams=None):
+  def _GetInstanceInfo(self, instance_name, qmp_cache, deadline=None):
     """Get instance properties.
 
-    @type instance_name: string
-    @param instance_name: the instance name
-    @type hvparams: dict of strings
-    @param hvparams: hypervisor parameters to be used with this instance
-    @rtype: tuple of strings
-    @return: (name, id, memory, vcpus, stat, times)
+    @type qmp_cache: L{QmpConnectionCache}
+    @param qmp_cache: Cache of QMP connections to use
+    @type deadline: float or None
+    @param deadline: If given and already passed, the instance's monitor isn't
+      queried and the information from /proc is returned instead
+    @see: L{GetInstanceInfo}
 
     """
     _, pid, alive = self._InstancePidAlive(instance_name)
@@ -1033,34 +1054,67 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     istat = hv_base.HvInstanceState.RUNNING
     times = 0
 
-    try:
-      qmp = QmpConnection(self._InstanceQmpMonitor(instance_name))
-      qmp.connect()
-      vcpus = len(qmp.Execute("query-cpus"))
-      # Will fail if ballooning is not enabled, but we can then just resort to
-      # the value above.
-      mem_bytes = qmp.Execute("query-balloon")[qmp.ACTUAL_KEY]
-      memory = mem_bytes / 1048576
-    except errors.HypervisorError:
-      pass
+    if deadline is None or time.time() < deadline:
+      try:
+        ((cpus_ok, cpus), (balloon_ok, balloon)) = \
+          qmp_cache.ExecuteBatch(self._InstanceQmpMonitor(instance_name),
+                                 [("query-cpus", None),
+                                  ("query-balloon", None)])
+      except errors.HypervisorError:
+        pass
+      else:
+        if cpus_ok:
+          vcpus = len(cpus)
+        # Will fail if ballooning is not enabled, but we can then just resort
+        # to the value above.
+        if balloon_ok:
+          memory = balloon[QmpConnection.ACTUAL_KEY] / 1048576
 
     return (instance_name, pid, memory, vcpus, istat, times)
 
+  def GetInstanceInfo(self, instance_name, hvparams=None):
+    """Get instance properties.
+
+    @type instance_name: string
+    @param instance_name: the instance name
+    @type hvparams: dict of strings
+    @param hvparams: hypervisor parameters to be used with this instance
+    @rtype: tuple of strings
+    @return: (name, id, memory, vcpus, stat, times)
+
+    """
+    with QmpConnectionCache() as qmp_cache:
+      return self._GetInstanceInfo(instance_name, qmp_cache)
+
   def GetAllInstancesInfo(self, hvparams=None):
     """Get properties of all instances.
 
+    The instances are queried concurrently, using a bounded number of
+    threads. Instances whose monitors haven't been queried within
+    L{_INFO_QMP_TIMEOUT} seconds are reported using the information from
+    /proc only.
+
     @type hvparams: dict of strings
     @param hvparams: hypervisor parameters
     @return: list of tuples (name, id, memory, vcpus, stat, times)
 
     """
+    deadline = time.time() + self._INFO_QMP_TIMEOUT
+
+    with QmpConnectionCache() as qmp_cache:
+      fn = compat.partial(self._GetInstanceInfo, qmp_cache=qmp_cache,
+                          deadline=deadline)
+      results = workerpool.ParallelMap("KvmInstanceInfo", fn,
+                                       os.listdir(self._PIDS_DIR),
+                                       self._INFO_MAX_WORKERS)
+
     data = []
-    for name in os.listdir(self._PIDS_DIR):
-      try:
-        info = self.GetInstanceInfo(name)
-      except errors.HypervisorError:
-        # Ignore exceptions due to instances being shut down
-        continue
+    for (success, info) in results:
+      if not success:
+        if isinstance(info, errors.HypervisorError):
+          # Ignore exceptions due to instances being shut down
+          continue
+        raise info
       if info:
         data.append(info)
     return data
@@ -1947,13 +2001,13 @@ class KVMHypervisor(hv_base.BaseHypervisor):
         raise errors.HypervisorError("Failed to open SPICE password file %s: %s"
                                      % (spice_password_file, err))
 
-      qmp = QmpConnection(self._InstanceQmpMonitor(instance.name))
-      qmp.connect()
       arguments = {
           "protocol": "spice",
           "password": spice_pwd,
       }
-      qmp.Execute("set_password", arguments)
+      with QmpConnectionCache() as qmp_cache:
+        qmp_cache.Execute(self._InstanceQmpMonitor(instance.name),
+                          "set_password", arguments)
 
     for filename in temp_files:
       utils.RemoveFile(filename)
@@ -2007,32 +2061,23 @@ class KVMHypervisor(hv_base.BaseHypervisor):
   def _CallMonitorCommand(cls, instance_name, command, timeout=None):
     """Invoke a command on the instance monitor.
 
-    """
-    if timeout is not None:
-      timeout_cmd = "timeout %s" % (timeout, )
-    else:
-      timeout_cmd = ""
-
-    # TODO: Replace monitor calls with QMP once KVM >= 0.14 is the minimum
-    # version. The monitor protocol is designed for human consumption, whereas
-    # QMP is made for programmatic usage. In the worst case QMP can also
-    # execute monitor commands. As it is, all calls to socat take at least
-    # 500ms and likely more: socat can't detect the end of the reply and waits
-    # for 500ms of no data received before exiting (500 ms is the default for
-    # the "-t" parameter).
-    socat = ("echo %s | %s %s STDIO UNIX-CONNECT:%s" %
-             (utils.ShellQuote(command),
-              timeout_cmd,
-              constants.SOCAT_PATH,
-              utils.ShellQuote(cls._InstanceMonitor(instance_name))))
-    result = utils.RunCmd(socat)
-    if result.failed:
-      msg = ("Failed to send command '%s' to instance '%s', reason '%s',"
-             " output: %s" %
-             (command, instance_name, result.fail_reason, result.output))
-      raise errors.HypervisorError(msg)
+    @type instance_name: string
+    @param instance_name: the instance whose monitor to use
+    @type command: string
+    @param command: the monitor command line
+    @type timeout: number
+    @param timeout: how long to wait for the reply, in seconds
+    @rtype: string
+    @return: the output of the command
 
-    return result
+    """
+    try:
+      with HmpConnection(cls._InstanceMonitor(instance_name)) as hmp:
+        return hmp.Execute(command, timeout=timeout)
+    except errors.HypervisorError, err:
+      raise errors.HypervisorError("Failed to send command '%s' to instance"
+                                   " '%s', reason '%s'" %
+                                   (command, instance_name, err))
 
   @_with_qmp
   def VerifyHotplugSupport(self, instance, action, dev_type):
@@ -2075,7 +2120,7 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     except errors.HypervisorError:
       raise errors.HotplugError("Instance is probably down")
 
-    match = self._INFO_VERSION_RE.search(output.stdout)
+    match = self._INFO_VERSION_RE.search(output)
     if not match:
       raise errors.HotplugError("Cannot parse qemu version via monitor")
 
@@ -2516,21 +2561,22 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     """
     precopy_passes = 0
     while precopy_passes < 2:
-      migration_status = \
-          self._CallMonitorCommand(instance.name, 'info migrate')
+      try:
+        migration_status = \
+            self._CallMonitorCommand(instance.name, 'info migrate')
+      except errors.HypervisorError, err:
+        logging.debug('Error polling for dirty sync count in '
+          'hv_kvm._PostcopyAfterPrecopy(): %s' % err)
+        break
 
-      status_match = self._MIGRATION_STATUS_RE.search(migration_status.stdout)
+      status_match = self._MIGRATION_STATUS_RE.search(migration_status)
       if status_match and status_match.group(1) != 'active':
         logging.debug('Did not attempt postcopy, migration status: %s'
           % status_match.group(1))
         break
-      if migration_status.stderr:
-        logging.debug('Error polling for dirty sync count in '
-          'hv_kvm._PostcopyAfterPrecopy(): %s' % migration_status.stderr)
-        break
 
       passes_match = \
-          self._MIGRATION_PRECOPY_PASSES_RE.search(migration_status.stdout)
+          self._MIGRATION_PRECOPY_PASSES_RE.search(migration_status)
       if passes_match:
         precopy_passes = int(passes_match.group(1))
     else:
@@ -2573,18 +2619,18 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     info_command = "info migrate"
     for _ in range(self._MIGRATION_INFO_MAX_BAD_ANSWERS):
       result = self._CallMonitorCommand(instance.name, info_command)
-      match = self._MIGRATION_STATUS_RE.search(result.stdout)
+      match = self._MIGRATION_STATUS_RE.search(result)
       if not match:
-        if not result.stdout:
+        if not result:
           logging.info("KVM: empty 'info migrate' result")
         else:
           logging.warning("KVM: unknown 'info migrate' result: %s",
-                          result.stdout)
+                          result)
       else:
         status = match.group(1)
         if status in constants.HV_KVM_MIGRATION_VALID_STATUSES:
           migration_status = objects.MigrationStatus(status=status)
-          match = self._MIGRATION_PROGRESS_RE.search(result.stdout)
+          match = self._MIGRATION_PROGRESS_RE.search(result)
           if match:
             migration_status.transferred_ram = match.group("transferred")
             migration_status.total_ram = match.group("total")
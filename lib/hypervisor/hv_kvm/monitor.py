@@ -39,6 +39,8 @@ import errno
 import socket
 import StringIO
 import logging
+import threading
+import time
 try:
   import fdsend   # pylint: disable=F0401
 except ImportError:
@@ -237,6 +239,135 @@ def _ensure_connection(fn):
   return wrapper
 
 
+class HmpConnection(MonitorSocket):
+  """Connection to the QEMU human monitor (HMP).
+
+  The human monitor has no message framing; the only way to know that the
+  reply to a command is complete is to wait for the prompt that the monitor
+  prints once it is ready to accept the next command.
+
+  """
+  _PROMPT = "(qemu) "
+  _DEFAULT_TIMEOUT = 60
+
+  def __init__(self, monitor_filename):
+    super(HmpConnection, self).__init__(monitor_filename)
+    self._buf = ""
+
+  def __enter__(self):
+    self.connect()
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    self.close()
+
+  def connect(self):
+    """Connects to the human monitor.
+
+    Consumes the banner, so that the next data received from the monitor is
+    the reply to the first command.
+
+    @raise errors.HypervisorError: when there are communication errors
+
+    """
+    super(HmpConnection, self).connect()
+    try:
+      self._RecvUntilPrompt(self._SOCKET_TIMEOUT)
+    except errors.HypervisorError:
+      self.close()
+      raise
+
+  def _close(self):
+    super(HmpConnection, self)._close()
+    self._buf = ""
+
+  def _RecvUntilPrompt(self, timeout, eof_ok=False):
+    """Receives data from the monitor up to the next prompt.
+
+    @type timeout: number
+    @param timeout: how long to wait for the prompt, in seconds
+    @type eof_ok: bool
+    @param eof_ok: whether the peer closing the connection is a valid end
+                   of the reply (e.g. after C{quit})
+    @rtype: string
+    @return: the data received before the prompt
+
+    """
+    self._check_connection()
+
+    deadline = time.time() + timeout
+    start = 0
+    while True:
+      pos = self._buf.find(self._PROMPT, start)
+      if pos >= 0:
+        data = self._buf[:pos]
+        self._buf = self._buf[pos + len(self._PROMPT):]
+        return data
+
+      # Only the tail of the buffer can contain the beginning of a prompt
+      # split across two reads
+      start = max(0, len(self._buf) - len(self._PROMPT) + 1)
+
+      remaining = deadline - time.time()
+      if remaining <= 0:
+        raise errors.HypervisorError("Timeout while waiting for the monitor"
+                                     " prompt")
+
+      try:
+        self.sock.settimeout(remaining)
+        data = self.sock.recv(4096)
+      except socket.timeout:
+        raise errors.HypervisorError("Timeout while waiting for the monitor"
+                                     " prompt")
+      except socket.error, err:
+        raise errors.HypervisorError("Unable to receive data from the"
+                                     " monitor: %s" % err)
+
+      if not data:
+        data = self._buf
+        self._close()
+        if eof_ok:
+          return data
+        raise errors.HypervisorError("Connection to the monitor was closed"
+                                     " unexpectedly")
+
+      self._buf += data
+
+  def Execute(self, command, timeout=None):
+    """Executes a command and returns its output.
+
+    @type command: string
+    @param command: the monitor command line
+    @type timeout: number
+    @param timeout: how long to wait for the reply, in seconds
+    @rtype: string
+    @return: the output of the command, without the echoed command line
+    @raise errors.HypervisorError: when there are communication errors or the
+        reply does not arrive in time
+
+    """
+    self._check_connection()
+
+    if timeout is None:
+      timeout = self._DEFAULT_TIMEOUT
+
+    try:
+      self.sock.sendall(command + "\n")
+    except socket.error, err:
+      self._close()
+      raise errors.HypervisorError("Unable to send data to the monitor: %s" %
+                                   err)
+
+    reply = self._RecvUntilPrompt(timeout, eof_ok=True)
+
+    # The monitor echoes the command line before its output
+    (first, sep, rest) = reply.partition("\n")
+    if sep and command in first:
+      reply = rest
+
+    return reply
+
+
 class QmpConnection(MonitorSocket):
   """Connection to the QEMU Monitor using the QEMU Monitor Protocol (QMP).
 
@@ -248,6 +379,7 @@ class QmpConnection(MonitorSocket):
   _ACTUAL_KEY = ACTUAL_KEY = "actual"
   _ERROR_CLASS_KEY = "class"
   _ERROR_DESC_KEY = "desc"
+  _ID_KEY = "id"
   _EXECUTE_KEY = "execute"
   _ARGUMENTS_KEY = "arguments"
   _VERSION_KEY = "version"
@@ -312,6 +444,12 @@ class QmpConnection(MonitorSocket):
     self.Execute(self._CAPABILITIES_COMMAND)
     self.supported_commands = self._GetSupportedCommands()
 
+  def _close(self):
+    super(QmpConnection, self)._close()
+    # Data left over from this connection must not be parsed as part of the
+    # next one
+    self._buf = ""
+
   def _ParseMessage(self, buf):
     """Extract and parse a QMP message from the given buffer.
 
@@ -357,7 +495,11 @@ class QmpConnection(MonitorSocket):
       while True:
         data = self.sock.recv(4096)
         if not data:
-          break
+          # The peer closed the connection (e.g. the instance was shut down);
+          # the connection can't be used anymore
+          self._close()
+          raise errors.HypervisorError("Connection to the QMP monitor was"
+                                       " closed unexpectedly")
         recv_buffer.write(data)
 
         (message, self._buf) = self._ParseMessage(recv_buffer.getvalue())
@@ -435,12 +577,71 @@ class QmpConnection(MonitorSocket):
       logging.debug("QMP %s %s: %s\n", command, arguments, ret)
     return ret
 
-  def _GetResponse(self, command):
-    """Parse the QMP response
+  def ExecuteBatch(self, commands):
+    """Executes several QMP commands at once.
 
-    If error key found in the response message raise HypervisorError.
-    Ignore any async event and thus return the response message
-    related to command.
+    All commands are sent before the first response is read, saving a round
+    trip per command. QMP executes commands in the order they were received
+    and replies in the same order.
+
+    @type commands: list of tuples; (string, dict or None)
+    @param commands: commands and their arguments
+    @rtype: list of tuples; (bool, object)
+    @return: for every command whether it succeeded and either its return
+      value or an error message
+    @raise errors.HypervisorError: when there are communication errors
+
+    """
+    self._check_connection()
+
+    messages = []
+    for (idx, (command, arguments)) in enumerate(commands):
+      if (self.supported_commands is not None and
+          command not in self.supported_commands):
+        raise QmpCommandNotSupported("Instance does not support the '%s'"
+                                      " QMP command." % command)
+
+      message = QmpMessage({
+        self._EXECUTE_KEY: command,
+        self._ID_KEY: idx,
+        })
+      if arguments:
+        message[self._ARGUMENTS_KEY] = arguments
+      messages.append(str(message))
+
+    try:
+      self.sock.sendall("".join(messages))
+    except socket.timeout, err:
+      raise errors.HypervisorError("Timeout while sending a QMP message: "
+                                   "%s" % err)
+    except socket.error, err:
+      # The connection is broken, e.g. because the peer went away
+      self._close()
+      raise errors.HypervisorError("Unable to send data from KVM using the"
+                                   " QMP protocol: %s" % err)
+
+    result = []
+    for (idx, (command, _)) in enumerate(commands):
+      response = self._RecvReply()
+
+      if response[self._ID_KEY] not in (None, idx):
+        raise errors.HypervisorError("kvm: QMP reply for command %s doesn't"
+                                     " match request (got id %s)" %
+                                     (command, response[self._ID_KEY]))
+
+      err = response[self._ERROR_KEY]
+      if err:
+        result.append((False, "%s (%s)" % (err[self._ERROR_DESC_KEY],
+                                           err[self._ERROR_CLASS_KEY])))
+      else:
+        result.append((True, response[self._RETURN_KEY]))
+
+    return result
+
+  def _RecvReply(self):
+    """Receives the next reply to a command.
+
+    Asynchronous events received in the meantime are ignored.
 
     """
     # According the the QMP specification, there are only two reply types to a
@@ -450,19 +651,32 @@ class QmpConnection(MonitorSocket):
     # the "event" key.
     while True:
       response = self._Recv()
-      err = response[self._ERROR_KEY]
-      if err:
-        raise errors.HypervisorError("kvm: error executing the %s"
-                                     " command: %s (%s):" %
-                                     (command,
-                                      err[self._ERROR_DESC_KEY],
-                                      err[self._ERROR_CLASS_KEY]))
 
-      elif response[self._EVENT_KEY]:
+      if response[self._EVENT_KEY] and not response[self._ERROR_KEY]:
         # Filter-out any asynchronous events
         continue
 
-      return response[self._RETURN_KEY]
+      return response
+
+  def _GetResponse(self, command):
+    """Parse the QMP response
+
+    If error key found in the response message raise HypervisorError.
+    Ignore any async event and thus return the response message
+    related to command.
+
+    """
+    response = self._RecvReply()
+
+    err = response[self._ERROR_KEY]
+    if err:
+      raise errors.HypervisorError("kvm: error executing the %s"
+                                   " command: %s (%s):" %
+                                   (command,
+                                    err[self._ERROR_DESC_KEY],
+                                    err[self._ERROR_CLASS_KEY]))
+
+    return response[self._RETURN_KEY]
 
   def _filter_hvinfo(self, hvinfo):
     """Filter non valid keys of the device's hvinfo (if any)."""
@@ -786,3 +1000,102 @@ class QmpConnection(MonitorSocket):
       # succeeded, the whole hot-add action will fail and the runtime file will
       # not be updated which will make the instance non migrate-able
       logging.info("Removing fdset with id %s failed: %s", fdset, err)
+
+
+class QmpConnectionCache(object):
+  """Cache of QMP connections, one per monitor socket.
+
+  Connections are opened on first use and reused for subsequent commands.
+  If a cached connection turns out to be closed, e.g. because the instance
+  was restarted in the meantime, it is transparently re-established once.
+
+  QEMU serves only one QMP client at a time, hence connections must not be
+  held longer than necessary. The cache is meant to be used as a context
+  manager around a bounded unit of work; all connections are closed when
+  leaving it. It can be shared between threads, as long as a monitor socket
+  is only used by one thread at a time.
+
+  """
+  def __init__(self, _connection_cls=QmpConnection):
+    """Initializes this class.
+
+    """
+    self._connection_cls = _connection_cls
+    self._lock = threading.Lock()
+    self._connections = {}
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    self.Close()
+
+  def Get(self, monitor_filename):
+    """Returns a connected QMP connection for a monitor socket.
+
+    The connection stays open until the cache is closed, so that the
+    methods of L{QmpConnection} don't reconnect for every call.
+
+    @rtype: L{QmpConnection}
+
+    """
+    self._lock.acquire()
+    try:
+      qmp = self._connections.get(monitor_filename)
+      if qmp is None:
+        qmp = self._connection_cls(monitor_filename)
+        self._connections[monitor_filename] = qmp
+    finally:
+      self._lock.release()
+
+    if not qmp.is_connected():
+      qmp.connect()
+
+    return qmp
+
+  def ExecuteBatch(self, monitor_filename, commands):
+    """Executes several commands on a monitor socket.
+
+    @see: L{QmpConnection.ExecuteBatch}
+
+    """
+    qmp = self.Get(monitor_filename)
+    try:
+      return qmp.ExecuteBatch(commands)
+    except errors.HypervisorError:
+      if qmp.is_connected():
+        raise
+
+    # The connection was closed by the peer, retry once on a new connection
+    logging.debug("QMP connection to %s was closed, reconnecting",
+                  monitor_filename)
+    return self.Get(monitor_filename).ExecuteBatch(commands)
+
+  def Execute(self, monitor_filename, command, arguments=None):
+    """Executes a command on a monitor socket.
+
+    @see: L{QmpConnection.Execute}
+
+    """
+    ((success, value), ) = \
+      self.ExecuteBatch(monitor_filename, [(command, arguments)])
+
+    if not success:
+      raise errors.HypervisorError("kvm: error executing the %s command: %s" %
+                                   (command, value))
+
+    return value
+
+  def Close(self):
+    """Closes all cached connections.
+
+    """
+    self._lock.acquire()
+    try:
+      connections = self._connections.values()
+      self._connections.clear()
+    finally:
+      self._lock.release()
+
+    for qmp in connections:
+      qmp.close()
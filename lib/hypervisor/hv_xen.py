@@ -47,6 +47,7 @@ from ganeti.hypervisor import hv_base
 from ganeti import netutils
 from ganeti import objects
 from ganeti import pathutils
+from ganeti import serializer
 
 
 XEND_CONFIG_FILE = utils.PathJoin(pathutils.XEN_CONFIG_DIR, "xend-config.sxp")
@@ -54,6 +55,8 @@ XL_CONFIG_FILE = utils.PathJoin(pathutils.XEN_CONFIG_DIR, "xen/xl.conf")
 VIF_BRIDGE_SCRIPT = utils.PathJoin(pathutils.XEN_CONFIG_DIR,
                                    "scripts/vif-bridge")
 _DOM0_NAME = "Domain-0"
+#: Toolstack commands which don't change the state of domains
+_XEN_QUERY_COMMANDS = frozenset(["list", "info"])
 _DISK_LETTERS = string.ascii_lowercase
 
 _FILE_DRIVER_MAP = {
@@ -63,6 +66,118 @@ _FILE_DRIVER_MAP = {
   }
 
 
+class _XenStateCache(object):
+  """Node-local snapshot of the output of Xen toolstack queries.
+
+  Every node daemon request is handled in a separate process, so the output
+  of queries such as C{xl list} is kept in files and shared between requests
+  for a short time. Commands changing the state of domains invalidate the
+  snapshot, including the output of queries which were started before the
+  command finished.
+
+  The lifetime of the snapshot is given by the caller, see the
+  C{xen_state_cache_ttl} hypervisor parameter. Every state change done by
+  Ganeti goes through L{XenHypervisor._RunXen} (or
+  L{XenHypervisor.FinalizeMigrationDst} for incoming migrations) and thus
+  invalidates the snapshot immediately, so the lifetime only bounds how long
+  changes made outside of Ganeti, e.g. a domain crashing or being destroyed
+  by an administrator, can go unnoticed.
+
+  """
+  _INVALIDATED_FILE = "invalidated"
+
+  def __init__(self, cache_dir):
+    """Initializes this class.
+
+    @type cache_dir: string
+    @param cache_dir: directory for the cache files; if it doesn't exist,
+        nothing is cached
+
+    """
+    self._cache_dir = cache_dir
+
+  def _EntryPath(self, cmd):
+    """Returns the path of the cache file for a command.
+
+    """
+    return utils.PathJoin(self._cache_dir, "-".join(cmd))
+
+  def _ReadInvalidated(self):
+    """Returns the time of the last invalidation.
+
+    """
+    try:
+      return float(utils.ReadFile(utils.PathJoin(self._cache_dir,
+                                                 self._INVALIDATED_FILE)))
+    except EnvironmentError, err:
+      if err.errno != errno.ENOENT:
+        raise
+      return 0.0
+
+  def Get(self, cmd, ttl, _now=None):
+    """Returns the cached output of a command.
+
+    @type cmd: list of strings
+    @param cmd: the query command
+    @type ttl: float
+    @param ttl: time in seconds for which query output is reused
+    @rtype: string or None
+    @return: the standard output of the command, or C{None} if no recent
+        enough output is available
+
+    """
+    if _now is None:
+      _now = time.time()
+
+    try:
+      entry = serializer.LoadJson(utils.ReadFile(self._EntryPath(cmd)))
+      invalidated = self._ReadInvalidated()
+    except (EnvironmentError, ValueError), err:
+      if not (isinstance(err, EnvironmentError) and err.errno == errno.ENOENT):
+        logging.warning("Can't read Xen state cache for '%s': %s",
+                        utils.ShellQuoteArgs(cmd), err)
+      return None
+
+    started = entry["started"]
+    if not invalidated < started <= _now < started + ttl:
+      return None
+
+    return entry["stdout"]
+
+  def Put(self, cmd, started, stdout):
+    """Stores the output of a command.
+
+    @type cmd: list of strings
+    @param cmd: the query command
+    @type started: float
+    @param started: time at which the command was started
+    @type stdout: string
+    @param stdout: the standard output of the command
+
+    """
+    try:
+      utils.WriteFile(self._EntryPath(cmd),
+                      data=serializer.DumpJson({
+                        "started": started,
+                        "stdout": stdout,
+                        }))
+    except EnvironmentError, err:
+      if err.errno != errno.ENOENT:
+        logging.warning("Can't update Xen state cache for '%s': %s",
+                        utils.ShellQuoteArgs(cmd), err)
+
+  def Invalidate(self):
+    """Discards the output of all queries started until now.
+
+    """
+    try:
+      utils.WriteFile(utils.PathJoin(self._cache_dir, self._INVALIDATED_FILE),
+                      data=repr(time.time()))
+    except EnvironmentError, err:
+      if err.errno != errno.ENOENT:
+        logging.warning("Can't invalidate Xen state cache: %s", err)
+
+
 def _CreateConfigCpus(cpu_mask):
   """Create a CPU config string for Xen's config file.
 
@@ -544,7 +659,8 @@ class XenHypervisor(hv_base.BaseHypervisor):
     XL_CONFIG_FILE,
     ]
 
-  def __init__(self, _cfgdir=None, _run_cmd_fn=None, _cmd=None):
+  def __init__(self, _cfgdir=None, _run_cmd_fn=None, _cmd=None,
+               _state_cache=None):
     hv_base.BaseHypervisor.__init__(self)
 
     if _cfgdir is None:
@@ -559,6 +675,11 @@ class XenHypervisor(hv_base.BaseHypervisor):
 
     self._cmd = _cmd
 
+    if _state_cache is None:
+      self._state_cache = _XenStateCache(pathutils.XEN_STATE_CACHE_DIR)
+    else:
+      self._state_cache = _state_cache
+
   @staticmethod
   def _GetCommandFromHvparams(hvparams):
     """Returns the Xen command extracted from the given hvparams.
@@ -608,7 +729,44 @@ class XenHypervisor(hv_base.BaseHypervisor):
     cmd.extend([self._GetCommand(hvparams)])
     cmd.extend(args)
 
-    return self._run_cmd_fn(cmd)
+    try:
+      return self._run_cmd_fn(cmd)
+    finally:
+      if args[0] not in _XEN_QUERY_COMMANDS:
+        self._state_cache.Invalidate()
+
+  def _RunXenQuery(self, args, hvparams):
+    """Runs a Xen query command, reusing recent output if possible.
+
+    Successful output is shared with other node daemon requests for the
+    number of seconds given by the C{xen_state_cache_ttl} hypervisor
+    parameter; a value of zero disables sharing.
+
+    @see: L{_RunXen}
+
+    """
+    assert args[0] in _XEN_QUERY_COMMANDS
+
+    cmd = [self._GetCommand(hvparams)] + args
+
+    if hvparams is None:
+      ttl = constants.XEN_STATE_CACHE_TTL
+    else:
+      ttl = hvparams.get(constants.HV_XEN_STATE_CACHE_TTL,
+                         constants.XEN_STATE_CACHE_TTL)
+
+    if ttl > 0:
+      stdout = self._state_cache.Get(cmd, ttl)
+      if stdout is not None:
+        return utils.RunResult(constants.EXIT_SUCCESS, None, stdout, "", cmd,
+                               None, None)
+
+    started = time.time()
+    result = self._RunXen(args, hvparams)
+    if ttl > 0 and not result.failed:
+      self._state_cache.Put(cmd, started, result.stdout)
+
+    return result
 
   def _ConfigFileName(self, instance_name):
     """Get the config file name for an instance.
@@ -832,7 +990,7 @@ class XenHypervisor(hv_base.BaseHypervisor):
     @param hvparams: hypervisor parameters to be used on this node
 
     """
-    return _GetAllInstanceList(lambda: self._RunXen(["list"], hvparams),
+    return _GetAllInstanceList(lambda: self._RunXenQuery(["list"], hvparams),
                                include_node, delays=self._INSTANCE_LIST_DELAYS,
                                timeout=self._INSTANCE_LIST_TIMEOUT)
 
@@ -847,7 +1005,7 @@ class XenHypervisor(hv_base.BaseHypervisor):
 
     """
     instance_list = _GetRunningInstanceList(
-      lambda: self._RunXen(["list"], hvparams),
+      lambda: self._RunXenQuery(["list"], hvparams),
       False, delays=self._INSTANCE_LIST_DELAYS,
       timeout=self._INSTANCE_LIST_TIMEOUT)
     return [info[0] for info in instance_list]
@@ -1144,7 +1302,7 @@ class XenHypervisor(hv_base.BaseHypervisor):
     @see: L{_GetNodeInfo} and L{_ParseNodeInfo}
 
     """
-    result = self._RunXen(["info"], hvparams)
+    result = self._RunXenQuery(["info"], hvparams)
     if result.failed:
       logging.error("Can't retrieve xen hypervisor information (%s): %s",
                     result.fail_reason, result.output)
@@ -1292,6 +1450,9 @@ class XenHypervisor(hv_base.BaseHypervisor):
 
     """
 
+    # The domain was created by the migration, not by this node
+    self._state_cache.Invalidate()
+
     # We should recreate the config file if the domain is present and running,
     # regardless if we think the migration succeeded or not.
     info = self.GetInstanceInfo(instance.name, hvparams=instance.hvparams)
@@ -1520,6 +1681,7 @@ class XenPvmHypervisor(XenHypervisor):
     constants.HV_XEN_CMD:
       hv_base.ParamInSet(True, constants.KNOWN_XEN_COMMANDS),
     constants.HV_XEN_CPUID: hv_base.NO_CHECK,
+    constants.HV_XEN_STATE_CACHE_TTL: hv_base.OPT_NONNEGATIVE_INT_CHECK,
     constants.HV_SOUNDHW: hv_base.NO_CHECK,
     }
 
@@ -1641,6 +1803,7 @@ class XenHvmHypervisor(XenHypervisor):
     constants.HV_XEN_CMD:
       hv_base.ParamInSet(True, constants.KNOWN_XEN_COMMANDS),
     constants.HV_XEN_CPUID: hv_base.NO_CHECK,
+    constants.HV_XEN_STATE_CACHE_TTL: hv_base.OPT_NONNEGATIVE_INT_CHECK,
     constants.HV_SOUNDHW: hv_base.NO_CHECK,
     }
 
@@ -40,6 +40,7 @@ import threading
 import itertools
 import operator
 import os
+import zlib
 
 try:
   # pylint: disable=E0611
@@ -73,6 +74,9 @@ from ganeti.cmdlib import cluster
 #: Retrieves "id" attribute
 _GetIdAttr = operator.attrgetter("id")
 
+#: Suffix of the file holding the log journal of a job
+_JOURNAL_SUFFIX = ".journal"
+
 
 class CancelJob(Exception):
   """Special exception to cancel a job.
@@ -90,6 +94,52 @@ def TimeStampNow():
   return utils.SplitTime(time.time())
 
 
+def _EncodeJournalRecord(op_index, log_entry):
+  """Encodes a log entry as a record of a job's log journal.
+
+  Every record is a line containing the Adler-32 checksum of the data in
+  hexadecimal, followed by a space and the JSON encoded data.
+
+  @type op_index: int
+  @param op_index: Index of the opcode the entry belongs to
+  @type log_entry: tuple
+  @param log_entry: Log entry, see L{_QueuedOpCode}
+  @rtype: string
+
+  """
+  data = serializer.DumpJson([op_index, log_entry]).rstrip("\n")
+  return "%08x %s\n" % (zlib.adler32(data) & 0xffffffff, data)
+
+
+def _DecodeJournal(data):
+  """Decodes the records of a job's log journal.
+
+  Decoding stops at the first invalid record, as such a record can only be
+  the result of an interrupted write.
+
+  @type data: string
+  @param data: Contents of the journal
+  @rtype: list of tuples; (int, list)
+  @return: Opcode index and log entry of every record
+
+  """
+  result = []
+
+  for line in data.splitlines():
+    (checksum, _, payload) = line.partition(" ")
+    try:
+      if int(checksum, 16) != zlib.adler32(payload) & 0xffffffff:
+        raise ValueError("Checksum mismatch")
+      (op_index, log_entry) = serializer.LoadJson(payload)
+    except ValueError, err:
+      logging.warning("Ignoring rest of job journal after invalid record: %s",
+                      err)
+      break
+    result.append((op_index, log_entry))
+
+  return result
+
+
 def _CallJqUpdate(runner, names, file_name, content):
   """Updates job queue file after virtualizing filename.
 
@@ -328,6 +378,22 @@ class _QueuedJob(object):
       "process_id": self.process_id,
       }
 
+  def ReplayJournal(self, records):
+    """Adds the log entries of the job's log journal.
+
+    Entries already contained in the job file are ignored.
+
+    @type records: list of tuples; (int, list)
+    @param records: Opcode index and log entry of every journal record, see
+        L{_DecodeJournal}
+
+    """
+    serial = self.log_serial
+    for (op_index, log_entry) in records:
+      if log_entry[0] > serial:
+        self.ops[op_index].log.append(log_entry)
+        self.log_serial = max(self.log_serial, log_entry[0])
+
   def CalcStatus(self):
     """Compute the status of this job.
 
@@ -623,10 +689,13 @@ class _OpExecCallbacks(mcpu.OpExecCbBase):
     else:
       log_msgs = [log_msgs]
 
+    log_entries = []
     for msg in log_msgs:
       self._job.log_serial += 1
-      self._op.log.append((self._job.log_serial, timestamp, log_type, msg))
-    self._queue.UpdateJobUnlocked(self._job, replicate=False)
+      log_entries.append((self._job.log_serial, timestamp, log_type, msg))
+    self._op.log.extend(log_entries)
+    self._queue.AppendJobLogUnlocked(self._job, self._job.ops.index(self._op),
+                                     log_entries)
 
   # TODO: Cleanup calling conventions, make them explicit
   def Feedback(self, *args):
@@ -1374,6 +1443,21 @@ class JobQueue(object):
     """
     return utils.PathJoin(pathutils.QUEUE_DIR, "job-%s" % job_id)
 
+  @staticmethod
+  def _GetJobJournalPath(job_id):
+    """Returns the log journal file for a given job id.
+
+    The journal holds the log entries added to a job since its job file
+    was last written.
+
+    @type job_id: str
+    @param job_id: the job identifier
+    @rtype: str
+    @return: the path to the log journal file
+
+    """
+    return JobQueue._GetJobPath(job_id) + _JOURNAL_SUFFIX
+
   @staticmethod
   def _GetArchivedJobPath(job_id):
     """Returns the archived job file for a give job id.
@@ -1420,14 +1504,18 @@ class JobQueue(object):
     @return: the list of job IDs
 
     """
-    jlist = []
+    jobs = set()
 
     for path in cls._DetermineJobDirectories(archived):
       for filename in utils.ListVisibleFiles(path):
         m = constants.JOB_FILE_RE.match(filename)
         if m:
-          jlist.append(int(m.group(1)))
+          jobs.add(int(m.group(1)))
 
+      if path != pathutils.QUEUE_DIR:
+        jobs.update(jstore.ListArchivedJobs(path))
+
+    jlist = list(jobs)
     if sort:
       jlist.sort()
     return jlist
@@ -1505,6 +1593,11 @@ class JobQueue(object):
       except EnvironmentError, err:
         if err.errno != errno.ENOENT:
           raise
+        if archived:
+          # Archived jobs are eventually packed into the archive segment
+          raw_data = jstore.ReadArchivedJob(os.path.dirname(filepath), job_id)
+          if raw_data:
+            break
       else:
         break
 
@@ -1515,9 +1608,18 @@ class JobQueue(object):
     if writable is None:
       writable = not archived
 
+    journal = ""
+    if not archived:
+      try:
+        journal = utils.ReadFile(JobQueue._GetJobJournalPath(job_id))
+      except EnvironmentError, err:
+        if err.errno != errno.ENOENT:
+          raise
+
     try:
       data = serializer.LoadJson(raw_data)
       job = _QueuedJob.Restore(queue, data, writable, archived)
+      job.ReplayJournal(_DecodeJournal(journal))
     except Exception, err: # pylint: disable=W0703
       raise errors.JobFileCorrupted(err)
 
@@ -1624,11 +1726,76 @@ class JobQueue(object):
       assert job.writable, "Can't update read-only job"
       assert not job.archived, "Can't update archived job"
 
+    # Clients waiting for changes of the job only watch its journal if it
+    # exists when they start waiting, so it has to be there before the job
+    # file is written and they are woken up; otherwise they would miss the
+    # first log entries appended to it
+    os.close(self._OpenJobJournal(job.id, 0))
+
     filename = self._GetJobPath(job.id)
     data = serializer.DumpJson(job.Serialize())
     logging.debug("Writing job %s to %s", job.id, filename)
     self._UpdateJobQueueFile(filename, data, replicate)
 
+    # All log entries are in the job file now. The journal is truncated in
+    # place instead of being removed, so that watches on it keep working; it
+    # is removed when the job gets archived.
+    os.close(self._OpenJobJournal(job.id, os.O_TRUNC))
+
+  def _OpenJobJournal(self, job_id, flags):
+    """Opens the log journal of a job for writing, creating it if needed.
+
+    @type job_id: int
+    @param job_id: the job identifier
+    @type flags: int
+    @param flags: additional flags for C{os.open}
+    @rtype: int
+    @return: the file descriptor of the journal
+
+    """
+    getents = runtime.GetEnts()
+
+    fd = os.open(self._GetJobJournalPath(job_id),
+                 os.O_WRONLY | os.O_CREAT | flags,
+                 constants.JOB_QUEUE_FILES_PERMS)
+    try:
+      os.fchown(fd, getents.masterd_uid, getents.daemons_gid)
+    except EnvironmentError:
+      os.close(fd)
+      raise
+
+    return fd
+
+  def AppendJobLogUnlocked(self, job, op_index, log_entries):
+    """Appends new log entries of a job to its log journal.
+
+    Unlike L{UpdateJobUnlocked}, this doesn't write the whole job, so the
+    cost of adding log entries doesn't depend on the size of the job's log.
+    Like log-only job updates, the journal is not replicated to the other
+    nodes; its entries are included the next time the job is written.
+
+    @type job: L{_QueuedJob}
+    @param job: the changed job
+    @type op_index: int
+    @param op_index: index of the opcode the log entries belong to
+    @type log_entries: list
+    @param log_entries: the new log entries
+
+    """
+    assert job.writable, "Can't update read-only job"
+    assert not job.archived, "Can't update archived job"
+
+    data = "".join(_EncodeJournalRecord(op_index, log_entry)
+                   for log_entry in log_entries)
+
+    fd = self._OpenJobJournal(job.id, os.O_APPEND)
+    try:
+      offset = 0
+      while offset < len(data):
+        offset += os.write(fd, buffer(data, offset))
+    finally:
+      os.close(fd)
+
   def HasJobBeenFinalized(self, job_id):
     """Checks if a job has been finalized.
 
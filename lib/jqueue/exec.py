@@ -44,6 +44,7 @@ import time
 from ganeti import mcpu
 from ganeti.server import masterd
 from ganeti.rpc import transport
+import ganeti.rpc.node as rpc
 from ganeti import serializer
 from ganeti import utils
 from ganeti import pathutils
@@ -124,7 +125,7 @@ def main():
     def _HupHandler(signum, _frame):
       logging.debug("Received signal %d, old flag was %s, will set to True",
                     signum, mcpu.sighupReceived)
-      mcpu.sighupReceived[0] = True
+      mcpu.NotifyLockGrant()
     signal.signal(signal.SIGHUP, _HupHandler)
 
     def _User1Handler(signum, _frame):
@@ -178,6 +179,7 @@ def main():
   except Exception: # pylint: disable=W0703
     logging.exception("Exception when trying to run job %d", job_id)
   finally:
+    rpc.LogConnectionPoolStats()
     logging.debug("Job %d finalized", job_id)
     logging.debug("Removing livelock file %s", livelock_name.GetPath())
     os.remove(livelock_name.GetPath())
@@ -30,18 +30,35 @@
 
 """Module implementing the job queue handling."""
 
+import bisect
 import errno
 import os
+import zlib
 
 from ganeti import constants
 from ganeti import errors
 from ganeti import runtime
+from ganeti import serializer
 from ganeti import utils
 from ganeti import pathutils
 
 
 JOBS_PER_ARCHIVE_DIRECTORY = constants.JSTORE_JOBS_PER_ARCHIVE_DIRECTORY
 
+#: Name of the file in an archive directory holding the packed jobs
+ARCHIVE_SEGMENT_FILE = "segment"
+
+#: Name of the index of L{ARCHIVE_SEGMENT_FILE}
+ARCHIVE_INDEX_FILE = "segment.index"
+
+#: Format of the lines of an archive index, which are sorted by job ID; the
+#: fields are job ID, offset and length of the compressed job in the segment
+#: and the job's end timestamp
+_ARCHIVE_INDEX_LINE = "%012d %016d %010d %012d\n"
+
+#: Length of the lines of an archive index
+_ARCHIVE_INDEX_LINE_LEN = len(_ARCHIVE_INDEX_LINE % (0, 0, 0, 0))
+
 
 def _ReadNumericFile(file_name):
   """Reads a file containing a number.
@@ -233,3 +250,244 @@ def ParseJobId(job_id):
     return int(job_id)
   except (ValueError, TypeError):
     raise errors.ParameterError("Invalid job ID '%s'" % job_id)
+
+
+def _ParseArchiveIndexLine(line):
+  """Parses a line of an archive index.
+
+  @rtype: tuple; (int, int, int, int)
+  @return: Job ID, offset and length in the segment and end timestamp
+
+  """
+  try:
+    (job_id, offset, length, timestamp) = map(int, line.split())
+  except ValueError:
+    raise errors.JobFileCorrupted("Invalid archive index line '%s'" % line)
+
+  return (job_id, offset, length, timestamp)
+
+
+def ReadArchiveIndex(path):
+  """Reads the index of the jobs packed in an archive directory.
+
+  @type path: string
+  @param path: Archive directory
+  @rtype: list of tuples; (int, int, int, int)
+  @return: Job ID, offset and length in the segment and end timestamp of
+    every packed job, sorted by job ID
+
+  """
+  try:
+    data = utils.ReadFile(utils.PathJoin(path, ARCHIVE_INDEX_FILE))
+  except EnvironmentError, err:
+    if err.errno == errno.ENOENT:
+      return []
+    raise
+
+  return [_ParseArchiveIndexLine(line) for line in data.splitlines()]
+
+
+def ListArchivedJobs(path, min_id=None, max_id=None, min_timestamp=None,
+                     max_timestamp=None):
+  """Lists the jobs packed in an archive directory.
+
+  All ranges include their limits.
+
+  @type path: string
+  @param path: Archive directory
+  @type min_id: int
+  @param min_id: Lowest job ID to list
+  @type max_id: int
+  @param max_id: Highest job ID to list
+  @type min_timestamp: int
+  @param min_timestamp: Only list jobs which ended at or after this time
+  @type max_timestamp: int
+  @param max_timestamp: Only list jobs which ended at or before this time
+  @rtype: list of int
+  @return: Sorted job IDs
+
+  """
+  entries = ReadArchiveIndex(path)
+
+  start = 0
+  end = len(entries)
+  if min_id is not None:
+    start = bisect.bisect_left(entries, (min_id, ))
+  if max_id is not None:
+    end = bisect.bisect_left(entries, (max_id + 1, ))
+
+  return [job_id for (job_id, _, _, timestamp) in entries[start:end]
+          if ((min_timestamp is None or timestamp >= min_timestamp) and
+              (max_timestamp is None or timestamp <= max_timestamp))]
+
+
+def _LookupArchiveIndex(fh, job_id):
+  """Finds a job in an archive index using a binary search.
+
+  @type fh: file
+  @param fh: Opened archive index
+  @type job_id: int
+  @param job_id: Job ID
+  @rtype: tuple or None
+  @return: Index entry of the job, see L{ReadArchiveIndex}
+
+  """
+  lo = 0
+  hi = os.fstat(fh.fileno()).st_size // _ARCHIVE_INDEX_LINE_LEN
+
+  while lo < hi:
+    mid = (lo + hi) // 2
+    fh.seek(mid * _ARCHIVE_INDEX_LINE_LEN)
+    entry = _ParseArchiveIndexLine(fh.read(_ARCHIVE_INDEX_LINE_LEN))
+    if entry[0] < job_id:
+      lo = mid + 1
+    elif entry[0] > job_id:
+      hi = mid
+    else:
+      return entry
+
+  return None
+
+
+def ReadArchivedJob(path, job_id):
+  """Reads a job packed in an archive directory.
+
+  @type path: string
+  @param path: Archive directory
+  @type job_id: int
+  @param job_id: Job ID
+  @rtype: string or None
+  @return: Serialized job, or C{None} if the job is not packed in the
+    directory
+
+  """
+  try:
+    fh = open(utils.PathJoin(path, ARCHIVE_INDEX_FILE), "rb")
+  except EnvironmentError, err:
+    if err.errno == errno.ENOENT:
+      return None
+    raise
+
+  try:
+    entry = _LookupArchiveIndex(fh, job_id)
+  finally:
+    fh.close()
+
+  if entry is None:
+    return None
+
+  (_, offset, length, _) = entry
+
+  fh = open(utils.PathJoin(path, ARCHIVE_SEGMENT_FILE), "rb")
+  try:
+    fh.seek(offset)
+    data = fh.read(length)
+  finally:
+    fh.close()
+
+  try:
+    return zlib.decompress(data)
+  except zlib.error, err:
+    raise errors.JobFileCorrupted("Can't decompress job %s: %s" %
+                                  (job_id, err))
+
+
+def _GetJobEndTimestamp(data):
+  """Returns the end timestamp of a serialized job.
+
+  Jobs which didn't end use their received timestamp instead.
+
+  @rtype: int
+
+  """
+  try:
+    job = serializer.LoadJson(data)
+    timestamp = job.get("end_timestamp") or job.get("received_timestamp")
+    return int(timestamp[0])
+  except (ValueError, TypeError, AttributeError, IndexError):
+    return 0
+
+
+def PackArchiveDirectory(path):
+  """Packs the jobs in an archive directory into its segment.
+
+  Jobs are compressed one by one and appended to the segment, so they can
+  be read without decompressing others. The per-job files are only removed
+  after the index has been replaced, so readers find every job either in
+  its own file or through the index.
+
+  @type path: string
+  @param path: Archive directory
+  @rtype: int
+  @return: Number of packed jobs
+
+  """
+  job_files = []
+  for filename in utils.ListVisibleFiles(path):
+    m = constants.JOB_FILE_RE.match(filename)
+    if m:
+      job_files.append((int(m.group(1)), utils.PathJoin(path, filename)))
+
+  if not job_files:
+    return 0
+
+  job_files.sort()
+
+  entries = dict((entry[0], entry) for entry in ReadArchiveIndex(path))
+  getents = runtime.GetEnts()
+
+  fd = os.open(utils.PathJoin(path, ARCHIVE_SEGMENT_FILE),
+               os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+               constants.JOB_QUEUE_FILES_PERMS)
+  try:
+    os.fchown(fd, getents.masterd_uid, getents.daemons_gid)
+
+    # Anything left over by an interrupted run is not referenced by the
+    # index, so it's skipped
+    offset = os.fstat(fd).st_size
+
+    for (job_id, filename) in job_files:
+      if job_id in entries:
+        # Packed before, but removing the file didn't finish
+        continue
+
+      raw = utils.ReadFile(filename)
+      data = zlib.compress(raw)
+      written = 0
+      while written < len(data):
+        written += os.write(fd, buffer(data, written))
+
+      entries[job_id] = (job_id, offset, len(data), _GetJobEndTimestamp(raw))
+      offset += len(data)
+
+    os.fsync(fd)
+  finally:
+    os.close(fd)
+
+  utils.WriteFile(utils.PathJoin(path, ARCHIVE_INDEX_FILE),
+                  data="".join(_ARCHIVE_INDEX_LINE % entries[job_id]
+                               for job_id in sorted(entries)),
+                  uid=getents.masterd_uid, gid=getents.daemons_gid,
+                  mode=constants.JOB_QUEUE_FILES_PERMS)
+
+  for (_, filename) in job_files:
+    utils.RemoveFile(filename)
+
+  return len(job_files)
+
+
+def PackArchive():
+  """Packs the jobs in all archive directories.
+
+  @rtype: int
+  @return: Number of packed jobs
+
+  """
+  count = 0
+
+  for name in utils.ListVisibleFiles(pathutils.JOB_QUEUE_ARCHIVE_DIR):
+    path = utils.PathJoin(pathutils.JOB_QUEUE_ARCHIVE_DIR, name)
+    if os.path.isdir(path):
+      count += PackArchiveDirectory(path)
+
+  return count
@@ -55,6 +55,7 @@ REQ_SUBMIT_JOB_TO_DRAINED_QUEUE = constants.LUXI_REQ_SUBMIT_JOB_TO_DRAINED_QUEUE
 REQ_SUBMIT_MANY_JOBS = constants.LUXI_REQ_SUBMIT_MANY_JOBS
 REQ_PICKUP_JOB = constants.LUXI_REQ_PICKUP_JOB
 REQ_WAIT_FOR_JOB_CHANGE = constants.LUXI_REQ_WAIT_FOR_JOB_CHANGE
+REQ_WAIT_FOR_JOBS_CHANGE = constants.LUXI_REQ_WAIT_FOR_JOBS_CHANGE
 REQ_CANCEL_JOB = constants.LUXI_REQ_CANCEL_JOB
 REQ_ARCHIVE_JOB = constants.LUXI_REQ_ARCHIVE_JOB
 REQ_CHANGE_JOB_PRIORITY = constants.LUXI_REQ_CHANGE_JOB_PRIORITY
@@ -180,6 +181,30 @@ class Client(cl.AbstractClient):
                             prev_log_serial,
                             min(WFJC_TIMEOUT, timeout)))
 
+  def WaitForJobsChangeOnce(self, jobs, fields, timeout=WFJC_TIMEOUT):
+    """Waits for changes on any of several jobs.
+
+    @type jobs: list of tuples; (job ID, previous job information, previous
+      log serial)
+    @param jobs: Jobs to be observed, see L{WaitForJobChangeOnce} for the
+      meaning of the per-job values
+    @type fields: list
+    @param fields: List of field names to be observed
+    @type timeout: int/float
+    @param timeout: Timeout in seconds (values larger than L{WFJC_TIMEOUT} will
+                    be capped to that value)
+    @return: L{constants.JOB_NOTCHANGED} or a list of (job ID, update) pairs
+      for all jobs which changed; the update is C{None} for jobs which can't
+      be found
+
+    """
+    assert timeout >= 0, "Timeout can not be negative"
+    jobs = [(Client._PrepareJobId(REQ_WAIT_FOR_JOBS_CHANGE, job_id),
+             prev_job_info, prev_log_serial)
+            for (job_id, prev_job_info, prev_log_serial) in jobs]
+    return self.CallMethod(REQ_WAIT_FOR_JOBS_CHANGE,
+                           (jobs, fields, min(WFJC_TIMEOUT, timeout)))
+
   def WaitForJobChange(self, job_id, fields, prev_job_info, prev_log_serial):
     job_id = Client._PrepareJobId(REQ_WAIT_FOR_JOB_CHANGE, job_id)
     while True:
@@ -36,6 +36,7 @@ from ganeti import compat
 from ganeti import constants
 from ganeti import errors
 from ganeti import ht
+from ganeti import objects
 from ganeti import outils
 from ganeti import opcodes
 from ganeti import serializer
@@ -501,7 +502,10 @@ class IAllocator(object):
     ginfo = cfg.GetAllNodeGroupsInfo()
     ninfo = cfg.GetAllNodesInfo()
     iinfo = cfg.GetAllInstancesInfo()
-    i_list = [(inst, cluster_info.FillBE(inst)) for inst in iinfo.values()]
+    # The filled parameters are only read, so views are used instead of
+    # copying the defaults for every instance
+    params = objects.ClusterParamsCache(cluster_info)
+    i_list = [(inst, params.GetBEParams(inst)) for inst in iinfo.values()]
 
     # node data
     node_list = [n.uuid for n in ninfo.values() if n.vm_capable]
@@ -532,7 +536,7 @@ class IAllocator(object):
     assert len(data["nodes"]) == len(ninfo), \
         "Incomplete node data computed"
 
-    data["instances"] = self._ComputeInstanceData(cfg, cluster_info, i_list)
+    data["instances"] = self._ComputeInstanceData(cfg, params, i_list)
 
     self.in_data = data
 
@@ -769,15 +773,18 @@ class IAllocator(object):
     return node_results
 
   @staticmethod
-  def _ComputeInstanceData(cfg, cluster_info, i_list):
+  def _ComputeInstanceData(cfg, params, i_list):
     """Compute global instance data.
 
+    @type params: L{objects.ClusterParamsCache}
+    @param params: the cluster's parameter defaults
+
     """
     instance_data = {}
     for iinfo, beinfo in i_list:
       nic_data = []
       for nic in iinfo.nics:
-        filled_params = cluster_info.SimpleFillNIC(nic.nicparams)
+        filled_params = params.GetNICParams(nic.nicparams)
         nic_dict = {
           "mac": nic.mac,
           "ip": nic.ip,
@@ -37,7 +37,11 @@ are two kinds of classes defined:
 
 """
 
+import os
 import sys
+import errno
+import bisect
+import select
 import logging
 import random
 import time
@@ -58,6 +62,9 @@ from ganeti import wconfd
 sighupReceived = [False]
 lusExecuting = [0]
 
+#: Read and write end of the pipe used by L{NotifyLockGrant}, created lazily
+_lockGrantPipe = []
+
 _OP_PREFIX = "Op"
 _LU_PREFIX = "LU"
 
@@ -68,6 +75,130 @@ class LockAcquireTimeout(Exception):
   """
 
 
+def _GetLockGrantPipe():
+  """Returns the pipe used for lock grant notifications.
+
+  """
+  if not _lockGrantPipe:
+    (read_fd, write_fd) = os.pipe()
+    for fd in [read_fd, write_fd]:
+      utils.SetCloseOnExecFlag(fd, True)
+      utils.SetNonblockFlag(fd, True)
+    _lockGrantPipe.extend([read_fd, write_fd])
+
+  return _lockGrantPipe
+
+
+def NotifyLockGrant():
+  """Notifies a waiting lock request that locks may have been granted.
+
+  WConfD sends a SIGHUP to job processes whose pending lock requests may have
+  become satisfiable. This function is meant to be called from the signal
+  handler and wakes up L{WaitForLockGrant}.
+
+  """
+  sighupReceived[0] = True
+
+  if _lockGrantPipe:
+    (_, write_fd) = _lockGrantPipe
+    try:
+      os.write(write_fd, "\0")
+    except OSError, err:
+      # The pipe being full means there already is a pending notification
+      if err.errno != errno.EAGAIN:
+        raise
+
+
+def WaitForLockGrant(timeout):
+  """Waits for a notification sent via L{NotifyLockGrant}.
+
+  Notifications received before this function is called are reported
+  immediately.
+
+  @type timeout: float
+  @param timeout: Maximum time to wait in seconds
+  @rtype: bool
+  @return: Whether a notification was received
+
+  """
+  (read_fd, _) = _GetLockGrantPipe()
+
+  if not sighupReceived[0]:
+    utils.WaitForFdCondition(read_fd, select.POLLIN, timeout)
+
+  return ClearLockGrant()
+
+
+def ClearLockGrant():
+  """Discards all pending lock grant notifications.
+
+  @rtype: bool
+  @return: Whether there was a pending notification
+
+  """
+  received = sighupReceived[0]
+  sighupReceived[0] = False
+
+  if _lockGrantPipe:
+    (read_fd, _) = _lockGrantPipe
+    while True:
+      try:
+        data = os.read(read_fd, 4096)
+      except OSError, err:
+        if err.errno == errno.EAGAIN:
+          break
+        raise
+      if not data:
+        break
+      received = True
+
+  return received
+
+
+class LockWaitHistogram(object):
+  """Distribution of the time spent waiting for locks to be granted.
+
+  """
+  #: Upper bounds of the histogram buckets in seconds
+  BUCKETS = [0.001, 0.01, 0.1, 1.0, 10.0, 60.0]
+
+  def __init__(self):
+    """Initializes this class.
+
+    """
+    self.counts = [0] * (len(self.BUCKETS) + 1)
+    self.total = 0.0
+    self.maximum = 0.0
+
+  def Add(self, duration):
+    """Records the duration of a lock wait.
+
+    @type duration: float
+    @param duration: Time in seconds until the locks were granted or the
+      request timed out
+
+    """
+    self.counts[bisect.bisect_left(self.BUCKETS, duration)] += 1
+    self.total += duration
+    self.maximum = max(self.maximum, duration)
+
+  def Count(self):
+    """Returns the number of recorded lock waits.
+
+    """
+    return sum(self.counts)
+
+  def __str__(self):
+    """Formats the histogram for logging.
+
+    """
+    buckets = ["<=%ss: %d" % (limit, count)
+               for (limit, count) in zip(self.BUCKETS, self.counts)]
+    buckets.append(">%ss: %d" % (self.BUCKETS[-1], self.counts[-1]))
+    return ("%d waits, total %0.3fs, max %0.3fs (%s)" %
+            (self.Count(), self.total, self.maximum, ", ".join(buckets)))
+
+
 def _CalculateLockAttemptTimeouts():
   """Calculate timeouts for lock attempts.
 
@@ -308,6 +439,7 @@ class Processor(object):
     self._enable_locks = enable_locks
     self.wconfd = wconfd # Indirection to allow testing
     self._wconfdcontext = context.GetWConfdContext(ec_id)
+    self.lock_wait_histogram = LockWaitHistogram()
 
   def _CheckLocksEnabled(self):
     """Checks if locking is enabled.
@@ -341,9 +473,10 @@ class Processor(object):
       priority = constants.OP_PRIO_DEFAULT
 
     ## Expect a signal
-    if sighupReceived[0]:
+    if ClearLockGrant():
       logging.warning("Ignoring unexpected SIGHUP")
-    sighupReceived[0] = False
+
+    start = time.time()
 
     # Request locks
     self.wconfd.Client().UpdateLocksWaiting(self._wconfdcontext, priority,
@@ -351,22 +484,22 @@ class Processor(object):
     pending = self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
 
     if pending:
-      def _HasPending():
-        if sighupReceived[0]:
-          return self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
-        else:
-          return True
-
-      pending = utils.SimpleRetry(False, _HasPending, 0.05, timeout)
-
-      signal = sighupReceived[0]
+      running_timeout = utils.RunningTimeout(timeout, True)
+
+      # WConfD signals us once the locks may have been granted; only then is
+      # it worth asking again
+      while pending:
+        remaining = running_timeout.Remaining()
+        if remaining <= 0:
+          break
+        if WaitForLockGrant(remaining):
+          pending = self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
 
       if pending:
+        # Locks might have been granted just as the timeout expired
         pending = self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
 
-      if pending and signal:
-        logging.warning("Ignoring unexpected SIGHUP")
-      sighupReceived[0] = False
+    self.lock_wait_histogram.Add(time.time() - start)
 
     logging.debug("Finished trying. Pending: %s", pending)
     if pending:
@@ -452,13 +585,17 @@ class Processor(object):
       ## acquire the locks one by one (in lock order).
       for r in request:
         logging.debug("Definite request %s for %s", r, self._wconfdcontext)
+        ClearLockGrant()
+        start = time.time()
         self.wconfd.Client().UpdateLocksWaiting(self._wconfdcontext, priority,
                                                 [r])
         while True:
           pending = self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
           if not pending:
             break
-          time.sleep(10.0 * random.random())
+          # Notifications are only a hint, so still check regularly
+          WaitForLockGrant(10.0 * random.random())
+        self.lock_wait_histogram.Add(time.time() - start)
 
     elif opportunistic:
       logging.debug("For %ss trying to opportunistically acquire"
@@ -756,10 +893,27 @@ class Processor(object):
                                       self.cfg.GetMasterNode(), self.GetECId(),
                                       constants.POST_HOOKS_STATUS_ERROR)
       raise
+    finally:
+      self._LogLockWaits()
 
     self._CheckLUResult(op, result)
     return result
 
+  def _LogLockWaits(self):
+    """Logs the lock waits so far.
+
+    The summary is internal data and therefore only written to the daemon
+    log; since this is called while an opcode's exception may be pending,
+    it must not raise.
+
+    """
+    try:
+      if self.lock_wait_histogram.Count():
+        logging.debug("Lock waits of %s so far: %s", self._ec_id,
+                      self.lock_wait_histogram)
+    except Exception: # pylint: disable=W0703
+      pass
+
   def Log(self, *args):
     """Forward call to feedback callback function.
 
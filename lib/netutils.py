@@ -36,11 +36,14 @@ the command line scripts.
 """
 
 
+import collections
 import errno
 import os
 import re
+import select
 import socket
 import struct
+import time
 import IN
 import logging
 
@@ -355,6 +358,133 @@ def TcpPing(target, port, timeout=10, live_port_needed=False, source=None):
   return success
 
 
+#: Maximum number of connections opened at the same time by L{TcpPingMany}
+_TCP_PING_MAX_CONCURRENT = 256
+
+
+def _TcpPingResult(err, live_port_needed):
+  """Evaluates the outcome of a connection attempt made by L{TcpPingMany}.
+
+  @type err: int
+  @param err: Error number of the connection attempt, 0 if it succeeded
+
+  """
+  if err == 0:
+    return True
+  return (not live_port_needed) and err == errno.ECONNREFUSED
+
+
+def _StartTcpPing(family, target, port, source):
+  """Starts a non-blocking connection attempt.
+
+  @rtype: tuple; (socket or None, int)
+  @return: The socket if the attempt is still in progress and the error
+    number of the connection attempt otherwise
+
+  """
+  sock = socket.socket(family, socket.SOCK_STREAM)
+
+  if source is not None:
+    try:
+      sock.bind((source, 0))
+    except socket.error, err:
+      # as in TcpPing, the connection is attempted anyway
+      logging.debug("Can't bind to source address %s: %s", source, err)
+
+  sock.setblocking(0)
+
+  err = sock.connect_ex((target, port))
+  if err in (errno.EINPROGRESS, errno.EAGAIN):
+    return (sock, 0)
+
+  sock.close()
+  return (None, err)
+
+
+def TcpPingMany(probes, port, timeout=10, live_port_needed=False,
+                max_concurrent=_TCP_PING_MAX_CONCURRENT):
+  """Pings many targets at once using TCP connect(2).
+
+  This is the same check as L{TcpPing}, but the connections are made
+  without blocking and are waited for using poll(2), so unreachable targets
+  only delay the result by a single timeout. Every connection attempt has
+  its own deadline, starting when the connection is opened.
+
+  @type probes: list of tuples; (string, string or None)
+  @param probes: the IPs to ping, each with the source address to connect
+      from (see L{TcpPing})
+  @type port: int
+  @param port: the port to connect to
+  @type timeout: int
+  @param timeout: the timeout on each connection attempt
+  @type live_port_needed: boolean
+  @param live_port_needed: whether a closed port will cause the
+      ping to fail, as if there was a timeout
+  @type max_concurrent: int
+  @param max_concurrent: the maximum number of connections in progress at
+      the same time
+  @rtype: list of bool
+  @return: whether each target was reachable, in the order of C{probes}
+
+  """
+  assert max_concurrent > 0
+
+  pending = collections.deque()
+  for (idx, (target, source)) in enumerate(probes):
+    try:
+      family = IPAddress.GetAddressFamily(target)
+    except errors.IPAddressError, err:
+      raise errors.ProgrammerError("Family of IP address given in parameter"
+                                   " 'target' can't be determined: %s" % err)
+    pending.append((idx, family, target, source))
+
+  logging.debug("Attempting to reach TCP port %s on %s targets with a timeout"
+                " of %s seconds", port, len(pending), timeout)
+
+  results = [False] * len(pending)
+  poller = select.poll()
+
+  # file descriptor as key, tuple of index, socket and deadline as value
+  active = {}
+
+  try:
+    while pending or active:
+      while pending and len(active) < max_concurrent:
+        (idx, family, target, source) = pending.popleft()
+        (sock, err) = _StartTcpPing(family, target, port, source)
+        if sock is None:
+          results[idx] = _TcpPingResult(err, live_port_needed)
+        else:
+          active[sock.fileno()] = (idx, sock, time.time() + timeout)
+          poller.register(sock, select.POLLOUT)
+
+      if not active:
+        continue
+
+      wait = min(deadline for (_, _, deadline) in active.values()) - time.time()
+      events = utils.RetryOnSignal(poller.poll, max(0, int(wait * 1000) + 1))
+
+      for (fd, _) in events:
+        (idx, sock, _) = active.pop(fd)
+        poller.unregister(fd)
+        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        sock.close()
+        results[idx] = _TcpPingResult(err, live_port_needed)
+
+      now = time.time()
+      for (fd, (_, sock, deadline)) in active.items():
+        if deadline <= now:
+          # timed out, the result stays False
+          del active[fd]
+          poller.unregister(fd)
+          sock.close()
+  finally:
+    for (_, sock, _) in active.values():
+      sock.close()
+
+  return results
+
+
 def GetDaemonPort(daemon_name):
   """Get the daemon port for this cluster.
 
@@ -48,6 +48,7 @@ pass to and from external parties.
 # R0902: Allow instances of these objects to have more than 20 attributes
 
 import ConfigParser
+import collections
 import re
 import copy
 import logging
@@ -65,11 +66,23 @@ from ganeti import serializer
 
 __all__ = ["ConfigObject", "ConfigData", "NIC", "Disk", "Instance",
            "OS", "Node", "NodeGroup", "Cluster", "FillDict", "Network",
-           "Filter", "Maintenance"]
+           "Filter", "Maintenance", "LayeredParams", "ClusterParamsCache"]
 
 _TIMESTAMPS = ["ctime", "mtime"]
 _UUID = ["uuid"]
 
+#: Parameter value types which can be shared instead of copied
+_IMMUTABLE_PARAM_TYPES = (basestring, int, long, float, bool, type(None))
+
+
+def _CopyParamValue(value):
+  """Copies a parameter value unless it can't be modified.
+
+  """
+  if isinstance(value, _IMMUTABLE_PARAM_TYPES):
+    return value
+  return copy.deepcopy(value)
+
 
 def FillDict(defaults_dict, custom_dict, skip_keys=None):
   """Basic function to apply settings on top a default dict.
@@ -84,7 +97,11 @@ def FillDict(defaults_dict, custom_dict, skip_keys=None):
   @return: dict with the 'full' values
 
   """
-  ret_dict = copy.deepcopy(defaults_dict)
+  # only the default values which end up in the result and could be
+  # modified through it need to be copied
+  ret_dict = dict((key, _CopyParamValue(value))
+                  for (key, value) in defaults_dict.iteritems()
+                  if key not in custom_dict)
   ret_dict.update(custom_dict)
   if skip_keys:
     for k in skip_keys:
@@ -93,6 +110,67 @@ def FillDict(defaults_dict, custom_dict, skip_keys=None):
   return ret_dict
 
 
+class LayeredParams(collections.Mapping):
+  """Read-only view of parameters filled from several layers.
+
+  Looking up a parameter searches the layers from the most specific one
+  (e.g. the instance's parameters) to the least specific one (e.g. the
+  cluster defaults), so no dictionary is copied until L{Materialize} is
+  called. The layers must not be modified while the view is in use.
+
+  """
+  def __init__(self, layers, skip_keys=None):
+    """Initializes this class.
+
+    @type layers: list of dict
+    @param layers: Parameter dicts, from the least to the most specific one
+    @type skip_keys: list
+    @param skip_keys: Parameters to hide
+
+    """
+    self._layers = layers
+    self._skip_keys = frozenset(skip_keys or [])
+
+  def __getitem__(self, key):
+    if key not in self._skip_keys:
+      for layer in reversed(self._layers):
+        if key in layer:
+          return layer[key]
+    raise KeyError(key)
+
+  def __iter__(self):
+    seen = set(self._skip_keys)
+    for layer in self._layers:
+      for key in layer:
+        if key not in seen:
+          seen.add(key)
+          yield key
+
+  def __len__(self):
+    return sum(1 for _ in self)
+
+  def Materialize(self):
+    """Returns the filled parameters as a new dict.
+
+    The result is the same as when filling the layers one after the other
+    using L{FillDict}.
+
+    @rtype: dict
+
+    """
+    ret_dict = {}
+    for layer in self._layers[:-1]:
+      ret_dict.update(layer)
+    ret_dict = dict((key, _CopyParamValue(value))
+                    for (key, value) in ret_dict.iteritems()
+                    if key not in self._skip_keys)
+    if self._layers:
+      ret_dict.update((key, value)
+                      for (key, value) in self._layers[-1].iteritems()
+                      if key not in self._skip_keys)
+    return ret_dict
+
+
 def FillIPolicy(default_ipolicy, custom_ipolicy):
   """Fills an instance policy with defaults.
 
@@ -209,13 +287,13 @@ class ConfigObject(outils.ValidatedSlots):
   __slots__ = []
 
   def __getattr__(self, name):
-    if name not in self.GetAllSlots():
+    if name not in self._all_slots_set:
       raise AttributeError("Invalid object attribute %s.%s" %
                            (type(self).__name__, name))
     return None
 
   def __setstate__(self, state):
-    slots = self.GetAllSlots()
+    slots = self._all_slots_set
     for name in state:
       if name in slots:
         setattr(self, name, state[name])
@@ -254,12 +332,11 @@ class ConfigObject(outils.ValidatedSlots):
                           will be replaced with None.
 
     """
-    result = {}
-    for name in self.GetAllSlots():
-      value = getattr(self, name, None)
-      if value is not None:
-        result[name] = value
-    return result
+    # all values are fetched at once, unset slots are None (see __getattr__)
+    return dict((name, value)
+                for (name, value) in zip(self._all_slots,
+                                         self._get_slot_values(self))
+                if value is not None)
 
   __getstate__ = ToDict
 
@@ -2190,6 +2267,103 @@ class Cluster(TaggableObject):
         self.enabled_disk_templates)
 
 
+class ClusterParamsCache(object):
+  """Memoizes the parameter defaults of a cluster.
+
+  Hypervisor parameters are combined from the cluster's and the OS'
+  defaults, which is done only once per hypervisor and OS as long as the
+  cluster's serial number doesn't change. The returned parameters are
+  L{LayeredParams} views on top of the defaults; callers which need to
+  modify them must use L{LayeredParams.Materialize}.
+
+  """
+  def __init__(self, cluster):
+    """Initializes this class.
+
+    @type cluster: L{Cluster}
+    @param cluster: Cluster object
+
+    """
+    self._cluster = cluster
+    self._serial_no = cluster.serial_no
+    self._hv_defaults = {}
+    self._os_defaults = {}
+
+  def _CheckSerial(self):
+    """Forgets the memoized defaults if the cluster was changed.
+
+    """
+    if self._serial_no != self._cluster.serial_no:
+      self._serial_no = self._cluster.serial_no
+      self._hv_defaults.clear()
+      self._os_defaults.clear()
+
+  def GetHVParams(self, instance, skip_globals=False):
+    """Returns an instance's hypervisor parameters.
+
+    @see: L{Cluster.FillHV}
+    @rtype: L{LayeredParams}
+
+    """
+    if skip_globals:
+      skip_keys = constants.HVC_GLOBALS
+    else:
+      skip_keys = []
+
+    self._CheckSerial()
+
+    key = (instance.hypervisor, instance.os, skip_globals)
+    try:
+      defaults = self._hv_defaults[key]
+    except KeyError:
+      defaults = self._cluster.GetHVDefaults(instance.hypervisor, instance.os,
+                                             skip_keys=skip_keys)
+      self._hv_defaults[key] = defaults
+
+    return LayeredParams([defaults, instance.hvparams], skip_keys=skip_keys)
+
+  def GetBEParams(self, instance):
+    """Returns an instance's backend parameters.
+
+    @see: L{Cluster.FillBE}
+    @rtype: L{LayeredParams}
+
+    """
+    return LayeredParams([
+      self._cluster.beparams.get(constants.PP_DEFAULT, {}),
+      instance.beparams,
+      ])
+
+  def GetNICParams(self, nicparams):
+    """Returns a NIC's parameters.
+
+    @see: L{Cluster.SimpleFillNIC}
+    @rtype: L{LayeredParams}
+
+    """
+    return LayeredParams([
+      self._cluster.nicparams.get(constants.PP_DEFAULT, {}),
+      nicparams,
+      ])
+
+  def GetOSParams(self, os_name, os_params_public):
+    """Returns the public OS parameters of an instance.
+
+    @see: L{Cluster.SimpleFillOS}
+    @rtype: L{LayeredParams}
+
+    """
+    self._CheckSerial()
+
+    try:
+      defaults = self._os_defaults[os_name]
+    except KeyError:
+      defaults = self._cluster.SimpleFillOS(os_name, {})
+      self._os_defaults[os_name] = defaults
+
+    return LayeredParams([defaults, os_params_public])
+
+
 class BlockDevStatus(ConfigObject):
   """Config object representing the status of a block device."""
   __slots__ = [
@@ -29,13 +29,60 @@
 
 """Module for object related utils."""
 
+import operator
+
 
 #: Supported container types for serialization/de-serialization (must be a
 #: tuple as it's used as a parameter for C{isinstance})
 _SEQUENCE_TYPES = (list, tuple, set, frozenset)
 
 
-class AutoSlots(type):
+def _BuildSlotsGetter(slots):
+  """Builds a function returning the values of the given slots as a tuple.
+
+  @type slots: tuple
+  @param slots: Slot names
+
+  """
+  if not slots:
+    return lambda _: ()
+  elif len(slots) == 1:
+    getter = operator.attrgetter(slots[0])
+    return lambda obj: (getter(obj), )
+  else:
+    return operator.attrgetter(*slots)
+
+
+class CachedSlots(type):
+  """Meta class caching the slots of a class and all its parents.
+
+  The slots are collected once when the class is created instead of walking
+  the class hierarchy whenever they're needed. The following attributes are
+  set on each class:
+
+    - C{_all_slots}: tuple of all slots, starting with the class' own slots
+    - C{_all_slots_set}: frozenset of all slots, for fast membership checks
+    - C{_get_slot_values}: function returning the values of all slots of an
+      object as a tuple, in the order of C{_all_slots}; unset slots raise
+      L{AttributeError} unless the class defines C{__getattr__}
+
+  """
+  def __init__(cls, name, bases, attrs):
+    """Called when a class has been created.
+
+    """
+    type.__init__(cls, name, bases, attrs)
+
+    slots = []
+    for parent in cls.__mro__:
+      slots.extend(getattr(parent, "__slots__", []))
+
+    cls._all_slots = tuple(slots)
+    cls._all_slots_set = frozenset(slots)
+    cls._get_slot_values = staticmethod(_BuildSlotsGetter(cls._all_slots))
+
+
+class AutoSlots(CachedSlots):
   """Meta base class for __slots__ definitions.
 
   """
@@ -70,6 +117,7 @@ class ValidatedSlots(object):
   """Sets and validates slots.
 
   """
+  __metaclass__ = CachedSlots
   __slots__ = []
 
   def __init__(self, **kwargs):
@@ -81,7 +129,7 @@ class ValidatedSlots(object):
     __slots__ attribute for this class.
 
     """
-    slots = self.GetAllSlots()
+    slots = self._all_slots_set
     for (key, value) in kwargs.items():
       if key not in slots:
         raise TypeError("Object %s doesn't support the parameter '%s'" %
@@ -90,13 +138,10 @@ class ValidatedSlots(object):
 
   @classmethod
   def GetAllSlots(cls):
-    """Compute the list of all declared slots for a class.
+    """Return the list of all declared slots for a class.
 
     """
-    slots = []
-    for parent in cls.__mro__:
-      slots.extend(getattr(parent, "__slots__", []))
-    return slots
+    return list(cls._all_slots)
 
   def Validate(self):
     """Validates the slots.
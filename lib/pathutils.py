@@ -67,6 +67,7 @@ PREPARE_NODE_JOIN = _constants.PKGLIBDIR + "/prepare-node-join"
 SSH_UPDATE = _constants.PKGLIBDIR + "/ssh-update"
 NODE_DAEMON_SETUP = _constants.PKGLIBDIR + "/node-daemon-setup"
 SSL_UPDATE = _constants.PKGLIBDIR + "/ssl-update"
+WIPE_DEVICE = _constants.PKGLIBDIR + "/wipe-device"
 XEN_CONSOLE_WRAPPER = _constants.PKGLIBDIR + "/tools/xen-console-wrapper"
 CFGUPGRADE = _constants.PKGLIBDIR + "/tools/cfgupgrade"
 POST_UPGRADE = _constants.PKGLIBDIR + "/tools/post-upgrade"
@@ -91,10 +92,13 @@ SSH_HOST_RSA_PUB = _constants.SSH_HOST_RSA_PUB
 SSH_PUB_KEYS = DATA_DIR + "/ganeti_pub_keys"
 
 BDEV_CACHE_DIR = RUN_DIR + "/bdev-cache"
+XEN_STATE_CACHE_DIR = RUN_DIR + "/xen-state-cache"
 DISK_LINKS_DIR = RUN_DIR + "/instance-disks"
 SOCKET_DIR = RUN_DIR + "/socket"
 CRYPTO_KEYS_DIR = RUN_DIR + "/crypto"
 IMPORT_EXPORT_DIR = RUN_DIR + "/import-export"
+WIPE_DIR = RUN_DIR + "/wipe"
+NODED_COMMAND_STATS_FILE = RUN_DIR + "/noded-command-stats"
 INSTANCE_STATUS_FILE = RUN_DIR + "/instance-status"
 INSTANCE_REASON_DIR = RUN_DIR + "/instance-reason"
 #: User-id pool lock directory (used user IDs have a corresponding lock file in
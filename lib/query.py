@@ -744,14 +744,46 @@ class Query(object):
     """
     return GetAllFields(self._fields)
 
-  def Query(self, ctx, sort_by_name=True):
+  def Query(self, ctx, sort_by_name=True, columnar=True):
     """Execute a query.
 
+    Fields whose retrieval function provides C{GetColumn} (see
+    L{_ItemAttrGetter}) are, unless disabled via C{columnar}, evaluated for all
+    items passing the filter at once after the data container has been
+    iterated. All other fields are still evaluated row by row while iterating,
+    as their retrieval functions may depend on per-item state of the container.
+
     @param ctx: Data container passed to field retrieval functions, must
       support iteration using C{__iter__}
     @type sort_by_name: boolean
     @param sort_by_name: Whether to sort by name or keep the input data's
       ordering
+    @type columnar: boolean
+    @param columnar: Whether to evaluate simple fields column-wise
+
+    """
+    if columnar:
+      columns = [idx for (idx, (_, _, _, fn)) in enumerate(self._fields)
+                 if hasattr(fn, "GetColumn")]
+    else:
+      columns = None
+
+    if columns:
+      result = self._QueryColumns(ctx, sort_by_name, frozenset(columns))
+    else:
+      result = self._QueryRows(ctx, sort_by_name)
+
+    # Verify result
+    if __debug__:
+      for row in result:
+        _VerifyResultRow(self._fields, row)
+
+    return result
+
+  def _QueryRows(self, ctx, sort_by_name):
+    """Executes a query evaluating all fields row by row.
+
+    See L{Query.Query} for arguments.
 
     """
     sort = (self._name_fn and sort_by_name)
@@ -764,10 +796,6 @@ class Query(object):
 
       row = [_ProcessResult(fn(ctx, item)) for (_, _, _, fn) in self._fields]
 
-      # Verify result
-      if __debug__:
-        _VerifyResultRow(self._fields, row)
-
       if sort:
         (status, name) = _ProcessResult(self._name_fn(ctx, item))
         assert status == constants.RS_NORMAL
@@ -789,6 +817,58 @@ class Query(object):
 
     return map(operator.itemgetter(2), result)
 
+  def _QueryColumns(self, ctx, sort_by_name, columns):
+    """Executes a query evaluating some fields column-wise.
+
+    @type columns: frozenset of integers
+    @param columns: Indices of fields to be evaluated column-wise
+
+    """
+    sort = (self._name_fn and sort_by_name)
+    name_column = (sort and hasattr(self._name_fn, "GetColumn"))
+
+    rowfns = [(idx, fn) for (idx, (_, _, _, fn)) in enumerate(self._fields)
+              if idx not in columns]
+
+    items = []
+    rows = []
+    names = []
+
+    # Filter items and evaluate remaining fields while the container's
+    # per-item state is valid
+    for item in ctx:
+      if not (self._filter_fn is None or self._filter_fn(ctx, item)):
+        continue
+
+      items.append(item)
+
+      row = [None] * len(self._fields)
+      for (idx, fn) in rowfns:
+        row[idx] = _ProcessResult(fn(ctx, item))
+      rows.append(row)
+
+      if sort and not name_column:
+        names.append(_ProcessResult(self._name_fn(ctx, item)))
+
+    for idx in columns:
+      (_, _, _, fn) = self._fields[idx]
+      for (row, value) in zip(rows, fn.GetColumn(items)):
+        row[idx] = value
+
+    if not sort:
+      return rows
+
+    if name_column:
+      names = self._name_fn.GetColumn(items)
+
+    assert compat.all(status == constants.RS_NORMAL for (status, _) in names)
+
+    result = [(utils.NiceSortKey(name), idx, row)
+              for (idx, ((_, name), row)) in enumerate(zip(names, rows))]
+    result.sort()
+
+    return map(operator.itemgetter(2), result)
+
   def OldStyleQuery(self, ctx, sort_by_name=True):
     """Query with "old" query result format.
 
@@ -981,14 +1061,75 @@ def _GetNodeRole(node, master_uuid):
     return constants.NR_REGULAR
 
 
+class _ItemAttrGetter(object):
+  """Field retrieval function returning an attribute of the item.
+
+  The value only depends on the item itself and not on any per-item state of
+  the data container, therefore a whole column can be retrieved at once using
+  L{GetColumn} (see L{Query.Query}).
+
+  """
+  __slots__ = [
+    "_getter",
+    ]
+
+  def __init__(self, attr):
+    """Initializes this class.
+
+    @param attr: Attribute name
+
+    """
+    self._getter = operator.attrgetter(attr)
+
+  def __call__(self, _, item):
+    """Returns the attribute of a single item.
+
+    """
+    return self._getter(item)
+
+  def GetColumn(self, items):
+    """Returns processed results for a list of items.
+
+    @type items: list
+    @rtype: list of tuples; (status, value)
+
+    """
+    return [(RS_NORMAL, value) for value in map(self._getter, items)]
+
+
+class _ItemMaybeAttrGetter(_ItemAttrGetter):
+  """Field retrieval function returning a not-None attribute of the item.
+
+  If the value is None, then C{_FS_UNAVAIL} will be returned instead.
+
+  """
+  __slots__ = []
+
+  def __call__(self, _, item):
+    """Returns the attribute of a single item.
+
+    """
+    val = self._getter(item)
+    if val is None:
+      return _FS_UNAVAIL
+    else:
+      return val
+
+  def GetColumn(self, items):
+    """Returns processed results for a list of items.
+
+    """
+    return [(RS_UNAVAIL, None) if value is None else (RS_NORMAL, value)
+            for value in map(self._getter, items)]
+
+
 def _GetItemAttr(attr):
   """Returns a field function to return an attribute of the item.
 
   @param attr: Attribute name
 
   """
-  getter = operator.attrgetter(attr)
-  return lambda _, item: getter(item)
+  return _ItemAttrGetter(attr)
 
 
 def _GetItemMaybeAttr(attr):
@@ -999,13 +1140,7 @@ def _GetItemMaybeAttr(attr):
   @param attr: Attribute name
 
   """
-  def _helper(_, obj):
-    val = getattr(obj, attr)
-    if val is None:
-      return _FS_UNAVAIL
-    else:
-      return val
-  return _helper
+  return _ItemMaybeAttrGetter(attr)
 
 
 def _GetNDParam(name):
@@ -1446,6 +1581,7 @@ class InstanceQueryData(object):
     self.nodes = nodes
     self.groups = groups
     self.networks = networks
+    self.params_cache = objects.ClusterParamsCache(cluster)
 
     # Used for individual rows
     self.inst_hvparams = None
@@ -1461,10 +1597,12 @@ class InstanceQueryData(object):
 
     """
     for inst in self.instances:
-      self.inst_hvparams = self.cluster.FillHV(inst, skip_globals=True)
-      self.inst_beparams = self.cluster.FillBE(inst)
-      self.inst_osparams = self.cluster.SimpleFillOS(inst.os, inst.osparams)
-      self.inst_nicparams = [self.cluster.SimpleFillNIC(nic.nicparams)
+      self.inst_hvparams = self.params_cache.GetHVParams(inst,
+                                                         skip_globals=True)
+      self.inst_beparams = self.params_cache.GetBEParams(inst)
+      self.inst_osparams = self.params_cache.GetOSParams(inst.os,
+                                                         inst.osparams)
+      self.inst_nicparams = [self.params_cache.GetNICParams(nic.nicparams)
                              for nic in inst.nics]
 
       yield inst
@@ -1518,7 +1656,7 @@ def _GetInstLiveData(name):
 
 
 def _GetLiveInstStatus(ctx, instance, instance_state):
-  hvparams = ctx.cluster.FillHV(instance, skip_globals=True)
+  hvparams = ctx.params_cache.GetHVParams(instance, skip_globals=True)
 
   allow_userdown = \
       ctx.cluster.enabled_user_shutdown and \
@@ -2046,13 +2184,13 @@ def _GetInstanceParameterFields():
     # Filled parameters
     (_MakeField("hvparams", "HypervisorParameters", QFT_OTHER,
                 "Hypervisor parameters (merged)"),
-     IQ_CONFIG, 0, lambda ctx, _: ctx.inst_hvparams),
+     IQ_CONFIG, 0, lambda ctx, _: ctx.inst_hvparams.Materialize()),
     (_MakeField("beparams", "BackendParameters", QFT_OTHER,
                 "Backend parameters (merged)"),
-     IQ_CONFIG, 0, lambda ctx, _: ctx.inst_beparams),
+     IQ_CONFIG, 0, lambda ctx, _: ctx.inst_beparams.Materialize()),
     (_MakeField("osparams", "OpSysParameters", QFT_OTHER,
                 "Operating system parameters (merged)"),
-     IQ_CONFIG, 0, lambda ctx, _: ctx.inst_osparams),
+     IQ_CONFIG, 0, lambda ctx, _: ctx.inst_osparams.Materialize()),
 
     # Unfilled parameters
     (_MakeField("custom_hvparams", "CustomHypervisorParameters", QFT_OTHER,
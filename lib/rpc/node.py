@@ -77,6 +77,10 @@ _RPC_CLIENT_HEADERS = [
 #: Special value to describe an offline host
 _OFFLINE = object()
 
+#: Per-process pool of cURL handles used for node RPC, allowing connections
+#: to nodes to be kept alive between calls
+_CURL_POOL = http.client.CurlPool(max_idle=constants.RPC_CONNECTION_MAX_IDLE)
+
 
 def Init():
   """Initializes the module-global HTTP client manager.
@@ -103,9 +107,22 @@ def Shutdown():
   running.
 
   """
+  LogConnectionPoolStats()
+  _CURL_POOL.Clear()
   pycurl.global_cleanup()
 
 
+def LogConnectionPoolStats():
+  """Logs how often connections to nodes were reused by this process.
+
+  """
+  stats = _CURL_POOL.GetStats()
+  if stats["hits"] or stats["misses"]:
+    logging.info("RPC connections: %s reused, %s new, %s expired or"
+                 " discarded, %s idle", stats["hits"], stats["misses"],
+                 stats["evictions"], stats["idle"])
+
+
 def _ConfigRpcCurl(curl):
   noded_cert = pathutils.NODED_CERT_FILE
   noded_client_cert = pathutils.NODED_CLIENT_CERT_FILE
@@ -459,7 +476,8 @@ class _RpcProcessor(object):
       "Missing RPC read timeout for procedure '%s'" % procedure
 
     if _req_process_fn is None:
-      _req_process_fn = http.client.ProcessRequests
+      _req_process_fn = compat.partial(http.client.ProcessRequests,
+                                       pool=_CURL_POOL)
 
     (results, requests) = \
       self._PrepareRequests(self._resolver(nodes, resolver_opts), self._port,
@@ -472,6 +490,19 @@ class _RpcProcessor(object):
     return self._CombineResults(results, requests, procedure)
 
 
+def _IsNodeIndependent(cdef):
+  """Checks whether the request body of a call is the same for all nodes.
+
+  @see: L{rpc_defs.NODE_INDEPENDENT_ENCODINGS}
+
+  """
+  (_, _, _, _, argdefs, prep_fn, _, _) = cdef
+
+  return (prep_fn is None and
+          compat.all(argkind in rpc_defs.NODE_INDEPENDENT_ENCODINGS
+                     for (_, argkind, _) in argdefs))
+
+
 class _RpcClientBase(object):
   def __init__(self, resolver, encoder_fn, lock_monitor_cb=None,
                _req_process_fn=None):
@@ -518,16 +549,21 @@ class _RpcClientBase(object):
       prep_fn = lambda _, args: args
     assert callable(prep_fn)
 
-    # encode the arguments for each node individually, pass them and the node
-    # name to the prep_fn, and serialise its return value
     encode_args_fn = lambda node: [self._encoder(node, (argdef[1], val)) for
                                       (argdef, val) in zip(argdefs, args)]
-    pnbody = dict(
-      (n,
-       serializer.DumpJson(prep_fn(n, encode_args_fn(n)),
-                           private_encoder=serializer.EncodeWithPrivateFields))
-      for n in node_list
-    )
+    dump_fn = compat.partial(serializer.DumpJson,
+                             private_encoder=serializer.EncodeWithPrivateFields)
+
+    if node_list and _IsNodeIndependent(cdef):
+      # the body is the same for all nodes, hence the arguments are encoded
+      # and serialised only once and the result is shared by all requests
+      body = dump_fn(prep_fn(None, encode_args_fn(None)))
+      pnbody = dict.fromkeys(node_list, body)
+    else:
+      # encode the arguments for each node individually, pass them and the
+      # node name to the prep_fn, and serialise its return value
+      pnbody = dict((n, dump_fn(prep_fn(n, encode_args_fn(n))))
+                    for n in node_list)
 
     result = self._proc(node_list, procedure, pnbody, read_timeout,
                         req_resolver_opts)
@@ -809,6 +845,7 @@ class RpcRunner(_RpcClientBase,
 
     """
     self._cfg = cfg
+    self._params_cache = None
 
     encoders = _ENCODERS.copy()
 
@@ -848,6 +885,39 @@ class RpcRunner(_RpcClientBase,
     _generated_rpc.RpcClientDnsOnly.__init__(self)
     _generated_rpc.RpcClientDefault.__init__(self)
 
+  def _Call(self, cdef, node_list, args):
+    """Entry point for automatically generated RPC wrappers.
+
+    The cluster's parameter defaults are memoized while the arguments of
+    the call are encoded, e.g. for every node an instance is sent to. As
+    cluster objects can be modified in place before their serial number is
+    bumped, they are not kept for later calls.
+
+    """
+    self._params_cache = {}
+    try:
+      return _RpcClientBase._Call(self, cdef, node_list, args)
+    finally:
+      self._params_cache = None
+
+  def _GetParamsCache(self, cluster):
+    """Returns the parameter defaults cache for a cluster object.
+
+    @type cluster: L{objects.Cluster}
+    @rtype: L{objects.ClusterParamsCache}
+
+    """
+    if self._params_cache is None:
+      # Not encoding the arguments of a call
+      return objects.ClusterParamsCache(cluster)
+
+    try:
+      return self._params_cache[id(cluster)]
+    except KeyError:
+      cache = objects.ClusterParamsCache(cluster)
+      self._params_cache[id(cluster)] = cache
+      return cache
+
   def _NicDict(self, _, nic):
     """Convert the given nic to a dict and encapsulate netinfo
 
@@ -886,24 +956,23 @@ class RpcRunner(_RpcClientBase,
 
     """
     idict = instance.ToDict()
-    cluster = self._cfg.GetClusterInfo()
-    idict["hvparams"] = cluster.FillHV(instance)
+    params = self._GetParamsCache(self._cfg.GetClusterInfo())
+    idict["hvparams"] = params.GetHVParams(instance).Materialize()
     idict["secondary_nodes"] = \
       self._cfg.GetInstanceSecondaryNodes(instance.uuid)
     if hvp is not None:
       idict["hvparams"].update(hvp)
-    idict["beparams"] = cluster.FillBE(instance)
+    idict["beparams"] = params.GetBEParams(instance).Materialize()
     if bep is not None:
       idict["beparams"].update(bep)
-    idict["osparams"] = cluster.SimpleFillOS(instance.os, instance.osparams)
+    idict["osparams"] = \
+      params.GetOSParams(instance.os, instance.osparams).Materialize()
     if osp is not None:
       idict["osparams"].update(osp)
     disks = self._cfg.GetInstanceDisks(instance.uuid)
     idict["disks_info"] = self._DisksDictDP(node, (disks, instance))
     for nic in idict["nics"]:
-      nic["nicparams"] = objects.FillDict(
-        cluster.nicparams[constants.PP_DEFAULT],
-        nic["nicparams"])
+      nic["nicparams"] = params.GetNICParams(nic["nicparams"]).Materialize()
       network = nic.get("network", None)
       if network:
         net_uuid = self._cfg.LookupNetwork(network)
@@ -51,6 +51,81 @@ from ganeti.rpc import errors
 DEF_CTMO = constants.LUXI_DEF_CTMO
 DEF_RWTO = constants.LUXI_DEF_RWTO
 
+#: Maximum number of bytes read at once
+_RECV_SIZE = 128 * 1024
+
+#: Messages shorter than this are sent together with the terminator in a
+#: single call, longer ones are sent separately to avoid copying them
+_SEND_COPY_LIMIT = 64 * 1024
+
+
+class _MessageBuffer(object):
+  """Splits a stream of received data into messages.
+
+  Incomplete messages are kept as a list of chunks and only newly received
+  data is searched for the terminator, so receiving a message takes time
+  linear in its size no matter in how many pieces it arrives.
+
+  """
+  def __init__(self):
+    """Initializes this class.
+
+    """
+    assert len(constants.LUXI_EOM) == 1, \
+      "Message terminator must be a single character"
+
+    self._chunks = []
+    self._msgs = collections.deque()
+
+  def __len__(self):
+    """Returns the number of complete messages.
+
+    """
+    return len(self._msgs)
+
+  def Add(self, data):
+    """Adds newly received data.
+
+    @type data: string
+
+    """
+    start = 0
+    pos = data.find(constants.LUXI_EOM)
+
+    while pos != -1:
+      self._chunks.append(data[start:pos])
+      self._msgs.append("".join(self._chunks))
+      self._chunks = []
+      start = pos + 1
+      pos = data.find(constants.LUXI_EOM, start)
+
+    if start == 0:
+      self._chunks.append(data)
+    elif start < len(data):
+      self._chunks.append(data[start:])
+
+  def Pop(self):
+    """Returns the oldest complete message.
+
+    """
+    return self._msgs.popleft()
+
+
+def _FormatMessage(msg):
+  """Returns the pieces to be sent for a message.
+
+  @type msg: string
+  @rtype: list of strings
+
+  """
+  if constants.LUXI_EOM in msg:
+    raise errors.ProtocolError("Message terminator found in payload")
+
+  if len(msg) < _SEND_COPY_LIMIT:
+    return [msg + constants.LUXI_EOM]
+  else:
+    return [msg, constants.LUXI_EOM]
+
 
 class Transport(object):
   """Low-level transport class.
@@ -93,8 +168,7 @@ class Transport(object):
       self._ctimeout, self._rwtimeout = timeouts
 
     self.socket = None
-    self._buffer = ""
-    self._msgs = collections.deque()
+    self._msgs = _MessageBuffer()
 
     try:
       self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
@@ -155,13 +229,13 @@ class Transport(object):
     This just sends a message and doesn't wait for the response.
 
     """
-    if constants.LUXI_EOM in msg:
-      raise errors.ProtocolError("Message terminator found in payload")
+    data = _FormatMessage(msg)
 
     self._CheckSocket()
     try:
       # TODO: sendall is not guaranteed to send everything
-      self.socket.sendall(msg + constants.LUXI_EOM)
+      for part in data:
+        self.socket.sendall(part)
     except socket.timeout, err:
       raise errors.TimeoutError("Sending timeout: %s" % str(err))
 
@@ -181,7 +255,7 @@ class Transport(object):
         raise errors.TimeoutError("Extended receive timeout")
       while True:
         try:
-          data = self.socket.recv(4096)
+          data = self.socket.recv(_RECV_SIZE)
         except socket.timeout, err:
           raise errors.TimeoutError("Receive timeout: %s" % str(err))
         except socket.error, err:
@@ -191,10 +265,8 @@ class Transport(object):
         break
       if not data:
         raise errors.ConnectionClosedError("Connection closed while reading")
-      new_msgs = (self._buffer + data).split(constants.LUXI_EOM)
-      self._buffer = new_msgs.pop()
-      self._msgs.extend(new_msgs)
-    return self._msgs.popleft()
+      self._msgs.Add(data)
+    return self._msgs.Pop()
 
   def Call(self, msg):
     """Send a message and wait for the response.
@@ -266,8 +338,7 @@ class FdTransport(object):
     self._rstream = io.open(fds[0], 'rb', 0)
     self._wstream = io.open(fds[1], 'wb', 0)
 
-    self._buffer = ""
-    self._msgs = collections.deque()
+    self._msgs = _MessageBuffer()
 
   def _CheckSocket(self):
     """Make sure we are connected.
@@ -282,11 +353,11 @@ class FdTransport(object):
     This just sends a message and doesn't wait for the response.
 
     """
-    if constants.LUXI_EOM in msg:
-      raise errors.ProtocolError("Message terminator found in payload")
+    data = _FormatMessage(msg)
 
     self._CheckSocket()
-    self._wstream.write(msg + constants.LUXI_EOM)
+    for part in data:
+      self._wstream.write(part)
     self._wstream.flush()
 
   def Recv(self):
@@ -298,13 +369,11 @@ class FdTransport(object):
     """
     self._CheckSocket()
     while not self._msgs:
-      data = self._rstream.read(4096)
+      data = self._rstream.read(_RECV_SIZE)
       if not data:
         raise errors.ConnectionClosedError("Connection closed while reading")
-      new_msgs = (self._buffer + data).split(constants.LUXI_EOM)
-      self._buffer = new_msgs.pop()
-      self._msgs.extend(new_msgs)
-    return self._msgs.popleft()
+      self._msgs.Add(data)
+    return self._msgs.Pop()
 
   def Call(self, msg):
     """Send a message and wait for the response.
@@ -49,6 +49,7 @@ RPC definition fields:
 """
 
 from ganeti import constants
+from ganeti import compat
 from ganeti import utils
 from ganeti import objects
 
@@ -84,6 +85,20 @@ ACCEPT_OFFLINE_NODE = object()
  ED_NIC_DICT,
  ED_DEVICE_DICT) = range(1, 17)
 
+#: Argument encodings whose result doesn't depend on the node the call is
+#: sent to. If all arguments of a call use one of these and no custom body
+#: encoder is given, the request body is only encoded once for all nodes.
+NODE_INDEPENDENT_ENCODINGS = compat.UniqueFrozenset([
+  None,
+  ED_OBJECT_DICT,
+  ED_OBJECT_DICT_LIST,
+  ED_FILE_DETAILS,
+  ED_FINALIZE_EXPORT_DISKS,
+  ED_COMPRESS,
+  ED_BLOCKDEV_RENAME,
+  ED_NIC_DICT,
+  ])
+
 
 def _Prepare(calls):
   """Converts list of calls to dictionary.
@@ -122,6 +137,8 @@ def _BlockdevGetMirrorStatusPostProc(result):
 def _BlockdevGetMirrorStatusMultiPreProc(node, args):
   """Prepares the appropriate node values for blockdev_getmirrorstatus_multi.
 
+  This is also used for blockdev_find_multi, which takes the same argument.
+
   """
   # there should be only one argument to this RPC, already holding a
   # node->disks dictionary, we just need to extract the value for the
@@ -142,6 +159,28 @@ def _BlockdevGetMirrorStatusMultiPostProc(result):
   return result
 
 
+def _BlockDevStatusTreeFromDict(tree):
+  """Converts a status tree as returned by blockdev_find_multi.
+
+  """
+  (status, children) = tree
+  if status is not None:
+    status = objects.BlockDevStatus.FromDict(status)
+  return (status, map(_BlockDevStatusTreeFromDict, children))
+
+
+def _BlockdevFindMultiPostProc(result):
+  """Post-processor for call_blockdev_find_multi.
+
+  """
+  if not result.fail_msg:
+    for idx, (success, tree) in enumerate(result.payload):
+      if success:
+        result.payload[idx] = (success, _BlockDevStatusTreeFromDict(tree))
+
+  return result
+
+
 def _NodeInfoPreProc(node, args):
   """Prepare the storage_units argument for node_info calls."""
   assert len(args) == 2
@@ -387,6 +426,16 @@ _BLOCKDEV_CALLS = [
     ("size", None, None),
     ], None, None,
     "Request wipe at given offset with given size of a block device"),
+  ("blockdev_wipe_start", SINGLE, None, constants.RPC_TMO_NORMAL, [
+    ("disks", ED_DISKS_DICT_DP, None),
+    ("areas", None, "Offset and size in MiB of the area to wipe per disk"),
+    ], None, None, "Starts wiping block devices in the background"),
+  ("blockdev_wipe_status", SINGLE, None, constants.RPC_TMO_FAST, [
+    ("names", None, "Wipe names"),
+    ], None, None, "Gets the status of background wipes"),
+  ("blockdev_wipe_cleanup", SINGLE, None, constants.RPC_TMO_NORMAL, [
+    ("names", None, "Wipe names"),
+    ], None, None, "Cleans up after background wipes"),
   ("blockdev_remove", SINGLE, None, constants.RPC_TMO_NORMAL, [
     ("bdev", ED_SINGLE_DISK_DICT_DP, None),
     ], None, None, "Request removal of a given block device"),
@@ -461,6 +510,11 @@ _BLOCKDEV_CALLS = [
     ("disk", ED_SINGLE_DISK_DICT_DP, None),
     ], None, _BlockdevFindPostProc,
     "Request identification of a given block device"),
+  ("blockdev_find_multi", MULTI, None, constants.RPC_TMO_NORMAL, [
+    ("node_disks", ED_NODE_TO_DISK_DICT_DP, None),
+    ], _BlockdevGetMirrorStatusMultiPreProc, _BlockdevFindMultiPostProc,
+    "Request identification of block devices and their children from"
+    " multiple nodes"),
   ("blockdev_getmirrorstatus", SINGLE, None, constants.RPC_TMO_NORMAL, [
     ("disks", ED_DISKS_DICT_DP, None),
     ], None, _BlockdevGetMirrorStatusPostProc,
@@ -688,6 +742,9 @@ CALLS = {
      "Requests a node to clean the cluster information it has"),
     ("master_node_name", MULTI, None, constants.RPC_TMO_URGENT, [], None, None,
      "Returns the master node name"),
+    ("node_command_stats", MULTI, None, constants.RPC_TMO_URGENT, [
+      ("reset", None, "Whether to reset the statistics"),
+      ], None, None, "Return statistics about the commands run by the node"),
     ]),
   "RpcClientDnsOnly": _Prepare([
     ("version", MULTI, ACCEPT_OFFLINE_NODE, constants.RPC_TMO_URGENT, [], None,
@@ -145,6 +145,36 @@ def _DefaultAlternative(value, default):
   return default
 
 
+def _BlockDevStatusTreeToDict(tree):
+  """Converts a status tree as returned by L{backend.BlockdevFindMulti}.
+
+  """
+  (status, children) = tree
+  if status is not None:
+    status = status.ToDict()
+  return (status, map(_BlockDevStatusTreeToDict, children))
+
+
+def _LogCommandStats(rpc_name):
+  """Logs the statistics of the commands run while handling a request.
+
+  The statistics collected by L{utils.RunCmd} are reset before every
+  request and therefore only cover the current one. Requests are handled
+  by different processes, so the totals are kept by
+  L{backend.UpdateCommandStats}.
+
+  """
+  stats = utils.GetCommandStats()
+  if not stats:
+    return
+  logging.debug("Commands run for RPC '%s': %s", rpc_name,
+                utils.CommaJoin("%s (%d runs, %d failed, %d timed out,"
+                                " %.3fs)" %
+                                (program, s["count"], s["failed"],
+                                 s["timeouts"], s["total_time"])
+                                for (program, s) in sorted(stats.items())))
+
+
 class MlockallRequestExecutor(http.server.HttpServerRequestExecutor):
   """Subclass ensuring request handlers are locked in RAM.
 
@@ -164,9 +194,17 @@ class NodeRequestHandler(http.server.HttpServerHandler):
   # too many public methods, and unused args - all methods get params
   # due to the API
   # pylint: disable=R0904,W0613
-  def __init__(self):
+  def __init__(self, command_stats=False):
+    """Initializes this class.
+
+    @type command_stats: bool
+    @param command_stats: whether to add up the statistics of the commands
+        run while handling requests, see L{backend.UpdateCommandStats}
+
+    """
     http.server.HttpServerHandler.__init__(self)
     self.noded_pid = os.getpid()
+    self._command_stats = command_stats
 
   def HandleRequest(self, req):
     """Handle a request.
@@ -184,6 +222,7 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     if method is None:
       raise http.HttpNotFound()
 
+    utils.ResetCommandStats()
     try:
       result = (True, method(serializer.LoadJson(req.request_body)))
 
@@ -204,6 +243,13 @@ class NodeRequestHandler(http.server.HttpServerHandler):
       logging.exception("Error in RPC call")
       result = (False, "Error while executing backend function: %s" % str(err))
 
+    _LogCommandStats(path)
+    if self._command_stats:
+      try:
+        backend.UpdateCommandStats(utils.GetCommandStats())
+      except Exception: # pylint: disable=W0703
+        logging.exception("Can't update the command statistics")
+
     return serializer.DumpJson(result)
 
   # the new block devices  --------------------------
@@ -257,6 +303,31 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     bdev = objects.Disk.FromDict(bdev_s)
     return backend.BlockdevWipe(bdev, offset, size)
 
+  @staticmethod
+  def perspective_blockdev_wipe_start(params):
+    """Start wiping block devices in the background.
+
+    """
+    disks_s, areas = params
+    disks = [objects.Disk.FromDict(bdev_s) for bdev_s in disks_s]
+    return backend.StartBlockdevWipe([(disk, offset, size)
+                                      for (disk, (offset, size))
+                                      in zip(disks, areas)])
+
+  @staticmethod
+  def perspective_blockdev_wipe_status(params):
+    """Retrieves the status of background wipes.
+
+    """
+    return backend.GetBlockdevWipeStatus(params[0])
+
+  @staticmethod
+  def perspective_blockdev_wipe_cleanup(params):
+    """Cleans up after background wipes.
+
+    """
+    return backend.CleanupBlockdevWipe(params[0])
+
   @staticmethod
   def perspective_blockdev_remove(params):
     """Remove a block device.
@@ -371,6 +442,27 @@ class NodeRequestHandler(http.server.HttpServerHandler):
 
     return result.ToDict()
 
+  @staticmethod
+  def perspective_blockdev_find_multi(params):
+    """Find a list of disks and their children.
+
+    This will try to find but not activate the disks.
+
+    """
+    (node_disks, ) = params
+
+    disks = [objects.Disk.FromDict(dsk_s) for dsk_s in node_disks]
+
+    result = []
+
+    for (success, tree) in backend.BlockdevFindMulti(disks):
+      if success:
+        result.append((success, _BlockDevStatusTreeToDict(tree)))
+      else:
+        result.append((success, tree))
+
+    return result
+
   @staticmethod
   def perspective_blockdev_snapshot(params):
     """Create a snapshot device.
@@ -915,6 +1007,17 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     token_requests = params[0]
     return backend.GetCryptoTokens(token_requests)
 
+  @staticmethod
+  def perspective_node_command_stats(params):
+    """Query the statistics of the commands run by the node daemon.
+
+    Statistics are only collected if the daemon was started with
+    C{--command-stats}.
+
+    """
+    (reset, ) = params
+    return backend.GetCommandStats(reset)
+
   @staticmethod
   def perspective_node_ensure_daemon(params):
     """Ensure daemon is running.
@@ -1325,6 +1428,16 @@ def CheckNoded(options, args):
                           sys.argv[0])
     sys.exit(constants.EXIT_FAILURE)
 
+  if options.keep_alive_requests < 1:
+    print >> sys.stderr, ("%s --keep-alive-requests argument must be >= 1" %
+                          sys.argv[0])
+    sys.exit(constants.EXIT_FAILURE)
+
+  if options.keep_alive_timeout <= 0:
+    print >> sys.stderr, ("%s --keep-alive-timeout argument must be > 0" %
+                          sys.argv[0])
+    sys.exit(constants.EXIT_FAILURE)
+
   try:
     codecs.lookup("string-escape")
   except LookupError:
@@ -1434,14 +1547,16 @@ def PrepNoded(options, _):
     # startup of the whole node daemon because of this
     logging.critical("Can't init/verify the queue, proceeding anyway: %s", err)
 
-  handler = NodeRequestHandler()
+  handler = NodeRequestHandler(command_stats=options.command_stats)
 
   mainloop = daemon.Mainloop()
   server = http.server.HttpServer(
       mainloop, options.bind_address, options.port, options.max_clients,
       handler, ssl_params=ssl_params, ssl_verify_peer=True,
       request_executor_class=request_executor_class,
-      ssl_verify_callback=SSLVerifyPeer)
+      ssl_verify_callback=SSLVerifyPeer,
+      keep_alive_requests=options.keep_alive_requests,
+      keep_alive_idle_timeout=options.keep_alive_timeout)
   server.Start()
 
   return (mainloop, server)
@@ -1474,6 +1589,20 @@ def Main():
                     default=20, type="int",
                     help="Number of simultaneous connections accepted"
                     " by noded")
+  parser.add_option("--keep-alive-requests", dest="keep_alive_requests",
+                    default=constants.NODED_KEEP_ALIVE_REQUESTS, type="int",
+                    help="Number of requests served on one connection"
+                    " before its worker process exits (1 disables"
+                    " keep-alive)")
+  parser.add_option("--keep-alive-timeout", dest="keep_alive_timeout",
+                    default=constants.NODED_KEEP_ALIVE_TIMEOUT, type="float",
+                    help="Number of seconds after which an idle keep-alive"
+                    " connection is closed")
+  parser.add_option("--command-stats", dest="command_stats",
+                    default=False, action="store_true",
+                    help="Add up statistics about the commands run for"
+                    " all requests, to be queried with"
+                    " \"gnt-debug command-stats\"")
 
   daemon.GenericMain(constants.NODED, parser, CheckNoded, PrepNoded, ExecNoded,
                      default_ssl_cert=pathutils.NODED_CERT_FILE,
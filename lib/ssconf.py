@@ -35,6 +35,7 @@ configuration data, which is mostly static and available to all nodes.
 
 """
 
+import os
 import sys
 import errno
 import logging
@@ -54,6 +55,20 @@ _VALID_KEYS = constants.VALID_SS_KEYS
 #: Maximum size for ssconf files
 _MAX_SIZE = 128 * 1024
 
+#: Name of the file holding a snapshot of all ssconf values
+SNAPSHOT_FILENAME = "ssconf-snapshot"
+
+#: First line of the snapshot file, including the version of its format
+_SNAPSHOT_HEADER = "ganeti-ssconf-snapshot 1\n"
+
+#: Maximum size for the snapshot file
+_MAX_SNAPSHOT_SIZE = len(_VALID_KEYS) * (_MAX_SIZE + 256)
+
+# Parsed snapshot files, indexed by file name; each value is a tuple of the
+# file's identity (device, inode, size and modification time) and the
+# dictionary of ssconf values
+_snapshot_cache = {}
+
 
 def ReadSsconfFile(filename):
   """Reads an ssconf file and verifies its size.
@@ -77,6 +92,53 @@ def ReadSsconfFile(filename):
   return data.rstrip("\n")
 
 
+def _SerializeSnapshot(values):
+  """Serializes ssconf values for the snapshot file.
+
+  Every value is stored after a line with its key and length, so values can
+  contain arbitrary data.
+
+  @type values: dict
+  @param values: Dictionary, ssconf key as key, value as value
+  @rtype: string
+
+  """
+  parts = [_SNAPSHOT_HEADER]
+  for (key, value) in sorted(values.items()):
+    parts.append("%s %d\n%s\n" % (key, len(value), value))
+  return "".join(parts)
+
+
+def _ParseSnapshot(data):
+  """Parses the contents of the snapshot file.
+
+  @type data: string
+  @param data: File contents
+  @rtype: dict
+  @return: Dictionary, ssconf key as key, value as value
+  @raise ValueError: When the data is not a valid snapshot
+
+  """
+  if not data.startswith(_SNAPSHOT_HEADER):
+    raise ValueError("Unknown snapshot format")
+
+  values = {}
+  pos = len(_SNAPSHOT_HEADER)
+  while pos < len(data):
+    end = data.index("\n", pos)
+    (key, length) = data[pos:end].split(" ")
+    if key not in _VALID_KEYS:
+      raise ValueError("Invalid key '%s'" % key)
+    start = end + 1
+    end = start + int(length)
+    if data[end:end + 1] != "\n":
+      raise ValueError("Truncated value for key '%s'" % key)
+    values[key] = data[start:end]
+    pos = end + 1
+
+  return values
+
+
 class SimpleStore(object):
   """Interface to static cluster data.
 
@@ -86,6 +148,9 @@ class SimpleStore(object):
 
   Other particularities of the datastore:
     - keys are restricted to predefined values
+    - besides a file per key, all values are written to a snapshot file,
+      which is preferred when reading as it provides a consistent view of
+      all keys with a single read
 
   """
   def __init__(self, cfg_location=None, _lockfile=pathutils.SSCONF_LOCK_FILE):
@@ -107,12 +172,65 @@ class SimpleStore(object):
     filename = self._cfg_dir + "/" + constants.SSCONF_FILEPREFIX + key
     return filename
 
+  def GetSnapshotFilename(self):
+    """Returns the name of the snapshot file.
+
+    """
+    return self._cfg_dir + "/" + SNAPSHOT_FILENAME
+
+  def _ReadSnapshot(self):
+    """Returns the values from the snapshot file.
+
+    The file is only parsed again if it changed since the last call.
+
+    @rtype: dict or None
+    @return: Dictionary, ssconf key as key, value as value, or C{None} if the
+        snapshot file is missing or can't be used
+
+    """
+    filename = self.GetSnapshotFilename()
+    try:
+      st = os.stat(filename)
+    except EnvironmentError:
+      return None
+
+    cached = _snapshot_cache.get(filename)
+    if (cached is not None and
+        cached[0] == (st.st_dev, st.st_ino, st.st_size, st.st_mtime)):
+      return cached[1]
+
+    statcb = utils.FileStatHelper()
+    try:
+      data = utils.ReadFile(filename, size=_MAX_SNAPSHOT_SIZE, preread=statcb)
+      if statcb.st.st_size > _MAX_SNAPSHOT_SIZE:
+        raise ValueError("File is too large")
+      values = _ParseSnapshot(data)
+    except (EnvironmentError, ValueError), err:
+      logging.debug("Not using ssconf snapshot %s: %s", filename, err)
+      return None
+
+    st = statcb.st
+    _snapshot_cache[filename] = \
+      ((st.st_dev, st.st_ino, st.st_size, st.st_mtime), values)
+    return values
+
   def _ReadFile(self, key, default=None):
     """Generic routine to read keys.
 
-    This will read the file which holds the value requested. Errors
+    This will read the value requested from the snapshot file, or if the
+    snapshot doesn't contain it, from the file which holds the value. Errors
     will be changed into ConfigurationErrors.
 
+    """
+    values = self._ReadSnapshot()
+    if values is not None and key in values:
+      return values[key]
+
+    return self._ReadKeyFile(key, default=default)
+
+  def _ReadKeyFile(self, key, default=None):
+    """Reads a key from the file which holds its value.
+
     """
     filename = self.KeyToFilename(key)
     try:
@@ -129,12 +247,25 @@ class SimpleStore(object):
     @rtype: dict
     @return: Dictionary, ssconf key as key, value as value
 
+    """
+    values = self._ReadSnapshot()
+    if values is not None:
+      return values.copy()
+
+    return self._ReadAllFiles()
+
+  def _ReadAllFiles(self):
+    """Reads the values of all keys from their files.
+
+    @rtype: dict
+    @return: Dictionary, ssconf key as key, value as value
+
     """
     result = []
 
     for key in _VALID_KEYS:
       try:
-        value = self._ReadFile(key)
+        value = self._ReadKeyFile(key)
       except errors.ConfigurationError:
         # Ignore non-existing files
         pass
@@ -146,6 +277,9 @@ class SimpleStore(object):
   def WriteFiles(self, values, dry_run=False):
     """Writes ssconf files used by external scripts.
 
+    After writing the files for the given keys, the snapshot file is
+    replaced with the values of all keys.
+
     @type values: dict
     @param values: Dictionary of (name, value)
     @type dry_run boolean
@@ -171,9 +305,23 @@ class SimpleStore(object):
         utils.WriteFile(self.KeyToFilename(name), data=value,
                         mode=constants.SS_FILE_PERMS,
                         dry_run=dry_run)
+
+      if values and not dry_run:
+        utils.WriteFile(self.GetSnapshotFilename(),
+                        data=_SerializeSnapshot(self._ReadAllFiles()),
+                        mode=constants.SS_FILE_PERMS)
     finally:
       ssconf_lock.Unlock()
 
+  def RemoveSnapshot(self):
+    """Removes the snapshot file.
+
+    This must be done after modifying ssconf files without L{WriteFiles}, so
+    that their values are read from the files again.
+
+    """
+    utils.RemoveFile(self.GetSnapshotFilename())
+
   def GetFileList(self):
     """Return the list of all config files.
 
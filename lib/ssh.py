@@ -37,9 +37,9 @@ import logging
 import os
 import shutil
 import tempfile
+import threading
 
 from collections import namedtuple
-from functools import partial
 
 from ganeti import utils
 from ganeti import errors
@@ -310,291 +310,282 @@ def RemoveAuthorizedKey(file_name, key):
   RemoveAuthorizedKeys(file_name, [key])
 
 
-def _AddPublicKeyProcessLine(new_uuid, new_key, line_uuid, line_key, found):
-  """Processes one line of the public key file when adding a key.
-
-  This is a sub function that can be called within the
-  C{_ManipulatePublicKeyFile} function. It processes one line of the public
-  key file, checks if this line contains the key to add already and if so,
-  notes the occurrence in the return value.
-
-  @type new_uuid: string
-  @param new_uuid: the node UUID of the node whose key is added
-  @type new_key: string
-  @param new_key: the SSH key to be added
-  @type line_uuid: the UUID of the node whose line in the public key file
-    is processed in this function call
-  @param line_key: the SSH key of the node whose line in the public key
-    file is processed in this function call
-  @type found: boolean
-  @param found: whether or not the (UUID, key) pair of the node whose key
-    is being added was found in the public key file already.
-  @rtype: (boolean, string)
-  @return: a possibly updated value of C{found} and the processed line
+#: Modifications of the public key file understood by L{ModifyPubKeyFile}
+PUB_KEY_ADD = "add"
+PUB_KEY_REMOVE = "remove"
+PUB_KEY_RENAME = "rename"
 
-  """
-  if line_uuid == new_uuid and line_key == new_key:
-    logging.debug("SSH key of node '%s' already in key file.", new_uuid)
-    found = True
-  return (found, "%s %s\n" % (line_uuid, line_key))
+# Serializes modifications of the public key file and accesses to the cache
+# of its parsed contents
+_pub_key_file_lock = threading.Lock()
 
+# Parsed public key files, indexed by file name; each value is a tuple of the
+# file's identity as returned by L{_GetPubKeyFileId} and a L{_PubKeyIndex}
+_pub_key_file_cache = {}
 
-def _AddPublicKeyElse(new_uuid, new_key):
-  """Adds a new SSH key to the key file if it did not exist already.
 
-  This is an auxiliary function for C{_ManipulatePublicKeyFile} which
-  is carried out when a new key is added to the public key file and
-  after processing the whole file, we found out that the key does
-  not exist in the file yet but needs to be appended at the end.
+def _ParseKeyLine(line, error_fn):
+  """Parses a line of the public key file.
 
-  @type new_uuid: string
-  @param new_uuid: the UUID of the node whose key is added
-  @type new_key: string
-  @param new_key: the SSH key to be added
-  @rtype: string
-  @return: a new line to be added to the file
+  @type line: string
+  @param line: line of the public key file
+  @type error_fn: function
+  @param error_fn: function to process error messages
+  @rtype: tuple (string, string)
+  @return: a tuple containing the UUID of the node and a string containing
+    the SSH key and possible more parameters for the key
 
   """
-  return "%s %s\n" % (new_uuid, new_key)
-
-
-def _RemovePublicKeyProcessLine(
-    target_uuid, _target_key,
-    line_uuid, line_key, found):
-  """Processes a line in the public key file when aiming for removing a key.
-
-  This is an auxiliary function for C{_ManipulatePublicKeyFile} when we
-  are removing a key from the public key file. This particular function
-  only checks if the current line contains the UUID of the node in
-  question and writes the line to the temporary file otherwise.
-
-  @type target_uuid: string
-  @param target_uuid: UUID of the node whose key is being removed
-  @type _target_key: string
-  @param _target_key: SSH key of the node (not used)
-  @type line_uuid: string
-  @param line_uuid: UUID of the node whose line is processed in this call
-  @type line_key: string
-  @param line_key: SSH key of the nodes whose line is processed in this call
-  @type found: boolean
-  @param found: whether or not the UUID was already found.
-  @rtype: (boolean, string)
-  @return: a tuple, indicating if the target line was found and the processed
-    line; the line is 'None', if the original line is removed
+  if len(line.rstrip()) == 0:
+    return (None, None)
+  chunks = line.split(" ")
+  if len(chunks) < 2:
+    raise error_fn("Error parsing public SSH key file. Line: '%s'"
+                   % line)
+  uuid = chunks[0]
+  key = " ".join(chunks[1:]).rstrip()
+  return (uuid, key)
+
+
+class _PubKeyIndex(object):
+  """In-memory representation of the public key file.
+
+  The entries are kept in the order of the file, while a dictionary maps each
+  node identifier (usually the node's UUID, but in some cases its name) to
+  the positions of its keys. This way, looking up, adding, removing or
+  renaming the keys of a node does not require processing the whole file.
 
   """
-  if line_uuid != target_uuid:
-    return (found, "%s %s\n" % (line_uuid, line_key))
-  else:
-    return (True, None)
+  def __init__(self, entries=None, positions=None):
+    """Initializes this class.
 
+    """
+    # List of (identifier, key) tuples; removed entries are set to None
+    self._entries = entries or []
+    # Maps identifiers to the sorted list of positions of their entries
+    self._positions = positions or {}
 
-def _RemovePublicKeyElse(
-    target_uuid, _target_key):
-  """Logs when we tried to remove a key that does not exist.
+  @classmethod
+  def FromLines(cls, lines, error_fn):
+    """Builds an index from the lines of a public key file.
 
-  This is an auxiliary function for C{_ManipulatePublicKeyFile} which is
-  run after we have processed the complete public key file and did not find
-  the key to be removed.
+    """
+    index = cls()
+    for line in lines:
+      (uuid, key) = _ParseKeyLine(line, error_fn)
+      if uuid:
+        index.Append(uuid, key)
+    return index
 
-  @type target_uuid: string
-  @param target_uuid: the UUID of the node whose key was supposed to be removed
-  @type _target_key: string
-  @param _target_key: the key of the node which was supposed to be removed
-    (not used)
-  @rtype: string
-  @return: in this case, always None
+  def Append(self, identifier, key):
+    """Adds a key at the end of the file.
 
-  """
-  logging.debug("Trying to remove key of node '%s' which is not in list"
-                " of public keys.", target_uuid)
-  return None
+    """
+    self._positions.setdefault(identifier, []).append(len(self._entries))
+    self._entries.append((identifier, key))
 
+  def Lookup(self, identifier):
+    """Returns the list of keys of a node.
 
-def _ReplaceNameByUuidProcessLine(
-    node_name, _key, line_identifier, line_key, found, node_uuid=None):
-  """Replaces a node's name with its UUID on a matching line in the key file.
+    """
+    return [self._entries[pos][1]
+            for pos in self._positions.get(identifier, [])]
 
-  This is an auxiliary function for C{_ManipulatePublicKeyFile} which processes
-  a line of the ganeti public key file. If the line in question matches the
-  node's name, the name will be replaced by the node's UUID.
+  def Add(self, identifier, key):
+    """Adds a key unless the node already has exactly this key.
 
-  @type node_name: string
-  @param node_name: name of the node to be replaced by the UUID
-  @type _key: string
-  @param _key: SSH key of the node (not used)
-  @type line_identifier: string
-  @param line_identifier: an identifier of a node in a line of the public key
-    file. This can be either a node name or a node UUID, depending on if it
-    got replaced already or not.
-  @type line_key: string
-  @param line_key: SSH key of the node whose line is processed
-  @type found: boolean
-  @param found: whether or not the line matches the node's name
-  @type node_uuid: string
-  @param node_uuid: the node's UUID which will replace the node name
-  @rtype: (boolean, string)
-  @return: a tuple indicating whether the target line was found and the
-    processed line
+    """
+    if key in self.Lookup(identifier):
+      logging.debug("SSH key of node '%s' already in key file.", identifier)
+    else:
+      self.Append(identifier, key)
 
-  """
-  if node_name == line_identifier:
-    return (True, "%s %s\n" % (node_uuid, line_key))
-  else:
-    return (found, "%s %s\n" % (line_identifier, line_key))
+  def Remove(self, identifier):
+    """Removes all keys of a node.
 
+    """
+    positions = self._positions.pop(identifier, None)
+    if not positions:
+      logging.debug("Trying to remove key of node '%s' which is not in list"
+                    " of public keys.", identifier)
+      return
+    for pos in positions:
+      self._entries[pos] = None
 
-def _ReplaceNameByUuidElse(
-    node_uuid, node_name, _key):
-  """Logs a debug message when we try to replace a key that is not there.
+  def Rename(self, old_identifier, new_identifier):
+    """Replaces the identifier of all keys of a node.
 
-  This is an implementation of the auxiliary C{process_else_fn} function for
-  the C{_ManipulatePubKeyFile} function when we use it to replace a line
-  in the public key file that is indexed by the node's name instead of the
-  node's UUID.
+    """
+    positions = self._positions.pop(old_identifier, None)
+    if not positions:
+      logging.debug("Trying to replace node name '%s' with UUID '%s', but"
+                    " no line with that name was found.", old_identifier,
+                    new_identifier)
+      return
+    for pos in positions:
+      self._entries[pos] = (new_identifier, self._entries[pos][1])
+    self._positions[new_identifier] = \
+      sorted(self._positions.get(new_identifier, []) + positions)
+
+  def Query(self, identifiers):
+    """Returns a dictionary mapping identifiers to their list of keys.
+
+    @type identifiers: list of string or None
+    @param identifiers: identifiers to look up, C{None} for all of them
+
+    """
+    if identifiers is None:
+      identifiers = self._positions.keys()
+    result = {}
+    for identifier in identifiers:
+      keys = self.Lookup(identifier)
+      if keys:
+        result[identifier] = keys
+    return result
+
+  def Copy(self):
+    """Returns an independent copy of this index.
+
+    """
+    return self.__class__(entries=self._entries[:],
+                          positions=dict((identifier, positions[:])
+                                         for (identifier, positions)
+                                         in self._positions.items()))
+
+  def Serialize(self):
+    """Returns the contents of the public key file.
+
+    """
+    return "".join("%s %s\n" % entry
+                   for entry in self._entries
+                   if entry is not None)
 
-  @type node_uuid: string
-  @param node_uuid: the node's UUID
-  @type node_name: string
-  @param node_name: the node's UUID
-  @type _key: string (not used)
-  @param _key: the node's SSH key (not used)
-  @rtype: string
-  @return: in this case, always None
+
+def _GetPubKeyFileId(st):
+  """Returns the values identifying a version of the public key file.
+
+  The file is always replaced atomically, therefore a new version comes with a
+  new inode, modification time or size.
 
   """
-  logging.debug("Trying to replace node name '%s' with UUID '%s', but"
-                " no line with that name was found.", node_name, node_uuid)
-  return None
+  return (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
 
 
-def _ParseKeyLine(line, error_fn):
-  """Parses a line of the public key file.
+def _GetPubKeyIndex(key_file, error_fn):
+  """Returns the parsed contents of the public key file.
 
-  @type line: string
-  @param line: line of the public key file
-  @type error_fn: function
-  @param error_fn: function to process error messages
-  @rtype: tuple (string, string)
-  @return: a tuple containing the UUID of the node and a string containing
-    the SSH key and possible more parameters for the key
+  The parsed file is cached for as long as the file is not modified. Callers
+  must hold L{_pub_key_file_lock} and must not modify the returned index.
+
+  @raise IOError: if the file can't be read
 
   """
-  if len(line.rstrip()) == 0:
-    return (None, None)
-  chunks = line.split(" ")
-  if len(chunks) < 2:
-    raise error_fn("Error parsing public SSH key file. Line: '%s'"
-                   % line)
-  uuid = chunks[0]
-  key = " ".join(chunks[1:]).rstrip()
-  return (uuid, key)
+  try:
+    file_id = _GetPubKeyFileId(os.stat(key_file))
+  except OSError:
+    file_id = None
 
+  cached = _pub_key_file_cache.get(key_file)
+  if file_id is not None and cached is not None and cached[0] == file_id:
+    return cached[1]
 
-def _ManipulatePubKeyFile(target_identifier, target_key,
-                          key_file=pathutils.SSH_PUB_KEYS,
-                          error_fn=errors.ProgrammerError,
-                          process_line_fn=None, process_else_fn=None):
-  """Manipulates the list of public SSH keys of the cluster.
-
-  This is a general function to manipulate the public key file. It needs
-  two auxiliary functions C{process_line_fn} and C{process_else_fn} to
-  work. Generally, the public key file is processed as follows:
-  1) The function processes each line of the original ganeti public key file,
-  applies the C{process_line_fn} function on it, which returns a possibly
-  manipulated line and an indicator whether the line in question was found.
-  If a line is returned, it is added to a list of lines for later writing
-  to the file.
-  2) If all lines are processed and the 'found' variable is False, the
-  seconds auxiliary function C{process_else_fn} is called to possibly
-  add more lines to the list of lines.
-  3) Finally, the list of lines is assembled to a string and written
-  atomically to the public key file, thereby overriding it.
+  f = open(key_file, "r")
+  try:
+    file_id = _GetPubKeyFileId(os.fstat(f.fileno()))
+    index = _PubKeyIndex.FromLines(f, error_fn)
+  finally:
+    f.close()
+
+  _pub_key_file_cache[key_file] = (file_id, index)
+  return index
+
+
+def _WritePubKeyFile(key_file, index, **kwargs):
+  """Writes the public key file and updates the cache of its contents.
+
+  Callers must hold L{_pub_key_file_lock}.
+
+  """
+  _pub_key_file_cache.pop(key_file, None)
+  utils.WriteFile(key_file, data=index.Serialize(), **kwargs)
+  _pub_key_file_cache[key_file] = \
+    (_GetPubKeyFileId(os.stat(key_file)), index)
+
+
+def ModifyPubKeyFile(changes, key_file=pathutils.SSH_PUB_KEYS,
+                     error_fn=errors.ProgrammerError):
+  """Applies a list of modifications to the list of public SSH keys.
+
+  All modifications are applied in the given order with a single read and
+  write of the public key file. Each modification is a tuple of an action
+  and two arguments:
+    - C{(PUB_KEY_ADD, uuid, key)} adds a key of a node unless the node
+      has this key already
+    - C{(PUB_KEY_REMOVE, uuid, None)} removes all keys of a node
+    - C{(PUB_KEY_RENAME, name, uuid)} replaces a node's name by its UUID;
+      when a node is added to the cluster, its key is first added by name as
+      the UUID is not known yet
 
   If the public key file does not exist, we create it. This is necessary for
   a smooth transition after an upgrade.
 
-  @type target_identifier: str
-  @param target_identifier: identifier of the node whose key is added; in most
-    cases this is the node's UUID, but in some it is the node's host name
-  @type target_key: str
-  @param target_key: string containing a public SSH key (a complete line
-    possibly including more parameters than just the key)
+  @type changes: list of tuples
+  @param changes: modifications to apply
   @type key_file: str
   @param key_file: filename of the file of public node keys (optional
     parameter for testing)
   @type error_fn: function
   @param error_fn: Function that returns an exception, used to customize
     exception types depending on the calling context
-  @type process_line_fn: function
-  @param process_line_fn: function to process one line of the public key file
-  @type process_else_fn: function
-  @param process_else_fn: function to be called if no line of the key file
-    matches the target uuid
 
   """
-  assert process_else_fn is not None
-  assert process_line_fn is not None
+  if not changes:
+    return
 
-  old_lines = []
-  f_orig = None
-  if os.path.exists(key_file):
-    try:
-      f_orig = open(key_file, "r")
-      old_lines = f_orig.readlines()
-    finally:
-      f_orig.close()
-  else:
-    try:
-      f_orig = open(key_file, "w")
-      f_orig.close()
-    except IOError as e:
-      raise errors.SshUpdateError("Cannot create public key file: %s" % e)
-
-  found = False
-  new_lines = []
-  for line in old_lines:
-    (uuid, key) = _ParseKeyLine(line, error_fn)
-    if not uuid:
-      continue
-    (new_found, new_line) = process_line_fn(target_identifier, target_key,
-                                            uuid, key, found)
-    if new_found:
-      found = True
-    if new_line is not None:
-      new_lines.append(new_line)
-  if not found:
-    new_line = process_else_fn(target_identifier, target_key)
-    if new_line is not None:
-      new_lines.append(new_line)
-  new_file_content = "".join(new_lines)
-  utils.WriteFile(key_file, data=new_file_content)
+  with _pub_key_file_lock:
+    if os.path.exists(key_file):
+      index = _GetPubKeyIndex(key_file, error_fn).Copy()
+    else:
+      try:
+        open(key_file, "w").close()
+      except IOError as e:
+        raise errors.SshUpdateError("Cannot create public key file: %s" % e)
+      index = _PubKeyIndex()
+
+    for (action, identifier, value) in changes:
+      if action == PUB_KEY_ADD:
+        index.Add(identifier, value)
+      elif action == PUB_KEY_REMOVE:
+        index.Remove(identifier)
+      elif action == PUB_KEY_RENAME:
+        index.Rename(identifier, value)
+      else:
+        raise errors.ProgrammerError("Unknown public key file modification"
+                                     " '%s'" % action)
+
+    _WritePubKeyFile(key_file, index)
 
 
 def AddPublicKey(new_uuid, new_key, key_file=pathutils.SSH_PUB_KEYS,
                  error_fn=errors.ProgrammerError):
   """Adds a new key to the list of public keys.
 
-  @see: _ManipulatePubKeyFile for parameter descriptions.
+  @see: L{ModifyPubKeyFile} for parameter descriptions.
 
   """
-  _ManipulatePubKeyFile(new_uuid, new_key, key_file=key_file,
-                        process_line_fn=_AddPublicKeyProcessLine,
-                        process_else_fn=_AddPublicKeyElse,
-                        error_fn=error_fn)
+  ModifyPubKeyFile([(PUB_KEY_ADD, new_uuid, new_key)], key_file=key_file,
+                   error_fn=error_fn)
 
 
 def RemovePublicKey(target_uuid, key_file=pathutils.SSH_PUB_KEYS,
                     error_fn=errors.ProgrammerError):
   """Removes a key from the list of public keys.
 
-  @see: _ManipulatePubKeyFile for parameter descriptions.
+  @see: L{ModifyPubKeyFile} for parameter descriptions.
 
   """
-  _ManipulatePubKeyFile(target_uuid, None, key_file=key_file,
-                        process_line_fn=_RemovePublicKeyProcessLine,
-                        process_else_fn=_RemovePublicKeyElse,
-                        error_fn=error_fn)
+  ModifyPubKeyFile([(PUB_KEY_REMOVE, target_uuid, None)], key_file=key_file,
+                   error_fn=error_fn)
 
 
 def ReplaceNameByUuid(node_uuid, node_name, key_file=pathutils.SSH_PUB_KEYS,
@@ -610,22 +601,19 @@ def ReplaceNameByUuid(node_uuid, node_name, key_file=pathutils.SSH_PUB_KEYS,
   @type node_name: string
   @param node_name: the node's name to be replaced by the node's UUID
 
-  @see: _ManipulatePubKeyFile for the other parameter descriptions.
+  @see: L{ModifyPubKeyFile} for the other parameter descriptions.
 
   """
-  process_line_fn = partial(_ReplaceNameByUuidProcessLine, node_uuid=node_uuid)
-  process_else_fn = partial(_ReplaceNameByUuidElse, node_uuid=node_uuid)
-  _ManipulatePubKeyFile(node_name, None, key_file=key_file,
-                        process_line_fn=process_line_fn,
-                        process_else_fn=process_else_fn,
-                        error_fn=error_fn)
+  ModifyPubKeyFile([(PUB_KEY_RENAME, node_name, node_uuid)],
+                   key_file=key_file, error_fn=error_fn)
 
 
 def ClearPubKeyFile(key_file=pathutils.SSH_PUB_KEYS, mode=0600):
   """Resets the content of the public key file.
 
   """
-  utils.WriteFile(key_file, data="", mode=mode)
+  with _pub_key_file_lock:
+    _WritePubKeyFile(key_file, _PubKeyIndex(), mode=mode)
 
 
 def OverridePubKeyFile(key_map, key_file=pathutils.SSH_PUB_KEYS):
@@ -635,18 +623,20 @@ def OverridePubKeyFile(key_map, key_file=pathutils.SSH_PUB_KEYS):
   @param key_map: dictionary mapping uuids to lists of SSH keys
 
   """
-  new_lines = []
+  index = _PubKeyIndex()
   for (uuid, keys) in key_map.items():
     for key in keys:
-      new_lines.append("%s %s\n" % (uuid, key))
-  new_file_content = "".join(new_lines)
-  utils.WriteFile(key_file, data=new_file_content)
+      index.Append(uuid, key)
+  with _pub_key_file_lock:
+    _WritePubKeyFile(key_file, index)
 
 
 def QueryPubKeyFile(target_uuids, key_file=pathutils.SSH_PUB_KEYS,
                     error_fn=errors.ProgrammerError):
   """Retrieves a map of keys for the requested node UUIDs.
 
+  The file is only parsed again if it changed since the last call.
+
   @type target_uuids: str or list of str
   @param target_uuids: UUID of the node to retrieve the key for or a list
     of UUIDs of nodes to retrieve the keys for
@@ -660,23 +650,10 @@ def QueryPubKeyFile(target_uuids, key_file=pathutils.SSH_PUB_KEYS,
   @return: dictionary mapping node uuids to their ssh keys
 
   """
-  all_keys = target_uuids is None
   if isinstance(target_uuids, str):
     target_uuids = [target_uuids]
-  result = {}
-  f = open(key_file, "r")
-  try:
-    for line in f:
-      (uuid, key) = _ParseKeyLine(line, error_fn)
-      if not uuid:
-        continue
-      if all_keys or (uuid in target_uuids):
-        if uuid not in result:
-          result[uuid] = []
-        result[uuid].append(key)
-  finally:
-    f.close()
-  return result
+  with _pub_key_file_lock:
+    return _GetPubKeyIndex(key_file, error_fn).Query(target_uuids)
 
 
 def InitSSHSetup(key_type, key_bits, error_fn=errors.OpPrereqError,
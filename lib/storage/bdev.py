@@ -1345,7 +1345,7 @@ def FindDevice(disk, children, **kwargs):
   return device
 
 
-def Assemble(disk, children):
+def Assemble(disk, children, **kwargs):
   """Try to attach or assemble an existing device.
 
   This will attach to assemble the device, as needed, to bring it
@@ -1362,7 +1362,7 @@ def Assemble(disk, children):
   _VerifyDiskParams(disk)
   device = DEV_MAP[disk.dev_type](disk.logical_id, children, disk.size,
                                   disk.params, disk.dynamic_params,
-                                  name=disk.name, uuid=disk.uuid)
+                                  name=disk.name, uuid=disk.uuid, **kwargs)
   device.Assemble()
   return device
 
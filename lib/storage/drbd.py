@@ -95,13 +95,16 @@ class DRBD8(object):
     return DRBD8Info.CreateFromFile()
 
   @staticmethod
-  def GetUsedDevs():
+  def GetUsedDevs(info=None):
     """Compute the list of used DRBD minors.
 
+    @type info: L{DRBD8Info}
+    @param info: the /proc/drbd info to use, read from the file if not given
     @rtype: list of ints
 
     """
-    info = DRBD8.GetProcInfo()
+    if info is None:
+      info = DRBD8.GetProcInfo()
     return [m for m in info.GetMinors()
             if not info.GetMinorStatus(m).is_unconfigured]
 
@@ -165,6 +168,115 @@ class DRBD8(object):
                       minor, result.output)
 
 
+class DRBD8Snapshot(object):
+  """A snapshot of the DRBD state of the node.
+
+  A single snapshot is meant to be shared by all DRBD devices handled
+  within one RPC call, similar to the LVM info cache used for plain disks.
+  It reads /proc/drbd at most once and fetches the `drbdsetup show` data of
+  all minors with a single command, where the DRBD version allows it.
+
+  Operations changing the state of a minor must call L{Invalidate}, so that
+  the next query reads the current state again.
+
+  """
+  def __init__(self):
+    self._proc_info = None
+    self._show_info = {}
+    # None while not tried yet, otherwise whether _show_info covers all minors
+    self._show_all = None
+    self._stale_minors = set()
+
+  def GetProcInfo(self):
+    """Returns the parsed /proc/drbd info.
+
+    @rtype: L{DRBD8Info}
+
+    """
+    if self._proc_info is None:
+      self._proc_info = DRBD8.GetProcInfo()
+    return self._proc_info
+
+  def GetUsedDevs(self):
+    """Compute the list of used DRBD minors.
+
+    @rtype: list of ints
+
+    """
+    return DRBD8.GetUsedDevs(info=self.GetProcInfo())
+
+  def GetShowInfo(self, minor, show_info_cls, cmd_gen):
+    """Returns the parsed `drbdsetup show` information for a minor.
+
+    @type minor: int
+    @param minor: the minor to return information for
+    @type show_info_cls: class
+    @param show_info_cls: the L{drbd_info.BaseShowInfo} class for the
+        running DRBD version
+    @type cmd_gen: L{drbd_cmdgen.BaseDRBDCmdGenerator}
+    @param cmd_gen: the command generator for the running DRBD version
+    @rtype: dict as described in L{drbd_info.BaseShowInfo.GetDevInfo}
+
+    """
+    if minor in self._show_info:
+      return self._show_info[minor]
+
+    if self._show_all is None:
+      self._show_all = self._ReadAllShowInfo(show_info_cls, cmd_gen)
+      if minor in self._show_info:
+        return self._show_info[minor]
+
+    if self._show_all and minor not in self._stale_minors:
+      # not shown at all, thus not configured
+      return {}
+
+    info = show_info_cls.GetDevInfo(_GetShowData(cmd_gen, minor))
+    self._show_info[minor] = info
+    self._stale_minors.discard(minor)
+    return info
+
+  def _ReadAllShowInfo(self, show_info_cls, cmd_gen):
+    """Fetches the `drbdsetup show` information for all minors.
+
+    @rtype: boolean
+    @return: whether the information for all minors could be fetched
+
+    """
+    cmd = cmd_gen.GenShowAllCmd()
+    if cmd is None:
+      return False
+
+    show_data = _RunShowCmd(cmd)
+    if show_data is None:
+      return False
+
+    try:
+      self._show_info.update(show_info_cls.GetAllDevInfo(show_data))
+    except errors.BlockDeviceError, err:
+      logging.warning("Falling back to showing single DRBD minors: %s", err)
+      return False
+
+    self._stale_minors.clear()
+    return True
+
+  def Invalidate(self, minor=None):
+    """Discards the cached state.
+
+    @type minor: int or None
+    @param minor: the minor whose configuration has changed, or C{None} to
+        discard the cached configuration of all minors
+
+    """
+    self._proc_info = None
+    if minor is None:
+      self._show_info = {}
+      self._show_all = None
+      self._stale_minors = set()
+    else:
+      self._show_info.pop(minor, None)
+      self._stale_minors.add(minor)
+
+
 class DRBD8Dev(base.BlockDev):
   """DRBD v8.x block device.
 
@@ -177,9 +289,14 @@ class DRBD8Dev(base.BlockDev):
   two children: the data device and the meta_device. The meta
   device is checked for valid size and is zeroed on create.
 
+  A L{DRBD8Snapshot} can be passed as the C{drbd_snapshot} keyword argument
+  to share the DRBD state queries with other devices.
+
   """
   _DRBD_MAJOR = 147
 
+  _snapshot = None
+
   # timeout constants
   _NET_RECONFIG_TIMEOUT = 60
 
@@ -204,6 +321,7 @@ class DRBD8Dev(base.BlockDev):
     # The secret is wrapped in the Private data type, and it has to be extracted
     # before use
     self._secret = unique_id[5].Get()
+    self._snapshot = kwargs.get("drbd_snapshot")
 
     if children:
       if not _CanReadDevice(children[1].dev_path):
@@ -213,7 +331,7 @@ class DRBD8Dev(base.BlockDev):
                                    dyn_params, **kwargs)
     self.major = self._DRBD_MAJOR
 
-    info = DRBD8.GetProcInfo()
+    info = self._GetProcInfo()
     version = info.GetVersion()
     if version["k_major"] != 8:
       base.ThrowError("Mismatch in DRBD kernel version and requested ganeti"
@@ -300,12 +418,7 @@ class DRBD8Dev(base.BlockDev):
     @rtype: string
 
     """
-    result = utils.RunCmd(self._cmd_gen.GenShowCmd(minor))
-    if result.failed:
-      logging.error("Can't display the drbd config: %s - %s",
-                    result.fail_reason, result.output)
-      return None
-    return result.stdout
+    return _GetShowData(self._cmd_gen, minor)
 
   def _GetShowInfo(self, minor):
     """Return parsed information from `drbdsetup show`.
@@ -315,7 +428,43 @@ class DRBD8Dev(base.BlockDev):
     @rtype: dict as described in L{drbd_info.BaseShowInfo.GetDevInfo}
 
     """
-    return self._show_info_cls.GetDevInfo(self._GetShowData(minor))
+    if self._snapshot is None:
+      return self._show_info_cls.GetDevInfo(self._GetShowData(minor))
+    return self._snapshot.GetShowInfo(minor, self._show_info_cls,
+                                      self._cmd_gen)
+
+  def _GetProcInfo(self):
+    """Return the /proc/drbd information, from the snapshot if we have one.
+
+    @rtype: L{DRBD8Info}
+
+    """
+    if self._snapshot is None:
+      return DRBD8.GetProcInfo()
+    return self._snapshot.GetProcInfo()
+
+  def _InvalidateSnapshot(self, minor):
+    """Discard the snapshot state of a minor about to change.
+
+    @type minor: int
+    @param minor: the minor whose state changes
+
+    """
+    if self._snapshot is not None:
+      self._snapshot.Invalidate(minor)
+
+  def _RunCmd(self, minor, cmd):
+    """Run a command changing the state of a minor.
+
+    @type minor: int
+    @param minor: the minor whose state the command changes
+    @type cmd: list
+    @param cmd: the command to run
+    @rtype: L{utils.RunResult}
+
+    """
+    self._InvalidateSnapshot(minor)
+    return utils.RunCmd(cmd)
 
   def _MatchesLocal(self, info):
     """Test if our local config matches with an existing device.
@@ -394,7 +543,7 @@ class DRBD8Dev(base.BlockDev):
                                           size, self.params)
 
     for cmd in cmds:
-      result = utils.RunCmd(cmd)
+      result = self._RunCmd(minor, cmd)
       if result.failed:
         base.ThrowError("drbd%d: can't attach local disk: %s",
                         minor, result.output)
@@ -445,12 +594,14 @@ class DRBD8Dev(base.BlockDev):
                                       rhost, rport, protocol,
                                       dual_pri, hmac, secret, self.params)
 
-    result = utils.RunCmd(cmd)
+    result = self._RunCmd(minor, cmd)
     if result.failed:
       base.ThrowError("drbd%d: can't setup network: %s - %s",
                       minor, result.fail_reason, result.output)
 
     def _CheckNetworkConfig():
+      # the configuration may only show up after a while
+      self._InvalidateSnapshot(minor)
       info = self._GetShowInfo(minor)
       if not "local_addr" in info or not "remote_addr" in info:
         raise utils.RetryAgain()
@@ -568,7 +719,7 @@ class DRBD8Dev(base.BlockDev):
 
     """
     cmd = self._cmd_gen.GenSyncParamsCmd(minor, params)
-    result = utils.RunCmd(cmd)
+    result = self._RunCmd(minor, cmd)
     if result.failed:
       msg = ("Can't change syncer rate: %s - %s" %
              (result.fail_reason, result.output))
@@ -609,7 +760,7 @@ class DRBD8Dev(base.BlockDev):
     else:
       cmd = self._cmd_gen.GenResumeSyncCmd(self.minor)
 
-    result = utils.RunCmd(cmd)
+    result = self._RunCmd(self.minor, cmd)
     if result.failed:
       logging.error("Can't %s: %s - %s", cmd,
                     result.fail_reason, result.output)
@@ -624,7 +775,7 @@ class DRBD8Dev(base.BlockDev):
     if self.minor is None:
       base.ThrowError("drbd%d: GetStats() called while not attached",
                       self._aminor)
-    info = DRBD8.GetProcInfo()
+    info = self._GetProcInfo()
     if not info.HasMinorStatus(self.minor):
       base.ThrowError("drbd%d: can't find myself in /proc", self.minor)
     return info.GetMinorStatus(self.minor)
@@ -683,7 +834,7 @@ class DRBD8Dev(base.BlockDev):
 
     cmd = self._cmd_gen.GenPrimaryCmd(self.minor, force)
 
-    result = utils.RunCmd(cmd)
+    result = self._RunCmd(self.minor, cmd)
     if result.failed:
       base.ThrowError("drbd%d: can't make drbd device primary: %s", self.minor,
                       result.output)
@@ -697,7 +848,7 @@ class DRBD8Dev(base.BlockDev):
     if self.minor is None and not self.Attach():
       base.ThrowError("drbd%d: can't Attach() in Close()", self._aminor)
     cmd = self._cmd_gen.GenSecondaryCmd(self.minor)
-    result = utils.RunCmd(cmd)
+    result = self._RunCmd(self.minor, cmd)
     if result.failed:
       base.ThrowError("drbd%d: can't switch drbd device to secondary: %s",
                       self.minor, result.output)
@@ -731,6 +882,7 @@ class DRBD8Dev(base.BlockDev):
     dstatus = _DisconnectStatus(base.IgnoreError(self._ShutdownNet, self.minor))
 
     def _WaitForDisconnect():
+      self._InvalidateSnapshot(self.minor)
       if self.GetProcStatus().is_standalone:
         return
 
@@ -803,7 +955,10 @@ class DRBD8Dev(base.BlockDev):
     /proc).
 
     """
-    used_devs = DRBD8.GetUsedDevs()
+    if self._snapshot is None:
+      used_devs = DRBD8.GetUsedDevs()
+    else:
+      used_devs = self._snapshot.GetUsedDevs()
     if self._aminor in used_devs:
       minor = self._aminor
     else:
@@ -935,7 +1090,7 @@ class DRBD8Dev(base.BlockDev):
 
     """
     cmd = self._cmd_gen.GenDetachCmd(minor)
-    result = utils.RunCmd(cmd)
+    result = self._RunCmd(minor, cmd)
     if result.failed:
       base.ThrowError("drbd%d: can't detach local disk: %s",
                       minor, result.output)
@@ -953,7 +1108,7 @@ class DRBD8Dev(base.BlockDev):
     cmd = self._cmd_gen.GenDisconnectCmd(minor, family,
                                          self._lhost, self._lport,
                                          self._rhost, self._rport)
-    result = utils.RunCmd(cmd)
+    result = self._RunCmd(minor, cmd)
     if result.failed:
       base.ThrowError("drbd%d: can't shutdown network: %s",
                       minor, result.output)
@@ -966,6 +1121,7 @@ class DRBD8Dev(base.BlockDev):
       logging.info("drbd%d: not attached during Shutdown()", self._aminor)
       return
 
+    self._InvalidateSnapshot(self.minor)
     try:
       DRBD8.ShutdownAll(self.minor)
     finally:
@@ -1002,7 +1158,7 @@ class DRBD8Dev(base.BlockDev):
       # so we'll return here
       return
     cmd = self._cmd_gen.GenResizeCmd(self.minor, self.size + amount)
-    result = utils.RunCmd(cmd)
+    result = self._RunCmd(self.minor, cmd)
     if result.failed:
       base.ThrowError("drbd%d: resize failed: %s", self.minor, result.output)
 
@@ -1078,6 +1234,36 @@ class DRBD8Dev(base.BlockDev):
     return cls(unique_id, children, size, params, dyn_params)
 
 
+def _RunShowCmd(cmd):
+  """Run a `drbdsetup show` command.
+
+  @type cmd: list
+  @param cmd: the command to run
+  @rtype: string
+  @return: the output of the command, or C{None} if it failed
+
+  """
+  result = utils.RunCmd(cmd)
+  if result.failed:
+    logging.error("Can't display the drbd config: %s - %s",
+                  result.fail_reason, result.output)
+    return None
+  return result.stdout
+
+
+def _GetShowData(cmd_gen, minor):
+  """Return the `drbdsetup show` data of a single minor.
+
+  @type cmd_gen: L{drbd_cmdgen.BaseDRBDCmdGenerator}
+  @param cmd_gen: the command generator for the running DRBD version
+  @type minor: int
+  @param minor: the minor to collect show output for
+  @rtype: string
+
+  """
+  return _RunShowCmd(cmd_gen.GenShowCmd(minor))
+
+
 def _CanReadDevice(path):
   """Check if we can read from the given device.
 
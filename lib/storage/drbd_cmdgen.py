@@ -50,6 +50,15 @@ class BaseDRBDCmdGenerator(object):
   def GenShowCmd(self, minor):
     raise NotImplementedError
 
+  def GenShowAllCmd(self):
+    """Generate a command showing the configuration of all minors at once.
+
+    @return: the command, or C{None} if this DRBD version can only show
+        single minors
+
+    """
+    raise NotImplementedError
+
   def GenInitMetaCmd(self, minor, meta_dev):
     raise NotImplementedError
 
@@ -111,6 +120,10 @@ class DRBD83CmdGenerator(BaseDRBDCmdGenerator):
   def GenShowCmd(self, minor):
     return ["drbdsetup", self._DevPath(minor), "show"]
 
+  def GenShowAllCmd(self):
+    # drbdsetup 8.3 needs a device to show
+    return None
+
   def GenInitMetaCmd(self, minor, meta_dev):
     return ["drbdmeta", "--force", self._DevPath(minor),
             "v08", meta_dev, "0", "create-md"]
@@ -313,6 +326,9 @@ class DRBD84CmdGenerator(BaseDRBDCmdGenerator):
   def GenShowCmd(self, minor):
     return ["drbdsetup", "show", minor]
 
+  def GenShowAllCmd(self):
+    return ["drbdsetup", "show", "all"]
+
   def GenInitMetaCmd(self, minor, meta_dev):
     return ["drbdmeta", "--force", self._DevPath(minor),
             "v08", meta_dev, "flex-external", "create-md"]
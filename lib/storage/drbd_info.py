@@ -42,6 +42,17 @@ from ganeti import compat
 from ganeti.storage import base
 
 
+#: Tokens of `drbdsetup show` output: quoted strings, braces and semicolons,
+#: comments and plain words
+_SHOW_TOKEN_RE = re.compile(r'"([^"]*)"|([{};])|#[^\n]*|([^\s{};"#]+)')
+
+#: An address with port, the host optionally in IPv6 brackets
+_SHOW_ADDRESS_RE = re.compile(r"^\[?([0-9a-fA-F.:]+?)\]?:([0-9]+)$")
+
+#: The index of an extended meta-disk value
+_SHOW_INDEX_RE = re.compile(r"^\[([0-9]+)\]$")
+
+
 class DRBD8Status(object): # pylint: disable=R0902
   """A DRBD status representation class.
 
@@ -365,10 +376,97 @@ class BaseShowInfo(object):
 
     return cls._TransformParseResult(results)
 
+  @classmethod
+  def GetAllDevInfo(cls, show_data):
+    """Parse details about all DRBD minors shown at once.
+
+    This parses the output of a single `drbdsetup show` call covering
+    several devices, as generated by
+    L{drbd_cmdgen.BaseDRBDCmdGenerator.GenShowAllCmd}.
+
+    @rtype: dict
+    @return: a dictionary mapping minors to dicts as returned by
+        L{GetDevInfo}
+
+    """
+    raise NotImplementedError
+
   @classmethod
   def _TransformParseResult(cls, parse_result):
     raise NotImplementedError
 
+  @staticmethod
+  def _TransformFastStatement(tokens):
+    """Convert the tokens of a statement to the pyparsing result format.
+
+    @type tokens: list of strings
+    @param tokens: the keyword and the values of the statement, without
+        the terminating semicolon
+
+    """
+    values = [tok for tok in tokens[1:] if tok != "_is_default"]
+    if values and values[0] in ("ipv4", "ipv6"):
+      values = values[1:]
+    if len(values) == 1:
+      addr = _SHOW_ADDRESS_RE.match(values[0])
+      if addr:
+        return [tokens[0], addr.group(1), int(addr.group(2))]
+    elif len(values) == 2 and values[0] == "minor" and values[1].isdigit():
+      return [tokens[0], int(values[1])]
+    elif len(values) > 1:
+      index = _SHOW_INDEX_RE.match("".join(values[1:]))
+      if index:
+        return [tokens[0], values[0], int(index.group(1))]
+    return [tokens[0]] + values
+
+  @classmethod
+  def _FastParse(cls, show_data):
+    """Parse `drbdsetup show` output without pyparsing.
+
+    The output of `drbdsetup show` is made up of statements terminated by
+    a semicolon and of sections enclosed in braces, so a simple tokenizer
+    is enough to build the same nested structure as the pyparsing grammar,
+    at a fraction of the cost. Section arguments, like resource names or
+    volume numbers, are dropped just as in the grammar.
+
+    @rtype: list
+    @return: the top-level sections and statements
+
+    """
+    stack = [[]]
+    tokens = []
+    for match in _SHOW_TOKEN_RE.finditer(show_data):
+      (quoted, punct, word) = match.groups()
+      if punct == "{":
+        if not tokens:
+          base.ThrowError("Can't parse drbdsetup show output: section"
+                          " without name")
+        section = [tokens[0]]
+        stack[-1].append(section)
+        stack.append(section)
+        tokens = []
+      elif punct == "}":
+        if tokens or len(stack) == 1:
+          base.ThrowError("Can't parse drbdsetup show output: unexpected"
+                          " closing brace")
+        stack.pop()
+      elif punct == ";":
+        if not tokens:
+          base.ThrowError("Can't parse drbdsetup show output: empty"
+                          " statement")
+        stack[-1].append(cls._TransformFastStatement(tokens))
+        tokens = []
+      elif word is not None:
+        tokens.append(word)
+      elif quoted is not None:
+        tokens.append(quoted)
+      # anything else is a comment
+
+    if tokens or len(stack) != 1:
+      base.ThrowError("Can't parse drbdsetup show output: unexpected end")
+
+    return stack[0]
+
   @classmethod
   def _GetShowParser(cls):
     """Return a parser for `drbd show` output.
@@ -447,6 +545,43 @@ class DRBD84ShowInfo(BaseShowInfo):
 
     return resource
 
+  @classmethod
+  def GetAllDevInfo(cls, show_data):
+    """Parse details about all DRBD minors shown at once.
+
+    See L{BaseShowInfo.GetAllDevInfo}. DRBD 8.4 shows one resource per
+    minor, and the minor is found in the device statement of its volume.
+
+    """
+    retval = {}
+    if not show_data:
+      return retval
+
+    for resource in cls._FastParse(show_data):
+      if resource[0] != "resource":
+        continue
+      minor = cls._GetResourceMinor(resource[1:])
+      if minor is None:
+        base.ThrowError("Can't find the minor of a resource in drbdsetup"
+                        " show output")
+      retval[minor] = cls._TransformParseResult(resource[1:])
+
+    return retval
+
+  @staticmethod
+  def _GetResourceMinor(sections):
+    for section in sections:
+      if section[0] != "_this_host":
+        continue
+      for entry in section[1:]:
+        if entry[0] != "volume":
+          continue
+        for stmt in entry[1:]:
+          if stmt[0] == "device" and len(stmt) == 2 and \
+              isinstance(stmt[1], int):
+            return stmt[1]
+    return None
+
   @classmethod
   def _TransformVolumeSection(cls, vol_content, retval):
     for entry in vol_content:
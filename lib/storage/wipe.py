@@ -0,0 +1,284 @@
+#
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Zeroing of block devices and disk files.
+
+Wiping is done in the kernel wherever possible: if the device guarantees
+that discarded blocks read back as zeroes they are simply discarded,
+otherwise the C{BLKZEROOUT} ioctl lets the kernel (or the device itself, if
+it supports WRITE SAME/WRITE ZEROES) zero the range without copying any data
+from userspace. Only when neither is available, e.g. for file-based disks,
+zeroes are written with large, aligned C{O_DIRECT} writes from a single
+reusable buffer.
+
+"""
+
+import errno
+import fcntl
+import logging
+import mmap
+import os
+import stat
+import struct
+
+from ganeti import constants
+
+
+#: From <linux/fs.h>: _IO(0x12, 119) and _IO(0x12, 127)
+BLKDISCARD = 0x1277
+BLKZEROOUT = 0x127f
+
+#: Discard blocks, device guarantees they read back as zeroes
+WIPE_METHOD_DISCARD = "discard"
+#: C{BLKZEROOUT}, offloaded to the device using WRITE SAME/WRITE ZEROES
+WIPE_METHOD_WRITE_SAME = "write-same"
+#: C{BLKZEROOUT}, zeroes are written by the kernel
+WIPE_METHOD_ZEROOUT = "zeroout"
+#: Zeroes are written from userspace
+WIPE_METHOD_WRITE = "direct-write"
+
+#: Maximum amount of data in MiB handled per step; progress is reported after
+#: each
+WIPE_STEP_SIZE = constants.MAX_WIPE_CHUNK
+
+#: Amount of data handled per step in percent of the wiped size, unless
+#: limited by L{WIPE_STEP_SIZE}
+WIPE_STEP_PERCENT = constants.MIN_WIPE_CHUNK_PERCENT
+
+#: Size of the zero buffer used for writing, in MiB
+_WRITE_BUFFER_SIZE = 16
+
+_SYSFS_DEV_BLOCK_DIR = "/sys/dev/block"
+
+_MIB = 1024 * 1024
+
+#: Errors returned by ioctls not supported by a device or file
+_UNSUPPORTED_ERRNOS = frozenset([
+  errno.ENOTTY,
+  errno.EINVAL,
+  errno.EOPNOTSUPP,
+  ])
+
+_IOCTL_METHODS = {
+  WIPE_METHOD_DISCARD: BLKDISCARD,
+  WIPE_METHOD_WRITE_SAME: BLKZEROOUT,
+  WIPE_METHOD_ZEROOUT: BLKZEROOUT,
+  }
+
+
+def _ReadQueueAttribute(path, name):
+  """Reads a request queue attribute of a block device from sysfs.
+
+  @type path: string
+  @param path: path of the block device
+  @type name: string
+  @param name: name of the attribute below C{queue/}
+  @rtype: int or None
+  @return: value of the attribute, or C{None} if it couldn't be read
+
+  """
+  try:
+    st = os.stat(path)
+  except EnvironmentError:
+    return None
+
+  if not stat.S_ISBLK(st.st_mode):
+    return None
+
+  sysfs_dir = os.path.join(_SYSFS_DEV_BLOCK_DIR,
+                           "%d:%d" % (os.major(st.st_rdev),
+                                      os.minor(st.st_rdev)))
+
+  # Partitions don't have a queue of their own, theirs is the parent's
+  for queue_dir in [os.path.join(sysfs_dir, "queue"),
+                    os.path.join(sysfs_dir, "..", "queue")]:
+    try:
+      fh = open(os.path.join(queue_dir, name), "r")
+      try:
+        return int(fh.read().strip())
+      finally:
+        fh.close()
+    except (EnvironmentError, ValueError):
+      continue
+
+  return None
+
+
+def GetWipeMethods(path):
+  """Returns the wipe methods to try for a device, best one first.
+
+  @type path: string
+  @param path: path of the block device or file
+  @rtype: list of strings
+
+  """
+  try:
+    is_blockdev = stat.S_ISBLK(os.stat(path).st_mode)
+  except EnvironmentError:
+    is_blockdev = False
+
+  if not is_blockdev:
+    return [WIPE_METHOD_WRITE]
+
+  methods = []
+
+  if _ReadQueueAttribute(path, "discard_zeroes_data"):
+    methods.append(WIPE_METHOD_DISCARD)
+
+  if (_ReadQueueAttribute(path, "write_zeroes_max_bytes") or
+      _ReadQueueAttribute(path, "write_same_max_bytes")):
+    methods.append(WIPE_METHOD_WRITE_SAME)
+  else:
+    methods.append(WIPE_METHOD_ZEROOUT)
+
+  methods.append(WIPE_METHOD_WRITE)
+
+  return methods
+
+
+def _OpenForWriting(path):
+  """Opens a device or file for writing, bypassing the page cache if possible.
+
+  @rtype: tuple; (int, bool)
+  @return: file descriptor and whether C{O_DIRECT} is in use
+
+  """
+  flags = os.O_WRONLY
+  if hasattr(os, "O_CLOEXEC"):
+    flags |= os.O_CLOEXEC
+
+  try:
+    return (os.open(path, flags | os.O_DIRECT), True)
+  except OSError, err:
+    # Some filesystems (e.g. tmpfs) don't support direct I/O
+    if err.errno != errno.EINVAL:
+      raise
+
+  return (os.open(path, flags), False)
+
+
+def _ZeroRangeIoctl(fd, request, start, length):
+  """Asks the kernel to discard or zero a byte range of a block device.
+
+  """
+  fcntl.ioctl(fd, request, struct.pack("QQ", start, length))
+
+
+def _WriteZeroes(fd, buf, start, length):
+  """Writes zeroes to a byte range using a preallocated zero buffer.
+
+  @type buf: mmap.mmap
+  @param buf: page-aligned buffer filled with zeroes
+
+  """
+  os.lseek(fd, start, os.SEEK_SET)
+
+  buf_size = len(buf)
+
+  while length > 0:
+    written = os.write(fd, buffer(buf, 0, min(length, buf_size)))
+    length -= written
+
+
+def _GetStepSize(size):
+  """Returns the amount of data to wipe per step.
+
+  @type size: int
+  @param size: amount of MiB to wipe
+  @rtype: int
+  @return: step size in MiB, at least 1
+
+  """
+  # Truncating to integer to avoid rounding errors
+  return max(1, min(WIPE_STEP_SIZE, int(size / 100.0 * WIPE_STEP_PERCENT)))
+
+
+def WipeDevice(path, offset, size, progress_fn=None):
+  """Fills part of a block device or disk file with zeroes.
+
+  The data is wiped in steps of L{WIPE_STEP_PERCENT} percent of C{size}, but
+  at most L{WIPE_STEP_SIZE} MiB.
+
+  @type path: string
+  @param path: path of the device or file
+  @type offset: int
+  @param offset: offset in MiB at which to start wiping
+  @type size: int
+  @param size: amount of MiB to wipe
+  @type progress_fn: callable or None
+  @param progress_fn: called with the method in use and the number of MiB
+    wiped so far after each step
+  @rtype: string
+  @return: the method with which the data was wiped
+
+  """
+  methods = GetWipeMethods(path)
+  step_size = _GetStepSize(size)
+
+  (fd, direct) = _OpenForWriting(path)
+  buf = None
+  try:
+    done = 0
+
+    while done < size:
+      method = methods[0]
+      start = (offset + done) * _MIB
+      length = min(step_size, size - done) * _MIB
+
+      if method == WIPE_METHOD_WRITE:
+        if buf is None:
+          # Anonymous mappings are page-aligned and zero-filled, as required
+          # for direct I/O
+          buf = mmap.mmap(-1, _WRITE_BUFFER_SIZE * _MIB)
+        _WriteZeroes(fd, buf, start, length)
+      else:
+        try:
+          _ZeroRangeIoctl(fd, _IOCTL_METHODS[method], start, length)
+        except EnvironmentError, err:
+          if err.errno not in _UNSUPPORTED_ERRNOS:
+            raise
+          logging.info("Wipe method '%s' not supported for %s (%s), trying"
+                       " '%s'", method, path, err, methods[1])
+          methods.pop(0)
+          continue
+
+      done += length // _MIB
+
+      if progress_fn:
+        progress_fn(method, done)
+
+    if not direct:
+      os.fsync(fd)
+  finally:
+    if buf is not None:
+      buf.close()
+    os.close(fd)
+
+  return methods[0]
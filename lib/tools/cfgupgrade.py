@@ -729,9 +729,21 @@ class CfgUpgrade(object):
 
   # DOWNGRADE ------------------------------------------------------------
 
+  @OrFail("Removing the Xen state cache lifetime")
+  def DowngradeXenStateCacheTtl(self):
+    # pylint can't infer config_data type
+    # pylint: disable=E1103
+    cluster = self.config_data["cluster"]
+    hvparams = cluster.get("hvparams", {}).values()
+    for os_hvp in cluster.get("os_hvp", {}).values():
+      hvparams.extend(os_hvp.values())
+    for hvp in hvparams:
+      hvp.pop(constants.HV_XEN_STATE_CACHE_TTL, None)
+
   def DowngradeAll(self):
     self.config_data["version"] = version.BuildVersion(DOWNGRADE_MAJOR,
                                                        DOWNGRADE_MINOR, 0)
+    self.DowngradeXenStateCacheTtl()
 
     return not self.errors
 
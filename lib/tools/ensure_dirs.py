@@ -86,7 +86,7 @@ def RecursiveEnsure(path, uid, gid, dir_perm, file_perm):
 
 
 def EnsureQueueDir(path, mode, uid, gid):
-  """Sets the correct permissions on all job files in the queue.
+  """Sets the correct permissions on all job and journal files in the queue.
 
   @param path: Directory path
   @param mode: Wanted file mode
@@ -95,7 +95,8 @@ def EnsureQueueDir(path, mode, uid, gid):
 
   """
   for filename in utils.ListVisibleFiles(path):
-    if constants.JOB_FILE_RE.match(filename):
+    if (constants.JOB_FILE_RE.match(filename) or
+        constants.JOB_JOURNAL_FILE_RE.match(filename)):
       utils.EnforcePermission(utils.PathJoin(path, filename), mode, uid=uid,
                               gid=gid)
 
@@ -167,7 +168,7 @@ def GetPaths():
     ]
 
   ss = ssconf.SimpleStore()
-  for ss_path in ss.GetFileList():
+  for ss_path in ss.GetFileList() + [ss.GetSnapshotFilename()]:
     paths.append((ss_path, FILE, constants.SS_FILE_PERMS,
                   getent.noded_uid, getent.noded_gid, False))
 
@@ -196,6 +197,8 @@ def GetPaths():
      getent.luxid_uid, getent.daemons_gid, False),
     (pathutils.BDEV_CACHE_DIR, DIR, 0755,
      getent.noded_uid, getent.masterd_gid),
+    (pathutils.XEN_STATE_CACHE_DIR, DIR, 0700,
+     getent.noded_uid, getent.masterd_gid),
     (pathutils.UIDPOOL_LOCKDIR, DIR, 0750,
      getent.noded_uid, getent.masterd_gid),
     (pathutils.DISK_LINKS_DIR, DIR, 0755,
@@ -204,6 +207,8 @@ def GetPaths():
      getent.noded_uid, getent.masterd_gid),
     (pathutils.IMPORT_EXPORT_DIR, DIR, 0755,
      getent.noded_uid, getent.masterd_gid),
+    (pathutils.WIPE_DIR, DIR, 0755,
+     getent.noded_uid, getent.masterd_gid),
     (pathutils.LOG_DIR, DIR, 0770, getent.masterd_uid, getent.daemons_gid),
     (masterd_log, FILE, 0600, getent.masterd_uid, getent.masterd_gid, False),
     (confd_log, FILE, 0600, getent.confd_uid, getent.masterd_gid, False),
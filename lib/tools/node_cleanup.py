@@ -94,7 +94,9 @@ def Main():
       (pathutils.CLUSTER_DOMAIN_SECRET_FILE, True),
       ]
     clean_files.extend((f, True) for f in pathutils.ALL_CERT_FILES)
-    clean_files.extend((f, False) for f in ssconf.SimpleStore().GetFileList())
+    ss = ssconf.SimpleStore()
+    clean_files.extend((f, False) for f in ss.GetFileList())
+    clean_files.append((ss.GetSnapshotFilename(), False))
 
     if not opts.yes_do_it:
       cli.ToStderr("Cleaning a node is irreversible. If you really want to"
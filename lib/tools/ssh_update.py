@@ -164,17 +164,20 @@ def UpdatePubKeyFile(data, dry_run, key_file=pathutils.SSH_PUB_KEYS):
       logging.info("This is a dry run, not adding or replacing a key to %s",
                    key_file)
     else:
+      changes = []
       for uuid, keys in public_keys.items():
         if action == constants.SSHS_REPLACE_OR_ADD:
-          ssh.RemovePublicKey(uuid, key_file=key_file)
+          changes.append((ssh.PUB_KEY_REMOVE, uuid, None))
         for key in keys:
-          ssh.AddPublicKey(uuid, key, key_file=key_file)
+          changes.append((ssh.PUB_KEY_ADD, uuid, key))
+      ssh.ModifyPubKeyFile(changes, key_file=key_file)
   elif action == constants.SSHS_REMOVE:
     if dry_run:
       logging.info("This is a dry run, not removing keys from %s", key_file)
     else:
-      for uuid in public_keys.keys():
-        ssh.RemovePublicKey(uuid, key_file=key_file)
+      ssh.ModifyPubKeyFile([(ssh.PUB_KEY_REMOVE, uuid, None)
+                            for uuid in public_keys.keys()],
+                           key_file=key_file)
   elif action == constants.SSHS_CLEAR:
     if dry_run:
       logging.info("This is a dry run, not clearing file %s", key_file)
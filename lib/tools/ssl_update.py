@@ -43,6 +43,7 @@ from ganeti import errors
 from ganeti import utils
 from ganeti import ht
 from ganeti import pathutils
+from ganeti import ssconf
 from ganeti.tools import common
 
 
@@ -103,6 +104,7 @@ def ClearMasterCandidateSsconfList():
   else:
     logging.debug("Trying to delete the ssconf file '%s' which does not"
                   " exist.", ssconf_file)
+  ssconf.SimpleStore().RemoveSnapshot()
 
 
 # pylint: disable=E1103
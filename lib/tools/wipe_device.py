@@ -0,0 +1,162 @@
+#
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script to wipe part of a block device in the background.
+
+The node daemon starts one instance of this script per disk to wipe, so that
+all disks of an instance are wiped concurrently. Progress is written to a
+status file which is read by the node daemon when the master polls for it.
+
+"""
+
+import os
+import optparse
+import sys
+import logging
+
+from ganeti import cli
+from ganeti import constants
+from ganeti import serializer
+from ganeti import utils
+from ganeti.storage import wipe
+
+
+class _StatusFile(object):
+  """Status file of a running wipe.
+
+  """
+  def __init__(self, path, size):
+    """Initializes this class.
+
+    @type path: string
+    @param path: path of the status file
+    @type size: int
+    @param size: amount of MiB to wipe
+
+    """
+    self._path = path
+    self._data = {
+      constants.WIPE_STATUS_DONE: 0,
+      constants.WIPE_STATUS_SIZE: size,
+      constants.WIPE_STATUS_METHOD: None,
+      constants.WIPE_STATUS_FINISHED: False,
+      constants.WIPE_STATUS_ERROR: None,
+      }
+
+  def _Write(self):
+    """Writes the current status to the status file.
+
+    """
+    utils.WriteFile(self._path, data=serializer.DumpJson(self._data),
+                    mode=0400)
+
+  def SetProgress(self, method, done):
+    """Records the progress of the wipe.
+
+    @type method: string
+    @param method: wipe method in use
+    @type done: int
+    @param done: number of MiB wiped so far
+
+    """
+    self._data[constants.WIPE_STATUS_METHOD] = method
+    self._data[constants.WIPE_STATUS_DONE] = done
+    self._Write()
+
+  def SetFinished(self, error=None):
+    """Marks the wipe as finished.
+
+    @type error: string or None
+    @param error: error message if the wipe failed
+
+    """
+    self._data[constants.WIPE_STATUS_FINISHED] = True
+    self._data[constants.WIPE_STATUS_ERROR] = error
+    self._Write()
+
+
+def ParseOptions():
+  """Parses the options passed to the program.
+
+  @return: Options and arguments
+
+  """
+  parser = optparse.OptionParser(usage="%prog <status-file> <device>"
+                                 " <offset> <size>",
+                                 prog=os.path.basename(sys.argv[0]))
+  parser.add_option(cli.DEBUG_OPT)
+  parser.add_option(cli.VERBOSE_OPT)
+
+  (opts, args) = parser.parse_args()
+
+  if len(args) != 4:
+    parser.error("Expected exactly four arguments")
+
+  (status_path, dev_path, offset, size) = args
+
+  try:
+    offset = int(offset)
+    size = int(size)
+  except ValueError:
+    parser.error("Offset and size must be integers")
+
+  return (opts, status_path, dev_path, offset, size)
+
+
+def Main():
+  """Main routine.
+
+  """
+  (opts, status_path, dev_path, offset, size) = ParseOptions()
+
+  utils.SetupToolLogging(
+      opts.debug, opts.verbose,
+      toolname=os.path.splitext(os.path.basename(__file__))[0])
+
+  status = _StatusFile(status_path, size)
+  status.SetProgress(None, 0)
+
+  try:
+    logging.info("Wiping %s MiB of %s at offset %s MiB", size, dev_path,
+                 offset)
+    method = wipe.WipeDevice(dev_path, offset, size,
+                             progress_fn=status.SetProgress)
+    logging.info("Wiped %s using method '%s'", dev_path, method)
+  except Exception, err: # pylint: disable=W0703
+    logging.debug("Caught unhandled exception", exc_info=True)
+
+    (retcode, message) = cli.FormatError(err)
+    logging.error(message)
+    status.SetFinished(error="Wiping %s failed: %s" % (dev_path, message))
+
+    return retcode
+  else:
+    status.SetFinished()
+    return constants.EXIT_SUCCESS
@@ -40,8 +40,9 @@ import select
 import logging
 import signal
 import resource
-
-from cStringIO import StringIO
+import fcntl
+import threading
+import time
 
 from ganeti import errors
 from ganeti import constants
@@ -61,6 +62,20 @@ _no_fork = False
  _TIMEOUT_TERM,
  _TIMEOUT_KILL) = range(3)
 
+#: Directory listing the open file descriptors of the current process
+_PROC_SELF_FD = "/proc/self/fd"
+
+#: Maximum number of bytes read from a command's output at once
+_READ_SIZE = 64 * 1024
+
+#: Upper bounds (in seconds) of the buckets of the command duration histogram;
+#: durations above the last bound are counted in an additional bucket
+CMD_DURATION_BUCKETS = [0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0]
+
+# Statistics of the commands run by L{RunCmd}, see L{GetCommandStats}
+_cmd_stats = {}
+_cmd_stats_lock = threading.Lock()
+
 
 def DisableFork():
   """Disables the use of fork(2).
@@ -104,7 +119,7 @@ class RunResult(object):
     self.stdout = stdout
     self.stderr = stderr
     self.failed = (signal_ is not None or exit_code != 0)
-    self.failed_by_timeout = timeout_action != _TIMEOUT_NONE
+    self.failed_by_timeout = timeout_action not in (None, _TIMEOUT_NONE)
 
     fail_msgs = []
     if self.signal is not None:
@@ -223,6 +238,12 @@ def RunCmd(cmd, env=None, output=None, cwd="/", reset_env=False,
 
   cmd_env = _BuildCmdEnvironment(env, reset_env)
 
+  if shell:
+    program = (strcmd.split(None, 1) or [""])[0]
+  else:
+    program = cmd[0]
+
+  start = time.time()
   try:
     if output is None:
       out, err, status, timeout_action = _RunCmdPipe(cmd, cmd_env, shell, cwd,
@@ -238,6 +259,7 @@ def RunCmd(cmd, env=None, output=None, cwd="/", reset_env=False,
       status = _RunCmdFile(cmd, cmd_env, shell, output, cwd, noclose_fds)
       out = err = ""
   except OSError, err:
+    _RecordCommandStats(program, time.time() - start, True, False)
     if err.errno == errno.ENOENT:
       raise errors.OpExecError("Can't execute '%s': not found (%s)" %
                                (strcmd, err))
@@ -251,7 +273,102 @@ def RunCmd(cmd, env=None, output=None, cwd="/", reset_env=False,
     exitcode = None
     signal_ = -status
 
-  return RunResult(exitcode, signal_, out, err, strcmd, timeout_action, timeout)
+  result = RunResult(exitcode, signal_, out, err, strcmd, timeout_action,
+                     timeout)
+  _RecordCommandStats(program, time.time() - start, result.failed,
+                      result.failed_by_timeout)
+  return result
+
+
+def _RecordCommandStats(program, duration, failed, timed_out):
+  """Adds a finished command to the command statistics.
+
+  @type program: string
+  @param program: the command's program (argv[0])
+  @type duration: float
+  @param duration: the command's running time in seconds
+
+  """
+  bucket = len(CMD_DURATION_BUCKETS)
+  for (idx, bound) in enumerate(CMD_DURATION_BUCKETS):
+    if duration <= bound:
+      bucket = idx
+      break
+
+  with _cmd_stats_lock:
+    stats = _cmd_stats.get(program)
+    if stats is None:
+      stats = _cmd_stats[program] = {
+        "count": 0,
+        "failed": 0,
+        "timeouts": 0,
+        "total_time": 0.0,
+        "histogram": [0] * (len(CMD_DURATION_BUCKETS) + 1),
+        }
+    stats["count"] += 1
+    stats["total_time"] += duration
+    stats["histogram"][bucket] += 1
+    if failed:
+      stats["failed"] += 1
+    if timed_out:
+      stats["timeouts"] += 1
+
+
+def GetCommandStats():
+  """Returns statistics about the commands run by L{RunCmd}.
+
+  The statistics cover all commands run by the current process since it was
+  started or since the last call to L{ResetCommandStats}.
+
+  @rtype: dict
+  @return: dictionary mapping the program (argv[0]) of each command to a
+      dictionary with the number of runs (C{count}), failed runs (C{failed}),
+      runs terminated due to a timeout (C{timeouts}), the total running time
+      in seconds (C{total_time}) and a histogram of the running times
+      (C{histogram}, see L{CMD_DURATION_BUCKETS})
+
+  """
+  with _cmd_stats_lock:
+    return dict((program, dict(stats, histogram=stats["histogram"][:]))
+                for (program, stats) in _cmd_stats.items())
+
+
+def ResetCommandStats():
+  """Resets the statistics returned by L{GetCommandStats}.
+
+  """
+  with _cmd_stats_lock:
+    _cmd_stats.clear()
+
+
+def MergeCommandStats(total, stats):
+  """Adds command statistics to previously collected ones.
+
+  @type total: dict
+  @param total: statistics in the format returned by L{GetCommandStats}
+  @type stats: dict
+  @param stats: statistics in the format returned by L{GetCommandStats}
+  @rtype: dict
+  @return: the combined statistics as a new dictionary
+
+  """
+  result = dict((program, dict(program_stats,
+                               histogram=program_stats["histogram"][:]))
+                for (program, program_stats) in total.items())
+
+  for (program, program_stats) in stats.items():
+    merged = result.get(program)
+    if merged is None:
+      result[program] = dict(program_stats,
+                             histogram=program_stats["histogram"][:])
+      continue
+
+    for key in ["count", "failed", "timeouts", "total_time"]:
+      merged[key] += program_stats[key]
+    merged["histogram"] = [a + b for (a, b) in zip(merged["histogram"],
+                                                   program_stats["histogram"])]
+
+  return result
 
 
 def SetupDaemonEnv(cwd="/", umask=077):
@@ -549,26 +666,20 @@ def _RunCmdPipe(cmd, env, via_shell, cwd, interactive, timeout, noclose_fds,
   else:
     stdin = subprocess.PIPE
 
-  if noclose_fds:
-    preexec_fn = lambda: CloseFDs(noclose_fds)
-    close_fds = False
-  else:
-    preexec_fn = None
-    close_fds = True
-
+  preexec_fn = compat.partial(_CloseInheritedFDs, noclose_fds)
   child = subprocess.Popen(cmd, shell=via_shell,
                            stderr=stderr,
                            stdout=stdout,
                            stdin=stdin,
-                           close_fds=close_fds, env=env,
+                           close_fds=False, env=env,
                            cwd=cwd,
                            preexec_fn=preexec_fn)
 
   if postfork_fn:
     postfork_fn(child.pid)
 
-  out = StringIO()
-  err = StringIO()
+  out = []
+  err = []
 
   linger_timeout = None
 
@@ -623,13 +734,18 @@ def _RunCmdPipe(cmd, env, via_shell, cwd, interactive, timeout, noclose_fds,
 
       for fd, event in pollresult:
         if event & select.POLLIN or event & select.POLLPRI:
-          data = fdmap[fd][1].read()
+          try:
+            data = os.read(fd, _READ_SIZE)
+          except OSError, read_err:
+            if read_err.errno == errno.EAGAIN:
+              continue
+            raise
           # no data from read signifies EOF (the same as POLLHUP)
           if not data:
             poller.unregister(fd)
             del fdmap[fd]
             continue
-          fdmap[fd][0].write(data)
+          fdmap[fd][0].append(data)
         if (event & select.POLLNVAL or event & select.POLLHUP or
             event & select.POLLERR):
           poller.unregister(fd)
@@ -659,8 +775,8 @@ def _RunCmdPipe(cmd, env, via_shell, cwd, interactive, timeout, noclose_fds,
       logging.warning(msg_linger)
       utils_wrapper.IgnoreProcessNotFound(os.kill, child.pid, signal.SIGKILL)
 
-  out = out.getvalue()
-  err = err.getvalue()
+  out = "".join(out)
+  err = "".join(err)
 
   status = child.wait()
   return out, err, status, timeout_action
@@ -687,20 +803,14 @@ def _RunCmdFile(cmd, env, via_shell, output, cwd, noclose_fds):
 
   """
   fh = open(output, "a")
-
-  if noclose_fds:
-    preexec_fn = lambda: CloseFDs(noclose_fds + [fh.fileno()])
-    close_fds = False
-  else:
-    preexec_fn = None
-    close_fds = True
+  preexec_fn = compat.partial(_CloseInheritedFDs, noclose_fds)
 
   try:
     child = subprocess.Popen(cmd, shell=via_shell,
                              stderr=subprocess.STDOUT,
                              stdout=fh,
                              stdin=subprocess.PIPE,
-                             close_fds=close_fds, env=env,
+                             close_fds=False, env=env,
                              cwd=cwd,
                              preexec_fn=preexec_fn)
 
@@ -1073,15 +1183,8 @@ def RunInSeparateProcess(fn, *args):
   return bool(exitcode)
 
 
-def CloseFDs(noclose_fds=None):
-  """Close file descriptors.
-
-  This closes all file descriptors above 2 (i.e. except
-  stdin/out/err).
-
-  @type noclose_fds: list or None
-  @param noclose_fds: if given, it denotes a list of file descriptor
-      that should not be closed
+def _GetMaxFD():
+  """Returns the upper limit for file descriptor numbers.
 
   """
   # Default maximum for the number of available file descriptors.
@@ -1099,8 +1202,66 @@ def CloseFDs(noclose_fds=None):
   if maxfd == resource.RLIM_INFINITY:
     maxfd = MAXFD
 
+  return maxfd
+
+
+def _GetOpenFDs():
+  """Returns the file descriptors above 2 which might be open.
+
+  Only the descriptors actually open are returned if they can be listed from
+  C{/proc}. Otherwise all numbers up to the file descriptor limit are
+  returned, which can take a long time to process if the limit is high.
+
+  @rtype: list of int
+
+  """
+  try:
+    fds = [int(name) for name in os.listdir(_PROC_SELF_FD)]
+  except (OSError, ValueError):
+    return range(3, _GetMaxFD())
+
+  # The list includes the descriptor used for reading the directory, which
+  # is closed already
+  return sorted(fd for fd in fds if fd > 2)
+
+
+def CloseFDs(noclose_fds=None):
+  """Close file descriptors.
+
+  This closes all file descriptors above 2 (i.e. except
+  stdin/out/err).
+
+  @type noclose_fds: list or None
+  @param noclose_fds: if given, it denotes a list of file descriptor
+      that should not be closed
+
+  """
   # Iterate through and close all file descriptors (except the standard ones)
-  for fd in range(3, maxfd):
+  for fd in _GetOpenFDs():
     if noclose_fds and fd in noclose_fds:
       continue
     utils_wrapper.CloseFdNoError(fd)
+
+
+def _CloseInheritedFDs(noclose_fds):
+  """Closes the file descriptors a new program would inherit.
+
+  This is run in a child process between fork and exec. Descriptors with the
+  close-on-exec flag are left alone, as they are closed by exec anyway; this
+  includes the pipe used by L{subprocess} to report errors from exec.
+
+  @type noclose_fds: list or None
+  @param noclose_fds: if given, it denotes a list of file descriptor
+      that should not be closed
+
+  """
+  for fd in _GetOpenFDs():
+    if noclose_fds and fd in noclose_fds:
+      continue
+    try:
+      flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+    except IOError:
+      # Not open
+      continue
+    if not flags & fcntl.FD_CLOEXEC:
+      utils_wrapper.CloseFdNoError(fd)
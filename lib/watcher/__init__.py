@@ -58,6 +58,7 @@ from ganeti import netutils
 from ganeti import qlang
 from ganeti import ssconf
 from ganeti import ht
+from ganeti import jstore
 from ganeti import pathutils
 
 import ganeti.rapi.client # pylint: disable=W0611
@@ -84,6 +85,10 @@ CHILD_PROCESS_DELAY = 1.0
 #: How many seconds to wait for instance status file lock
 INSTANCE_STATUS_LOCK_TIMEOUT = 10.0
 
+#: Default number of instance restart or disk activation jobs submitted at
+#: the same time
+MAX_PARALLEL_JOBS = 20
+
 
 class NotMasterError(errors.GenericError):
   """Exception raised when this host is not the master."""
@@ -157,25 +162,25 @@ class Instance(object):
     self.snodes = snodes
     self.disk_template = disk_template
 
-  def Restart(self, cl):
-    """Encapsulates the start of an instance.
+  def GetRestartOp(self):
+    """Returns the opcode to start the instance.
 
     """
     op = opcodes.OpInstanceStartup(instance_name=self.name, force=False)
     op.reason = [(constants.OPCODE_REASON_SRC_WATCHER,
                   "Restarting instance %s" % self.name,
                   utils.EpochNano())]
-    cli.SubmitOpCode(op, cl=cl)
+    return op
 
-  def ActivateDisks(self, cl):
-    """Encapsulates the activation of all disks of an instance.
+  def GetActivateDisksOp(self):
+    """Returns the opcode to activate all disks of the instance.
 
     """
     op = opcodes.OpInstanceActivateDisks(instance_name=self.name)
     op.reason = [(constants.OPCODE_REASON_SRC_WATCHER,
                   "Activating disks for instance %s" % self.name,
                   utils.EpochNano())]
-    cli.SubmitOpCode(op, cl=cl)
+    return op
 
   def NeedsCleanup(self):
     """Determines whether the instance needs cleanup.
@@ -235,13 +240,63 @@ def _CleanupInstance(cl, notepad, inst, locks):
     notepad.RecordCleanupAttempt(inst.name)
 
 
-def _CheckInstances(cl, notepad, instances, locks):
+def _RunJobs(cl, ops, max_parallel, priority):
+  """Runs single-opcode jobs and waits for their results.
+
+  At most C{max_parallel} jobs are submitted at the same time, using a single
+  LUXI call. All jobs of such a batch are waited for before submitting the
+  next one.
+
+  @type ops: list of L{opcodes.OpCode}
+  @param ops: opcodes to run, each in its own job
+  @type max_parallel: int
+  @param max_parallel: maximum number of jobs submitted at the same time
+  @type priority: int or None
+  @param priority: priority for the opcodes, C{None} to keep the default
+  @rtype: list of tuples
+  @return: list of (success, result or exception) in the same order as
+      C{ops}
+
+  """
+  results = []
+
+  for start in range(0, len(ops), max_parallel):
+    batch = ops[start:start + max_parallel]
+    if priority is not None:
+      for op in batch:
+        op.priority = priority
+
+    try:
+      submitted = cl.SubmitManyJobs([[op] for op in batch])
+    except Exception, err: # pylint: disable=W0703
+      results.extend((False, err) for _ in batch)
+      continue
+
+    for (status, data) in submitted:
+      if not status:
+        results.append((False, errors.GenericError("Job submission failed: %s"
+                                                   % data)))
+        continue
+
+      try:
+        (result, ) = cli.PollJob(data, cl=cl, feedback_fn=logging.debug)
+      except Exception, err: # pylint: disable=W0703
+        results.append((False, err))
+      else:
+        results.append((True, result))
+
+  return results
+
+
+def _CheckInstances(cl, notepad, instances, locks, max_parallel=1,
+                    priority=None):
   """Make a pass over the list of instances, restarting downed ones.
 
   """
   notepad.MaintainInstanceList(instances.keys())
 
   started = set()
+  restart = []
 
   for inst in instances.values():
     if inst.NeedsCleanup():
@@ -260,14 +315,9 @@ def _CheckInstances(cl, notepad, instances, locks):
                       " giving up", inst.name, MAXTRIES)
         continue
 
-      try:
-        logging.info("Restarting instance '%s' (attempt #%s)",
-                     inst.name, n + 1)
-        inst.Restart(cl)
-      except Exception: # pylint: disable=W0703
-        logging.exception("Error while restarting instance '%s'", inst.name)
-      else:
-        started.add(inst.name)
+      logging.info("Restarting instance '%s' (attempt #%s)",
+                   inst.name, n + 1)
+      restart.append(inst)
 
       notepad.RecordRestartAttempt(inst.name)
 
@@ -277,10 +327,20 @@ def _CheckInstances(cl, notepad, instances, locks):
         if inst.status not in HELPLESS_STATES:
           logging.info("Restart of instance '%s' succeeded", inst.name)
 
+  results = _RunJobs(cl, [inst.GetRestartOp() for inst in restart],
+                     max_parallel, priority)
+  for (inst, (success, result)) in zip(restart, results):
+    if success:
+      started.add(inst.name)
+    else:
+      logging.error("Error while restarting instance '%s': %s",
+                    inst.name, result)
+
   return started
 
 
-def _CheckDisks(cl, notepad, nodes, instances, started):
+def _CheckDisks(cl, notepad, nodes, instances, started, max_parallel=1,
+                priority=None):
   """Check all nodes for restarted ones.
 
   """
@@ -302,6 +362,7 @@ def _CheckDisks(cl, notepad, nodes, instances, started):
   if check_nodes:
     # Activate disks for all instances with any of the checked nodes as a
     # secondary node.
+    activate = []
     for node in check_nodes:
       for instance_name in node.secondaries:
         try:
@@ -323,12 +384,19 @@ def _CheckDisks(cl, notepad, nodes, instances, started):
                         " it was already started", inst.name)
           continue
 
-        try:
-          logging.info("Activating disks for instance '%s'", inst.name)
-          inst.ActivateDisks(cl)
-        except Exception: # pylint: disable=W0703
-          logging.exception("Error while activating disks for instance '%s'",
-                            inst.name)
+        if inst in activate:
+          # Another of the checked nodes is a secondary node as well
+          continue
+
+        logging.info("Activating disks for instance '%s'", inst.name)
+        activate.append(inst)
+
+    results = _RunJobs(cl, [inst.GetActivateDisksOp() for inst in activate],
+                       max_parallel, priority)
+    for (inst, (success, result)) in zip(activate, results):
+      if not success:
+        logging.error("Error while activating disks for instance '%s': %s",
+                      inst.name, result)
 
     # Keep changed boot IDs
     for node in check_nodes:
@@ -507,6 +575,12 @@ def ParseOptions():
   parser.add_option("--rapi-ip", dest="rapi_ip",
                     default=constants.IP4_ADDRESS_LOCALHOST,
                     help="Use this IP to talk to RAPI.")
+  parser.add_option("--max-parallel-jobs", dest="max_parallel_jobs",
+                    default=MAX_PARALLEL_JOBS, type="int",
+                    help=("Maximum number of instance restart or disk"
+                          " activation jobs submitted at the same time"
+                          " (default %s)" % MAX_PARALLEL_JOBS))
+  parser.add_option(cli.PRIORITY_OPT)
   # See optparse documentation for why default values are not set by options
   parser.set_defaults(wait_children=True)
   options, args = parser.parse_args()
@@ -515,6 +589,9 @@ def ParseOptions():
   if args:
     parser.error("No arguments expected")
 
+  if options.max_parallel_jobs < 1:
+    parser.error("The maximum number of parallel jobs must be positive")
+
   return (options, args)
 
 
@@ -698,6 +775,18 @@ def _ArchiveJobs(cl, age):
   logging.debug("Archived %s jobs, left %s", arch_count, left_count)
 
 
+def _PackArchivedJobs():
+  """Packs archived jobs into the segments of their archive directories.
+
+  """
+  try:
+    count = jstore.PackArchive()
+  except (EnvironmentError, errors.GenericError), err:
+    logging.error("Can't pack archived jobs: %s", err)
+  else:
+    logging.debug("Packed %s archived jobs", count)
+
+
 def _CheckMaster(cl):
   """Ensures current host is master node.
 
@@ -757,6 +846,7 @@ def _GlobalWatcher(opts):
 
   _CheckMaster(client)
   _ArchiveJobs(client, opts.job_age)
+  _PackArchivedJobs()
 
   # Spawn child processes for all node groups
   _StartGroupChildren(client, opts.wait_children)
@@ -892,8 +982,11 @@ def _GroupWatcher(opts):
                          pathutils.WATCHER_GROUP_INSTANCE_STATUS_FILE,
                          known_groups)
 
-    started = _CheckInstances(client, notepad, instances, locks)
-    _CheckDisks(client, notepad, nodes, instances, started)
+    started = _CheckInstances(client, notepad, instances, locks,
+                              max_parallel=opts.max_parallel_jobs,
+                              priority=opts.priority)
+    _CheckDisks(client, notepad, nodes, instances, started,
+                max_parallel=opts.max_parallel_jobs, priority=opts.priority)
   except Exception, err:
     logging.info("Not updating status file due to failure: %s", err)
     raise
@@ -634,3 +634,54 @@ class WorkerPool(object):
       self._lock.release()
 
     logging.debug("All workers terminated")
+
+
+class _MapWorker(BaseWorker):
+  """Worker for L{ParallelMap}.
+
+  """
+  def RunTask(self, fn, item, idx, results): # pylint: disable=W0221
+    """Calls the function and stores its result.
+
+    """
+    try:
+      results[idx] = (True, fn(item))
+    except Exception, err: # pylint: disable=W0703
+      results[idx] = (False, err)
+
+
+def ParallelMap(name, fn, items, max_workers):
+  """Calls a function for every item using a bounded number of threads.
+
+  @type name: string
+  @param name: Name for the worker threads
+  @type fn: callable
+  @param fn: Function called with every item as its only argument
+  @type items: sequence
+  @param items: Items to process
+  @type max_workers: int
+  @param max_workers: Maximum number of concurrent calls
+  @rtype: list of tuples; (bool, object)
+  @return: For every item, in the same order, whether the call succeeded and
+    either its return value or the exception it raised
+
+  """
+  assert max_workers > 0
+
+  items = list(items)
+  results = [None] * len(items)
+
+  if not items:
+    return results
+
+  pool = WorkerPool(name, min(max_workers, len(items)), _MapWorker)
+  try:
+    pool.AddManyTasks([(fn, item, idx, results)
+                       for (idx, item) in enumerate(items)])
+    pool.Quiesce()
+  finally:
+    pool.TerminateWorkers()
+
+  assert compat.all(res is not None for res in results)
+
+  return results
@@ -320,6 +320,31 @@ maxWipeChunk = 1024
 minWipeChunkPercent :: Int
 minWipeChunkPercent = 10
 
+-- | Interval in seconds at which the master polls the progress of
+-- asynchronous disk wipes
+wipeStatusPollInterval :: Int
+wipeStatusPollInterval = 5
+
+-- | Number of MiB wiped so far
+wipeStatusDone :: String
+wipeStatusDone = "done"
+
+-- | Total number of MiB to wipe
+wipeStatusSize :: String
+wipeStatusSize = "size"
+
+-- | Method used for wiping (discard, write-same, zeroout or direct-write)
+wipeStatusMethod :: String
+wipeStatusMethod = "method"
+
+-- | Whether the wipe has finished
+wipeStatusFinished :: String
+wipeStatusFinished = "finished"
+
+-- | Error message if the wipe failed
+wipeStatusError :: String
+wipeStatusError = "error"
+
 -- * Directories
 
 runDirsMode :: Int
@@ -524,6 +549,14 @@ xlMigrationPidfile = "socat.pid"
 knownXenCommands :: FrozenSet String
 knownXenCommands = ConstantUtils.mkSet [xenCmdXl, xenCmdXm]
 
+-- | Default time in seconds for which the output of Xen toolstack queries
+-- ('xl list', 'xl info') is shared between node daemon requests, see the
+-- 'hvXenStateCacheTtl' hypervisor parameter. Commands changing the state of
+-- domains invalidate the shared output right away, so this only limits how
+-- long changes made outside of Ganeti can go unnoticed.
+xenStateCacheTtl :: Double
+xenStateCacheTtl = 2.0
+
 -- * KVM and socat
 
 kvmPath :: String
@@ -1441,6 +1474,22 @@ rpcTmo_1day = Types.rpcTimeoutToRaw OneDay
 rpcConnectTimeout :: Int
 rpcConnectTimeout = 5
 
+-- | Default number of requests the node daemon serves on one keep-alive
+-- connection
+nodedKeepAliveRequests :: Int
+nodedKeepAliveRequests = 100
+
+-- | Default number of seconds after which the node daemon closes an idle
+-- keep-alive connection
+nodedKeepAliveTimeout :: Double
+nodedKeepAliveTimeout = 5.0
+
+-- | Number of seconds for which RPC clients keep idle connections to nodes
+-- for reuse. This is shorter than 'nodedKeepAliveTimeout', so that clients
+-- don't pick connections which the node daemon is about to close.
+rpcConnectionMaxIdle :: Double
+rpcConnectionMaxIdle = nodedKeepAliveTimeout - 1
+
 -- OS
 
 osScriptCreate :: String
@@ -1889,6 +1938,9 @@ hvXenCmd = "xen_cmd"
 hvXenCpuid :: String
 hvXenCpuid = "cpuid"
 
+hvXenStateCacheTtl :: String
+hvXenStateCacheTtl = "xen_state_cache_ttl"
+
 hvsParameterTitles :: Map String String
 hvsParameterTitles =
   Map.fromList
@@ -1994,6 +2046,7 @@ hvsParameterTypes = Map.fromList
   , (hvVnetHdr,                         VTypeBool)
   , (hvXenCmd,                          VTypeString)
   , (hvXenCpuid,                        VTypeString)
+  , (hvXenStateCacheTtl,                VTypeFloat)
   ]
 
 -- * Migration statuses
@@ -4074,6 +4127,7 @@ hvcDefaults =
              , (hvVifScript,      PyValueEx "")
              , (hvXenCmd,         PyValueEx xenCmdXm)
              , (hvXenCpuid,       PyValueEx "")
+             , (hvXenStateCacheTtl, PyValueEx xenStateCacheTtl)
              , (hvSoundhw,        PyValueEx "")
              ])
   , (XenHvm, Map.fromList
@@ -4100,6 +4154,7 @@ hvcDefaults =
              , (hvViridian,       PyValueEx False)
              , (hvXenCmd,         PyValueEx xenCmdXm)
              , (hvXenCpuid,       PyValueEx "")
+             , (hvXenStateCacheTtl, PyValueEx xenStateCacheTtl)
              , (hvSoundhw,        PyValueEx "")
              ])
   , (Kvm, Map.fromList
@@ -4185,7 +4240,8 @@ hvcGlobals =
   ConstantUtils.mkSet [hvMigrationBandwidth,
                        hvMigrationMode,
                        hvMigrationPort,
-                       hvXenCmd]
+                       hvXenCmd,
+                       hvXenStateCacheTtl]
 
 becDefaults :: Map String PyValueEx
 becDefaults =
@@ -4801,6 +4857,11 @@ sshsSshKeyBits = "ssh_key_bits"
 sshsMaxRetries :: Integer
 sshsMaxRetries = 3
 
+-- Maximum number of nodes whose SSH key files are updated concurrently
+-- during SSH update operations.
+sshsMaxParallel :: Int
+sshsMaxParallel = 20
+
 sshsAdd :: String
 sshsAdd = "add"
 
@@ -5143,6 +5204,9 @@ luxiReqSubmitManyJobs = "SubmitManyJobs"
 luxiReqWaitForJobChange :: String
 luxiReqWaitForJobChange = "WaitForJobChange"
 
+luxiReqWaitForJobsChange :: String
+luxiReqWaitForJobsChange = "WaitForJobsChange"
+
 luxiReqPickupJob :: String
 luxiReqPickupJob = "PickupJob"
 
@@ -5230,6 +5294,7 @@ luxiReqAll =
   , luxiReqSubmitJobToDrainedQueue
   , luxiReqSubmitManyJobs
   , luxiReqWaitForJobChange
+  , luxiReqWaitForJobsChange
   , luxiReqPickupJob
   , luxiReqQueryFilters
   , luxiReqReplaceFilter
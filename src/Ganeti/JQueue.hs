@@ -56,6 +56,9 @@ module Ganeti.JQueue
     , calcJobPriority
     , jobFileName
     , liveJobFile
+    , liveJobJournalFile
+    , liveJobFilesToWatch
+    , removeJobJournal
     , archivedJobFile
     , determineJobDirectories
     , getJobIDs
@@ -103,12 +106,19 @@ import Control.Monad ( filterM
 import Control.Monad.IO.Class
 import Control.Monad.Trans (lift)
 import Control.Monad.Trans.Maybe
-import Data.List (stripPrefix, sortBy, isPrefixOf)
+import qualified Data.ByteString.Char8 as BS
+import qualified Data.ByteString.Lazy.Char8 as BL
+import Data.Char (ord)
+import Data.List (stripPrefix, sortBy, isPrefixOf, foldl')
 import Data.Maybe
 import Data.Ord (comparing)
+import qualified Data.Set as Set
+import Numeric (readHex)
 -- workaround what seems to be a bug in ghc 7.4's TH shadowing code
 import System.Directory
 import System.FilePath
+import System.IO ( withBinaryFile, hFileSize, hSeek, IOMode(..)
+                 , SeekMode(..))
 import System.IO.Error (isDoesNotExistError)
 import System.Posix.Files
 import System.Posix.Signals (sigHUP, sigTERM, sigUSR1, sigKILL, signalProcess)
@@ -118,6 +128,7 @@ import qualified Text.JSON
 import Text.JSON.Types
 
 import Ganeti.BasicTypes
+import Ganeti.Codec (decompressZlib)
 import qualified Ganeti.Config as Config
 import qualified Ganeti.Constants as C
 import Ganeti.Errors (ErrorResult, ResultG)
@@ -328,6 +339,24 @@ parseJobFileId path =
 liveJobFile :: FilePath -> JobId -> FilePath
 liveJobFile rootdir jid = rootdir </> jobFileName jid
 
+-- | Suffix of the log journal of a live job.
+jobJournalSuffix :: String
+jobJournalSuffix = ".journal"
+
+-- | Computes the full path to the log journal of a live job. The journal
+-- holds the log entries appended to the job since its job file was last
+-- written.
+liveJobJournalFile :: FilePath -> JobId -> FilePath
+liveJobJournalFile rootdir jid = liveJobFile rootdir jid ++ jobJournalSuffix
+
+-- | Computes the files that change whenever a live job changes, i.e., its
+-- job file and, if it exists, its log journal.
+liveJobFilesToWatch :: FilePath -> JobId -> IO [FilePath]
+liveJobFilesToWatch rootdir jid = do
+  let journal = liveJobJournalFile rootdir jid
+  has_journal <- doesFileExist journal
+  return $ liveJobFile rootdir jid : [journal | has_journal]
+
 -- | Computes the full path to an archives job. BROKEN.
 archivedJobFile :: FilePath -> JobId -> FilePath
 archivedJobFile rootdir jid =
@@ -432,9 +461,86 @@ sortJobIDs = sortBy (comparing fromJobId)
 
 -- | Computes the list of jobs in a given directory.
 getDirJobIDs :: FilePath -> ResultT IOError IO [JobId]
-getDirJobIDs path =
-  withErrorLogAt WARNING ("Failed to list job directory " ++ path) .
-    liftM (mapMaybe parseJobFileId) $ liftIO (getDirectoryContents path)
+getDirJobIDs path = do
+  jids <- withErrorLogAt WARNING ("Failed to list job directory " ++ path) .
+            liftM (mapMaybe parseJobFileId) $ liftIO (getDirectoryContents path)
+  packed <- liftIO $ getSegmentJobIDs path
+  -- while being packed, a job can have both its own file and an index entry
+  let jidset = Set.fromList jids
+  return $ jids ++ filter (`Set.notMember` jidset) packed
+
+-- | Name of the file in an archive directory holding the packed jobs.
+archiveSegmentFile :: FilePath
+archiveSegmentFile = "segment"
+
+-- | Name of the index of the segment of an archive directory. Its lines are
+-- sorted by job ID and have a fixed length; they contain the job ID, the
+-- offset and length of the compressed job in the segment and the job's end
+-- timestamp.
+archiveIndexFile :: FilePath
+archiveIndexFile = "segment.index"
+
+-- | Length of the lines of an archive index.
+archiveIndexLineLength :: Int
+archiveIndexLineLength = 54
+
+-- | Parses a line of an archive index into the job ID and the offset and
+-- length of the compressed job in the segment.
+parseArchiveIndexLine :: BS.ByteString -> Maybe (JobId, Integer, Int)
+parseArchiveIndexLine line =
+  case mapM (liftM fst . BS.readInteger) $ BS.words line of
+    Just [jid, offset, len, _] -> do
+      jid' <- makeJobId $ fromInteger jid
+      return (jid', offset, fromInteger len)
+    _ -> Nothing
+
+-- | Computes the list of jobs packed in the segment of an archive directory.
+getSegmentJobIDs :: FilePath -> IO [JobId]
+getSegmentJobIDs path = do
+  let index = path </> archiveIndexFile
+  contents <- BS.readFile index `Control.Exception.catch`
+                ignoreIOError BS.empty True
+                  ("Failed to read archive index " ++ index)
+  return . map (\(jid, _, _) -> jid) . mapMaybe parseArchiveIndexLine
+    $ BS.lines contents
+
+-- | Reads a job packed in the segment of an archive directory, finding it
+-- with a binary search in the segment's index.
+readSegmentJob :: FilePath -> JobId -> IO (Maybe String)
+readSegmentJob path jid =
+  let index = path </> archiveIndexFile
+      segment = path </> archiveSegmentFile
+      linelen = toInteger archiveIndexLineLength
+      lookupJob h lo hi
+        | lo >= hi = return Nothing
+        | otherwise = do
+            let mid = (lo + hi) `div` 2
+            hSeek h AbsoluteSeek (mid * linelen)
+            line <- BS.hGet h archiveIndexLineLength
+            case parseArchiveIndexLine line of
+              Nothing -> return Nothing
+              Just (jid', offset, len)
+                | jid' < jid -> lookupJob h (mid + 1) hi
+                | jid' > jid -> lookupJob h lo mid
+                | otherwise -> return $ Just (offset, len)
+      readJob = do
+        entry <- withBinaryFile index ReadMode $ \h -> do
+                   size <- hFileSize h
+                   lookupJob h 0 (size `div` linelen)
+        case entry of
+          Nothing -> return Nothing
+          Just (offset, len) -> do
+            compressed <- withBinaryFile segment ReadMode $ \h ->
+                            hSeek h AbsoluteSeek offset >> BS.hGet h len
+            case decompressZlib $ BL.fromChunks [compressed] of
+              Left err -> do
+                logWarning $ "Failed to decompress job " ++
+                             show (fromJobId jid) ++ " from " ++ segment ++
+                             ": " ++ err
+                return Nothing
+              Right raw -> return . Just $ BL.unpack raw
+  in readJob `Control.Exception.catch`
+       ignoreIOError Nothing True ("Failed to read archive segment in " ++ path)
 
 -- | Reads the job data from disk.
 readJobDataFromDisk :: FilePath -> Bool -> JobId -> IO (Maybe (String, Bool))
@@ -444,11 +550,75 @@ readJobDataFromDisk rootdir archived jid = do
       all_paths = if archived
                     then [(live_path, False), (archived_path, True)]
                     else [(live_path, False)]
-  foldM (\state (path, isarchived) ->
-           liftM (\r -> Just (r, isarchived)) (readFile path)
-             `Control.Exception.catch`
-             ignoreIOError state True
-               ("Failed to read job file " ++ path)) Nothing all_paths
+  result <- foldM (\state (path, isarchived) ->
+                     liftM (\r -> Just (r, isarchived)) (readFile path)
+                       `Control.Exception.catch`
+                       ignoreIOError state True
+                         ("Failed to read job file " ++ path))
+                  Nothing all_paths
+  -- archived jobs are eventually packed into the archive segment
+  if isNothing result && archived
+    then liftM (fmap (\r -> (r, True)))
+           $ readSegmentJob (takeDirectory archived_path) jid
+    else return result
+
+-- | Reads the log journal of a live job. A missing journal is treated as
+-- an empty one.
+readJobJournal :: FilePath -> JobId -> IO String
+readJobJournal rootdir jid = do
+  let path = liveJobJournalFile rootdir jid
+  contents <- readFile path `Control.Exception.catch`
+                ignoreIOError "" True ("Failed to read job journal " ++ path)
+  -- force reading the whole file, so that it gets closed
+  length contents `seq` return contents
+
+-- | Removes the log journal of a job, e.g., after archiving it.
+removeJobJournal :: FilePath -> JobId -> IO ()
+removeJobJournal rootdir jid = do
+  let path = liveJobJournalFile rootdir jid
+  removeFile path `Control.Exception.catch`
+    ignoreIOError () True ("Failed to remove job journal " ++ path)
+
+-- | Computes the Adler-32 checksum of a string of 8-bit characters.
+adler32 :: String -> Integer
+adler32 = combine . foldl' step (1, 0)
+  where step (a, b) c = let a' = (a + toInteger (ord c)) `mod` 65521
+                            b' = (b + a') `mod` 65521
+                        in a' `seq` b' `seq` (a', b')
+        combine (a, b) = b * 65536 + a
+
+-- | Parses a record of a job's log journal, consisting of the checksum of
+-- the data in hexadecimal and the JSON encoded data, separated by a space.
+-- Returns the index of the opcode and the log entry of the record.
+parseJournalRecord :: String
+                   -> Maybe (Int, (Int, Timestamp, ELogType, JSValue))
+parseJournalRecord line = do
+  let (checksum, rest) = break (== ' ') line
+  payload <- stripPrefix " " rest
+  (value, "") <- listToMaybe $ readHex checksum
+  if value /= adler32 payload
+    then Nothing
+    else case Text.JSON.decode payload of
+           Text.JSON.Ok record -> Just record
+           Text.JSON.Error _ -> Nothing
+
+-- | Adds the log entries of a job's log journal to the job. Entries already
+-- contained in the job file are ignored, and the journal is only used up to
+-- the first invalid record, as such a record can only be the result of an
+-- interrupted write.
+replayJobJournal :: String -> QueuedJob -> QueuedJob
+replayJobJournal journal job =
+  let serial = maximum . (0 :) . map (\(s, _, _, _) -> s) . concatMap qoLog
+                 $ qjOps job
+      records = [ r | Just r@(_, (s, _, _, _)) <-
+                        takeWhile isJust . map parseJournalRecord
+                          $ lines journal
+                    , s > serial ]
+      addEntries idx op =
+        op { qoLog = qoLog op ++ [ entry | (i, entry) <- records, i == idx ] }
+  in if null records
+       then job
+       else job { qjOps = zipWith addEntries [0..] $ qjOps job }
 
 -- | Failed to load job error.
 noSuchJob :: Result (QueuedJob, Bool)
@@ -458,13 +628,16 @@ noSuchJob = Bad "Can't load job file"
 loadJobFromDisk :: FilePath -> Bool -> JobId -> IO (Result (QueuedJob, Bool))
 loadJobFromDisk rootdir archived jid = do
   raw <- readJobDataFromDisk rootdir archived jid
+  journal <- case raw of
+               Just (_, False) -> readJobJournal rootdir jid
+               _ -> return ""
   -- note: we need some stricness below, otherwise the wrapping in a
   -- Result will create too much lazyness, and not close the file
   -- descriptors for the individual jobs
   return $! case raw of
              Nothing -> noSuchJob
              Just (str, arch) ->
-               liftM (\qj -> (qj, arch)) .
+               liftM (\qj -> (replayJobJournal journal qj, arch)) .
                fromJResult "Parsing job file" $ Text.JSON.decode str
 
 -- | Write a job to disk.
@@ -714,6 +887,7 @@ archiveSomeJobsUntil replicateFn qDir endt cutt arch torepl (jid:jids) = do
                                  ++ " failed unexpectedly: " ++ s
                   continue
                 Ok () -> do
+                  removeJobJournal qDir jid
                   let torepl' = jid:torepl
                   if length torepl' >= 10
                     then do
@@ -56,7 +56,7 @@ import qualified Data.ByteString.UTF8 as UTF8
 import qualified Data.Set as Set (toList)
 import Data.IORef
 import Data.List (intersperse)
-import Data.Maybe (fromMaybe)
+import Data.Maybe (catMaybes, fromMaybe)
 import qualified Text.JSON as J
 import Text.JSON (encode, showJSON, JSValue(..))
 import System.Info (arch)
@@ -92,8 +92,8 @@ import Ganeti.Query.Filter (makeSimpleFilter)
 import Ganeti.THH.HsRPC (runRpcClient, RpcClientMonad)
 import Ganeti.Types
 import qualified Ganeti.UDSServer as U (Handler(..), listener)
-import Ganeti.Utils ( lockFile, exitIfBad, exitUnless, watchFile
-                    , safeRenameFile, newUUID, isUUID )
+import Ganeti.Utils ( lockFile, exitIfBad, exitUnless
+                    , watchFilesBy, safeRenameFile, newUUID, isUUID )
 import Ganeti.Utils.Monad (orM)
 import Ganeti.Utils.MVarLock
 import qualified Ganeti.Version as Version
@@ -463,6 +463,9 @@ handleCall qlock qstat cfg (SubmitManyJobs lops) =
 handleCall _ _ cfg (WaitForJobChange jid fields prev_job prev_log tmout) =
   waitForJobChange jid prev_job tmout $ computeJobUpdate cfg jid fields prev_log
 
+handleCall _ _ cfg (WaitForJobsChange jobs fields tmout) =
+  waitForJobsChange jobs tmout $ \jid -> computeJobUpdate cfg jid fields
+
 handleCall _ _ cfg (SetWatcherPause time) = do
   let mcs = Config.getMasterOrCandidates cfg
   _ <- executeRpcCall mcs $ RpcCallSetWatcherPause time
@@ -539,6 +542,7 @@ handleCall qlock _ cfg (ArchiveJob jid) =
       lift . withErrorT JobQueueError
            . annotateError "Archiving failed in an unexpected way"
            . mkResultT $ safeRenameFile queueDirPermissions live archive
+      liftIO $ removeJobJournal qDir jid
     _ <- liftIO . executeRpcCall mcs
                 $ RpcCallJobqueueRename [(live, archive)]
     return True
@@ -578,12 +582,44 @@ waitForJobChange jid prev_job tmout compute_fn = do
   case jobresult of
     Bad s -> return . Bad $ JobLost s
     Ok (job, _) | not (jobFinalized job) -> do
-      let jobfile = liveJobFile qDir jid
-      answer <- watchFile jobfile (min tmout C.luxiWfjcTimeout)
-                  (prev_job, JSArray []) compute_fn
+      jobfiles <- liveJobFilesToWatch qDir jid
+      answer <- watchFilesBy jobfiles (min tmout C.luxiWfjcTimeout)
+                  (/= (prev_job, JSArray [])) compute_fn
       return . Ok $ showJSON answer
     _ -> liftM (Ok . showJSON) compute_fn
 
+-- | Wait until at least one of the given jobs changed with respect to the
+-- information previously received by the client, and return the updates of
+-- all changed jobs. Finalized jobs always count as changed, jobs that can't
+-- be found are reported with a null update.
+waitForJobsChange :: [(JobId, JSValue, JSValue)] -> Int
+                     -> (JobId -> JSValue -> IO (JSValue, JSValue))
+                     -> IO (ErrorResult JSValue)
+waitForJobsChange jobs tmout compute_fn = do
+  qDir <- queueDir
+  let jobUpdate (jid, prev_job, prev_log) = do
+        jobresult <- loadJobFromDisk qDir False jid
+        case jobresult of
+          Bad _ -> return $ Just (jid, JSNull)
+          Ok (job, _) -> do
+            answer@(rfields, rlogs) <- compute_fn jid prev_log
+            return $ if jobFinalized job || rfields /= prev_job
+                          || rlogs /= JSArray []
+                       then Just (jid, showJSON answer)
+                       else Nothing
+      computeUpdates = liftM catMaybes $ mapM jobUpdate jobs
+  jobfiles <- liftM concat
+                $ mapM (\(jid, _, _) -> liveJobFilesToWatch qDir jid) jobs
+  initial <- computeUpdates
+  -- only watch the job files if all of them still exist
+  updates <- if null initial
+               then watchFilesBy jobfiles (min tmout C.luxiWfjcTimeout)
+                      (not . null) computeUpdates
+               else return initial
+  return . Ok $ if null updates
+                  then showJSON C.jobNotchanged
+                  else showJSON updates
+
 -- | Query the status of a job and return the requested fields
 -- and the logs newer than the given log number.
 computeJobUpdate :: ConfigData -> JobId -> [String] -> JSValue
@@ -643,6 +679,10 @@ luxiExec (qlock, qstat, creader) args =
       | fields == ["status"] -> do
         result <- handleWaitForJobChangeStatus jid prev_job prev_log tmout
         return (True, result)
+    WaitForJobsChange jobs fields tmout
+      | fields == ["status"] -> do
+        result <- waitForJobsChange jobs tmout computeJobUpdateStatus
+        return (True, result)
     _ -> do
      cfg <- creader
      result <- handleCallWrapper qlock qstat cfg args
@@ -72,6 +72,7 @@ import Ganeti.Locking.Locks (ClientId, ciIdentifier)
 import Ganeti.Logging.Lifted (logDebug, logInfo)
 import Ganeti.Objects
 import Ganeti.Objects.Lens
+import Ganeti.THH
 import Ganeti.Types (AdminState, AdminStateSource, JobId)
 import Ganeti.Utils (ordNub)
 import Ganeti.WConfd.ConfigState (ConfigState, csConfigData, csConfigDataL)
@@ -83,6 +84,20 @@ type DiskUUID = String
 type InstanceUUID = String
 type NodeUUID = String
 
+-- | A set of changes to the configuration, as sent by clients that hold the
+-- configuration lock exclusively. Objects are keyed by their UUID; objects
+-- listed in the containers are added or replaced, objects whose UUID is in
+-- the removed list are deleted.
+$(buildObject "ConfigDelta" "delta"
+  [ optionalField $ simpleField "cluster" [t| Cluster |]
+  , simpleField "nodes"      [t| Container Node      |]
+  , simpleField "nodegroups" [t| Container NodeGroup |]
+  , simpleField "instances"  [t| Container Instance  |]
+  , simpleField "networks"   [t| Container Network   |]
+  , simpleField "disks"      [t| Container Disk      |]
+  , simpleField "removed"    [t| [String]            |]
+  ])
+
 -- * accessor functions
 
 getInstanceByUUID :: ConfigState
@@ -222,6 +237,25 @@ updateConfigIfNecessary now target getContainer f cs = do
     then return ((serialOf current, mTimeOf current), cs)
     else f cs
 
+-- | Applies a configuration delta to the configuration data.
+--
+-- No checks are performed; like a full configuration write, the delta is
+-- trusted to come from a client holding the configuration lock.
+applyConfigDelta :: ConfigDelta -> ConfigData -> ConfigData
+applyConfigDelta delta =
+    maybe id (configClusterL .~) (deltaCluster delta)
+  . (configNodesL %~ apply (deltaNodes delta))
+  . (configNodegroupsL %~ apply (deltaNodegroups delta))
+  . (configInstancesL %~ apply (deltaInstances delta))
+  . (configNetworksL %~ apply (deltaNetworks delta))
+  . (configDisksL %~ apply (deltaDisks delta))
+  where
+    removed = S.fromList . map UTF8.fromString $ deltaRemoved delta
+    apply :: Container a -> Container a -> Container a
+    apply (GenericContainer new) (GenericContainer old) =
+      GenericContainer . M.union new
+        $ M.filterWithKey (\k _ -> not (k `S.member` removed)) old
+
 -- * UUID config checks
 
 -- | Checks if the config has the given UUID
@@ -43,8 +43,8 @@ module Ganeti.WConfd.Core where
 
 import Control.Arrow ((&&&))
 import Control.Concurrent (myThreadId)
-import Control.Lens.Setter (set)
-import Control.Monad (liftM, unless)
+import Control.Lens.Setter (set, over)
+import Control.Monad (liftM, unless, when)
 import qualified Data.Map as M
 import qualified Data.Set as S
 import Language.Haskell.TH (Name)
@@ -62,6 +62,7 @@ import Ganeti.Locking.Locks ( GanetiLocks(ConfigLock, BGL)
                             , ClientType(ClientOther), ClientId(..) )
 import qualified Ganeti.Locking.Waiting as LW
 import Ganeti.Objects ( ConfigData, DRBDSecret, LogicalVolume, Ip4Address
+                      , serialOf, mTimeOf
                       , configMaintenance, maintRoundDelay, maintJobs
                       , maintBalance, maintBalanceThreshold, maintEvacuated
                       , Incident, maintIncidents
@@ -139,6 +140,47 @@ lockConfig cid shared = do
         []  -> liftM Just CW.readConfig
         _   -> return Nothing
 
+-- | Lock the configuration like 'lockConfig', but only return it if its
+-- serial number differs from the one of the copy the client already has.
+-- Returns 'Nothing' if the lock couldn't be acquired, otherwise the current
+-- serial number of the configuration and, if it changed, the configuration.
+lockConfigIfChanged
+    :: ClientId
+    -> Bool -- ^ set to 'True' if the lock should be shared
+    -> Int -- ^ the serial number of the client's copy
+    -> WConfdMonad (J.MaybeForJSON (Int, J.MaybeForJSON ConfigData))
+lockConfigIfChanged cid shared serial = do
+  r <- liftM J.unMaybeForJSON $ lockConfig cid shared
+  return . J.MaybeForJSON $ fmap unlessKnown r
+  where
+    unlessKnown cdata
+      | serialOf cdata == serial = (serial, J.MaybeForJSON Nothing)
+      | otherwise                = (serialOf cdata, J.MaybeForJSON $ Just cdata)
+
+-- | Apply a set of changes to the configuration, if the config lock is held
+-- exclusively, and optionally release the lock. Returns the new serial number
+-- and modification time of the configuration, so that the client can keep
+-- using its copy.
+--
+-- If the lock is to be released and the caller does not hold it, the call
+-- returns 'Nothing', like 'writeConfigAndUnlock'.
+writeConfigDelta :: ClientId -> CM.ConfigDelta -> Bool
+                 -> WConfdMonad (J.MaybeForJSON (Int, J.TimeAsDoubleJSON))
+writeConfigDelta cid delta release = do
+  la <- readLockAllocation
+  if L.holdsLock cid ConfigLock L.OwnExclusive la
+    then do
+      modifyConfigState $ (,) () . over csConfigDataL (CM.applyConfigDelta delta)
+      cdata <- CW.readConfig
+      when release $ unlockConfig cid
+      return . J.MaybeForJSON $ Just ( serialOf cdata
+                                     , J.TimeAsDoubleJSON $ mTimeOf cdata )
+    else do
+      unless release $ checkConfigLock cid L.OwnExclusive
+      logWarning $ show cid ++ " tried writeConfigDelta without owning"
+                   ++ " the config lock"
+      return $ J.MaybeForJSON Nothing
+
 -- | Release the config lock, if the client currently holds it.
 unlockConfig
   :: ClientId -> WConfdMonad ()
@@ -421,8 +463,10 @@ exportedFunctions = [ 'echo
                     , 'writeConfig
                     , 'verifyConfig
                     , 'lockConfig
+                    , 'lockConfigIfChanged
                     , 'unlockConfig
                     , 'writeConfigAndUnlock
+                    , 'writeConfigDelta
                     , 'flushConfig
                     , 'flushConfigGroup
                     , 'maintenanceRoundDelay
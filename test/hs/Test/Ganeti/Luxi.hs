@@ -100,6 +100,10 @@ instance Arbitrary Luxi.LuxiOp where
       Luxi.ReqWaitForJobChange -> Luxi.WaitForJobChange <$> arbitrary <*>
                                   genFields <*> pure J.JSNull <*>
                                   pure J.JSNull <*> arbitrary
+      Luxi.ReqWaitForJobsChange -> Luxi.WaitForJobsChange <$>
+                                   listOf ((,,) <$> arbitrary <*>
+                                           pure J.JSNull <*> pure J.JSNull) <*>
+                                   genFields <*> arbitrary
       Luxi.ReqPickupJob -> Luxi.PickupJob <$> arbitrary
       Luxi.ReqArchiveJob -> Luxi.ArchiveJob <$> arbitrary
       Luxi.ReqAutoArchiveJobs -> Luxi.AutoArchiveJobs <$> arbitrary <*>
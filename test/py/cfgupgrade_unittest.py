@@ -455,6 +455,19 @@ class TestCfgupgrade(unittest.TestCase):
     newconf = self._LoadTestDataConfig("cluster_config_2.17.json")
     self.assertEqual(oldconf, newconf)
 
+  def testDowngradeXenStateCacheTtl(self):
+    cfg = self._LoadTestDataConfig("cluster_config_2.18.json")
+    cluster = cfg["cluster"]
+    cluster["hvparams"][constants.HT_XEN_PVM][
+      constants.HV_XEN_STATE_CACHE_TTL] = 0.0
+    cluster["os_hvp"]["TEMP-Ganeti-QA-OS"][constants.HT_XEN_HVM][
+      constants.HV_XEN_STATE_CACHE_TTL] = 5.0
+    self._TestUpgradeFromData(cfg, False)
+    _RunUpgrade(self.tmpdir, False, True, downgrade=True)
+    oldconf = self._LoadConfig()
+    newconf = self._LoadTestDataConfig("cluster_config_2.17.json")
+    self.assertEqual(oldconf, newconf)
+
   def testUpgradeCurrent(self):
     self._TestSimpleUpgrade(constants.CONFIG_VERSION, False)
 
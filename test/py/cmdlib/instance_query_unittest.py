@@ -32,10 +32,112 @@
 
 """
 
+from ganeti import constants
+from ganeti import objects
+from ganeti import opcodes
+
 from testsupport import *
 
 import testutils
 
 
+class TestLUInstanceQueryData(CmdlibTestCase):
+  def setUp(self):
+    super(TestLUInstanceQueryData, self).setUp()
+
+    self.snode = self.cfg.AddNewNode()
+    self.inst = self.cfg.AddNewInstance(disk_template=constants.DT_DRBD8,
+                                        secondary_node=self.snode)
+    self.op = opcodes.OpInstanceQueryData(instances=[self.inst.name],
+                                          static=False, use_locking=True)
+
+    self.rpc.call_instance_info.return_value = \
+      self.RpcResultsBuilder() \
+        .CreateSuccessfulNodeResult(self.master, {})
+
+    self.pstatus = objects.BlockDevStatus(dev_path="/dev/drbd0", major=147,
+                                          minor=0, sync_percent=None,
+                                          estimated_time=None,
+                                          is_degraded=False,
+                                          ldisk_status=constants.LDS_OKAY)
+    self.sstatus = objects.BlockDevStatus(dev_path="/dev/drbd1", major=147,
+                                          minor=1, sync_percent=50.0,
+                                          estimated_time=10,
+                                          is_degraded=True,
+                                          ldisk_status=constants.LDS_SYNC)
+    self.lvstatus = objects.BlockDevStatus(dev_path="/dev/xenvg/data",
+                                           major=253, minor=2,
+                                           sync_percent=None,
+                                           estimated_time=None,
+                                           is_degraded=False,
+                                           ldisk_status=constants.LDS_OKAY)
+
+  def _StatusTuple(self, status):
+    return (status.dev_path, status.major, status.minor,
+            status.sync_percent, status.estimated_time,
+            status.is_degraded, status.ldisk_status)
+
+  def testDiskStatus(self):
+    self.rpc.call_blockdev_find_multi.return_value = \
+      self.RpcResultsBuilder() \
+        .AddSuccessfulNode(self.master,
+                           [(True, (self.pstatus, [(self.lvstatus, []),
+                                                   (None, [])]))]) \
+        .AddSuccessfulNode(self.snode,
+                           [(True, (self.sstatus, [(None, []),
+                                                   (self.lvstatus, [])]))]) \
+        .Build()
+
+    result = self.ExecOpCode(self.op)
+
+    # a single RPC call covers all nodes and devices
+    self.assertEqual(self.rpc.call_blockdev_find_multi.call_count, 1)
+    (disk, ) = result[self.inst.name]["disks"]
+    self.assertEqual(disk["pstatus"], self._StatusTuple(self.pstatus))
+    self.assertEqual(disk["sstatus"], self._StatusTuple(self.sstatus))
+    (data, meta) = disk["children"]
+    self.assertEqual(data["pstatus"], self._StatusTuple(self.lvstatus))
+    self.assertEqual(data["sstatus"], None)
+    self.assertEqual(meta["pstatus"], None)
+    self.assertEqual(meta["sstatus"], self._StatusTuple(self.lvstatus))
+
+  def testOfflineSecondary(self):
+    self.rpc.call_blockdev_find_multi.return_value = \
+      self.RpcResultsBuilder() \
+        .AddSuccessfulNode(self.master,
+                           [(True, (self.pstatus, [(None, []),
+                                                   (None, [])]))]) \
+        .AddOfflineNode(self.snode) \
+        .Build()
+
+    result = self.ExecOpCode(self.op)
+
+    (disk, ) = result[self.inst.name]["disks"]
+    self.assertEqual(disk["pstatus"], self._StatusTuple(self.pstatus))
+    self.assertEqual(disk["sstatus"], None)
+    self.assertEqual([child["sstatus"] for child in disk["children"]],
+                     [None, None])
+
+  def testDiskError(self):
+    self.rpc.call_blockdev_find_multi.return_value = \
+      self.RpcResultsBuilder() \
+        .AddSuccessfulNode(self.master, [(False, "mock error")]) \
+        .AddSuccessfulNode(self.snode,
+                           [(True, (self.sstatus, [(None, []),
+                                                   (None, [])]))]) \
+        .Build()
+
+    self.ExecOpCodeExpectOpExecError(self.op, "mock error")
+
+  def testStatic(self):
+    op = self.CopyOpCode(self.op, static=True)
+    result = self.ExecOpCode(op)
+
+    self.assertFalse(self.rpc.call_blockdev_find_multi.called)
+    (disk, ) = result[self.inst.name]["disks"]
+    self.assertEqual(disk["pstatus"], None)
+    self.assertEqual(disk["sstatus"], None)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
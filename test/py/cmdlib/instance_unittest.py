@@ -1570,43 +1570,97 @@ class _RpcForDiskWipe:
     assert node == self._exp_node
     return rpc.RpcResult(data=self._pause_cb(disks, pause))
 
-  def call_blockdev_wipe(self, node, bdev, offset, size):
+  def call_blockdev_wipe_start(self, node, disks, areas):
     assert node == self._exp_node
-    return rpc.RpcResult(data=self._wipe_cb(bdev, offset, size))
+    return rpc.RpcResult(data=self._wipe_cb.Start(disks, areas))
+
+  def call_blockdev_wipe_status(self, node, names):
+    assert node == self._exp_node
+    return rpc.RpcResult(data=self._wipe_cb.Status(names))
+
+  def call_blockdev_wipe_cleanup(self, node, names):
+    assert node == self._exp_node
+    return rpc.RpcResult(data=self._wipe_cb.Cleanup(names))
 
 
 class _DiskWipeProgressTracker:
-  def __init__(self, start_offset):
+  """Simulates the background disk wipes of a node.
+
+  """
+  def __init__(self, start_offset, fail_disk=None):
     self._start_offset = start_offset
+    self._fail_disk = fail_disk
+    self._wipes = {}
+    self.polls = 0
     self.progress = {}
+    self.cleaned_up = []
 
-  def __call__(self, (disk, _), offset, size):
-    assert isinstance(offset, (long, int))
-    assert isinstance(size, (long, int))
+  def Start(self, (disks, instance), areas):
+    assert not self._wipes
+    assert len(disks) == len(areas)
 
-    max_chunk_size = (disk.size / 100.0 * constants.MIN_WIPE_CHUNK_PERCENT)
+    names = []
 
-    assert offset >= self._start_offset
-    assert (offset + size) <= disk.size
+    for (disk, (offset, size)) in zip(disks, areas):
+      assert disk.uuid in instance.disks
+      assert isinstance(offset, (long, int))
+      assert isinstance(size, (long, int))
+      assert offset >= self._start_offset or offset == 0
+      assert (offset + size) == disk.size
 
-    assert size > 0
-    assert size <= constants.MAX_WIPE_CHUNK
-    assert size <= max_chunk_size
+      name = "wipe-%s" % disk.logical_id
+      self._wipes[name] = (disk.logical_id, offset, size)
+      self.progress[disk.logical_id] = offset
+      names.append(name)
 
-    assert offset == self._start_offset or disk.logical_id in self.progress
+    return (True, names)
 
-    # Keep track of progress
-    cur_progress = self.progress.setdefault(disk.logical_id, self._start_offset)
+  def Status(self, names):
+    assert sorted(names) == sorted(self._wipes)
 
-    assert cur_progress == offset
+    self.polls += 1
 
-    # Record progress
-    self.progress[disk.logical_id] += size
+    if self.polls == 1:
+      # Status files haven't been written yet
+      return (True, [None] * len(names))
 
+    result = []
+
+    for name in names:
+      (logical_id, offset, size) = self._wipes[name]
+
+      if logical_id == self._fail_disk:
+        error = "Input/output error"
+      else:
+        error = None
+        self.progress[logical_id] = \
+          min(offset + size,
+              self.progress[logical_id] + constants.MAX_WIPE_CHUNK)
+
+      done = self.progress[logical_id] - offset
+
+      result.append({
+        constants.WIPE_STATUS_DONE: done,
+        constants.WIPE_STATUS_SIZE: size,
+        constants.WIPE_STATUS_METHOD: "zeroout",
+        constants.WIPE_STATUS_FINISHED: done == size or error is not None,
+        constants.WIPE_STATUS_ERROR: error,
+        })
+
+    return (True, result)
+
+  def Cleanup(self, names):
+    assert sorted(names) == sorted(self._wipes)
+    self.cleaned_up.extend(names)
     return (True, None)
 
 
 class TestWipeDisks(unittest.TestCase):
+  def setUp(self):
+    patcher = testutils.patch_object(instance_storage.time, "sleep")
+    self.sleep = patcher.start()
+    self.addCleanup(patcher.stop)
+
   def _FailingPauseCb(self, (disks, _), pause):
     self.assertEqual(len(disks), 3)
     self.assertTrue(pause)
@@ -1633,11 +1687,6 @@ class TestWipeDisks(unittest.TestCase):
 
     self.assertRaises(errors.OpExecError, instance_create.WipeDisks, lu, inst)
 
-  def _FailingWipeCb(self, (disk, _), offset, size):
-    # This should only ever be called for the first disk
-    self.assertEqual(disk.logical_id, "disk0")
-    return (False, None)
-
   def testFailingWipe(self):
     node_uuid = "node13445-uuid"
     pt = _DiskPauseTracker()
@@ -1651,7 +1700,9 @@ class TestWipeDisks(unittest.TestCase):
                    size=256, uuid="disk2"),
       ]
 
-    lu = _FakeLU(rpc=_RpcForDiskWipe(node_uuid, pt, self._FailingWipeCb),
+    progresst = _DiskWipeProgressTracker(0, fail_disk="disk0")
+
+    lu = _FakeLU(rpc=_RpcForDiskWipe(node_uuid, pt, progresst),
                  cfg=_ConfigForDiskWipe(node_uuid, disks))
 
     inst = objects.Instance(name="inst562",
@@ -1662,10 +1713,14 @@ class TestWipeDisks(unittest.TestCase):
     try:
       instance_create.WipeDisks(lu, inst)
     except errors.OpExecError, err:
-      self.assertTrue(str(err), "Could not wipe disk 0 at offset 0 ")
+      self.assertTrue(str(err).startswith("Could not wipe disk 0: "))
     else:
       self.fail("Did not raise exception")
 
+    # Check if the wipes were cleaned up
+    self.assertEqual(sorted(progresst.cleaned_up),
+                     ["wipe-disk0", "wipe-disk1", "wipe-disk2"])
+
     # Check if all disks were paused and resumed
     self.assertEqual(pt.history, [
       ("disk0", 100 * 1024, True),
@@ -1722,6 +1777,13 @@ class TestWipeDisks(unittest.TestCase):
     self.assertEqual(progresst.progress,
                      dict((i.logical_id, i.size) for i in disks))
 
+    # Disks are wiped concurrently, so polling ends with the largest disk
+    self.assertEqual(progresst.polls,
+                     1 + 500 * 1024 / constants.MAX_WIPE_CHUNK)
+    self.assertEqual(self.sleep.call_count, progresst.polls - 1)
+    self.assertEqual(sorted(progresst.cleaned_up),
+                     ["wipe-disk0", "wipe-disk1", "wipe-disk2", "wipe-disk3"])
+
   def testWipeWithStartOffset(self):
     for start_offset in [0, 280, 8895, 1563204]:
       disks = [
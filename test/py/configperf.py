@@ -0,0 +1,223 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for measuring the (de)serialization speed of configuration objects"""
+
+import sys
+import time
+import optparse
+
+from ganeti import constants
+from ganeti import objects
+
+
+def ParseOptions():
+  """Parses the command line options.
+
+  In case of command line errors, it will show the usage and exit the
+  program.
+
+  @return: the options in a tuple
+
+  """
+  parser = optparse.OptionParser()
+  parser.add_option("-n", dest="count", default=5000, type="int",
+                    help="Number of instances", metavar="NUM")
+  parser.add_option("-N", dest="nodes", default=200, type="int",
+                    help="Number of nodes", metavar="NUM")
+  parser.add_option("-r", dest="repeat", default=5, type="int",
+                    help="Number of repetitions", metavar="NUM")
+
+  (opts, args) = parser.parse_args()
+
+  if opts.count < 1 or opts.nodes < 1 or opts.repeat < 1:
+    parser.error("Number of instances, nodes and repetitions must be at"
+                 " least 1")
+
+  return (opts, args)
+
+
+def _MakeUuid(kind, idx):
+  """Returns a synthetic UUID.
+
+  """
+  return "4f7d6e9c-%04d-4000-8000-%012d" % (kind, idx)
+
+
+def _BuildConfigData(count, node_count):
+  """Builds the serialized form of a synthetic configuration.
+
+  """
+  group_uuid = _MakeUuid(0, 0)
+
+  nodes = dict((_MakeUuid(1, i), {
+    "name": "node%d.example.com" % i,
+    "uuid": _MakeUuid(1, i),
+    "primary_ip": "192.0.2.%d" % (i % 250 + 1),
+    "secondary_ip": "198.51.100.%d" % (i % 250 + 1),
+    "group": group_uuid,
+    "master_candidate": i < 10,
+    "offline": False,
+    "drained": False,
+    "vm_capable": True,
+    "master_capable": True,
+    "ndparams": {},
+    "tags": ["rack%d" % (i % 8)],
+    "serial_no": 1,
+    "ctime": 1234567890.0,
+    "mtime": 1234567890.0 + i,
+    }) for i in range(node_count))
+
+  instances = {}
+  disks = {}
+  for i in range(count):
+    node_uuid = _MakeUuid(1, i % node_count)
+    disk_uuid = _MakeUuid(2, i)
+    disks[disk_uuid] = {
+      "uuid": disk_uuid,
+      "dev_type": constants.DT_PLAIN,
+      "logical_id": ["xenvg", "%s.disk0" % disk_uuid],
+      "iv_name": "disk/0",
+      "mode": constants.DISK_RDWR,
+      "size": 10240,
+      "nodes": [node_uuid],
+      "params": {},
+      "serial_no": 1,
+      "ctime": 1234567890.0,
+      "mtime": 1234567890.0,
+      }
+    instances[_MakeUuid(3, i)] = {
+      "name": "inst%d.example.com" % i,
+      "uuid": _MakeUuid(3, i),
+      "primary_node": node_uuid,
+      "os": "debian-image",
+      "hypervisor": constants.HT_KVM,
+      "admin_state": constants.ADMINST_UP,
+      "admin_state_source": constants.ADMIN_SOURCE,
+      "disks_active": True,
+      "disks": [disk_uuid],
+      "nics": [{
+        "uuid": _MakeUuid(4, i),
+        "mac": "aa:00:00:%02x:%02x:%02x" % ((i >> 16) & 0xff,
+                                            (i >> 8) & 0xff, i & 0xff),
+        "nicparams": {},
+        }],
+      "hvparams": {},
+      "beparams": {},
+      "osparams": {},
+      "osparams_private": {},
+      "network_port": 11000 + i,
+      "tags": ["tag%d" % (i % 13)],
+      "serial_no": i % 7,
+      "ctime": 1234567890.0 + i,
+      "mtime": 1234567890.0 + i,
+      }
+
+  return {
+    "version": constants.CONFIG_VERSION,
+    "cluster": {
+      "cluster_name": "cluster.example.com",
+      "uuid": _MakeUuid(5, 0),
+      "hvparams": constants.HVC_DEFAULTS,
+      "beparams": {
+        constants.PP_DEFAULT: constants.BEC_DEFAULTS,
+        },
+      "nicparams": {
+        constants.PP_DEFAULT: constants.NICC_DEFAULTS,
+        },
+      "ndparams": constants.NDC_DEFAULTS,
+      "os_hvp": {},
+      "osparams": {},
+      "tcpudp_port_pool": [],
+      "tags": [],
+      "serial_no": 1,
+      "ctime": 1234567890.0,
+      "mtime": 1234567890.0,
+      },
+    "nodes": nodes,
+    "nodegroups": {
+      group_uuid: {
+        "name": "default",
+        "uuid": group_uuid,
+        "ndparams": {},
+        "tags": [],
+        "serial_no": 1,
+        },
+      },
+    "instances": instances,
+    "networks": {},
+    "disks": disks,
+    "filters": {},
+    "maintenance": {},
+    "serial_no": 1,
+    "ctime": 1234567890.0,
+    "mtime": 1234567890.0,
+    }
+
+
+def _Run(fn, repeat):
+  """Runs a function multiple times and returns the best time.
+
+  """
+  best = None
+  for _ in range(repeat):
+    start = time.time()
+    result = fn()
+    duration = time.time() - start
+    if best is None or duration < best:
+      best = duration
+  return (best, result)
+
+
+def main():
+  (opts, _) = ParseOptions()
+
+  # Normalize the data once, the loaded objects fill in some defaults
+  data = objects.ConfigData.FromDict(_BuildConfigData(opts.count,
+                                                      opts.nodes)).ToDict()
+
+  (loadtime, config) = _Run(lambda: objects.ConfigData.FromDict(data),
+                            opts.repeat)
+  (dumptime, result) = _Run(config.ToDict, opts.repeat)
+
+  if result != data:
+    print "Configuration changed during the round trip!"
+    return 1
+
+  print "Instances: %d, nodes: %d" % (opts.count, opts.nodes)
+  print "FromDict: %0.3fs" % loadtime
+  print "ToDict: %0.3fs" % dumptime
+
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -183,8 +183,8 @@ class TestNodeVerify(testutils.GanetiTestCase):
     my_name = netutils.Hostname.GetSysName()
     local_data = ([(my_name, "any", "any")], [my_name])
 
-    # we just test that whatever TcpPing returns, VerifyNode returns too
-    netutils.TcpPing = lambda a, b, source=None: True
+    # we just test that whatever TcpPingMany returns, VerifyNode returns too
+    netutils.TcpPingMany = lambda probes, port: [True] * len(probes)
     result = backend.VerifyNode({constants.NV_NODENETTEST: local_data},
                                 None, {})
 
@@ -193,6 +193,37 @@ class TestNodeVerify(testutils.GanetiTestCase):
     self.failUnless(result[constants.NV_NODENETTEST] == {},
                     "NodeNetTest failed")
 
+  def testVerifyNodeNetTestFailures(self):
+    my_name = netutils.Hostname.GetSysName()
+    nodes = [
+      (my_name, "192.0.2.1", "198.51.100.1"),
+      ("node2", "192.0.2.2", "198.51.100.2"),
+      ("node3", "192.0.2.3", "198.51.100.3"),
+      ("node4", "192.0.2.4", "192.0.2.4"),
+      ("node5", "192.0.2.5", "198.51.100.5"),
+      ]
+    reachable = frozenset(["192.0.2.1", "198.51.100.2", "192.0.2.5"])
+    probed = []
+
+    def _FakeTcpPingMany(probes, _):
+      probed.append(probes)
+      return [target in reachable for (target, _) in probes]
+
+    netutils.TcpPingMany = _FakeTcpPingMany
+    result = backend.VerifyNodeNetTest(my_name, (nodes, [my_name]))
+
+    self.assertEqual(result, {
+      "node2": "failure using the primary interface(s)",
+      "node3": "failure using the primary and secondary interface(s)",
+      "node4": "failure using the primary interface(s)",
+      })
+
+    # Secondary IPs are only probed for nodes with unreachable primary IPs
+    self.assertEqual(probed, [
+      [(pip, "192.0.2.1") for (_, pip, _) in nodes],
+      [("198.51.100.2", "198.51.100.1"), ("198.51.100.3", "198.51.100.1")],
+      ])
+
   def testVerifyNodeNetSkipTest(self):
     local_data = ([('n1.test.com', "any", "any")], [])
     result = backend.VerifyNode({constants.NV_NODENETTEST: local_data},
@@ -670,6 +701,60 @@ class TestSetWatcherPause(unittest.TestCase):
       self.assertEqual(os.stat(self.filename).st_mode & 0777, 0644)
 
 
+class TestCommandStats(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.filename = utils.PathJoin(self.tmpdir, "stats")
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  @staticmethod
+  def _MakeStats(count, failed, histogram):
+    return {
+      "count": count,
+      "failed": failed,
+      "timeouts": 0,
+      "total_time": 0.5 * count,
+      "histogram": histogram,
+      }
+
+  def testEmpty(self):
+    self.assertEqual(backend.GetCommandStats(False, _stats_file=self.filename),
+                     {})
+    backend.UpdateCommandStats({}, _stats_file=self.filename)
+    self.assertEqual(backend.GetCommandStats(False, _stats_file=self.filename),
+                     {})
+
+  def testUpdate(self):
+    backend.UpdateCommandStats({
+      "lvs": self._MakeStats(2, 0, [2, 0]),
+      }, _stats_file=self.filename)
+    backend.UpdateCommandStats({
+      "lvs": self._MakeStats(1, 1, [0, 1]),
+      "drbdsetup": self._MakeStats(3, 0, [1, 2]),
+      }, _stats_file=self.filename)
+
+    self.assertEqual(backend.GetCommandStats(False, _stats_file=self.filename),
+                     {
+                       "lvs": self._MakeStats(3, 1, [2, 1]),
+                       "drbdsetup": self._MakeStats(3, 0, [1, 2]),
+                     })
+    self.assertEqual(serializer.LoadJson(utils.ReadFile(self.filename)),
+                     backend.GetCommandStats(False, _stats_file=self.filename))
+
+  def testReset(self):
+    stats = {
+      "lvs": self._MakeStats(1, 0, [1, 0]),
+      }
+    backend.UpdateCommandStats(stats, _stats_file=self.filename)
+
+    self.assertEqual(backend.GetCommandStats(True, _stats_file=self.filename),
+                     stats)
+    self.assertEqual(backend.GetCommandStats(False, _stats_file=self.filename),
+                     {})
+
+
 class TestGetBlockDevSymlinkPath(unittest.TestCase):
   def setUp(self):
     self.tmpdir = tempfile.mkdtemp()
@@ -1044,6 +1129,13 @@ class TestAddRemoveGenerateNodeSshKey(testutils.GanetiTestCase):
     self._ssh_replace_name_by_uuid_mock.side_effect = \
       self._ssh_file_manager.ReplaceNameByUuid
 
+    self._ssh_modify_pub_key_file_patcher = testutils \
+      .patch_object(ssh, "ModifyPubKeyFile")
+    self._ssh_modify_pub_key_file_mock = \
+      self._ssh_modify_pub_key_file_patcher.start()
+    self._ssh_modify_pub_key_file_mock.side_effect = \
+      self._ssh_file_manager.ModifyPubKeyFile
+
     self._time_sleep_patcher = testutils \
         .patch_object(time, "sleep")
     self._time_sleep_mock = \
@@ -1061,6 +1153,7 @@ class TestAddRemoveGenerateNodeSshKey(testutils.GanetiTestCase):
     self._ssh_remove_public_key_patcher.stop()
     self._ssh_query_pub_key_file_patcher.stop()
     self._ssh_replace_name_by_uuid_patcher.stop()
+    self._ssh_modify_pub_key_file_patcher.stop()
     self._time_sleep_patcher.stop()
     self._TearDownTestData()
 
@@ -2049,6 +2142,104 @@ class TestAddRemoveGenerateNodeSshKey(testutils.GanetiTestCase):
       self.assertNotEqual(self._ssh_file_manager.GetKeyOfNode(node_name),
                           old_ssh_file_manager.GetKeyOfNode(node_name))
 
+  def testRenewCryptoFailingNode(self):
+    self._setUpRenewCrypto()
+
+    node_uuids = self._ssh_file_manager.GetAllNodeUuids()
+    node_names = self._ssh_file_manager.GetAllNodeNames()
+
+    # A potential master candidate in the middle of the list fails, the
+    # nodes after it must get their new keys distributed nevertheless
+    pot_mcs = [name for (name, _) in
+               self._ssh_file_manager.GetAllPurePotentialMasterCandidates()]
+    failing_node = sorted(pot_mcs, key=node_names.index)[len(pot_mcs) / 2]
+    later_pot_mcs = [name for name in pot_mcs
+                     if node_names.index(name) >
+                        node_names.index(failing_node)]
+    self.assertTrue(later_pot_mcs)
+
+    def _ReadRemoteSshPubKey(pub_key_file, node, cluster_name, port,
+                             ask_key, strict_host_check):
+      if node == failing_node:
+        raise errors.OpExecError("Can't connect to %s" % node)
+      return self._ssh_file_manager.GetKeyOfNode(node)
+
+    self._ssh_read_remote_ssh_pub_key_mock.side_effect = _ReadRemoteSshPubKey
+
+    try:
+      backend.RenewSshKeys(node_uuids, node_names,
+                           self._master_candidate_uuids,
+                           self._potential_master_candidates,
+                           constants.SSHK_DSA, constants.SSHK_DSA,
+                           constants.SSH_DEFAULT_KEY_BITS,
+                           ganeti_pub_keys_file=self._pub_key_file,
+                           ssconf_store=self._ssconf_mock,
+                           noded_cert_file=self.noded_cert_file,
+                           run_cmd_fn=self._run_cmd_mock)
+    except errors.SshUpdateError, err:
+      self.assertTrue(failing_node in str(err))
+    else:
+      self.fail("Did not raise exception")
+    finally:
+      self._tearDownRenewCrypto()
+
+    for node_name in pot_mcs:
+      if node_name == failing_node:
+        continue
+      node_uuid = node_uuids[node_names.index(node_name)]
+      self.assertTrue(self._ssh_file_manager.NodeHasPublicKey(
+        self._master_node, node_uuid, "new_key_%s" % node_name))
+
+    # The master's key is only renewed if all nodes succeeded
+    self.assertFalse(self._ssh_replace_ssh_keys_mock.called)
+
+
+class TestRunSshUpdateOnNodes(unittest.TestCase):
+  def setUp(self):
+    self._calls = []
+    self._failing = {}
+    patcher = testutils.patch_object(utils, "RetryByNumberOfTimes",
+                                     self._Retry)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def _Retry(self, max_retries, backoff, exception_class, fn, *args,
+             **kwargs):
+    return fn(*args, **kwargs)
+
+  def _RunCmd(self, cluster_name, node, cmd, port, data, **kwargs):
+    self._calls.append((node, port, data, kwargs))
+    if node in self._failing:
+      raise self._failing[node]
+    return node.upper()
+
+  def testResultsInNodeOrder(self):
+    nodes = ["node%d" % i for i in range(30)]
+    ports = dict((node, 22) for node in nodes)
+    result = backend._RunSshUpdateOnNodes(
+        self._RunCmd, "cluster", ports,
+        [(node, {"x": node}, i % 2 == 0) for (i, node) in enumerate(nodes)],
+        max_parallel=5, debug=True)
+    self.assertEqual(result,
+                     [(node, True, node.upper()) for node in nodes])
+    self.assertEqual(sorted(self._calls),
+                     sorted((node, 22, {"x": node}, {"debug": True})
+                            for node in nodes))
+
+  def testErrorsCollected(self):
+    err = errors.SshUpdateError("failed")
+    self._failing = {
+      "node2": err,
+      }
+    nodes = ["node1", "node2", "node3"]
+    result = backend._RunSshUpdateOnNodes(
+        self._RunCmd, "cluster", {}, [(node, {}, True) for node in nodes])
+    self.assertEqual(result, [
+      ("node1", True, "NODE1"),
+      ("node2", False, err),
+      ("node3", True, "NODE3"),
+      ])
+
 
 class TestRemoveSshKeyFromPublicKeyFile(testutils.GanetiTestCase):
 
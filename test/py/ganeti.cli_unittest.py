@@ -688,6 +688,64 @@ class TestGenericPollJob(testutils.GanetiTestCase):
                          job_id, cbs, cbs, cancel_fn=(lambda: False)))
     cbs.CheckEmpty()
 
+
+class _MockMultiJobPollCb(cli.JobPollCbBase, cli.JobPollReportCbBase):
+  def __init__(self, tc):
+    self.tc = tc
+    self._wfjcr = []
+    self.logs = []
+    self.notchanged = []
+
+  def AddWfjcResult(self, jobs, result):
+    self._wfjcr.append((jobs, result))
+
+  def WaitForJobsChangeOnce(self, jobs, fields,
+                            timeout=constants.DEFAULT_WFJC_TIMEOUT):
+    self.tc.assertEqualValues(fields, ["status"])
+    (exp_jobs, result) = self._wfjcr.pop(0)
+    self.tc.assertEqual(jobs, exp_jobs)
+    return result
+
+  def ReportLogMessage(self, job_id, serial, timestamp, log_type, log_msg):
+    self.logs.append((job_id, serial, log_msg))
+
+  def ReportNotChanged(self, job_id, status):
+    self.notchanged.append((job_id, status))
+
+
+class TestWaitForJobs(unittest.TestCase):
+  def test(self):
+    cbs = _MockMultiJobPollCb(self)
+    cbs.AddWfjcResult([(1, None, None), (2, None, None), (3, None, None)],
+                      constants.JOB_NOTCHANGED)
+    cbs.AddWfjcResult([(1, None, None), (2, None, None), (3, None, None)],
+                      [(2, ((constants.JOB_STATUS_RUNNING, ),
+                            [(5, utils.SplitTime(1273491611.0),
+                              constants.ELOG_MESSAGE, "Step 1")])),
+                       (3, None)])
+    cbs.AddWfjcResult([(1, None, None),
+                       (2, (constants.JOB_STATUS_RUNNING, ), 5)],
+                      [(2, ((constants.JOB_STATUS_SUCCESS, ), [])),
+                       (1, ((constants.JOB_STATUS_ERROR, ), None))])
+
+    self.assertEqual(list(cli._WaitForJobs([1, 2, 3], cbs, cbs)),
+                     [(3, False), (2, True), (1, True)])
+    self.assertEqual(cbs.notchanged, [(1, None), (2, None), (3, None)])
+    self.assertEqual(cbs.logs, [(2, 5, "Step 1")])
+    self.assertFalse(cbs._wfjcr)
+
+  def testSingleJobFallback(self):
+    cbs = _MockJobPollCb(self, 123)
+    self.assertRaises(NotImplementedError, cbs.WaitForJobsChangeOnce,
+                      [(123, None, None), (124, None, None)], ["status"])
+
+    cbs.AddWfjcResult(None, None, ((constants.JOB_STATUS_QUEUED, ), None))
+    self.assertEqual(cbs.WaitForJobsChangeOnce([(123, None, None)],
+                                               ["status"]),
+                     [(123, ((constants.JOB_STATUS_QUEUED, ), None))])
+    cbs.CheckEmpty()
+
+
 class TestFormatLogMessage(unittest.TestCase):
   def test(self):
     self.assertEqual(cli.FormatLogMessage(constants.ELOG_MESSAGE,
@@ -32,6 +32,7 @@
 
 
 import unittest
+import copy
 import os
 import tempfile
 import operator
@@ -58,6 +59,43 @@ def _StubGetEntResolver():
   return mocks.FakeGetentResolver()
 
 
+def _InitCluster(cfg):
+  """Initializes a cluster configuration file"""
+  me = netutils.Hostname()
+  ip = constants.IP4_ADDRESS_LOCALHOST
+  # master_ip must not conflict with the node ip address
+  master_ip = "127.0.0.2"
+
+  cluster_config = objects.Cluster(
+    serial_no=1,
+    rsahostkeypub="",
+    dsahostkeypub="",
+    highest_used_port=(constants.FIRST_DRBD_PORT - 1),
+    mac_prefix="aa:00:00",
+    volume_group_name="xenvg",
+    drbd_usermode_helper="/bin/true",
+    nicparams={constants.PP_DEFAULT: constants.NICC_DEFAULTS},
+    ndparams=constants.NDC_DEFAULTS,
+    tcpudp_port_pool=set(),
+    enabled_hypervisors=[constants.HT_FAKE],
+    master_node=me.name,
+    master_ip=master_ip,
+    master_netdev=constants.DEFAULT_BRIDGE,
+    cluster_name="cluster.local",
+    file_storage_dir="/tmp",
+    uid_pool=[],
+    )
+
+  master_node_config = objects.Node(name=me.name,
+                                    primary_ip=me.ip,
+                                    secondary_ip=ip,
+                                    serial_no=1,
+                                    master_candidate=True)
+
+  bootstrap.InitConfig(constants.CONFIG_VERSION,
+                       cluster_config, master_node_config, cfg)
+
+
 class TestConfigRunner(unittest.TestCase):
   """Testing case for HooksRunner"""
   def setUp(self):
@@ -84,39 +122,7 @@ class TestConfigRunner(unittest.TestCase):
 
   def _init_cluster(self, cfg):
     """Initializes the cfg object"""
-    me = netutils.Hostname()
-    ip = constants.IP4_ADDRESS_LOCALHOST
-    # master_ip must not conflict with the node ip address
-    master_ip = "127.0.0.2"
-
-    cluster_config = objects.Cluster(
-      serial_no=1,
-      rsahostkeypub="",
-      dsahostkeypub="",
-      highest_used_port=(constants.FIRST_DRBD_PORT - 1),
-      mac_prefix="aa:00:00",
-      volume_group_name="xenvg",
-      drbd_usermode_helper="/bin/true",
-      nicparams={constants.PP_DEFAULT: constants.NICC_DEFAULTS},
-      ndparams=constants.NDC_DEFAULTS,
-      tcpudp_port_pool=set(),
-      enabled_hypervisors=[constants.HT_FAKE],
-      master_node=me.name,
-      master_ip=master_ip,
-      master_netdev=constants.DEFAULT_BRIDGE,
-      cluster_name="cluster.local",
-      file_storage_dir="/tmp",
-      uid_pool=[],
-      )
-
-    master_node_config = objects.Node(name=me.name,
-                                      primary_ip=me.ip,
-                                      secondary_ip=ip,
-                                      serial_no=1,
-                                      master_candidate=True)
-
-    bootstrap.InitConfig(constants.CONFIG_VERSION,
-                         cluster_config, master_node_config, self.cfg_file)
+    _InitCluster(cfg)
 
   def _create_instance(self, cfg):
     """Create and return an instance object"""
@@ -657,6 +663,220 @@ class TestConfigRunner(unittest.TestCase):
     instance_disks = cfg.GetInstanceDisks("test-uuid")
     self.assertEqual(instance_disks, [disk])
 
+  def testIndexes(self):
+    cfg = self._get_object_mock()
+    node_group = cfg.LookupNodeGroup(None)
+    master_uuid = cfg.GetMasterNode()
+    node2 = objects.Node(name="node2.example.com", group=node_group,
+                         ndparams={}, uuid="node2-uuid")
+    cfg.AddNode(node2, "my-job")
+
+    inst = self._create_instance(cfg)
+    disk = objects.Disk(dev_type=constants.DT_DRBD8, size=128,
+                        logical_id=(master_uuid, node2.uuid,
+                                    12300, 0, 0, "secret"),
+                        children=[
+                          objects.Disk(dev_type=constants.DT_PLAIN, size=128,
+                                       logical_id=("myxenvg", "disk0"),
+                                       uuid="data0"),
+                          objects.Disk(dev_type=constants.DT_PLAIN, size=128,
+                                       logical_id=("myxenvg", "meta0"),
+                                       uuid="meta0")
+                        ],
+                        iv_name="disk/0", uuid="disk0")
+    cfg.AddInstance(inst, "my-job")
+    cfg.AddInstanceDisk(inst.uuid, disk)
+
+    self.assertEqual(cfg.GetInstanceInfoByName(inst.name).uuid, inst.uuid)
+    self.assertTrue(cfg.GetInstanceInfoByName("unknown.example.com") is None)
+    self.assertEqual(cfg.GetNodeInfoByName(node2.name).uuid, node2.uuid)
+    self.assertEqual(cfg.GetNodeInstances(master_uuid), ([inst.uuid], []))
+    self.assertEqual(cfg.GetNodeInstances(node2.uuid), ([], [inst.uuid]))
+    self.assertEqual(cfg.GetNodeGroupInstances(node_group),
+                     frozenset([inst.uuid]))
+    self.assertEqual(cfg.GetNodeGroupInstances("unknown-group"), frozenset())
+    self.assertEqual(cfg.GetInstanceForDisk("disk0"), inst.uuid)
+    self.assertTrue(cfg.GetInstanceForDisk("unknown-disk") is None)
+
+    # Changes made through the configuration are reflected in the indexes
+    cfg.RenameInstance(inst.uuid, "renamed.example.com")
+    self.assertTrue(cfg.GetInstanceInfoByName(inst.name) is None)
+    self.assertEqual(cfg.GetInstanceInfoByName("renamed.example.com").uuid,
+                     inst.uuid)
+    self.assertFalse(_IsErrorInList("index", cfg.VerifyConfig()))
+
+  def testIndexUpdates(self):
+    cfg = self._get_object_mock()
+    node_group = cfg.LookupNodeGroup(None)
+    master_uuid = cfg.GetMasterNode()
+    node2 = objects.Node(name="node2.example.com", group=node_group,
+                         ndparams={}, uuid="node2-uuid")
+    cfg.AddNode(node2, "my-job")
+    inst = self._create_instance(cfg)
+    cfg.AddInstance(inst, "my-job")
+
+    data = cfg._ConfigData()
+    index = config.ConfigIndex(data)
+    self.assertEqual(index.Verify(), [])
+
+    # Stale indexes are detected
+    inst.primary_node = node2.uuid
+    self.assertEqual(index.Verify(),
+                     ["configuration index 'node_primary' is out of date"])
+    index.UpdateInstance(inst)
+    self.assertEqual(index.Verify(), [])
+    self.assertEqual(index.node_primary, {node2.uuid: set([inst.uuid])})
+
+    # Moving a node to another group updates its instances
+    grp2 = objects.NodeGroup(name="grp2", members=[], uuid="grp2-uuid")
+    data.nodegroups[grp2.uuid] = grp2
+    node2.group = grp2.uuid
+    index.UpdateNodeGroup(node2.uuid)
+    self.assertEqual(index.Verify(), [])
+    self.assertEqual(index.group_all, {grp2.uuid: set([inst.uuid])})
+
+    index.RemoveInstance(inst.uuid)
+    del data.instances[inst.uuid]
+    self.assertEqual(index.Verify(), [])
+    self.assertEqual(index.instance_by_name, {})
+
+    index.RemoveNode(node2)
+    del data.nodes[node2.uuid]
+    self.assertEqual(index.Verify(), [])
+    self.assertEqual(index.node_by_name.values(), [master_uuid])
+
+class _FakeWConfd(object):
+  """Minimal stand-in for WConfd's configuration handling.
+
+  """
+  def __init__(self, config_dict):
+    self.config = config_dict
+    self.calls = []
+
+  def ReadConfig(self):
+    self.calls.append("ReadConfig")
+    return copy.deepcopy(self.config)
+
+  def LockConfig(self, _ctx, _shared):
+    self.calls.append("LockConfig")
+    return copy.deepcopy(self.config)
+
+  def LockConfigIfChanged(self, _ctx, _shared, serial_no):
+    self.calls.append("LockConfigIfChanged")
+    if serial_no == self.config["serial_no"]:
+      return (serial_no, None)
+    return (self.config["serial_no"], copy.deepcopy(self.config))
+
+  def UnlockConfig(self, _ctx):
+    self.calls.append("UnlockConfig")
+
+  def WriteConfigAndUnlock(self, _ctx, config_dict):
+    self.calls.append("WriteConfigAndUnlock")
+    self.config = copy.deepcopy(config_dict)
+    self.config["serial_no"] += 1
+    return True
+
+  def WriteConfigDelta(self, _ctx, delta, _releaselock):
+    self.calls.append("WriteConfigDelta")
+    self.config["cluster"] = delta["cluster"]
+    for name in ["nodes", "nodegroups", "instances", "networks", "disks"]:
+      container = self.config[name]
+      for uuid in delta["removed"]:
+        container.pop(uuid, None)
+      container.update(delta[name])
+    self.config["serial_no"] += 1
+    self.config["mtime"] = 1234.5
+    return (self.config["serial_no"], self.config["mtime"])
+
+
+class TestConfigDelta(unittest.TestCase):
+  def setUp(self):
+    fd, self.cfg_file = tempfile.mkstemp()
+    os.close(fd)
+    _InitCluster(self.cfg_file)
+    # Let an offline writer upgrade the configuration, as WConfd's copy
+    # would be
+    config.ConfigWriter(cfg_file=self.cfg_file, offline=True,
+                        _getents=_StubGetEntResolver).GetClusterName()
+    self.wconfd = _FakeWConfd(serializer.Load(utils.ReadFile(self.cfg_file)))
+    self.cfg = config.ConfigWriter(cfg_file=self.cfg_file,
+                                   _getents=_StubGetEntResolver,
+                                   wconfd=self.wconfd)
+
+  def tearDown(self):
+    os.unlink(self.cfg_file)
+
+  def testDeltaWrites(self):
+    self.cfg.SetVGName("othervg")
+    self.assertEqual(self.wconfd.calls, ["LockConfig", "WriteConfigDelta"])
+    self.assertEqual(self.wconfd.config["cluster"]["volume_group_name"],
+                     "othervg")
+
+    # The local copy is reused as long as nobody else changed the config
+    grp = objects.NodeGroup(name="grp1", members=[], uuid="grp1-uuid")
+    self.cfg.AddNodeGroup(grp, "job")
+    self.assertEqual(self.wconfd.calls[2:],
+                     ["LockConfigIfChanged", "WriteConfigDelta"])
+    self.assertEqual(self.wconfd.config["nodegroups"]["grp1-uuid"]["name"],
+                     "grp1")
+    self.assertEqual(self.cfg.GetConfigVersion(),
+                     self.wconfd.config["version"])
+
+    self.cfg.RemoveNodeGroup("grp1-uuid")
+    self.assertFalse("grp1-uuid" in self.wconfd.config["nodegroups"])
+
+    # A change made elsewhere is picked up
+    self.wconfd.config["cluster"]["volume_group_name"] = "thirdvg"
+    self.wconfd.config["serial_no"] += 1
+    self.cfg.SetDRBDHelper("/bin/false")
+    self.assertEqual(self.cfg.GetVGName(), "thirdvg")
+    self.assertEqual(self.wconfd.config["cluster"]["drbd_usermode_helper"],
+                     "/bin/false")
+    self.assertEqual(self.wconfd.calls.count("LockConfig"), 1)
+
+  def testUpgradedConfig(self):
+    # A node without a group is assigned to the default group when the
+    # configuration is upgraded after being received from WConfd
+    (node_uuid, node) = self.wconfd.config["nodes"].items()[0]
+    group_uuid = node.pop("group")
+
+    self.cfg.SetVGName("othervg")
+    self.assertEqual(self.wconfd.calls, ["LockConfig", "WriteConfigAndUnlock"])
+    self.assertEqual(self.wconfd.config["nodes"][node_uuid]["group"],
+                     group_uuid)
+    self.assertEqual(self.wconfd.config["cluster"]["volume_group_name"],
+                     "othervg")
+
+    # Without changes by the upgrade, deltas are used again
+    self.cfg.SetDRBDHelper("/bin/false")
+    self.assertEqual(self.wconfd.calls[-2:], ["LockConfig", "WriteConfigDelta"])
+
+  def testUpgradedSharedConfig(self):
+    (node_uuid, node) = self.wconfd.config["nodes"].items()[0]
+    group_uuid = node.pop("group")
+
+    # The copy upgraded under a shared lock isn't reused for the exclusive
+    # lock, which upgrades it again and writes the whole configuration
+    self.assertEqual(self.cfg.GetNodeInfo(node_uuid).group, group_uuid)
+    self.cfg.SetVGName("othervg")
+    self.assertEqual(self.wconfd.calls,
+                     ["ReadConfig", "LockConfig", "WriteConfigAndUnlock"])
+    self.assertEqual(self.wconfd.config["nodes"][node_uuid]["group"],
+                     group_uuid)
+    self.assertEqual(self.wconfd.config["cluster"]["volume_group_name"],
+                     "othervg")
+
+  def testFailedOperation(self):
+    self.cfg.SetVGName("othervg")
+    # A failed operation doesn't write its changes; the local copy must not
+    # be trusted anymore
+    self.assertRaises(errors.ConfigurationError, self.cfg.RemoveNode,
+                      "unknown-node-uuid")
+    self.assertEqual(self.wconfd.calls[-1], "UnlockConfig")
+    self.cfg.SetDRBDHelper("/bin/false")
+    self.assertEqual(self.wconfd.calls[-2:], ["LockConfig", "WriteConfigDelta"])
+
+
 def _IsErrorInList(err_str, err_list):
   return any((err_str in e) for e in err_list)
 
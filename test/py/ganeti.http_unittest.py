@@ -122,6 +122,51 @@ class TestMisc(unittest.TestCase):
                   "Digest realm=secure foo=\"x,y\""))
 
 
+class _EchoHandler(http.server.HttpServerHandler):
+  def HandleRequest(self, req):
+    return req.request_body
+
+
+class TestResponderKeepAlive(unittest.TestCase):
+  def _Call(self, headers, allow_keep_alive, peer_will_close=False):
+    req_msg = http.HttpMessage()
+    req_msg.start_line = \
+      http.HttpClientToServerStartLine("POST", "/", http.HTTP_1_1)
+    req_msg.headers = headers
+    req_msg.body = "data"
+    req_reader = type("TestReader", (object, ),
+                      {"sock": None, "peer_will_close": peer_will_close})()
+
+    responder = http.server.HttpResponder(_EchoHandler())
+    (_, _, force_close, resp_msg) = \
+      responder(lambda: (req_msg, req_reader),
+                allow_keep_alive=allow_keep_alive)
+    return (force_close, resp_msg)
+
+  def testDefaultClose(self):
+    (force_close, resp_msg) = self._Call({ http.HTTP_HOST: "node1", }, False)
+    self.assertFalse(force_close)
+    self.assertEqual(resp_msg.start_line.code, http.HTTP_OK)
+    self.assertEqual(resp_msg.body, "data")
+    self.assertEqual(resp_msg.headers[http.HTTP_CONNECTION], "close")
+
+  def testKeepAlive(self):
+    (_, resp_msg) = self._Call({ http.HTTP_HOST: "node1", }, True)
+    self.assertEqual(resp_msg.headers[http.HTTP_CONNECTION], "keep-alive")
+
+  def testPeerWillClose(self):
+    (_, resp_msg) = self._Call({ http.HTTP_HOST: "node1", }, True,
+                               peer_will_close=True)
+    self.assertEqual(resp_msg.headers[http.HTTP_CONNECTION], "close")
+
+  def testErrorCloses(self):
+    # Missing host header
+    (force_close, resp_msg) = self._Call({}, True)
+    self.assertTrue(force_close)
+    self.assertEqual(resp_msg.start_line.code, http.HttpBadRequest.code)
+    self.assertEqual(resp_msg.headers[http.HTTP_CONNECTION], "close")
+
+
 class _FakeRequestAuth(http.auth.HttpServerRequestAuthentication):
   def __init__(self, realm, authreq, authenticator):
     http.auth.HttpServerRequestAuthentication.__init__(self)
@@ -781,5 +826,113 @@ class TestProcessRequests(unittest.TestCase):
                       _curl_multi=NotImplemented, _curl_process=NotImplemented)
 
 
+class _ClosableFakeCurl(_FakeCurl):
+  def __init__(self):
+    _FakeCurl.__init__(self)
+    self.closed = False
+
+  def close(self):
+    assert not self.closed
+    self.closed = True
+
+
+class TestCurlPool(unittest.TestCase):
+  def setUp(self):
+    self.now = 1000.0
+
+  def _Time(self):
+    return self.now
+
+  def _MakePool(self, **kwargs):
+    return http.client.CurlPool(_curl=_ClosableFakeCurl, _time_fn=self._Time,
+                                **kwargs)
+
+  def testReuse(self):
+    pool = self._MakePool()
+    curl = pool.Get("node1", 1811)
+    self.assertEqual(pool.GetStats()["misses"], 1)
+    pool.Put("node1", 1811, curl, True)
+    self.assertEqual(pool.GetStats()["idle"], 1)
+
+    # Different destination
+    other = pool.Get("node2", 1811)
+    self.assertFalse(other is curl)
+    self.assertEqual(pool.GetStats()["misses"], 2)
+
+    self.assertTrue(pool.Get("node1", 1811) is curl)
+    stats = pool.GetStats()
+    self.assertEqual(stats["hits"], 1)
+    self.assertEqual(stats["idle"], 0)
+    self.assertFalse(curl.closed)
+
+  def testUnhealthy(self):
+    pool = self._MakePool()
+    curl = pool.Get("node1", 1811)
+    pool.Put("node1", 1811, curl, False)
+    self.assertTrue(curl.closed)
+    self.assertEqual(pool.GetStats()["idle"], 0)
+    self.assertFalse(pool.Get("node1", 1811) is curl)
+
+  def testIdleEviction(self):
+    pool = self._MakePool(max_idle=10)
+    curl = pool.Get("node1", 1811)
+    pool.Put("node1", 1811, curl, True)
+    self.now += 11
+    self.assertFalse(pool.Get("node1", 1811) is curl)
+    self.assertTrue(curl.closed)
+    stats = pool.GetStats()
+    self.assertEqual(stats["evictions"], 1)
+    self.assertEqual(stats["hits"], 0)
+
+  def testSizeCap(self):
+    pool = self._MakePool(max_size=2)
+    handles = [pool.Get("node%s" % i, 1811) for i in range(3)]
+    for (i, curl) in enumerate(handles):
+      pool.Put("node%s" % i, 1811, curl, True)
+    self.assertEqual(pool.GetStats()["idle"], 2)
+    self.assertEqual([curl.closed for curl in handles], [False, False, True])
+
+    pool.Clear()
+    self.assertTrue(compat.all(curl.closed for curl in handles))
+    self.assertEqual(pool.GetStats()["idle"], 0)
+
+  def testProcessRequests(self):
+    pool = self._MakePool()
+    requests = [http.client.HttpClientRequest("localhost", port, "GET", "/")
+                for port in [1811, 1811, 1812]]
+
+    def _Process(_, handles):
+      for curl in handles:
+        curl.info = {
+          pycurl.RESPONSE_CODE: http.HTTP_OK,
+          }
+        if hasattr(pycurl, "LOCAL_IP"):
+          curl.info[pycurl.LOCAL_IP] = "127.0.0.1"
+        if hasattr(pycurl, "LOCAL_PORT"):
+          curl.info[pycurl.LOCAL_PORT] = 1
+        curl.opts.clear()
+        yield (curl, None)
+
+    monitors = []
+    http.client.ProcessRequests(requests, lock_monitor_cb=monitors.append,
+                                pool=pool, _curl=NotImplemented,
+                                _curl_multi=NotImplemented,
+                                _curl_process=_Process)
+    self.assertTrue(compat.all(req.success for req in requests))
+    self.assertEqual(monitors[0].GetPoolStats(), {
+      "hits": 0,
+      "misses": 3,
+      "evictions": 0,
+      "idle": 3,
+      })
+
+    requests = [http.client.HttpClientRequest("localhost", 1811, "GET", "/")]
+    http.client.ProcessRequests(requests, pool=pool, _curl=NotImplemented,
+                                _curl_multi=NotImplemented,
+                                _curl_process=_Process)
+    self.assertTrue(requests[0].success)
+    self.assertEqual(pool.GetStats()["hits"], 1)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -247,6 +247,212 @@ class TestQmp(testutils.GanetiTestCase):
         self.assertEqual(response, expected_response)
 
 
+class TestQmpBatch(testutils.GanetiTestCase):
+  def testExecuteBatch(self):
+    socket_file = tempfile.NamedTemporaryFile()
+    os.remove(socket_file.name)
+    qmp_stub = QmpStub(socket_file.name, [
+      # Replies to both commands, with an asynchronous event in between
+      '{"return": {"enabled": true, "present": true}, "id": 0}\r\n'
+      '{"event": "RESUME", "timestamp": {}}\r\n'
+      '{"error": {"class": "GenericError", "desc": "Not running"},'
+      ' "id": 1}\r\n',
+      ])
+    qmp_stub.start()
+
+    with hv_kvm.QmpConnection(socket_file.name) as qmp:
+      result = qmp.ExecuteBatch([("query-kvm", None),
+                                 ("query-status", None)])
+      self.assertEqual(result, [
+        (True, {"enabled": True, "present": True}),
+        (False, "Not running (GenericError)"),
+        ])
+
+      self.assertRaises(monitor.QmpCommandNotSupported, qmp.ExecuteBatch,
+                        [("query-kvm", None), ("unsupported-command", None)])
+
+
+class _FakeQmpConnection(object):
+  def __init__(self, filename):
+    self.filename = filename
+    self.connected = False
+    self.connects = 0
+    self.fail = False
+
+  def is_connected(self):
+    return self.connected
+
+  def connect(self):
+    assert not self.connected
+    self.connected = True
+    self.connects += 1
+
+  def close(self):
+    self.connected = False
+
+  def ExecuteBatch(self, commands):
+    assert self.connected
+    if self.fail:
+      # Simulate the peer closing the connection
+      self.fail = False
+      self.connected = False
+      raise errors.HypervisorError("Connection closed")
+    return [(True, (self.filename, command)) for (command, _) in commands]
+
+
+class TestQmpConnectionCache(unittest.TestCase):
+  def test(self):
+    with monitor.QmpConnectionCache(_connection_cls=_FakeQmpConnection) as qc:
+      self.assertEqual(qc.Execute("inst1.qmp", "query-cpus"),
+                       ("inst1.qmp", "query-cpus"))
+      self.assertEqual(qc.ExecuteBatch("inst1.qmp", [("a", None),
+                                                     ("b", {})]),
+                       [(True, ("inst1.qmp", "a")), (True, ("inst1.qmp", "b"))])
+      self.assertEqual(qc.Execute("inst2.qmp", "query-cpus"),
+                       ("inst2.qmp", "query-cpus"))
+
+      conns = qc._connections.copy()
+      self.assertEqual(sorted(conns.keys()), ["inst1.qmp", "inst2.qmp"])
+      self.assertEqual(conns["inst1.qmp"].connects, 1)
+
+      # Reconnect after the connection has been closed by the peer
+      conns["inst1.qmp"].fail = True
+      self.assertEqual(qc.Execute("inst1.qmp", "query-balloon"),
+                       ("inst1.qmp", "query-balloon"))
+      self.assertEqual(conns["inst1.qmp"].connects, 2)
+
+    self.assertFalse(qc._connections)
+    self.assertFalse(compat.any(conn.is_connected()
+                                for conn in conns.values()))
+
+
+class _FakeHotplugHypervisor(object):
+  def __init__(self):
+    self.used = []
+
+  @staticmethod
+  def _InstanceQmpMonitor(instance_name):
+    return "%s.qmp" % instance_name
+
+  @hv_kvm._with_qmp
+  def Outer(self, instance):
+    self.used.append(self.qmp)
+    self.Inner(instance)
+    return self.qmp.ExecuteBatch([("device_del", {})])
+
+  @hv_kvm._with_qmp
+  def Inner(self, _instance):
+    self.used.append(self.qmp)
+
+
+class TestWithQmp(unittest.TestCase):
+  def test(self):
+    caches = []
+
+    def _NewCache():
+      caches.append(monitor.QmpConnectionCache(
+        _connection_cls=_FakeQmpConnection))
+      return caches[-1]
+
+    instance = mock.Mock()
+    instance.name = "inst1"
+    hv = _FakeHotplugHypervisor()
+
+    with mock.patch("ganeti.hypervisor.hv_kvm.QmpConnectionCache",
+                    side_effect=_NewCache):
+      self.assertEqual(hv.Outer(instance),
+                       [(True, ("inst1.qmp", "device_del"))])
+
+      # Nested methods share the connection, which is closed afterwards
+      self.assertEqual(len(caches), 1)
+      (qmp, inner_qmp) = hv.used
+      self.assertTrue(qmp is inner_qmp)
+      self.assertEqual(qmp.filename, "inst1.qmp")
+      self.assertEqual(qmp.connects, 1)
+      self.assertFalse(qmp.is_connected())
+      self.assertTrue(hv.qmp is None)
+
+      # The next call uses a new connection
+      hv.Inner(instance)
+      self.assertEqual(len(caches), 2)
+      self.assertFalse(hv.used[-1] is qmp)
+
+
+class HmpStub(threading.Thread):
+  """Stub for the human monitor of a KVM instance
+
+  """
+  _BANNER = "QEMU 2.5.0 monitor - type 'help' for more information\r\n"
+  _PROMPT = "(qemu) "
+
+  def __init__(self, socket_filename, replies, close_after=False):
+    threading.Thread.__init__(self)
+    self.replies = replies[:]
+    self.close_after = close_after
+    self.received = []
+
+    self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self.socket.bind(socket_filename)
+    self.socket.listen(1)
+
+  def run(self):
+    conn, _ = self.socket.accept()
+
+    # Send the prompt in a separate chunk to exercise buffering
+    conn.send(self._BANNER + self._PROMPT[:3])
+    conn.send(self._PROMPT[3:])
+
+    for reply in self.replies:
+      command = conn.recv(4096)
+      self.received.append(command)
+      conn.send(command.replace("\n", "\r\n") + reply)
+      if not self.close_after:
+        conn.send(self._PROMPT)
+
+    conn.close()
+    self.socket.close()
+
+
+class TestHmp(testutils.GanetiTestCase):
+  def setUp(self):
+    testutils.GanetiTestCase.setUp(self)
+    self.tmpdir = tempfile.mkdtemp()
+    self.socket_file = utils.PathJoin(self.tmpdir, "hmp.sock")
+
+  def tearDown(self):
+    testutils.GanetiTestCase.tearDown(self)
+    utils.RemoveFile(self.socket_file)
+    os.rmdir(self.tmpdir)
+
+  def testExecute(self):
+    stub = HmpStub(self.socket_file, [
+      "QEMU 2.5.0\r\n",
+      "",
+      ])
+    stub.start()
+
+    with monitor.HmpConnection(self.socket_file) as hmp:
+      self.assertEqual(hmp.Execute("info version"), "QEMU 2.5.0\r\n")
+      self.assertEqual(hmp.Execute("cont"), "")
+
+    stub.join()
+    self.assertEqual(stub.received, ["info version\n", "cont\n"])
+
+  def testPeerClosed(self):
+    stub = HmpStub(self.socket_file, [""], close_after=True)
+    stub.start()
+
+    with monitor.HmpConnection(self.socket_file) as hmp:
+      self.assertEqual(hmp.Execute("quit"), "")
+      self.assertFalse(hmp.is_connected())
+
+    stub.join()
+
+  def testNoSocket(self):
+    hmp = monitor.HmpConnection(self.socket_file)
+    self.assertRaises(errors.HypervisorError, hmp.connect)
+
+
 class TestConsole(unittest.TestCase):
   def MakeConsole(self, instance, node, group, hvparams):
     cons = hv_kvm.KVMHypervisor.GetInstanceConsole(instance, node, group,
@@ -705,149 +911,78 @@ class TestKvmCpuPinning(testutils.GanetiTestCase):
                        mock.call([4]))
 
 class TestPostcopyAfterPrecopy(testutils.GanetiTestCase):
+  _INFO_MIGRATE = (
+    'capabilities: xbzrle: off rdma-pin-all: off auto-converge: on'
+    'zero-blocks: off compress: off events: off x-postcopy-ram: on \n'
+    'Migration status: %s\n'
+    'skipped: 0 pages\n'
+    'dirty sync count: %i\n'
+    )
+
   def setUp(self):
     super(TestPostcopyAfterPrecopy, self).setUp()
-    kvm_class = 'ganeti.hypervisor.hv_kvm.KVMHypervisor'
     self.MockOut('qmp', mock.patch('ganeti.hypervisor.hv_kvm.QmpConnection'))
     self.MockOut('run_cmd', mock.patch('ganeti.utils.RunCmd'))
     self.MockOut('ensure_dirs', mock.patch('ganeti.utils.EnsureDirs'))
     self.MockOut('write_file', mock.patch('ganeti.utils.WriteFile'))
     self.params = constants.HVC_DEFAULTS[constants.HT_KVM].copy()
 
-  def _TestPostcopyAfterPrecopy(self, runcmd, postcopy_started_goal):
+  def _TestPostcopyAfterPrecopy(self, info_migrate, postcopy_started_goal):
     hypervisor = hv_kvm.KVMHypervisor()
     self.iteration = 0
     self.postcopy_started = False
 
-    def runcmd_mock(cmd, env=None, output=None, cwd="/", reset_env=False,
-           interactive=False, timeout=None, noclose_fds=None,
-           input_fd=None, postfork_fn=None):
-      res = utils.RunResult(0, None, '', '', cmd, None, None)
-      if not self.postcopy_started and cmd.find('migrate_start_postcopy') != -1:
+    def monitor_mock(instance_name, command, timeout=None):
+      if command == 'info migrate':
+        self.iteration += 1
+        return info_migrate()
+      if not self.postcopy_started and command == 'migrate_start_postcopy':
         self.postcopy_started = True
-        res.stdout = ('migrate_postcopy_start\n'
-                      '(qemu) ')
-      return runcmd(cmd, res)
+      return ''
 
-    with mock.patch('ganeti.utils.RunCmd', runcmd_mock):
+    with mock.patch('ganeti.hypervisor.hv_kvm.KVMHypervisor.'
+                    '_CallMonitorCommand', side_effect=monitor_mock):
       instance = mock.MagicMock()
       instance.name = 'example.instance'
       hypervisor._PostcopyAfterPrecopy(instance)
       self.assertEqual(self.postcopy_started, postcopy_started_goal)
 
   def testNormal(self):
-    def runcmd_normal(cmd, res):
-      res = utils.RunResult(0, None, '', '', cmd, None, None)
-      if cmd.find('info migrate') != -1:
-        self.iteration += 1
-        res.stdout = (
-            'QEMU 2.5.0 monitor - type \'help\' for more information\n'
-            '(qemu) info migrate\n'
-            'capabilities: xbzrle: off rdma-pin-all: off auto-converge: on'
-            'zero-blocks: off compress: off events: off x-postcopy-ram: on \n'
-            'Migration status: active\n'
-            'skipped: 0 pages\n'
-            'dirty sync count: %i\n'
-            '(qemu) ' % self.iteration
-          )
-      return res
-
-    self._TestPostcopyAfterPrecopy(runcmd_normal, True)
+    def info_migrate_normal():
+      return self._INFO_MIGRATE % ('active', self.iteration)
+
+    self._TestPostcopyAfterPrecopy(info_migrate_normal, True)
 
   def testEmptyResponses(self):
-    def runcmd_empty_responses(cmd, res):
-      res = utils.RunResult(0, None, '', '', cmd, None, None)
-      if cmd.find('info migrate') != -1:
-        self.iteration += 1
-        if self.iteration < 3:
-          res.stdout = (
-              'QEMU 2.5.0 monitor - type \'help\' for more information\n'
-              '(qemu) info migrate\n'
-              '(qemu) '
-            )
-        else:
-          res.stdout = (
-              'QEMU 2.5.0 monitor - type \'help\' for more information\n'
-              '(qemu) info migrate\n'
-              'capabilities: xbzrle: off rdma-pin-all: off auto-converge: on'
-              'zero-blocks: off compress: off events: off x-postcopy-ram: on \n'
-              'Migration status: active\n'
-              'skipped: 0 pages\n'
-              'dirty sync count: %i\n'
-              '(qemu) ' % self.iteration
-            )
-      return res
-    self._TestPostcopyAfterPrecopy(runcmd_empty_responses, True)
+    def info_migrate_empty_responses():
+      if self.iteration < 3:
+        return ''
+      return self._INFO_MIGRATE % ('active', self.iteration)
+
+    self._TestPostcopyAfterPrecopy(info_migrate_empty_responses, True)
 
   def testMonitorRemoved(self):
-    def runcmd_monitor_removed(cmd, res):
-      res = utils.RunResult(0, None, '', '', cmd, None, None)
-      if cmd.find('info migrate') != -1:
-        self.iteration += 1
-        if self.iteration < 3:
-          res.stdout = (
-              'QEMU 2.5.0 monitor - type \'help\' for more information\n'
-              '(qemu) info migrate\n'
-              'capabilities: xbzrle: off rdma-pin-all: off auto-converge: on'
-              'zero-blocks: off compress: off events: off x-postcopy-ram: on \n'
-              'Migration status: active\n'
-              'skipped: 0 pages\n'
-              'dirty sync count: %i\n'
-              '(qemu) '
-            )
-        else:
-          res.stderr = ('2017/07/26 15:49:52 socat[105703] E connect(3, AF=1 '
-                        '"/var/run/ganeti/kvm-hypervisor/ctrl/example.instanc'
-                        'e.monitor", 85): No such file or directory')
-      return res
-    self._TestPostcopyAfterPrecopy(runcmd_monitor_removed, False)
+    def info_migrate_monitor_removed():
+      if self.iteration < 3:
+        return self._INFO_MIGRATE % ('active', 0)
+      raise errors.HypervisorError("No monitor socket found")
+
+    self._TestPostcopyAfterPrecopy(info_migrate_monitor_removed, False)
 
   def testMigrationFailed(self):
-    def runcmd_migration_failed(cmd, res):
-      res = utils.RunResult(0, None, '', '', cmd, None, None)
-      if cmd.find('info migrate') != -1:
-        self.iteration += 1
-        if self.iteration < 3:
-          res.stdout = (
-              'QEMU 2.5.0 monitor - type \'help\' for more information\n'
-              '(qemu) info migrate\n'
-              'capabilities: xbzrle: off rdma-pin-all: off auto-converge: on'
-              'zero-blocks: off compress: off events: off x-postcopy-ram: on \n'
-              'Migration status: active\n'
-              'skipped: 0 pages\n'
-              'dirty sync count: %i\n'
-              '(qemu) '
-            )
-        else:
-          res.stdout = (
-              'QEMU 2.5.0 monitor - type \'help\' for more information\n'
-              '(qemu) info migrate\n'
-              'capabilities: xbzrle: off rdma-pin-all: off auto-converge: on'
-              'zero-blocks: off compress: off events: off x-postcopy-ram: on \n'
-              'Migration status: failed\n'
-              'skipped: 0 pages\n'
-              'dirty sync count: %i\n'
-              '(qemu) '
-            )
-      return res
-    self._TestPostcopyAfterPrecopy(runcmd_migration_failed, False)
+    def info_migrate_migration_failed():
+      if self.iteration < 3:
+        return self._INFO_MIGRATE % ('active', 0)
+      return self._INFO_MIGRATE % ('failed', 0)
+
+    self._TestPostcopyAfterPrecopy(info_migrate_migration_failed, False)
 
   def testAlreadyInPostcopy(self):
-    def runcmd_already_in_postcopy(cmd, res):
-      res = utils.RunResult(0, None, '', '', cmd, None, None)
-      if cmd.find('info migrate') != -1:
-        res.stdout = (
-            'QEMU 2.5.0 monitor - type \'help\' for more information\n'
-            '(qemu) info migrate\n'
-            'capabilities: xbzrle: off rdma-pin-all: off auto-converge: on'
-            'zero-blocks: off compress: off events: off x-postcopy-ram: on \n'
-            'Migration status: postcopy-active\n'
-            'skipped: 0 pages\n'
-            'dirty sync count: %i\n'
-            '(qemu) '
-          )
-      return res
-    self._TestPostcopyAfterPrecopy(runcmd_already_in_postcopy, False)
+    def info_migrate_already_in_postcopy():
+      return self._INFO_MIGRATE % ('postcopy-active', self.iteration)
+
+    self._TestPostcopyAfterPrecopy(info_migrate_already_in_postcopy, False)
+
 
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -36,6 +36,7 @@ import tempfile
 import shutil
 import random
 import os
+import time
 import mock
 
 from ganeti import constants
@@ -509,6 +510,129 @@ class TestXenHypervisorListInstances(unittest.TestCase):
     mock_run_cmd.assert_called_with([expected_xen_cmd, self.XEN_LIST])
 
 
+class TestXenStateCache(unittest.TestCase):
+
+  CMD = ["xl", "list"]
+
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.cache = hv_xen._XenStateCache(self.tmpdir)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def testEmpty(self):
+    self.assertEqual(self.cache.Get(self.CMD, 2.0), None)
+
+  def testTtl(self):
+    self.cache.Put(self.CMD, 100.0, "output")
+    self.assertEqual(self.cache.Get(self.CMD, 2.0, _now=100.0), "output")
+    self.assertEqual(self.cache.Get(self.CMD, 2.0, _now=101.9), "output")
+    self.assertEqual(self.cache.Get(self.CMD, 2.0, _now=102.0), None)
+    self.assertEqual(self.cache.Get(self.CMD, 2.0, _now=99.0), None)
+    self.assertEqual(self.cache.Get(["xl", "info"], 2.0, _now=100.0), None)
+
+  def testInvalidate(self):
+    started = time.time()
+    self.cache.Put(self.CMD, started, "output")
+    self.assertEqual(self.cache.Get(self.CMD, 2.0), "output")
+    self.cache.Invalidate()
+    self.assertEqual(self.cache.Get(self.CMD, 2.0), None)
+
+    # Output of queries started after the invalidation is used again
+    self.cache.Put(self.CMD, time.time() + 0.1, "new output")
+    self.assertEqual(self.cache.Get(self.CMD, 2.0, _now=time.time() + 0.2),
+                     "new output")
+
+  def testMissingDirectory(self):
+    cache = hv_xen._XenStateCache(utils.PathJoin(self.tmpdir, "missing"))
+    cache.Put(self.CMD, time.time(), "output")
+    cache.Invalidate()
+    self.assertEqual(cache.Get(self.CMD, 2.0), None)
+
+
+class TestXenHypervisorStateCache(unittest.TestCase):
+
+  XL_LIST = testutils.ReadTestData("xen-xm-list-4.0.1-four-instances.txt")
+
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.hvparams = {
+      constants.HV_XEN_CMD: constants.XEN_CMD_XL,
+      constants.HV_XEN_STATE_CACHE_TTL: 60.0,
+      }
+    self.run_cmd = mock.Mock(side_effect=self._RunCmd)
+    self.hv = hv_xen.XenHypervisor(
+      _cfgdir=NotImplemented, _run_cmd_fn=self.run_cmd,
+      _state_cache=hv_xen._XenStateCache(self.tmpdir))
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _RunCmd(self, cmd):
+    if cmd == ["xl", "list"]:
+      stdout = self.XL_LIST
+    else:
+      stdout = ""
+    return utils.RunResult(constants.EXIT_SUCCESS, None, stdout, "", cmd,
+                           None, None)
+
+  def _CountListCalls(self):
+    return len([args for (args, _) in self.run_cmd.call_args_list
+                if args[0] == ["xl", "list"]])
+
+  def testSharedList(self):
+    self.assertEqual(self.hv.ListInstances(hvparams=self.hvparams), [
+      "server01.example.com",
+      "web3106215069.example.com",
+      "testinstance.example.com",
+      ])
+    self.assertTrue(self.hv.GetInstanceInfo("server01.example.com",
+                                            hvparams=self.hvparams))
+    self.hv.GetAllInstancesInfo(hvparams=self.hvparams)
+
+    # A new hypervisor object, as created by another request
+    other_hv = hv_xen.XenHypervisor(
+      _cfgdir=NotImplemented, _run_cmd_fn=self.run_cmd,
+      _state_cache=hv_xen._XenStateCache(self.tmpdir))
+    self.assertTrue(other_hv.GetInstanceInfo("testinstance.example.com",
+                                             hvparams=self.hvparams))
+
+    self.assertEqual(self._CountListCalls(), 1)
+
+  def testInvalidatedByChange(self):
+    self.hv.ListInstances(hvparams=self.hvparams)
+    self.hv._RunXen(["mem-set", "server01.example.com", 128], self.hvparams)
+    self.hv.ListInstances(hvparams=self.hvparams)
+    self.assertEqual(self._CountListCalls(), 2)
+
+  def testFailureNotCached(self):
+    self.run_cmd.side_effect = \
+      lambda cmd: utils.RunResult(constants.EXIT_FAILURE, None, "", "", cmd,
+                                  None, None)
+    result = self.hv._RunXenQuery(["list"], self.hvparams)
+    self.assertTrue(result.failed)
+
+    self.run_cmd.side_effect = self._RunCmd
+    result = self.hv._RunXenQuery(["list"], self.hvparams)
+    self.assertFalse(result.failed)
+    self.assertEqual(result.stdout, self.XL_LIST)
+    self.assertEqual(self.run_cmd.call_count, 2)
+
+    result = self.hv._RunXenQuery(["list"], self.hvparams)
+    self.assertFalse(result.failed)
+    self.assertFalse(result.failed_by_timeout)
+    self.assertEqual(result.stdout, self.XL_LIST)
+    self.assertEqual(self.run_cmd.call_count, 2)
+
+  def testDisabled(self):
+    self.hvparams[constants.HV_XEN_STATE_CACHE_TTL] = 0.0
+    self.hv.ListInstances(hvparams=self.hvparams)
+    self.hv.ListInstances(hvparams=self.hvparams)
+    self.assertEqual(self._CountListCalls(), 2)
+    self.assertEqual(os.listdir(self.tmpdir), [])
+
+
 class TestXenHypervisorCheckToolstack(unittest.TestCase):
 
   def setUp(self):
@@ -54,6 +54,7 @@ from ganeti import compat
 from ganeti import mcpu
 from ganeti import query
 from ganeti import workerpool
+from ganeti import runtime
 
 import testutils
 
@@ -185,6 +186,48 @@ class TestQueuedJob(unittest.TestCase):
     newjob2 = jqueue._QueuedJob.Restore(None, newjob.Serialize(), True, False)
     self.assertFalse(newjob2.archived)
 
+  def testReplayJournal(self):
+    job = jqueue._QueuedJob(None, 1, [opcodes.OpTestDelay(),
+                                      opcodes.OpTestDelay()], True)
+    job.ops[0].log.append((1, (1000, 0), constants.ELOG_MESSAGE, "first"))
+    job.log_serial = 1
+
+    newjob = jqueue._QueuedJob.Restore(None, job.Serialize(), True, False)
+
+    records = [
+      (0, (1, (1000, 0), constants.ELOG_MESSAGE, "first")),
+      (0, (2, (1001, 0), constants.ELOG_MESSAGE, "second")),
+      (1, (3, (1002, 0), constants.ELOG_JQUEUE_TEST, ["third", 3])),
+      (1, (4, (1003, 0), constants.ELOG_MESSAGE, "fourth\nwith newline")),
+      ]
+    journal = "".join(jqueue._EncodeJournalRecord(op_index, entry)
+                      for (op_index, entry) in records)
+
+    # Simulate an interrupted write of the last record
+    newjob.ReplayJournal(jqueue._DecodeJournal(journal[:-10]))
+
+    self.assertEqual(newjob.log_serial, 3)
+    self.assertEqual([len(op.log) for op in newjob.ops], [2, 1])
+    self.assertEqual(newjob.GetLogEntries(1), [
+      [2, [1001, 0], constants.ELOG_MESSAGE, "second"],
+      [3, [1002, 0], constants.ELOG_JQUEUE_TEST, ["third", 3]],
+      ])
+
+    newjob.ReplayJournal(jqueue._DecodeJournal(journal))
+
+    self.assertEqual(newjob.log_serial, 4)
+    self.assertEqual([len(op.log) for op in newjob.ops], [2, 2])
+    self.assertEqual(newjob.GetLogEntries(3), [
+      [4, [1003, 0], constants.ELOG_MESSAGE, "fourth\nwith newline"],
+      ])
+
+  def testDecodeJournalChecksum(self):
+    record = jqueue._EncodeJournalRecord(0, (1, (1000, 0),
+                                             constants.ELOG_MESSAGE, "msg"))
+    self.assertEqual(len(jqueue._DecodeJournal(record)), 1)
+    self.assertEqual(jqueue._DecodeJournal(record.replace("msg", "msh")), [])
+    self.assertEqual(jqueue._DecodeJournal("garbage\n" + record), [])
+
   def testPriority(self):
     job_id = 4283
     ops = [
@@ -516,6 +559,7 @@ class _DisabledFakeDependencyManager:
 class _FakeQueueForProc:
   def __init__(self, depmgr=None):
     self._updates = []
+    self._log_appends = []
     self._submitted = []
 
     self._submit_count = itertools.count(1000)
@@ -528,12 +572,19 @@ class _FakeQueueForProc:
   def GetNextUpdate(self):
     return self._updates.pop(0)
 
+  def GetNextLogAppend(self):
+    return self._log_appends.pop(0)
+
   def GetNextSubmittedJob(self):
     return self._submitted.pop(0)
 
   def UpdateJobUnlocked(self, job, replicate=True):
     self._updates.append((job, bool(replicate)))
 
+  def AppendJobLogUnlocked(self, job, op_index, log_entries):
+    assert job.ops[op_index].log[-len(log_entries):] == log_entries
+    self._log_appends.append((job, op_index, len(log_entries)))
+
   def SubmitManyJobs(self, jobs):
     job_ids = [self._submit_count.next() for _ in jobs]
     self._submitted.extend(zip(job_ids, jobs))
@@ -1040,8 +1091,10 @@ class TestJobProcessor(unittest.TestCase, _JobProcessorTestUtils):
           cbs.Feedback(log_type, msg)
         else:
           cbs.Feedback(msg)
-        # Check for job update without replication
-        self.assertEqual(queue.GetNextUpdate(), (job, False))
+        # Check that the entry was only appended to the job's log journal
+        op_index = [qop.input for qop in job.ops].index(op)
+        self.assertEqual(queue.GetNextLogAppend(), (job, op_index, 1))
+        self.assertRaises(IndexError, queue.GetNextLogAppend)
         self.assertRaises(IndexError, queue.GetNextUpdate)
 
     opexec = _FakeExecOpCodeForProc(queue, _BeforeStart, _AfterStart)
@@ -1794,6 +1847,84 @@ class TestJobProcessorChangePriority(unittest.TestCase, _JobProcessorTestUtils):
                      [constants.OP_PRIO_DEFAULT, -10, 5])
 
 
+class _FakeGetEnts(object):
+  def __init__(self):
+    self.masterd_uid = os.getuid()
+    self.daemons_gid = os.getgid()
+
+
+class _JournalTestQueue(jqueue.JobQueue):
+  # pylint: disable=W0231
+  def __init__(self, queue_dir):
+    self._queue_dir = queue_dir
+    self.watched = []
+
+  def _GetJobPath(self, job_id):
+    return utils.PathJoin(self._queue_dir, "job-%s" % job_id)
+
+  def _GetJobJournalPath(self, job_id):
+    return self._GetJobPath(job_id) + jqueue._JOURNAL_SUFFIX
+
+  def _UpdateJobQueueFile(self, file_name, data, replicate):
+    utils.WriteFile(file_name, data=data)
+
+    # Like luxid, a client woken up by the job file being written only watches
+    # the job's files which exist at that time while waiting for the next
+    # change
+    self.watched = [path for path in
+                    (file_name, file_name + jqueue._JOURNAL_SUFFIX)
+                    if os.path.exists(path)]
+
+
+class TestJobJournal(unittest.TestCase, _JobProcessorTestUtils):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.patcher = testutils.patch_object(runtime, "GetEnts")
+    getents_fn = self.patcher.start()
+    getents_fn.return_value = _FakeGetEnts()
+
+  def tearDown(self):
+    self.patcher.stop()
+    shutil.rmtree(self.tmpdir)
+
+  def _AddLogEntry(self, queue, job, msg):
+    job.log_serial += 1
+    entry = (job.log_serial, utils.SplitTime(1234.5), constants.ELOG_MESSAGE,
+             msg)
+    job.ops[0].log.append(entry)
+    queue.AppendJobLogUnlocked(job, 0, [entry])
+
+  @staticmethod
+  def _ReadMessages(journal):
+    records = jqueue._DecodeJournal(utils.ReadFile(journal))
+    return [log_entry[3] for (_, log_entry) in records]
+
+  def testFirstFeedbackWhileWaiting(self):
+    queue = _JournalTestQueue(self.tmpdir)
+    job = self._CreateJob(queue, 8129, [opcodes.OpTestDummy(result="x")])
+    journal = queue._GetJobJournalPath(job.id)
+
+    self.assertFalse(os.path.exists(journal))
+    queue.UpdateJobUnlocked(job)
+
+    # The journal must exist before the job file is written, otherwise the
+    # waiting client doesn't notice the first feedback
+    self.assertTrue(journal in queue.watched)
+    self.assertEqual(utils.ReadFile(journal), "")
+
+    self._AddLogEntry(queue, job, "first")
+    self.assertEqual(self._ReadMessages(journal), ["first"])
+
+    # Writing the job again truncates the journal, but keeps the file so it
+    # is still being watched
+    queue.UpdateJobUnlocked(job)
+    self.assertTrue(journal in queue.watched)
+    self.assertEqual(utils.ReadFile(journal), "")
+
+    self._AddLogEntry(queue, job, "second")
+    self.assertEqual(self._ReadMessages(journal), ["second"])
+
+
 class _IdOnlyFakeJob:
   def __init__(self, job_id, priority=NotImplemented):
     self.id = str(job_id)
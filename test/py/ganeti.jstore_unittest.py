@@ -30,7 +30,10 @@
 
 """Script for testing ganeti.jstore"""
 
+import os
 import re
+import shutil
+import tempfile
 import unittest
 import random
 
@@ -39,6 +42,8 @@ from ganeti import utils
 from ganeti import compat
 from ganeti import errors
 from ganeti import jstore
+from ganeti import runtime
+from ganeti import serializer
 
 import testutils
 
@@ -106,5 +111,95 @@ class TestReadNumericFile(testutils.GanetiTestCase):
     self.assertRaises(errors.JobQueueError, jstore._ReadNumericFile, tmpfile)
 
 
+class _FakeGetEnts(object):
+  def __init__(self):
+    self.masterd_uid = os.getuid()
+    self.daemons_gid = os.getgid()
+
+
+class TestPackArchiveDirectory(testutils.GanetiTestCase):
+  def setUp(self):
+    testutils.GanetiTestCase.setUp(self)
+    self.tmpdir = tempfile.mkdtemp()
+    self.patcher = testutils.patch_object(runtime, "GetEnts")
+    getents_fn = self.patcher.start()
+    getents_fn.return_value = _FakeGetEnts()
+
+  def tearDown(self):
+    self.patcher.stop()
+    shutil.rmtree(self.tmpdir)
+    testutils.GanetiTestCase.tearDown(self)
+
+  def _WriteJob(self, job_id, end_timestamp):
+    data = serializer.DumpJson({
+      "id": job_id,
+      "end_timestamp": (end_timestamp, 0),
+      "ops": [],
+      })
+    utils.WriteFile(utils.PathJoin(self.tmpdir, "job-%s" % job_id), data=data)
+    return data
+
+  def testEmpty(self):
+    self.assertEqual(jstore.PackArchiveDirectory(self.tmpdir), 0)
+    self.assertEqual(os.listdir(self.tmpdir), [])
+    self.assertEqual(jstore.ListArchivedJobs(self.tmpdir), [])
+    self.assertTrue(jstore.ReadArchivedJob(self.tmpdir, 1) is None)
+
+  def testPack(self):
+    jobs = dict((job_id, self._WriteJob(job_id, 1000 + job_id))
+                for job_id in [9, 120, 13, 4])
+
+    self.assertEqual(jstore.PackArchiveDirectory(self.tmpdir), len(jobs))
+    self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                     [jstore.ARCHIVE_SEGMENT_FILE, jstore.ARCHIVE_INDEX_FILE])
+
+    for (job_id, data) in jobs.items():
+      self.assertEqual(jstore.ReadArchivedJob(self.tmpdir, job_id), data)
+    for job_id in [0, 5, 121]:
+      self.assertTrue(jstore.ReadArchivedJob(self.tmpdir, job_id) is None)
+
+    # Pack more jobs into the same segment
+    jobs[50] = self._WriteJob(50, 500)
+    self.assertEqual(jstore.PackArchiveDirectory(self.tmpdir), 1)
+
+    for (job_id, data) in jobs.items():
+      self.assertEqual(jstore.ReadArchivedJob(self.tmpdir, job_id), data)
+
+    self.assertEqual(jstore.ListArchivedJobs(self.tmpdir),
+                     [4, 9, 13, 50, 120])
+    self.assertEqual(jstore.ListArchivedJobs(self.tmpdir, min_id=9,
+                                             max_id=50),
+                     [9, 13, 50])
+    self.assertEqual(jstore.ListArchivedJobs(self.tmpdir, min_id=10),
+                     [13, 50, 120])
+    self.assertEqual(jstore.ListArchivedJobs(self.tmpdir, min_timestamp=1009,
+                                             max_timestamp=1013),
+                     [9, 13])
+    self.assertEqual(jstore.ListArchivedJobs(self.tmpdir, max_timestamp=600),
+                     [50])
+
+  def testInterruptedPack(self):
+    data = self._WriteJob(7, 100)
+    self.assertEqual(jstore.PackArchiveDirectory(self.tmpdir), 1)
+
+    # The job file was packed, but not removed afterwards, and the segment
+    # has trailing data not referenced by the index
+    utils.WriteFile(utils.PathJoin(self.tmpdir, "job-7"), data=data)
+    segment = utils.PathJoin(self.tmpdir, jstore.ARCHIVE_SEGMENT_FILE)
+    utils.WriteFile(segment, data=utils.ReadFile(segment) + "garbage")
+    other = self._WriteJob(8, 200)
+
+    self.assertEqual(jstore.PackArchiveDirectory(self.tmpdir), 2)
+    self.assertEqual(jstore.ListArchivedJobs(self.tmpdir), [7, 8])
+    self.assertEqual(jstore.ReadArchivedJob(self.tmpdir, 7), data)
+    self.assertEqual(jstore.ReadArchivedJob(self.tmpdir, 8), other)
+
+  def testCorruptedIndex(self):
+    utils.WriteFile(utils.PathJoin(self.tmpdir, jstore.ARCHIVE_INDEX_FILE),
+                    data="foo bar\n")
+    self.assertRaises(errors.JobFileCorrupted, jstore.ListArchivedJobs,
+                      self.tmpdir)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
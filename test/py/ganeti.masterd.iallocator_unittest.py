@@ -172,6 +172,76 @@ class TestComputeBasicNodeData(unittest.TestCase):
       })
 
 
+class _FakeConfigForInstanceData:
+  def GetInstanceDisks(self, _):
+    return [objects.Disk(dev_type=constants.DT_PLAIN, size=1024,
+                         mode=constants.DISK_RDWR, spindles=1)]
+
+  def GetInstanceDiskTemplate(self, _):
+    return constants.DT_PLAIN
+
+  def GetInstanceSecondaryNodes(self, _):
+    return []
+
+  def GetNodeName(self, node_uuid):
+    return "name-%s" % node_uuid
+
+  def GetNodeNames(self, node_uuids):
+    return map(self.GetNodeName, node_uuids)
+
+
+class TestComputeInstanceData(unittest.TestCase):
+  def testFilledParams(self):
+    cluster = objects.Cluster(
+      beparams={
+        constants.PP_DEFAULT: {
+          constants.BE_MAXMEM: 1024,
+          constants.BE_VCPUS: 1,
+          constants.BE_SPINDLE_USE: 1,
+          },
+        },
+      nicparams={
+        constants.PP_DEFAULT: {
+          constants.NIC_MODE: constants.NIC_MODE_BRIDGED,
+          constants.NIC_LINK: "br0",
+          },
+        })
+    inst = objects.Instance(name="inst1", uuid="inst-uuid",
+                            primary_node="node-uuid", os="debian",
+                            hypervisor=constants.HT_FAKE,
+                            admin_state=constants.ADMINST_UP,
+                            disks_active=True,
+                            beparams={
+                              constants.BE_VCPUS: 4,
+                              },
+                            nics=[
+                              objects.NIC(mac="aa:00:00:00:00:01", ip=None,
+                                          nicparams={}),
+                              objects.NIC(mac="aa:00:00:00:00:02", ip=None,
+                                          nicparams={
+                                            constants.NIC_LINK: "br1",
+                                            }),
+                              ])
+    params = objects.ClusterParamsCache(cluster)
+    i_list = [(inst, params.GetBEParams(inst))]
+
+    result = iallocator.IAllocator._ComputeInstanceData(
+      _FakeConfigForInstanceData(), params, i_list)
+
+    pir = result["inst1"]
+    self.assertEqual(pir["vcpus"], 4)
+    self.assertEqual(pir["memory"], 1024)
+    self.assertEqual(pir["spindle_use"], 1)
+    self.assertEqual(pir["nodes"], ["name-node-uuid"])
+    self.assertEqual(pir["disk_space_total"], 1024)
+    self.assertEqual([(nic["link"], nic["bridge"]) for nic in pir["nics"]],
+                     [("br0", "br0"), ("br1", "br1")])
+
+    # The cluster's and the instance's parameters are left alone
+    self.assertEqual(inst.beparams, {constants.BE_VCPUS: 4})
+    self.assertEqual(inst.nics[0].nicparams, {})
+
+
 class TestProcessStorageInfo(unittest.TestCase):
 
   def setUp(self):
@@ -96,6 +96,38 @@ class TestLockAttemptTimeoutStrategy(unittest.TestCase):
       self.assert_(strat.NextAttempt() is None)
 
 
+class TestLockGrantNotification(unittest.TestCase):
+  def setUp(self):
+    mcpu.ClearLockGrant()
+
+  def testTimeout(self):
+    self.assertFalse(mcpu.WaitForLockGrant(0.01))
+
+  def testNotify(self):
+    mcpu.NotifyLockGrant()
+    self.assertTrue(mcpu.WaitForLockGrant(10.0))
+    self.assertFalse(mcpu.ClearLockGrant())
+
+    for _ in range(3):
+      mcpu.NotifyLockGrant()
+    self.assertTrue(mcpu.ClearLockGrant())
+    self.assertFalse(mcpu.WaitForLockGrant(0.01))
+
+
+class TestLockWaitHistogram(unittest.TestCase):
+  def test(self):
+    hist = mcpu.LockWaitHistogram()
+    self.assertEqual(hist.Count(), 0)
+
+    for duration in [0.0, 0.0005, 0.05, 0.07, 3.0, 3600.0]:
+      hist.Add(duration)
+
+    self.assertEqual(hist.Count(), 6)
+    self.assertEqual(hist.counts, [2, 0, 2, 0, 1, 0, 1])
+    self.assertEqual(hist.maximum, 3600.0)
+    self.assertTrue(str(hist).startswith("6 waits,"))
+
+
 class TestDispatchTable(unittest.TestCase):
   def test(self):
     for opcls in opcodes.OP_MAPPING.values():
@@ -211,6 +243,20 @@ class TestExecLU(unittest.TestCase):
     self.assertRaises(errors.OpPrereqError, self.proc._LockAndExecLU,
         lu, locking.LEVEL_CLUSTER, self.calc_timeout)
 
+  def testLogLockWaits(self):
+    with testutils.patch_object(mcpu.logging, "debug") as debug_mock:
+      # Nothing is logged before the first lock wait
+      self.proc._LogLockWaits()
+      self.assertFalse(debug_mock.called)
+
+      self.proc.lock_wait_histogram.Add(0.5)
+      self.proc._LogLockWaits()
+      self.assertEqual(debug_mock.call_count, 1)
+
+      # Failures must not replace the opcode's exception
+      debug_mock.side_effect = ValueError
+      self.proc._LogLockWaits()
+
 
 class TestSecretParams(unittest.TestCase):
   def testSecretParamsCheckNoError(self):
@@ -413,6 +413,58 @@ class _BaseTcpPingDeafTest:
                  "failed to ping alive host on deaf port (no source)")
 
 
+class TestTcpPingMany(unittest.TestCase):
+  def setUp(self):
+    self.address = constants.IP4_ADDRESS_LOCALHOST
+
+    self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self.listener.bind((self.address, 0))
+    self.listenerport = self.listener.getsockname()[1]
+    # connections are never accepted, so they must fit into the backlog
+    self.listener.listen(16)
+
+    self.deaflistener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self.deaflistener.bind((self.address, 0))
+    self.deaflistenerport = self.deaflistener.getsockname()[1]
+
+  def tearDown(self):
+    self.listener.close()
+    self.deaflistener.close()
+
+  def testEmpty(self):
+    self.assertEqual(netutils.TcpPingMany([], self.listenerport), [])
+
+  def testListener(self):
+    for max_concurrent in [1, 2, 100]:
+      result = netutils.TcpPingMany([(self.address, self.address),
+                                     (self.address, None),
+                                     (self.address, None)],
+                                    self.listenerport,
+                                    timeout=constants.TCP_PING_TIMEOUT,
+                                    live_port_needed=True,
+                                    max_concurrent=max_concurrent)
+      self.assertEqual(result, [True, True, True])
+
+  def testDeafListener(self):
+    probes = [(self.address, self.address), (self.address, None)]
+
+    self.assertEqual(netutils.TcpPingMany(probes, self.deaflistenerport,
+                                          timeout=constants.TCP_PING_TIMEOUT,
+                                          live_port_needed=True),
+                     [False, False])
+
+    # ECONNREFUSED is OK
+    self.assertEqual(netutils.TcpPingMany(probes, self.deaflistenerport,
+                                          timeout=constants.TCP_PING_TIMEOUT,
+                                          live_port_needed=False),
+                     [True, True])
+
+  def testInvalidTarget(self):
+    self.assertRaises(errors.ProgrammerError, netutils.TcpPingMany,
+                      [(self.address, None), ("foo", None)],
+                      self.listenerport)
+
+
 class TestIP4TcpPingDeaf(unittest.TestCase, _BaseTcpPingDeafTest):
   """Testcase for IPv4 TCP version of ping - against non listen(2)ing port"""
   family = socket.AF_INET
@@ -62,6 +62,71 @@ class TestDictState(unittest.TestCase):
     self.assertEquals(o1.ToDict(), {"a": 2, "b": 5})
 
 
+class TestFillDict(unittest.TestCase):
+  def test(self):
+    defaults = {"a": 1, "b": [1, 2], "c": {"x": "y"}, "d": "text"}
+    custom = {"c": {"z": 0}, "e": None}
+
+    result = objects.FillDict(defaults, custom, skip_keys=["d"])
+    self.assertEqual(result, {"a": 1, "b": [1, 2], "c": {"z": 0}, "e": None})
+
+    # Mutable default values are copied, custom values are not
+    self.assertFalse(result["b"] is defaults["b"])
+    self.assertTrue(result["c"] is custom["c"])
+    result["b"].append(3)
+    self.assertEqual(defaults["b"], [1, 2])
+
+
+class TestLayeredParams(unittest.TestCase):
+  def setUp(self):
+    self.layers = [
+      {"a": 1, "b": 2, "c": [3]},
+      {"b": 20, "d": 40},
+      {"d": None, "e": 50},
+      ]
+
+  def test(self):
+    params = objects.LayeredParams(self.layers)
+    self.assertEqual(params["a"], 1)
+    self.assertEqual(params["b"], 20)
+    self.assertTrue(params["d"] is None)
+    self.assertEqual(params.get("x", "default"), "default")
+    self.assertRaises(KeyError, lambda: params["x"])
+    self.assertTrue("e" in params)
+    self.assertEqual(len(params), 5)
+    self.assertEqual(sorted(params), ["a", "b", "c", "d", "e"])
+    self.assertEqual(dict(params), {"a": 1, "b": 20, "c": [3], "d": None,
+                                    "e": 50})
+
+  def testSkipKeys(self):
+    params = objects.LayeredParams(self.layers, skip_keys=["b", "e"])
+    self.assertFalse("b" in params)
+    self.assertRaises(KeyError, lambda: params["e"])
+    self.assertEqual(sorted(params), ["a", "c", "d"])
+
+  def testMaterialize(self):
+    for skip_keys in [None, ["a"], ["c", "d"]]:
+      params = objects.LayeredParams(self.layers, skip_keys=skip_keys)
+      expected = objects.FillDict(
+        objects.FillDict(self.layers[0], self.layers[1], skip_keys=skip_keys),
+        self.layers[2], skip_keys=skip_keys)
+      result = params.Materialize()
+      self.assertEqual(result, expected)
+      self.assertEqual(result, dict(params))
+
+      # The result can be modified without changing the layers
+      if "c" in result:
+        result["c"].append(4)
+      result["new"] = True
+      self.assertEqual(self.layers[0]["c"], [3])
+      self.assertFalse("new" in params)
+
+  def testEmpty(self):
+    params = objects.LayeredParams([])
+    self.assertEqual(len(params), 0)
+    self.assertEqual(params.Materialize(), {})
+
+
 class TestClusterObject(unittest.TestCase):
   """Tests done on a L{objects.Cluster}"""
 
@@ -168,6 +233,45 @@ class TestClusterObject(unittest.TestCase):
     for param, value in self.fake_cl.os_hvp[os][constants.HT_XEN_PVM].items():
       self.assertEqual(value, filled_conf[param])
 
+  def testParamsCacheHv(self):
+    cache = objects.ClusterParamsCache(self.fake_cl)
+
+    for os_name in ["lenny-image", "ubuntu-hardy", "unknown"]:
+      for hv_name in [constants.HT_FAKE, constants.HT_XEN_PVM]:
+        fake_inst = objects.Instance(name="foobar", os=os_name,
+                                     hypervisor=hv_name,
+                                     hvparams={"blah": "blubb"})
+        for skip_globals in [False, True]:
+          expected = self.fake_cl.FillHV(fake_inst, skip_globals=skip_globals)
+          params = cache.GetHVParams(fake_inst, skip_globals=skip_globals)
+          self.assertEqual(params.Materialize(), expected)
+          self.assertEqual(dict(params), expected)
+
+  def testParamsCacheSerial(self):
+    self.fake_cl.serial_no = 1
+    cache = objects.ClusterParamsCache(self.fake_cl)
+    fake_inst = objects.Instance(name="foobar", os="lenny-image",
+                                 hypervisor=constants.HT_FAKE, hvparams={})
+
+    self.assertEqual(cache.GetHVParams(fake_inst)["foo"], "baz")
+
+    # Changes are only noticed with the serial number
+    self.fake_cl.os_hvp["lenny-image"][constants.HT_FAKE]["foo"] = "new"
+    self.assertEqual(cache.GetHVParams(fake_inst)["foo"], "baz")
+    self.fake_cl.serial_no += 1
+    self.assertEqual(cache.GetHVParams(fake_inst)["foo"], "new")
+
+  def testParamsCacheBeNic(self):
+    cache = objects.ClusterParamsCache(self.fake_cl)
+    fake_inst = objects.Instance(name="foobar",
+                                 beparams={constants.BE_VCPUS: 3})
+    self.assertEqual(cache.GetBEParams(fake_inst).Materialize(),
+                     self.fake_cl.FillBE(fake_inst))
+
+    nicparams = {constants.NIC_LINK: "br100"}
+    self.assertEqual(cache.GetNICParams(nicparams).Materialize(),
+                     self.fake_cl.SimpleFillNIC(nicparams))
+
   def testFillNdParamsCluster(self):
     fake_node = objects.Node(name="test",
                              ndparams={},
@@ -766,6 +870,13 @@ class TestSimpleFillOS(unittest.TestCase):
                                                       "G": "G"},
                                                "os+a": {"F": "F"}}
 
+    def testParamsCache(self):
+      cache = objects.ClusterParamsCache(self.fake_cl)
+      for os_name in ["os", "os+a", "other"]:
+        public_dict = {"A": "A"}
+        self.assertEqual(cache.GetOSParams(os_name, public_dict).Materialize(),
+                         self.fake_cl.SimpleFillOS(os_name, public_dict))
+
     def testConflictPublicPrivate(self):
       "Make sure we disallow attempts to override params based on visibility."
       public_dict = {"A": "A", "X": "X"}
@@ -56,6 +56,48 @@ class TestAutoSlot(unittest.TestCase):
     self.assertEqual(slotted.__slots__, AutoSlotted.SLOTS)
 
 
+class _SlotsParent(outils.ValidatedSlots):
+  __slots__ = ["foo", "bar"]
+
+
+class _SlotsChild(_SlotsParent):
+  __slots__ = ["baz"]
+
+
+class _SlotsSingle(outils.ValidatedSlots):
+  __slots__ = ["foo"]
+
+
+class TestCachedSlots(unittest.TestCase):
+  def testGetAllSlots(self):
+    self.assertEqual(outils.ValidatedSlots.GetAllSlots(), [])
+    self.assertEqual(_SlotsParent.GetAllSlots(), ["foo", "bar"])
+    self.assertEqual(_SlotsChild.GetAllSlots(), ["baz", "foo", "bar"])
+
+    # Callers may modify the returned list
+    _SlotsChild.GetAllSlots().append("other")
+    self.assertEqual(_SlotsChild.GetAllSlots(), ["baz", "foo", "bar"])
+
+  def testMetadata(self):
+    self.assertEqual(_SlotsChild._all_slots, ("baz", "foo", "bar"))
+    self.assertEqual(_SlotsChild._all_slots_set,
+                     frozenset(["foo", "bar", "baz"]))
+    self.assertEqual(_SlotsParent._all_slots_set, frozenset(["foo", "bar"]))
+    self.assertEqual(AutoSlotted._all_slots, ("foo", "bar", "baz"))
+
+  def testSlotValues(self):
+    obj = _SlotsChild(foo=1, bar="x", baz=None)
+    self.assertEqual(obj._get_slot_values(obj), (None, 1, "x"))
+    self.assertEqual(_SlotsSingle._get_slot_values(_SlotsSingle(foo=3)),
+                     (3, ))
+    self.assertEqual(outils.ValidatedSlots._get_slot_values(obj), ())
+    self.assertRaises(AttributeError, obj._get_slot_values, _SlotsChild())
+
+  def testUnknownParameter(self):
+    self.assertRaises(TypeError, _SlotsParent, baz=1)
+    self.assertRaises(TypeError, _SlotsChild, other=1)
+
+
 class TestContainerToDicts(unittest.TestCase):
   def testUnknownType(self):
     for value in [None, 19410, "xyz"]:
@@ -306,6 +306,57 @@ class TestQuery(unittest.TestCase):
     self.assertEqual(len(fdefs), 3)
     self.assertEqual(fdefs["b"][1:], fdefs["c"][1:])
 
+  def testColumnar(self):
+    class _Item:
+      def __init__(self, name, ip):
+        self.name = name
+        self.ip = ip
+
+    class _StatefulData(_QueryData):
+      def __iter__(self):
+        for (idx, item) in enumerate(self.data):
+          # Per-item state which is only valid while iterating
+          self.current = idx
+          yield item
+
+    fielddef = query._PrepareFieldList([
+      (query._MakeField("name", "Name", constants.QFT_TEXT, "Name"),
+       None, 0, query._GetItemAttr("name")),
+      (query._MakeField("ip", "IP", constants.QFT_TEXT, "IP"),
+       None, 0, query._GetItemMaybeAttr("ip")),
+      (query._MakeField("pos", "Pos", constants.QFT_NUMBER, "Position"),
+       None, 0, lambda ctx, _: ctx.current),
+      ], [])
+
+    data = [_Item("node%s" % i, ("192.0.2.%s" % i) if i % 3 else None)
+            for i in [12, 3, 7, 1, 9, 20, 6]]
+
+    for (sort_by_name, qfilter) in [(False, None), (True, None),
+                                    (True, ["=~", "name", "node[0-9]$"]),
+                                    (False, ["<", "pos", 4])]:
+      q = query.Query(fielddef, ["ip", "pos", "name"], qfilter=qfilter,
+                      namefield="name")
+      expected = q.Query(_StatefulData(data), sort_by_name=sort_by_name,
+                         columnar=False)
+      self.assertEqual(q.Query(_StatefulData(data), sort_by_name=sort_by_name),
+                       expected)
+      self.assertTrue(expected)
+
+    q = query.Query(fielddef, ["name", "ip", "pos"], namefield="name",
+                    qfilter=["=~", "name", "node[0-9]$"])
+    self.assertEqual(q.Query(_StatefulData(data)), [
+      [(constants.RS_NORMAL, "node1"), (constants.RS_NORMAL, "192.0.2.1"),
+       (constants.RS_NORMAL, 3)],
+      [(constants.RS_NORMAL, "node3"), (constants.RS_UNAVAIL, None),
+       (constants.RS_NORMAL, 1)],
+      [(constants.RS_NORMAL, "node6"), (constants.RS_UNAVAIL, None),
+       (constants.RS_NORMAL, 6)],
+      [(constants.RS_NORMAL, "node7"), (constants.RS_NORMAL, "192.0.2.7"),
+       (constants.RS_NORMAL, 2)],
+      [(constants.RS_NORMAL, "node9"), (constants.RS_UNAVAIL, None),
+       (constants.RS_NORMAL, 4)],
+      ])
+
 
 class TestGetNodeRole(unittest.TestCase):
   def test(self):
@@ -59,6 +59,7 @@ KNOWN_UNUSED_LUXI = compat.UniqueFrozenset([
   luxi.REQ_QUERY_TAGS,
   luxi.REQ_SET_DRAIN_FLAG,
   luxi.REQ_SET_WATCHER_PAUSE,
+  luxi.REQ_WAIT_FOR_JOBS_CHANGE,
   ])
 
 
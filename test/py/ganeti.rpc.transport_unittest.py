@@ -0,0 +1,111 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for unittesting the RPC transport module"""
+
+
+import os
+import threading
+import unittest
+
+from ganeti import constants
+from ganeti.rpc import errors
+from ganeti.rpc import transport
+
+import testutils
+
+
+class TestMessageBuffer(unittest.TestCase):
+  def testEmpty(self):
+    buf = transport._MessageBuffer()
+    self.assertEqual(len(buf), 0)
+    buf.Add("")
+    self.assertEqual(len(buf), 0)
+
+  def testSplit(self):
+    msgs = ["", "a", "hello world", "x" * 10000, ""]
+    data = "".join(msg + constants.LUXI_EOM for msg in msgs) + "tail"
+
+    for chunksize in [1, 2, 3, 7, 4096, len(data)]:
+      buf = transport._MessageBuffer()
+      for i in range(0, len(data), chunksize):
+        buf.Add(data[i:i + chunksize])
+
+      self.assertEqual(len(buf), len(msgs))
+      self.assertEqual([buf.Pop() for _ in msgs], msgs)
+      self.assertEqual(len(buf), 0)
+
+      # The incomplete message is kept until its terminator arrives
+      buf.Add("end" + constants.LUXI_EOM)
+      self.assertEqual(len(buf), 1)
+      self.assertEqual(buf.Pop(), "tailend")
+
+
+class TestFdTransport(unittest.TestCase):
+  def setUp(self):
+    (rfd, wfd) = os.pipe()
+    self.sender = transport.FdTransport((os.open(os.devnull, os.O_RDONLY),
+                                         wfd))
+    self.receiver = transport.FdTransport((rfd,
+                                           os.open(os.devnull, os.O_WRONLY)))
+
+  def tearDown(self):
+    self.sender.Close()
+    self.receiver.Close()
+
+  def testSmallMessages(self):
+    for msg in ["", "foo", "bar baz"]:
+      self.sender.Send(msg)
+    self.assertEqual(self.receiver.Recv(), "")
+    self.assertEqual(self.receiver.Recv(), "foo")
+    self.assertEqual(self.receiver.Recv(), "bar baz")
+
+  def testLargeMessage(self):
+    # Larger than both the copy limit and a pipe buffer
+    msg = "x" * (4 * transport._SEND_COPY_LIMIT + 10)
+    thread = threading.Thread(target=self.sender.Send, args=(msg, ))
+    thread.start()
+    try:
+      self.assertEqual(self.receiver.Recv(), msg)
+    finally:
+      thread.join()
+
+  def testTerminatorInPayload(self):
+    self.assertRaises(errors.ProtocolError, self.sender.Send,
+                      "foo%sbar" % constants.LUXI_EOM)
+
+  def testClosed(self):
+    self.sender.Close()
+    self.assertRaises(errors.ConnectionClosedError, self.receiver.Recv)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -602,6 +602,49 @@ class TestRpcClientBase(unittest.TestCase):
         self.assertEqual(serializer.LoadJson(res.payload),
                          ["foo", hex(num), hash("Hello%s" % num)])
 
+  def testNodeIndependentEncoding(self):
+    resolver = rpc._StaticResolver(["192.0.2.%s" % i for i in range(1, 11)])
+    nodes = ["node%s.example.com" % i for i in range(1, 11)]
+
+    calls = []
+
+    def _Encode(node, value):
+      calls.append(node)
+      return value.upper()
+
+    encoders = {
+      rpc_defs.ED_COMPRESS: _Encode,
+      rpc_defs.ED_SINGLE_DISK_DICT_DP: _Encode,
+      }
+
+    def _VerifyRequest(req):
+      req.success = True
+      req.resp_status_code = http.HTTP_OK
+      req.resp_body = serializer.DumpJson((True, req.post_data))
+
+    http_proc = _FakeRequestProcessor(_VerifyRequest)
+    client = rpc._RpcClientBase(resolver, encoders.get,
+                                _req_process_fn=http_proc)
+
+    for (argkind, count) in [(rpc_defs.ED_COMPRESS, 1),
+                             (rpc_defs.ED_SINGLE_DISK_DICT_DP, len(nodes))]:
+      cdef = ("test_call", NotImplemented, None, constants.RPC_TMO_NORMAL, [
+        ("arg0", None, NotImplemented),
+        ("arg1", argkind, NotImplemented),
+        ], None, None, NotImplemented)
+
+      calls = []
+      result = client._Call(cdef, nodes, ["foo", "bar"])
+      self.assertEqual(len(calls), count)
+      self.assertEqual(len(result), len(nodes))
+      for res in result.values():
+        self.assertFalse(res.fail_msg)
+        self.assertEqual(serializer.LoadJson(res.payload), ["foo", "BAR"])
+
+      calls = []
+      self.assertEqual(client._Call(cdef, [], ["foo", "bar"]), {})
+      self.assertFalse(calls)
+
   def testPostProc(self):
     def _VerifyRequest(nums, req):
       req.success = True
@@ -932,6 +975,39 @@ class TestRpcRunner(unittest.TestCase):
     self.assertTrue(compat.all(disk.params == {} for disk in inst_disks),
                     msg="Configuration objects were modified")
 
+    # Defaults changed in place are used for the next encoding, even though
+    # the cluster's serial number is unchanged
+    cluster.osparams["linux"]["role"] = "database"
+    result = runner._encoder(NotImplemented, (rpc_defs.ED_INST_DICT, inst))
+    self.assertEqual(result["osparams"], {
+      "role": "database",
+      })
+    self.assertEqual(cluster.osparams["linux"], {
+      "role": "database",
+      })
+
+
+class TestConnectionPool(unittest.TestCase):
+  def testMaxIdle(self):
+    # Connections must not be reused after the node daemon closed them
+    self.assertTrue(constants.RPC_CONNECTION_MAX_IDLE <
+                    constants.NODED_KEEP_ALIVE_TIMEOUT)
+    self.assertEqual(rpc._CURL_POOL._max_idle,
+                     constants.RPC_CONNECTION_MAX_IDLE)
+
+  def testLogStats(self):
+    pool = http.client.CurlPool(_curl=object)
+    with testutils.patch_object(rpc, "_CURL_POOL", pool):
+      with testutils.patch_object(rpc.logging, "info") as info_mock:
+        rpc.LogConnectionPoolStats()
+        self.assertFalse(info_mock.called)
+
+        pool.Put("node1", 1811, pool.Get("node1", 1811), True)
+        pool.Get("node1", 1811)
+        rpc.LogConnectionPoolStats()
+        self.assertEqual(info_mock.call_count, 1)
+        self.assertEqual(info_mock.call_args[0][1:], (1, 1, 0, 0))
+
 
 class TestLegacyNodeInfo(unittest.TestCase):
   KEY_BOOT = "bootid"
@@ -182,6 +182,7 @@ class TestSimpleStore(unittest.TestCase):
       "ssconf_cluster_name",
       "ssconf_cluster_tags",
       "ssconf_instance_list",
+      ssconf.SNAPSHOT_FILENAME,
       ]))
 
     self.assertEqual(self._ReadSsFile(constants.SS_CLUSTER_NAME),
@@ -190,6 +191,73 @@ class TestSimpleStore(unittest.TestCase):
                      "value\nwith\nnewlines\n")
     self.assertEqual(self._ReadSsFile(constants.SS_INSTANCE_LIST), "")
 
+  def testWriteFilesSnapshot(self):
+    self.sstore.WriteFiles({
+      constants.SS_CLUSTER_NAME: "cluster.example.com",
+      constants.SS_CLUSTER_TAGS: "value\nwith\nnewlines\n",
+      })
+    self.sstore.WriteFiles({
+      constants.SS_INSTANCE_LIST: "inst1\ninst2",
+      })
+
+    self.assertEqual(ssconf._ParseSnapshot(
+      utils.ReadFile(self.sstore.GetSnapshotFilename())), {
+      constants.SS_CLUSTER_NAME: "cluster.example.com",
+      constants.SS_CLUSTER_TAGS: "value\nwith\nnewlines",
+      constants.SS_INSTANCE_LIST: "inst1\ninst2",
+      })
+
+  def testReadFromSnapshot(self):
+    self.sstore.WriteFiles({
+      constants.SS_CLUSTER_NAME: "cluster.example.com",
+      constants.SS_INSTANCE_LIST: "inst1\ninst2",
+      })
+
+    # Values are taken from the snapshot if it has them
+    utils.RemoveFile(self.sstore.KeyToFilename(constants.SS_CLUSTER_NAME))
+    self.assertEqual(self.sstore.GetClusterName(), "cluster.example.com")
+    self.assertEqual(self.sstore.ReadAll(), {
+      constants.SS_CLUSTER_NAME: "cluster.example.com",
+      constants.SS_INSTANCE_LIST: "inst1\ninst2",
+      })
+
+    # Keys missing in the snapshot are read from their files
+    utils.WriteFile(self.sstore.KeyToFilename(constants.SS_MASTER_NODE),
+                    data="node1.example.com\n")
+    self.assertEqual(self.sstore.GetMasterNode(), "node1.example.com")
+
+  def testReadSnapshotChanged(self):
+    self.sstore.WriteFiles({
+      constants.SS_CLUSTER_NAME: "cluster.example.com",
+      })
+    self.assertEqual(self.sstore.GetClusterName(), "cluster.example.com")
+
+    self.sstore.WriteFiles({
+      constants.SS_CLUSTER_NAME: "other.example.com",
+      })
+    self.assertEqual(self.sstore.GetClusterName(), "other.example.com")
+
+  def testReadWithoutSnapshot(self):
+    self.sstore.WriteFiles({
+      constants.SS_CLUSTER_NAME: "cluster.example.com",
+      })
+    self.sstore.RemoveSnapshot()
+    self.assertFalse(os.path.exists(self.sstore.GetSnapshotFilename()))
+
+    utils.WriteFile(self.sstore.KeyToFilename(constants.SS_CLUSTER_NAME),
+                    data="other.example.com\n")
+    self.assertEqual(self.sstore.GetClusterName(), "other.example.com")
+
+  def testReadInvalidSnapshot(self):
+    utils.WriteFile(self.sstore.KeyToFilename(constants.SS_CLUSTER_NAME),
+                    data="cluster.example.com\n")
+
+    for data in ["", "Hello World", ssconf._SNAPSHOT_HEADER + "cluster_name",
+                 ssconf._SNAPSHOT_HEADER + "cluster_name 100\nshort\n",
+                 ssconf._SNAPSHOT_HEADER + "unknown 1\nx\n"]:
+      utils.WriteFile(self.sstore.GetSnapshotFilename(), data=data)
+      self.assertEqual(self.sstore.GetClusterName(), "cluster.example.com")
+
   def testWriteFilesUnknownKey(self):
     values = {
       "unknown key": "value",
@@ -407,6 +407,44 @@ class TestPublicSshKeys(testutils.GanetiTestCase):
       "789-ABC ssh-dss AAAAB3NzaC1w5256closdj32mZaQU root@key-a\n"
       "123-456 ssh-dss BAasjkakfa234SFSFDA345462AAAB root@key-b\n")
 
+  def testModifyPubKeyFile(self):
+    pub_key_file = self._CreateTempFile()
+    name = "my.precious.node"
+    ssh.AddPublicKey(self.UUID_1, self.KEY_A, key_file=pub_key_file)
+    ssh.AddPublicKey(name, self.KEY_B, key_file=pub_key_file)
+    ssh.ModifyPubKeyFile([
+      (ssh.PUB_KEY_REMOVE, self.UUID_1, None),
+      (ssh.PUB_KEY_ADD, self.UUID_1, self.KEY_B),
+      (ssh.PUB_KEY_ADD, self.UUID_1, self.KEY_B),
+      (ssh.PUB_KEY_RENAME, name, self.UUID_2),
+      (ssh.PUB_KEY_ADD, self.UUID_2, self.KEY_A),
+      (ssh.PUB_KEY_REMOVE, "non-existing-UUID", None),
+      ], key_file=pub_key_file)
+    self.assertFileContent(pub_key_file,
+      "789-ABC ssh-dss BAasjkakfa234SFSFDA345462AAAB root@key-b\n"
+      "123-456 ssh-dss BAasjkakfa234SFSFDA345462AAAB root@key-b\n"
+      "789-ABC ssh-dss AAAAB3NzaC1w5256closdj32mZaQU root@key-a\n")
+
+    result = ssh.QueryPubKeyFile(None, key_file=pub_key_file)
+    self.assertEqual(result, {
+      self.UUID_1: [self.KEY_B],
+      self.UUID_2: [self.KEY_B, self.KEY_A],
+      })
+
+  def testQueryAfterFileChanged(self):
+    pub_key_file = self._CreateTempFile()
+    ssh.AddPublicKey(self.UUID_1, self.KEY_A, key_file=pub_key_file)
+    result = ssh.QueryPubKeyFile(None, key_file=pub_key_file)
+    self.assertEqual(result, {self.UUID_1: [self.KEY_A]})
+
+    # Modifying the result must not affect later queries
+    result[self.UUID_1].append(self.KEY_B)
+
+    utils.WriteFile(pub_key_file,
+                    data="%s %s\n" % (self.UUID_2, self.KEY_B))
+    result = ssh.QueryPubKeyFile(None, key_file=pub_key_file)
+    self.assertEqual(result, {self.UUID_2: [self.KEY_B]})
+
   def testParseEmptyLines(self):
     pub_key_file = self._CreateTempFile()
     ssh.AddPublicKey(self.UUID_1, self.KEY_A, key_file=pub_key_file)
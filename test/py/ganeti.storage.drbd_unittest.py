@@ -36,6 +36,7 @@ import os
 from ganeti import constants
 from ganeti import errors
 from ganeti import serializer
+from ganeti import utils
 from ganeti.storage import drbd
 from ganeti.storage import drbd_info
 from ganeti.storage import drbd_cmdgen
@@ -225,6 +226,42 @@ class TestDRBD8Runner(testutils.GanetiTestCase):
                      "remote_addr" not in result),
                     "Should not find network info")
 
+  def testFastParser(self):
+    """Test that the fast parser agrees with the pyparsing grammar"""
+    for (name, cls) in [("bdev-drbd-8.0.txt", drbd_info.DRBD83ShowInfo),
+                        ("bdev-drbd-8.3.txt", drbd_info.DRBD83ShowInfo),
+                        ("bdev-drbd-net-ip4.txt", drbd_info.DRBD83ShowInfo),
+                        ("bdev-drbd-net-ip6.txt", drbd_info.DRBD83ShowInfo),
+                        ("bdev-drbd-disk.txt", drbd_info.DRBD83ShowInfo)]:
+      data = testutils.ReadTestData(name)
+      self.assertEqual(cls._TransformParseResult(cls._FastParse(data)),
+                       cls.GetDevInfo(data))
+
+    for name in ["bdev-drbd-8.4.txt", "bdev-drbd-8.4-no-disk-params.txt"]:
+      data = testutils.ReadTestData(name)
+      self.assertEqual(drbd_info.DRBD84ShowInfo.GetAllDevInfo(data),
+                       {0: drbd_info.DRBD84ShowInfo.GetDevInfo(data)})
+
+  def testFastParserErrors(self):
+    """Test the fast parser on broken input"""
+    for data in ["net {", "}", "net { timeout 60 }", "protocol C", ";"]:
+      self.assertRaises(errors.BlockDeviceError,
+                        drbd_info.DRBD83ShowInfo._FastParse, data)
+
+  def testGetAllDevInfo84(self):
+    """Test parsing several DRBD 8.4 resources at once"""
+    data = testutils.ReadTestData("bdev-drbd-8.4.txt")
+    other = data.replace("resource0", "resource3") \
+                .replace("minor 0", "minor 3") \
+                .replace("test.data", "other.data")
+    result = drbd_info.DRBD84ShowInfo.GetAllDevInfo(data + other)
+    self.assertEqual(sorted(result.keys()), [0, 3])
+    self.failUnless(self._has_disk(result[0], "/dev/xenvg/test.data",
+                                   "/dev/xenvg/test.meta"))
+    self.failUnless(self._has_disk(result[3], "/dev/xenvg/other.data",
+                                   "/dev/xenvg/test.meta"))
+    self.assertEqual(drbd_info.DRBD84ShowInfo.GetAllDevInfo(""), {})
+
   def testBarriersOptions(self):
     """Test class method that generates drbdsetup options for disk barriers"""
     # Tests that should fail because of wrong version/options combinations
@@ -587,5 +624,74 @@ class TestDRBD8Create(testutils.GanetiTestCase):
     self.assertEqual(dev.Attach(), False)
 
 
+class TestDRBD8Snapshot(testutils.GanetiTestCase):
+  """Testing case for drbd.DRBD8Snapshot"""
+
+  def setUp(self):
+    testutils.GanetiTestCase.setUp(self)
+    self.proc84_info = \
+      drbd_info.DRBD8Info.CreateFromFile(
+        filename=testutils.TestDataFilename("proc_drbd84.txt"))
+    self.show_data = testutils.ReadTestData("bdev-drbd-8.4.txt")
+    self.cmd_gen = drbd_cmdgen.DRBD84CmdGenerator(
+      self.proc84_info.GetVersion())
+    self.commands = []
+
+  def _RunCmd(self, cmd):
+    self.commands.append(cmd)
+    return utils.RunResult(constants.EXIT_SUCCESS, None, self.show_data, "",
+                           cmd, NotImplemented, NotImplemented)
+
+  @testutils.patch_object(drbd.DRBD8, "GetProcInfo")
+  def testProcInfo(self, proc_info):
+    proc_info.return_value = self.proc84_info
+    snapshot = drbd.DRBD8Snapshot()
+    self.assertEqual(snapshot.GetUsedDevs(), drbd.DRBD8.GetUsedDevs())
+    self.assertEqual(snapshot.GetProcInfo(), self.proc84_info)
+    self.assertEqual(proc_info.call_count, 2)
+    snapshot.Invalidate(0)
+    snapshot.GetProcInfo()
+    self.assertEqual(proc_info.call_count, 3)
+
+  @testutils.patch_object(drbd.utils, "RunCmd")
+  def testShowInfo(self, run_cmd):
+    run_cmd.side_effect = self._RunCmd
+    cls = drbd_info.DRBD84ShowInfo
+    snapshot = drbd.DRBD8Snapshot()
+    expected = cls.GetDevInfo(self.show_data)
+
+    self.assertEqual(snapshot.GetShowInfo(0, cls, self.cmd_gen), expected)
+    self.assertEqual(snapshot.GetShowInfo(0, cls, self.cmd_gen), expected)
+    # minors not shown at all are not configured
+    self.assertEqual(snapshot.GetShowInfo(5, cls, self.cmd_gen), {})
+    self.assertEqual(self.commands, [self.cmd_gen.GenShowAllCmd()])
+
+    # a changed minor is shown on its own
+    snapshot.Invalidate(5)
+    self.assertEqual(snapshot.GetShowInfo(5, cls, self.cmd_gen), expected)
+    self.assertEqual(snapshot.GetShowInfo(0, cls, self.cmd_gen), expected)
+    self.assertEqual(self.commands, [self.cmd_gen.GenShowAllCmd(),
+                                     self.cmd_gen.GenShowCmd(5)])
+
+    snapshot.Invalidate()
+    self.assertEqual(snapshot.GetShowInfo(0, cls, self.cmd_gen), expected)
+    self.assertEqual(len(self.commands), 3)
+
+  @testutils.patch_object(drbd.utils, "RunCmd")
+  def testShowInfoSingle(self, run_cmd):
+    run_cmd.side_effect = self._RunCmd
+    self.show_data = testutils.ReadTestData("bdev-drbd-8.3.txt")
+    cls = drbd_info.DRBD83ShowInfo
+    cmd_gen = drbd_cmdgen.DRBD83CmdGenerator(self.proc84_info.GetVersion())
+    snapshot = drbd.DRBD8Snapshot()
+    expected = cls.GetDevInfo(self.show_data)
+
+    self.assertEqual(snapshot.GetShowInfo(1, cls, cmd_gen), expected)
+    self.assertEqual(snapshot.GetShowInfo(1, cls, cmd_gen), expected)
+    self.assertEqual(snapshot.GetShowInfo(2, cls, cmd_gen), expected)
+    self.assertEqual(self.commands, [cmd_gen.GenShowCmd(1),
+                                     cmd_gen.GenShowCmd(2)])
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
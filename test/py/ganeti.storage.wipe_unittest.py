@@ -0,0 +1,152 @@
+#!/usr/bin/python
+#
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for unittesting the ganeti.storage.wipe module"""
+
+import errno
+import unittest
+
+from ganeti import utils
+from ganeti.storage import wipe
+
+import testutils
+
+
+_MIB = 1024 * 1024
+
+
+class TestWipeDevice(testutils.GanetiTestCase):
+  def setUp(self):
+    testutils.GanetiTestCase.setUp(self)
+    self.path = self._CreateTempFile()
+    utils.WriteFile(self.path, data="x" * (6 * _MIB))
+
+  def _CheckContents(self, offset, size):
+    data = utils.ReadFile(self.path)
+    self.assertEqual(len(data), 6 * _MIB)
+    self.assertEqual(data[:offset * _MIB], "x" * (offset * _MIB))
+    self.assertEqual(data[offset * _MIB:(offset + size) * _MIB],
+                     "\0" * (size * _MIB))
+    self.assertEqual(data[(offset + size) * _MIB:],
+                     "x" * ((6 - offset - size) * _MIB))
+
+  def testFile(self):
+    self.assertEqual(wipe.GetWipeMethods(self.path), [wipe.WIPE_METHOD_WRITE])
+
+    progress = []
+    method = wipe.WipeDevice(self.path, 1, 3,
+                             lambda *args: progress.append(args))
+    self.assertEqual(method, wipe.WIPE_METHOD_WRITE)
+    # Steps are at least 1 MiB
+    self.assertEqual(progress, [
+      (wipe.WIPE_METHOD_WRITE, 1),
+      (wipe.WIPE_METHOD_WRITE, 2),
+      (wipe.WIPE_METHOD_WRITE, 3),
+      ])
+    self._CheckContents(1, 3)
+
+  def testStepSize(self):
+    for (size, step) in [(0, 1), (5, 1), (19, 1), (20, 2), (4096, 409),
+                         (10240, 1024), (1024 * 1024, 1024)]:
+      self.assertEqual(wipe._GetStepSize(size), step)
+
+  def testSteps(self):
+    progress = []
+    with testutils.patch_object(wipe, "WIPE_STEP_SIZE", 2):
+      with testutils.patch_object(wipe, "WIPE_STEP_PERCENT", 100):
+        wipe.WipeDevice(self.path, 0, 5, lambda *args: progress.append(args))
+    self.assertEqual(progress, [
+      (wipe.WIPE_METHOD_WRITE, 2),
+      (wipe.WIPE_METHOD_WRITE, 4),
+      (wipe.WIPE_METHOD_WRITE, 5),
+      ])
+    self._CheckContents(0, 5)
+
+  def testFallback(self):
+    methods = [wipe.WIPE_METHOD_DISCARD, wipe.WIPE_METHOD_ZEROOUT,
+               wipe.WIPE_METHOD_WRITE]
+    ioctls = []
+
+    def _Ioctl(fd, request, start, length):
+      ioctls.append(request)
+      raise IOError(errno.ENOTTY, "Inappropriate ioctl for device")
+
+    progress = []
+    with testutils.patch_object(wipe, "GetWipeMethods", lambda _: methods):
+      with testutils.patch_object(wipe, "_ZeroRangeIoctl", _Ioctl):
+        method = wipe.WipeDevice(self.path, 2, 4,
+                                 lambda *args: progress.append(args))
+    self.assertEqual(method, wipe.WIPE_METHOD_WRITE)
+    self.assertEqual(ioctls, [wipe.BLKDISCARD, wipe.BLKZEROOUT])
+    self.assertEqual(progress, [(wipe.WIPE_METHOD_WRITE, i)
+                                for i in range(1, 5)])
+    self._CheckContents(2, 4)
+
+  def testIoctl(self):
+    ioctls = []
+
+    def _Ioctl(fd, request, start, length):
+      ioctls.append((request, start, length))
+
+    progress = []
+    with testutils.patch_object(wipe, "GetWipeMethods",
+                                lambda _: [wipe.WIPE_METHOD_WRITE_SAME,
+                                           wipe.WIPE_METHOD_WRITE]):
+      with testutils.patch_object(wipe, "WIPE_STEP_SIZE", 3):
+        with testutils.patch_object(wipe, "WIPE_STEP_PERCENT", 100):
+          with testutils.patch_object(wipe, "_ZeroRangeIoctl", _Ioctl):
+            method = wipe.WipeDevice(self.path, 1, 5,
+                                     lambda *args: progress.append(args))
+    self.assertEqual(method, wipe.WIPE_METHOD_WRITE_SAME)
+    self.assertEqual(ioctls, [
+      (wipe.BLKZEROOUT, 1 * _MIB, 3 * _MIB),
+      (wipe.BLKZEROOUT, 4 * _MIB, 2 * _MIB),
+      ])
+    self.assertEqual(progress, [
+      (wipe.WIPE_METHOD_WRITE_SAME, 3),
+      (wipe.WIPE_METHOD_WRITE_SAME, 5),
+      ])
+    # Nothing was written by the test itself
+    self._CheckContents(0, 0)
+
+  def testOtherError(self):
+    def _Ioctl(*_):
+      raise IOError(errno.EIO, "Input/output error")
+
+    with testutils.patch_object(wipe, "GetWipeMethods",
+                                lambda _: [wipe.WIPE_METHOD_ZEROOUT,
+                                           wipe.WIPE_METHOD_WRITE]):
+      with testutils.patch_object(wipe, "_ZeroRangeIoctl", _Ioctl):
+        self.assertRaises(IOError, wipe.WipeDevice, self.path, 0, 1)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -447,6 +447,20 @@ class TestRunCmd(testutils.GanetiTestCase):
     finally:
       temp.close()
 
+  def testFdsNotInherited(self):
+    temp = open(self.fname, "r+")
+    try:
+      result = utils.RunCmd(["/bin/bash", "-c",
+                             "test -e /proc/self/fd/%s" % temp.fileno()])
+      self.assertTrue(result.failed)
+    finally:
+      temp.close()
+
+  def testLargeOutput(self):
+    result = utils.RunCmd("head -c 1000000 /dev/zero")
+    self.assertFalse(result.failed)
+    self.assertEqual(result.stdout, "\0" * 1000000)
+
   def testOutputAndInteractive(self):
     self.assertRaises(errors.ProgrammerError, utils.RunCmd,
                       [], output=self.fname, interactive=True)
@@ -456,6 +470,77 @@ class TestRunCmd(testutils.GanetiTestCase):
                       [], output=self.fname, input_fd=open(self.fname))
 
 
+class TestCommandStats(unittest.TestCase):
+  def setUp(self):
+    utils.ResetCommandStats()
+
+  def tearDown(self):
+    utils.ResetCommandStats()
+
+  def testStats(self):
+    self.assertEqual(utils.GetCommandStats(), {})
+
+    self.assertFalse(utils.RunCmd(["true"]).failed)
+    self.assertTrue(utils.RunCmd(["false"]).failed)
+    self.assertTrue(utils.RunCmd(["false"]).failed)
+    self.assertTrue(utils.RunCmd(["sleep", "10"],
+                                 timeout=0.1).failed_by_timeout)
+    self.assertFalse(utils.RunCmd("true && true").failed)
+
+    stats = utils.GetCommandStats()
+    self.assertEqual(sorted(stats.keys()), ["false", "sleep", "true"])
+    self.assertEqual([(stats[program]["count"], stats[program]["failed"],
+                       stats[program]["timeouts"])
+                      for program in ["false", "sleep", "true"]],
+                     [(2, 2, 0), (1, 1, 1), (2, 0, 0)])
+    for program_stats in stats.values():
+      self.assertEqual(len(program_stats["histogram"]),
+                       len(utils.CMD_DURATION_BUCKETS) + 1)
+      self.assertEqual(sum(program_stats["histogram"]),
+                       program_stats["count"])
+      self.assertTrue(program_stats["total_time"] > 0)
+
+    # Returned statistics are a copy
+    stats["true"]["histogram"][0] += 10
+    self.assertEqual(sum(utils.GetCommandStats()["true"]["histogram"]), 2)
+
+  def testNotFound(self):
+    self.assertRaises(errors.OpExecError, utils.RunCmd,
+                      ["/some/path/that/does/not/exist"])
+    stats = utils.GetCommandStats()
+    self.assertEqual(stats["/some/path/that/does/not/exist"]["failed"], 1)
+
+  def testReset(self):
+    utils.RunCmd(["true"])
+    utils.ResetCommandStats()
+    self.assertEqual(utils.GetCommandStats(), {})
+
+  def testMerge(self):
+    self.assertEqual(utils.MergeCommandStats({}, {}), {})
+
+    utils.RunCmd(["true"])
+    utils.RunCmd(["false"])
+    first = utils.GetCommandStats()
+    utils.ResetCommandStats()
+    utils.RunCmd(["true"])
+    second = utils.GetCommandStats()
+
+    merged = utils.MergeCommandStats(first, second)
+    self.assertEqual(sorted(merged.keys()), ["false", "true"])
+    self.assertEqual(merged["false"], first["false"])
+    self.assertEqual(merged["true"]["count"], 2)
+    self.assertEqual(sum(merged["true"]["histogram"]), 2)
+    self.assertEqual(merged["true"]["total_time"],
+                     first["true"]["total_time"] +
+                     second["true"]["total_time"])
+
+    # The input statistics are not modified
+    self.assertEqual(first["true"]["count"], 1)
+    self.assertEqual(sum(first["true"]["histogram"]), 1)
+    merged["false"]["histogram"][0] += 10
+    self.assertEqual(sum(first["false"]["histogram"]), 1)
+
+
 class TestRunParts(testutils.GanetiTestCase):
   """Testing case for the RunParts function"""
 
@@ -0,0 +1,318 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for unittesting the watcher module"""
+
+import itertools
+import unittest
+from cStringIO import StringIO
+
+from ganeti import cli
+from ganeti import compat
+from ganeti import constants
+from ganeti import errors
+from ganeti import opcodes
+from ganeti import watcher
+from ganeti.watcher import state
+
+import testutils
+
+
+class _FakeLuxiClient(object):
+  """Fake LUXI client running single-opcode jobs on instances.
+
+  @ivar batches: Names of the instances of every C{SubmitManyJobs} call
+  @ivar ops: All submitted opcodes
+
+  """
+  def __init__(self, failing=frozenset(), rejected=frozenset(),
+               unsubmittable=frozenset()):
+    """Initializes this class.
+
+    @param failing: Instances whose jobs fail
+    @param rejected: Instances whose jobs are rejected on submission
+    @param unsubmittable: Instances whose batch fails to be submitted
+
+    """
+    self._failing = failing
+    self._rejected = rejected
+    self._unsubmittable = unsubmittable
+    self._job_ids = itertools.count(1000)
+    self._jobs = {}
+    self.batches = []
+    self.ops = []
+
+  def SubmitManyJobs(self, jobs):
+    names = []
+    for job in jobs:
+      (op, ) = job
+      names.append(op.instance_name)
+      self.ops.append(op)
+    self.batches.append(names)
+
+    if self._unsubmittable.intersection(names):
+      raise errors.ProgrammerError("Submitting jobs failed")
+
+    result = []
+    for (op, ) in jobs:
+      if op.instance_name in self._rejected:
+        result.append((False, "Job rejected"))
+      else:
+        job_id = str(self._job_ids.next())
+        self._jobs[job_id] = op
+        result.append((True, job_id))
+    return result
+
+  def PollJob(self, job_id, cl=None, feedback_fn=None):
+    assert cl is self
+    assert callable(feedback_fn)
+
+    op = self._jobs.pop(job_id)
+    if op.instance_name in self._failing:
+      raise errors.OpExecError("Job for %s failed" % op.instance_name)
+
+    return [op.instance_name]
+
+  def GetSubmittedNames(self):
+    return sorted(op.instance_name for op in self.ops)
+
+
+class _WatcherTestCase(unittest.TestCase):
+  def setUp(self):
+    self.patcher = testutils.patch_object(cli, "PollJob")
+    self.poll_fn = self.patcher.start()
+
+  def tearDown(self):
+    self.patcher.stop()
+
+  def _GetClient(self, **kwargs):
+    client = _FakeLuxiClient(**kwargs)
+    self.poll_fn.side_effect = client.PollJob
+    return client
+
+
+class TestRunJobs(_WatcherTestCase):
+  @staticmethod
+  def _MakeOps(count):
+    return [opcodes.OpInstanceStartup(instance_name="inst%s" % i)
+            for i in range(count)]
+
+  def testBatchSizes(self):
+    for max_parallel in [1, 2, 5]:
+      for count in [0, 1, max_parallel - 1, max_parallel, max_parallel + 1,
+                    2 * max_parallel, 2 * max_parallel + 1]:
+        cl = self._GetClient()
+        ops = self._MakeOps(count)
+
+        results = watcher._RunJobs(cl, ops, max_parallel, None)
+
+        exp_batches = [ops[i:i + max_parallel]
+                       for i in range(0, count, max_parallel)]
+        self.assertEqual(cl.batches,
+                         [[op.instance_name for op in batch]
+                          for batch in exp_batches])
+        self.assertTrue(compat.all(len(batch) <= max_parallel
+                                   for batch in cl.batches))
+        self.assertEqual(results,
+                         [(True, op.instance_name) for op in ops])
+
+  def testPriority(self):
+    cl = self._GetClient()
+    ops = self._MakeOps(5)
+
+    watcher._RunJobs(cl, ops, 2, constants.OP_PRIO_LOW)
+
+    self.assertEqual(cl.ops, ops)
+    self.assertEqual([op.priority for op in cl.ops],
+                     [constants.OP_PRIO_LOW] * 5)
+
+  def testDefaultPriority(self):
+    cl = self._GetClient()
+    ops = self._MakeOps(3)
+    priorities = [getattr(op, "priority", None) for op in ops]
+
+    watcher._RunJobs(cl, ops, 2, None)
+
+    self.assertEqual([getattr(op, "priority", None) for op in cl.ops],
+                     priorities)
+
+  def testFailuresDontStopLaterBatches(self):
+    cl = self._GetClient(failing=frozenset(["inst1"]),
+                         rejected=frozenset(["inst2"]),
+                         unsubmittable=frozenset(["inst4"]))
+    ops = self._MakeOps(7)
+
+    results = watcher._RunJobs(cl, ops, 2, None)
+
+    self.assertEqual(cl.batches, [
+      ["inst0", "inst1"],
+      ["inst2", "inst3"],
+      ["inst4", "inst5"],
+      ["inst6"],
+      ])
+    self.assertEqual([success for (success, _) in results],
+                     [True, False, False, True, False, False, True])
+    self.assertTrue(isinstance(results[1][1], errors.OpExecError))
+    self.assertTrue(isinstance(results[2][1], errors.GenericError))
+    self.assertTrue(isinstance(results[4][1], errors.ProgrammerError))
+    self.assertTrue(isinstance(results[5][1], errors.ProgrammerError))
+    self.assertEqual([results[i][1] for i in [0, 3, 6]],
+                     ["inst0", "inst3", "inst6"])
+
+
+def _MakeInstance(name, status, disks_active=True):
+  return watcher.Instance(name, status, constants.ADMINST_UP,
+                          constants.ADMIN_SOURCE, disks_active, [],
+                          constants.DT_DRBD8)
+
+
+class TestCheckInstances(_WatcherTestCase):
+  def testRestart(self):
+    cl = self._GetClient(failing=frozenset(["down3"]))
+    notepad = state.WatcherState(StringIO())
+
+    for _ in range(watcher.MAXTRIES):
+      notepad.RecordRestartAttempt("exhausted")
+    notepad.RecordRestartAttempt("running")
+
+    instances = dict((inst.name, inst) for inst in [
+      _MakeInstance("down1", constants.INSTST_ERRORDOWN),
+      _MakeInstance("down2", constants.INSTST_ERRORDOWN),
+      _MakeInstance("down3", constants.INSTST_ERRORDOWN),
+      _MakeInstance("exhausted", constants.INSTST_ERRORDOWN),
+      _MakeInstance("running", constants.INSTST_RUNNING),
+      _MakeInstance("nodedown", constants.INSTST_NODEDOWN),
+      ])
+
+    started = watcher._CheckInstances(cl, notepad, instances, [],
+                                      max_parallel=2,
+                                      priority=constants.OP_PRIO_HIGH)
+
+    # Only successful restarts count as started
+    self.assertEqual(started, set(["down1", "down2"]))
+
+    self.assertEqual([len(batch) for batch in cl.batches], [2, 1])
+    self.assertEqual(cl.GetSubmittedNames(), ["down1", "down2", "down3"])
+    for op in cl.ops:
+      self.assertTrue(isinstance(op, opcodes.OpInstanceStartup))
+      self.assertEqual(op.priority, constants.OP_PRIO_HIGH)
+
+    # Attempts are recorded when the restart is queued, whether it succeeds
+    # or not
+    for name in ["down1", "down2", "down3"]:
+      self.assertEqual(notepad.NumberOfRestartAttempts(name), 1)
+    self.assertEqual(notepad.NumberOfRestartAttempts("exhausted"),
+                     watcher.MAXTRIES + 1)
+    self.assertEqual(notepad.NumberOfRestartAttempts("running"), 0)
+    self.assertEqual(notepad.NumberOfRestartAttempts("nodedown"), 0)
+
+  def testNothingToRestart(self):
+    cl = self._GetClient()
+    notepad = state.WatcherState(StringIO())
+    instances = {
+      "inst1": _MakeInstance("inst1", constants.INSTST_RUNNING),
+      }
+
+    started = watcher._CheckInstances(cl, notepad, instances, [],
+                                      max_parallel=2)
+
+    self.assertEqual(started, set())
+    self.assertEqual(cl.batches, [])
+
+
+class TestCheckDisks(_WatcherTestCase):
+  def testActivateDisks(self):
+    cl = self._GetClient(failing=frozenset(["inst4"]))
+    notepad = state.WatcherState(StringIO())
+    notepad.SetNodeBootID("node1", "old1")
+    notepad.SetNodeBootID("node2", "old2")
+    notepad.SetNodeBootID("node3", "same")
+
+    nodes = dict((node.name, node) for node in [
+      # Rebooted nodes
+      watcher.Node("node1", "new1", False,
+                   ["inst1", "inst2", "inst3", "inst4", "missing"]),
+      watcher.Node("node2", "new2", False, ["inst1", "inst5", "inst6"]),
+      # Not rebooted
+      watcher.Node("node3", "same", False, ["inst7"]),
+      # Not returning a boot ID
+      watcher.Node("node4", None, False, ["inst8"]),
+      ])
+
+    instances = dict((inst.name, inst) for inst in [
+      _MakeInstance("inst1", constants.INSTST_RUNNING),
+      _MakeInstance("inst2", constants.INSTST_RUNNING, disks_active=False),
+      _MakeInstance("inst3", constants.INSTST_RUNNING),
+      _MakeInstance("inst4", constants.INSTST_RUNNING),
+      _MakeInstance("inst5", constants.INSTST_RUNNING),
+      _MakeInstance("inst6", constants.INSTST_RUNNING),
+      _MakeInstance("inst7", constants.INSTST_RUNNING),
+      _MakeInstance("inst8", constants.INSTST_RUNNING),
+      ])
+
+    watcher._CheckDisks(cl, notepad, nodes, instances, set(["inst3"]),
+                        max_parallel=2, priority=constants.OP_PRIO_LOW)
+
+    # inst1 has secondaries on both rebooted nodes, but its disks are only
+    # activated once; inst2's disks aren't active and inst3 was just started
+    self.assertEqual(cl.GetSubmittedNames(),
+                     ["inst1", "inst4", "inst5", "inst6"])
+    self.assertEqual([len(batch) for batch in cl.batches], [2, 2])
+    for op in cl.ops:
+      self.assertTrue(isinstance(op, opcodes.OpInstanceActivateDisks))
+      self.assertEqual(op.priority, constants.OP_PRIO_LOW)
+
+    # The failed activation of inst4 doesn't keep the new boot IDs from
+    # being recorded
+    self.assertEqual(notepad.GetNodeBootID("node1"), "new1")
+    self.assertEqual(notepad.GetNodeBootID("node2"), "new2")
+    self.assertEqual(notepad.GetNodeBootID("node3"), "same")
+    self.assertEqual(notepad.GetNodeBootID("node4"), None)
+
+  def testNoRebootedNodes(self):
+    cl = self._GetClient()
+    notepad = state.WatcherState(StringIO())
+    notepad.SetNodeBootID("node1", "same")
+
+    nodes = {
+      "node1": watcher.Node("node1", "same", False, ["inst1"]),
+      }
+    instances = {
+      "inst1": _MakeInstance("inst1", constants.INSTST_RUNNING),
+      }
+
+    watcher._CheckDisks(cl, notepad, nodes, instances, set(),
+                        max_parallel=2)
+
+    self.assertEqual(cl.batches, [])
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -486,5 +486,57 @@ class TestWorkerpool(unittest.TestCase):
       self._CheckWorkerCount(wp, 0)
 
 
+class TestParallelMap(unittest.TestCase):
+  def testEmpty(self):
+    self.assertEqual(workerpool.ParallelMap("Test", NotImplemented, [], 4), [])
+
+  def testOrder(self):
+    items = range(100)
+    result = workerpool.ParallelMap("Test", lambda i: i * 2, items, 7)
+    self.assertEqual(result, [(True, i * 2) for i in items])
+
+  def testErrors(self):
+    def _Fn(i):
+      if i % 3 == 0:
+        raise errors.GenericError("item %s" % i)
+      return i
+
+    result = workerpool.ParallelMap("Test", _Fn, range(10), 3)
+    self.assertEqual(len(result), 10)
+    for (i, (success, value)) in enumerate(result):
+      if i % 3 == 0:
+        self.assertFalse(success)
+        self.assertTrue(isinstance(value, errors.GenericError))
+        self.assertEqual(str(value), "item %s" % i)
+      else:
+        self.assertTrue(success)
+        self.assertEqual(value, i)
+
+  def testConcurrencyLimit(self):
+    lock = threading.Lock()
+    state = {
+      "running": 0,
+      "max": 0,
+      }
+
+    def _Fn(_):
+      lock.acquire()
+      try:
+        state["running"] += 1
+        state["max"] = max(state["max"], state["running"])
+      finally:
+        lock.release()
+      time.sleep(0.01)
+      lock.acquire()
+      try:
+        state["running"] -= 1
+      finally:
+        lock.release()
+
+    workerpool.ParallelMap("Test", _Fn, range(20), 4)
+    self.assertTrue(state["max"] <= 4)
+    self.assertEqual(state["running"], 0)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -0,0 +1,152 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for comparing row-wise and column-wise query performance"""
+
+import sys
+import time
+import optparse
+
+from ganeti import constants
+from ganeti import objects
+from ganeti import query
+
+
+#: Fields used if none are given on the command line
+_DEFAULT_FIELDS = [
+  "name", "uuid", "os", "hypervisor", "disk_template", "network_port",
+  "serial_no", "admin_state", "disks_active", "be/maxmem", "be/vcpus",
+  "tags", "ctime", "mtime",
+  ]
+
+
+def ParseOptions():
+  """Parses the command line options.
+
+  In case of command line errors, it will show the usage and exit the
+  program.
+
+  @return: the options in a tuple
+
+  """
+  parser = optparse.OptionParser()
+  parser.add_option("-n", dest="count", default=10000, type="int",
+                    help="Number of instances", metavar="NUM")
+  parser.add_option("-r", dest="repeat", default=5, type="int",
+                    help="Number of repetitions", metavar="NUM")
+  parser.add_option("-o", dest="fields", default=",".join(_DEFAULT_FIELDS),
+                    help="Comma-separated list of instance fields",
+                    metavar="FIELDS")
+  parser.add_option("-F", dest="qfilter", default=None,
+                    help="Filter on instance names (regular expression)",
+                    metavar="REGEX")
+
+  (opts, args) = parser.parse_args()
+
+  if opts.count < 1 or opts.repeat < 1:
+    parser.error("Number of instances and repetitions must be at least 1")
+
+  return (opts, args)
+
+
+def _BuildQueryData(count):
+  """Builds a synthetic instance query data container.
+
+  """
+  cluster = objects.Cluster(cluster_name="cluster.example.com",
+    hvparams=constants.HVC_DEFAULTS,
+    beparams={
+      constants.PP_DEFAULT: constants.BEC_DEFAULTS,
+      },
+    nicparams={
+      constants.PP_DEFAULT: constants.NICC_DEFAULTS,
+      },
+    os_hvp={},
+    osparams={})
+
+  instances = [
+    objects.Instance(name="inst%d.example.com" % i,
+                     uuid="4f7d6e9c-0000-4000-8000-%012d" % i,
+                     os="debian-image", hypervisor=constants.HT_KVM,
+                     disk_template=constants.DT_PLAIN, network_port=i,
+                     admin_state=constants.ADMINST_UP, disks_active=True,
+                     serial_no=i % 7, ctime=1234567890.0 + i, mtime=None,
+                     hvparams={}, beparams={}, osparams={}, nics=[],
+                     tags=set(["tag%d" % (i % 13)]))
+    for i in range(count)]
+
+  return query.InstanceQueryData(instances, cluster, None, [], [], {},
+                                 set(), {}, None, None, None)
+
+
+def _Run(q, data, repeat, columnar):
+  """Runs a query multiple times and returns the best time.
+
+  """
+  best = None
+  for _ in range(repeat):
+    start = time.time()
+    result = q.Query(data, columnar=columnar)
+    duration = time.time() - start
+    if best is None or duration < best:
+      best = duration
+  return (best, result)
+
+
+def main():
+  (opts, _) = ParseOptions()
+
+  if opts.qfilter:
+    qfilter = ["=~", "name", opts.qfilter]
+  else:
+    qfilter = None
+
+  q = query.Query(query.INSTANCE_FIELDS, opts.fields.split(","),
+                  qfilter=qfilter, namefield="name")
+  data = _BuildQueryData(opts.count)
+
+  (rowtime, rowresult) = _Run(q, data, opts.repeat, False)
+  (coltime, colresult) = _Run(q, data, opts.repeat, True)
+
+  if rowresult != colresult:
+    print "Results differ between row-wise and column-wise execution!"
+    return 1
+
+  print "Instances: %d, result rows: %d, fields: %d" % \
+    (opts.count, len(rowresult), len(q.GetFields()))
+  print "Row-wise: %0.3fs" % rowtime
+  print "Column-wise: %0.3fs (%0.1f%%)" % (coltime, 100.0 * coltime / rowtime)
+
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -699,7 +699,9 @@ class ConfigMock(config.ConfigWriter):
     self._master_node = self.AddNewNode(uuid=master_node_uuid)
 
   def _OpenConfig(self, _accept_foreign, force=False):
-    self._config_data = self._mocked_config_store
+    # The mock modifies the configuration data in place, so the secondary
+    # indexes have to be rebuilt for every access
+    self._SetConfigData(self._mocked_config_store)
 
   def _WriteConfig(self, destination=None, releaselock=False):
     self._mocked_config_store = self._ConfigData()
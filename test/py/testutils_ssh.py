@@ -33,6 +33,7 @@
 from ganeti import constants
 from ganeti import pathutils
 from ganeti import errors
+from ganeti import ssh
 
 from collections import namedtuple
 
@@ -760,4 +761,23 @@ class FakeSshFileManager(object):
         self._public_keys[self._master_node_name][node_name][:]
       del self._public_keys[self._master_node_name][node_name]
     self._AssertTypePublicKeys()
+
+  def ModifyPubKeyFile(self, changes, **kwargs):
+    """Emulates ssh.ModifyPubKeyFile on the master node.
+
+    Instead of actually mainpulating the public key file, this method
+    keeps the state of the file in a dictionary in memory.
+
+    @see: C{ssh.ModifyPubKeyFile}
+
+    """
+    for (action, identifier, value) in changes:
+      if action == ssh.PUB_KEY_ADD:
+        self.AddPublicKey(identifier, value)
+      elif action == ssh.PUB_KEY_REMOVE:
+        self.RemovePublicKey(identifier)
+      elif action == ssh.PUB_KEY_RENAME:
+        self.ReplaceNameByUuid(value, identifier)
+      else:
+        raise AssertionError("Unknown action '%s'" % action)
   # pylint: enable=W0613
@@ -0,0 +1,176 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2026 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for comparing row-wise and column-wise query performance"""
+"""Script for measuring LUXI transport throughput on large messages"""
+
+import os
+import sys
+import time
+import optparse
+import threading
+
+from ganeti import constants
+from ganeti.rpc import transport
+
+
+#: Read size used by the transports before receive buffers were chunked
+_LEGACY_RECV_SIZE = 4096
+
+
+def ParseOptions():
+  """Parses the command line options.
+
+  In case of command line errors, it will show the usage and exit the
+  program.
+
+  @return: the options in a tuple
+
+  """
+  parser = optparse.OptionParser()
+  parser.add_option("-s", dest="sizes", default="1,10,50",
+                    help="Comma-separated list of message sizes in MiB",
+                    metavar="SIZES")
+  parser.add_option("-r", dest="repeat", default=3, type="int",
+                    help="Number of repetitions", metavar="NUM")
+  parser.add_option("-l", dest="legacy", default=False, action="store_true",
+                    help=("Also measure splitting with the previous"
+                          " algorithm (very slow for large messages)"))
+
+  (opts, args) = parser.parse_args()
+
+  if opts.repeat < 1:
+    parser.error("Number of repetitions must be at least 1")
+
+  try:
+    opts.sizes = [int(i) for i in opts.sizes.split(",")]
+  except ValueError:
+    parser.error("Invalid message sizes: %s" % opts.sizes)
+
+  return (opts, args)
+
+
+def _LegacySplit(data):
+  """Splits data into messages the way the transports used to.
+
+  """
+  buf = ""
+  msgs = []
+  for i in range(0, len(data), _LEGACY_RECV_SIZE):
+    new_msgs = (buf + data[i:i + _LEGACY_RECV_SIZE]).split(constants.LUXI_EOM)
+    buf = new_msgs.pop()
+    msgs.extend(new_msgs)
+  return msgs
+
+
+def _BufferSplit(data):
+  """Splits data into messages using L{transport._MessageBuffer}.
+
+  """
+  buf = transport._MessageBuffer() # pylint: disable=W0212
+  for i in range(0, len(data), _LEGACY_RECV_SIZE):
+    buf.Add(data[i:i + _LEGACY_RECV_SIZE])
+  return [buf.Pop() for _ in range(len(buf))]
+
+
+def _TransferOnce(msg):
+  """Sends a message through a pipe using L{transport.FdTransport}.
+
+  @return: the time it took until the message was received
+
+  """
+  (rfd, wfd) = os.pipe()
+
+  sender = transport.FdTransport((os.open(os.devnull, os.O_RDONLY), wfd))
+  receiver = transport.FdTransport((rfd, os.open(os.devnull, os.O_WRONLY)))
+  try:
+    thread = threading.Thread(target=sender.Send, args=(msg, ))
+
+    start = time.time()
+    thread.start()
+    result = receiver.Recv()
+    duration = time.time() - start
+
+    thread.join()
+  finally:
+    sender.Close()
+    receiver.Close()
+
+  assert len(result) == len(msg)
+
+  return duration
+
+
+def _Best(fn, repeat):
+  """Runs a function multiple times and returns the best time.
+
+  """
+  best = None
+  for _ in range(repeat):
+    start = time.time()
+    fn()
+    duration = time.time() - start
+    if best is None or duration < best:
+      best = duration
+  return best
+
+
+def _FormatRate(size, duration):
+  """Formats a transfer rate in MiB/s.
+
+  """
+  return "%0.3fs (%0.1f MiB/s)" % (duration, size / max(duration, 1e-6))
+
+
+def main():
+  (opts, _) = ParseOptions()
+
+  for size in opts.sizes:
+    msg = "x" * (size * 1024 * 1024)
+    data = msg + constants.LUXI_EOM
+
+    print "Message size: %d MiB" % size
+
+    duration = min(_TransferOnce(msg) for _ in range(opts.repeat))
+    print "  Pipe transfer: %s" % _FormatRate(size, duration)
+
+    duration = _Best(lambda: _BufferSplit(data), opts.repeat)
+    print "  Buffer split: %s" % _FormatRate(size, duration)
+
+    if opts.legacy:
+      duration = _Best(lambda: _LegacySplit(data), opts.repeat)
+      print "  Legacy split: %s" % _FormatRate(size, duration)
+
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())